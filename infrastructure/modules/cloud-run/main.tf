@@ -41,6 +41,16 @@ resource "google_cloud_run_v2_service" "api" {
         value = var.region
       }
 
+      env {
+        name  = "WEB_CONCURRENCY"
+        value = tostring(var.web_concurrency)
+      }
+
+      env {
+        name  = "FORWARDED_ALLOW_IPS"
+        value = var.forwarded_allow_ips
+      }
+
       # PayPay credentials from Secret Manager
       dynamic "env" {
         for_each = var.paypay_api_key_secret_id != "" ? [1] : []
@@ -83,8 +93,8 @@ resource "google_cloud_run_v2_service" "api" {
 
       resources {
         limits = {
-          cpu    = "1"
-          memory = "512Mi"
+          cpu    = var.cpu
+          memory = var.memory
         }
       }
 
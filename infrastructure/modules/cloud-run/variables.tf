@@ -48,3 +48,28 @@ variable "paypay_merchant_id_secret_id" {
   type        = string
   default     = ""
 }
+
+# Container resources
+variable "cpu" {
+  description = "vCPUs per instance"
+  type        = string
+  default     = "1"
+}
+
+variable "memory" {
+  description = "Memory per instance (each worker process holds its own clients)"
+  type        = string
+  default     = "512Mi"
+}
+
+variable "web_concurrency" {
+  description = "uvicorn worker processes per instance (0 = one per vCPU)"
+  type        = number
+  default     = 1
+}
+
+variable "forwarded_allow_ips" {
+  description = "Proxy addresses whose X-Forwarded-For is trusted (Cloud Run front end connects from link-local addresses)"
+  type        = string
+  default     = "169.254.0.0/16"
+}
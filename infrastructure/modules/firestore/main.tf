@@ -60,3 +60,20 @@ resource "google_firestore_index" "donations_source_created" {
     order      = "DESCENDING"
   }
 }
+
+# provider + createdAt (for listing donations by payment provider)
+resource "google_firestore_index" "donations_provider_created" {
+  project    = var.project_id
+  database   = google_firestore_database.main.name
+  collection = "donations"
+
+  fields {
+    field_path = "provider"
+    order      = "ASCENDING"
+  }
+
+  fields {
+    field_path = "createdAt"
+    order      = "DESCENDING"
+  }
+}
@@ -8,12 +8,36 @@ from app.adapters.base import (
     ProviderError,
     WebhookVerificationResult,
 )
+from app.adapters.circuit_breaker import (
+    CircuitBreaker,
+    CircuitBreakerAdapter,
+    CircuitBreakerConfig,
+    CircuitOpenError,
+    CircuitState,
+)
+from app.adapters.concurrency_limit import (
+    AIMDLimiter,
+    ConcurrencyLimitAdapter,
+    ConcurrencyLimitConfig,
+    ConcurrencyLimitExceededError,
+)
 from app.adapters.paypay import PayPayAdapter
 from app.adapters.rakuten import RakutenPayAdapter
+from app.adapters.registry import AdapterRegistry
 
 __all__ = [
+    "AIMDLimiter",
+    "AdapterRegistry",
     "CheckoutSessionInput",
     "CheckoutSessionResult",
+    "CircuitBreaker",
+    "CircuitBreakerAdapter",
+    "CircuitBreakerConfig",
+    "CircuitOpenError",
+    "CircuitState",
+    "ConcurrencyLimitAdapter",
+    "ConcurrencyLimitConfig",
+    "ConcurrencyLimitExceededError",
     "NormalizedEvent",
     "PaymentProviderAdapter",
     "PayPayAdapter",
@@ -1,5 +1,7 @@
 """Abstract base class for payment provider adapters."""
 
+import hashlib
+import json
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from datetime import datetime
@@ -48,6 +50,16 @@ class NormalizedEvent:
     raw_payload: dict[str, Any]
 
 
+def payload_event_id(payload: dict[str, Any]) -> str:
+    """Event ID for a notification that carries none, derived from its payload.
+
+    The same payload always gets the same ID, so a redelivered or replayed
+    notification is recognized as a duplicate rather than recorded again.
+    """
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return f"evt_{hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16]}"
+
+
 class PaymentProviderAdapter(ABC):
     """Abstract base class for payment provider adapters."""
 
@@ -101,12 +113,32 @@ class PaymentProviderAdapter(ABC):
         """
         ...
 
+    async def ping(self) -> None:
+        """Open and verify the connection to the provider ahead of traffic.
+
+        Called at startup and periodically afterwards so the first checkout
+        does not pay for the TLS handshake and idle connections are not
+        dropped. Adapters without a persistent connection have nothing to do.
+
+        Raises:
+            Exception: Whatever the underlying client raises
+        """
+        return None
+
 
 class ProviderError(Exception):
     """Exception raised when provider API call fails."""
 
-    def __init__(self, provider: PaymentProvider, message: str, code: str | None = None):
+    def __init__(
+        self,
+        provider: PaymentProvider,
+        message: str,
+        code: str | None = None,
+        status_code: int | None = None,
+    ):
         self.provider = provider
         self.message = message
         self.code = code
+        # HTTP status of the provider response, if one was received
+        self.status_code = status_code
         super().__init__(f"[{provider.value}] {message}")
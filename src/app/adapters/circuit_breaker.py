@@ -0,0 +1,264 @@
+"""Per-provider circuit breaker for payment adapters.
+
+When a provider degrades, every checkout would otherwise wait for the full
+SDK timeout before failing. The breaker tracks the outcome and latency of
+the last N calls; once the failure or slow-call rate crosses its threshold
+it opens and rejects calls immediately. After a cool-down it lets a few
+probe calls through (half-open) and closes again if they succeed.
+"""
+
+import time
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any
+
+import structlog
+
+from app import deadline
+from app.adapters.base import (
+    CheckoutSessionInput,
+    CheckoutSessionResult,
+    NormalizedEvent,
+    PaymentProviderAdapter,
+    ProviderError,
+    WebhookVerificationResult,
+)
+from app.metrics import metrics
+from app.models.donation import PaymentProvider
+
+logger = structlog.get_logger()
+
+
+class CircuitState(str, Enum):
+    """Circuit breaker states."""
+
+    CLOSED = "closed"
+    HALF_OPEN = "half_open"
+    OPEN = "open"
+
+
+# Gauge values for circuit_breaker_state
+STATE_VALUES = {CircuitState.CLOSED: 0, CircuitState.HALF_OPEN: 1, CircuitState.OPEN: 2}
+
+
+@dataclass
+class CircuitBreakerConfig:
+    """Thresholds for a circuit breaker."""
+
+    window_size: int = 20
+    min_calls: int = 10
+    failure_rate_threshold: float = 0.5
+    slow_call_seconds: float = 3.0
+    slow_call_rate_threshold: float = 0.8
+    open_seconds: float = 30.0
+    half_open_probes: int = 2
+
+
+class CircuitOpenError(ProviderError):
+    """Raised without calling the provider while the circuit is open."""
+
+    def __init__(self, provider: PaymentProvider, retry_after: float):
+        self.retry_after = retry_after
+        super().__init__(
+            provider=provider,
+            message=f"Circuit open, retry after {retry_after:.0f}s",
+            code="CIRCUIT_OPEN",
+        )
+
+
+def is_provider_failure(error: BaseException) -> bool:
+    """Whether a failed call counts against the provider's health.
+
+    Calls that got no response (connection errors, provider timeouts) and
+    5xx count. Errors the caller caused do not: requests the provider
+    rejected (4xx or a result code, e.g. an invalid amount), and the
+    caller's own request deadline running out. 429s are left to the
+    concurrency limiter, which backs off on them.
+    """
+    if isinstance(error, deadline.DeadlineExceededError):
+        return False
+    if isinstance(error, ProviderError):
+        if error.status_code is not None:
+            return error.status_code >= 500
+        # A result code means the provider answered; no code means no response
+        return error.code is None
+    return True
+
+
+class CircuitBreaker:
+    """Count-based sliding-window circuit breaker."""
+
+    def __init__(
+        self,
+        provider: PaymentProvider,
+        config: CircuitBreakerConfig | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._provider = provider
+        self._config = config or CircuitBreakerConfig()
+        self._clock = clock
+        self._state = CircuitState.CLOSED
+        # (failed, slow) per call
+        self._window: deque[tuple[bool, bool]] = deque(maxlen=self._config.window_size)
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        metrics.set(
+            "circuit_breaker_state",
+            STATE_VALUES[self._state],
+            "Circuit state (0=closed, 1=half_open, 2=open)",
+            provider=provider.value,
+        )
+
+    @property
+    def state(self) -> CircuitState:
+        """Current state (an expired open circuit reports half-open)."""
+        if (
+            self._state == CircuitState.OPEN
+            and self._clock() - self._opened_at >= self._config.open_seconds
+        ):
+            self._transition(CircuitState.HALF_OPEN)
+        return self._state
+
+    def _transition(self, state: CircuitState) -> None:
+        previous = self._state
+        if previous == state:
+            return
+        self._state = state
+        if state == CircuitState.OPEN:
+            self._opened_at = self._clock()
+        if state in (CircuitState.HALF_OPEN, CircuitState.CLOSED):
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+        if state == CircuitState.CLOSED:
+            self._window.clear()
+
+        provider = self._provider.value
+        metrics.set("circuit_breaker_state", STATE_VALUES[state], provider=provider)
+        metrics.inc(
+            "circuit_breaker_transitions_total",
+            description="Circuit breaker state transitions",
+            provider=provider,
+            from_state=previous.value,
+            to_state=state.value,
+        )
+        log = logger.warning if state == CircuitState.OPEN else logger.info
+        log(
+            "Circuit breaker state changed",
+            provider=provider,
+            from_state=previous.value,
+            to_state=state.value,
+        )
+
+    def before_call(self) -> None:
+        """Admit a call or raise CircuitOpenError.
+
+        Raises:
+            CircuitOpenError: If the circuit is open or all probes are in flight
+        """
+        state = self.state
+        if state == CircuitState.CLOSED:
+            return
+        if (
+            state == CircuitState.HALF_OPEN
+            and self._probes_in_flight < self._config.half_open_probes
+        ):
+            self._probes_in_flight += 1
+            return
+
+        metrics.inc(
+            "circuit_breaker_rejected_total",
+            description="Calls rejected by an open circuit",
+            provider=self._provider.value,
+        )
+        retry_after = max(self._config.open_seconds - (self._clock() - self._opened_at), 1.0)
+        raise CircuitOpenError(self._provider, retry_after)
+
+    def record(self, failed: bool, duration: float) -> None:
+        """Record the outcome of an admitted call."""
+        slow = duration >= self._config.slow_call_seconds
+        if self._state == CircuitState.HALF_OPEN:
+            self._probes_in_flight = max(self._probes_in_flight - 1, 0)
+            if failed or slow:
+                self._transition(CircuitState.OPEN)
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self._config.half_open_probes:
+                self._transition(CircuitState.CLOSED)
+            return
+
+        if self._state == CircuitState.OPEN:
+            # A call admitted before the circuit opened; it no longer counts
+            return
+
+        self._window.append((failed, slow))
+        if len(self._window) < self._config.min_calls:
+            return
+        calls = len(self._window)
+        failure_rate = sum(1 for f, _ in self._window if f) / calls
+        slow_rate = sum(1 for _, s in self._window if s) / calls
+        if (
+            failure_rate >= self._config.failure_rate_threshold
+            or slow_rate >= self._config.slow_call_rate_threshold
+        ):
+            self._transition(CircuitState.OPEN)
+
+    def release(self) -> None:
+        """Release an admitted call that ended without an outcome (cancelled)."""
+        if self._state == CircuitState.HALF_OPEN:
+            self._probes_in_flight = max(self._probes_in_flight - 1, 0)
+
+
+class CircuitBreakerAdapter(PaymentProviderAdapter):
+    """Adapter wrapper that guards checkout session creation with a breaker.
+
+    Webhook verification and normalization are local operations and are
+    passed through unchanged.
+    """
+
+    def __init__(self, inner: PaymentProviderAdapter, breaker: CircuitBreaker):
+        self._inner = inner
+        self._breaker = breaker
+
+    @property
+    def provider_name(self) -> PaymentProvider:
+        return self._inner.provider_name
+
+    @property
+    def breaker(self) -> CircuitBreaker:
+        return self._breaker
+
+    async def create_checkout_session(
+        self, input: CheckoutSessionInput
+    ) -> CheckoutSessionResult:
+        """Create a checkout session unless the circuit is open."""
+        self._breaker.before_call()
+        started = time.monotonic()
+        try:
+            result = await self._inner.create_checkout_session(input)
+        except Exception as e:
+            # Caller-caused errors still count as calls, so a provider that
+            # only gets slow enough to exhaust deadlines shows as slow calls
+            self._breaker.record(
+                failed=is_provider_failure(e), duration=time.monotonic() - started
+            )
+            raise
+        except BaseException:
+            self._breaker.release()
+            raise
+        self._breaker.record(failed=False, duration=time.monotonic() - started)
+        return result
+
+    async def verify_webhook(
+        self, headers: dict[str, str], body: bytes
+    ) -> WebhookVerificationResult:
+        return await self._inner.verify_webhook(headers, body)
+
+    def normalize_event(self, event: dict[str, Any]) -> NormalizedEvent:
+        return self._inner.normalize_event(event)
+
+    async def ping(self) -> None:
+        # Connection upkeep is not a provider call: no permit, no breaker
+        await self._inner.ping()
@@ -0,0 +1,234 @@
+"""Adaptive (AIMD) concurrency limiter for outbound provider calls.
+
+A fixed number of concurrent provider calls is either too low at quiet
+times or too high when the provider slows down or starts answering 429 (all
+our egress shares one NAT IP). The limiter starts from an initial limit,
+adds one permitted in-flight call for every fast successful call made while
+the limit was in use, and multiplies the limit by a backoff ratio on a slow
+call, a timeout, a 429 or a 5xx. Calls that were already in flight when the
+limit was last cut do not cut it again, so one burst of errors backs off
+once rather than collapsing the limit. Calls over the limit wait briefly for
+a slot and are then rejected without reaching the provider.
+"""
+
+import asyncio
+import math
+import time
+from dataclasses import dataclass
+from typing import Any
+
+import structlog
+
+from app import deadline
+from app.adapters.base import (
+    CheckoutSessionInput,
+    CheckoutSessionResult,
+    NormalizedEvent,
+    PaymentProviderAdapter,
+    ProviderError,
+    WebhookVerificationResult,
+)
+from app.adapters.circuit_breaker import CircuitOpenError
+from app.metrics import metrics
+from app.models.donation import PaymentProvider
+
+logger = structlog.get_logger()
+
+
+@dataclass
+class ConcurrencyLimitConfig:
+    """Bounds and thresholds for an AIMD limiter."""
+
+    initial_limit: int = 10
+    min_limit: int = 1
+    max_limit: int = 50
+    latency_threshold_seconds: float = 2.0
+    backoff_ratio: float = 0.75
+    max_wait_seconds: float = 1.0
+
+
+@dataclass
+class Permit:
+    """A slot held by one in-flight call."""
+
+    in_flight: int  # calls in flight when the slot was taken, including this one
+    epoch: int  # backoff epoch at acquisition
+
+
+class ConcurrencyLimitExceededError(ProviderError):
+    """Raised without calling the provider when no slot frees up in time."""
+
+    def __init__(self, provider: PaymentProvider, limit: int, retry_after: float):
+        self.retry_after = retry_after
+        super().__init__(
+            provider=provider,
+            message=f"Concurrency limit {limit} reached",
+            code="CONCURRENCY_LIMITED",
+        )
+
+
+def is_overload(error: BaseException) -> bool:
+    """Whether a failed call signals that the provider is overloaded.
+
+    429s, 5xx, timeouts and calls that got no response at all count; errors
+    the provider answered deliberately (bad parameters, auth) do not.
+    """
+    if isinstance(error, ProviderError):
+        if error.status_code is not None:
+            return error.status_code == 429 or error.status_code >= 500
+        # A result code means the provider answered; no code means no response
+        return error.code is None
+    return True
+
+
+class AIMDLimiter:
+    """Additive-increase/multiplicative-decrease concurrency limit."""
+
+    def __init__(
+        self,
+        provider: PaymentProvider,
+        config: ConcurrencyLimitConfig | None = None,
+    ):
+        self._provider = provider
+        self._config = config or ConcurrencyLimitConfig()
+        self._limit = float(self._config.initial_limit)
+        self._in_flight = 0
+        # Incremented on every backoff
+        self._epoch = 0
+        self._slot_freed = asyncio.Condition()
+        labels = {"provider": provider.value}
+        metrics.gauge_callback(
+            "provider_concurrency_limit",
+            lambda: self.limit,
+            "Permitted concurrent provider calls",
+            **labels,
+        )
+        metrics.gauge_callback(
+            "provider_concurrency_in_flight",
+            lambda: self._in_flight,
+            "Provider calls in flight",
+            **labels,
+        )
+
+    @property
+    def config(self) -> ConcurrencyLimitConfig:
+        return self._config
+
+    @property
+    def limit(self) -> int:
+        return math.floor(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    async def acquire(self) -> Permit:
+        """Wait for a slot (bounded by max_wait and the request deadline).
+
+        Returns:
+            A permit to pass back to release()
+
+        Raises:
+            ConcurrencyLimitExceededError: If no slot frees up in time
+        """
+        if self._in_flight >= self.limit:
+            wait = self._config.max_wait_seconds
+            left = deadline.remaining()
+            if left is not None:
+                wait = min(wait, max(left, 0.0))
+            try:
+                async with self._slot_freed:
+                    await asyncio.wait_for(
+                        self._slot_freed.wait_for(lambda: self._in_flight < self.limit),
+                        wait,
+                    )
+            except TimeoutError:
+                metrics.inc(
+                    "provider_concurrency_rejected_total",
+                    description="Provider calls rejected by the concurrency limiter",
+                    provider=self._provider.value,
+                )
+                raise ConcurrencyLimitExceededError(
+                    self._provider, self.limit, self._config.max_wait_seconds
+                ) from None
+        self._in_flight += 1
+        return Permit(in_flight=self._in_flight, epoch=self._epoch)
+
+    async def release(self, permit: Permit, overloaded: bool | None) -> None:
+        """Release a slot and adjust the limit.
+
+        Args:
+            permit: Value returned by acquire()
+            overloaded: True to back off, False to grow, None to leave the
+                limit unchanged (cancelled or deliberately rejected calls)
+        """
+        self._in_flight = max(self._in_flight - 1, 0)
+        previous = self.limit
+        config = self._config
+        if overloaded:
+            if permit.epoch == self._epoch:
+                self._limit = max(config.min_limit, self._limit * config.backoff_ratio)
+                self._epoch += 1
+        elif overloaded is False and permit.in_flight * 2 >= self.limit:
+            # Only grow while the limit is actually being used
+            self._limit = min(config.max_limit, self._limit + 1)
+
+        if self.limit != previous:
+            log = logger.warning if self.limit < previous else logger.debug
+            log(
+                "Provider concurrency limit changed",
+                provider=self._provider.value,
+                previous=previous,
+                limit=self.limit,
+            )
+        async with self._slot_freed:
+            self._slot_freed.notify_all()
+
+
+class ConcurrencyLimitAdapter(PaymentProviderAdapter):
+    """Adapter wrapper that bounds concurrent checkout session creation."""
+
+    def __init__(self, inner: PaymentProviderAdapter, limiter: AIMDLimiter):
+        self._inner = inner
+        self._limiter = limiter
+
+    @property
+    def provider_name(self) -> PaymentProvider:
+        return self._inner.provider_name
+
+    @property
+    def limiter(self) -> AIMDLimiter:
+        return self._limiter
+
+    async def create_checkout_session(
+        self, input: CheckoutSessionInput
+    ) -> CheckoutSessionResult:
+        """Create a checkout session within the adaptive concurrency limit."""
+        permit = await self._limiter.acquire()
+        started = time.monotonic()
+        overloaded: bool | None = None
+        try:
+            result = await self._inner.create_checkout_session(input)
+            latency = time.monotonic() - started
+            overloaded = latency >= self._limiter.config.latency_threshold_seconds
+            return result
+        except CircuitOpenError:
+            # The provider was not called; nothing was learned about it
+            raise
+        except Exception as e:
+            overloaded = is_overload(e)
+            raise
+        finally:
+            await self._limiter.release(permit, overloaded)
+
+    async def verify_webhook(
+        self, headers: dict[str, str], body: bytes
+    ) -> WebhookVerificationResult:
+        return await self._inner.verify_webhook(headers, body)
+
+    def normalize_event(self, event: dict[str, Any]) -> NormalizedEvent:
+        return self._inner.normalize_event(event)
+
+    async def ping(self) -> None:
+        # Connection upkeep is not a provider call: no permit, no breaker
+        await self._inner.ping()
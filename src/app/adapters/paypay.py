@@ -4,18 +4,18 @@ Uses the official PayPay OPA SDK for API integration.
 https://github.com/paypay/paypayopa-sdk-python
 """
 
+import asyncio
 import contextlib
-import hashlib
-import hmac
 import json
 import uuid
+from collections.abc import Sequence
 from datetime import UTC, datetime, timedelta
 from typing import Any
 from urllib.parse import quote
 
-import paypayopa
 import structlog
 
+from app import deadline
 from app.adapters.base import (
     CheckoutSessionInput,
     CheckoutSessionResult,
@@ -23,7 +23,9 @@ from app.adapters.base import (
     PaymentProviderAdapter,
     ProviderError,
     WebhookVerificationResult,
+    payload_event_id,
 )
+from app.adapters.signing import WebhookSignatureVerifier
 from app.models.donation import DonationStatus, PaymentProvider
 
 logger = structlog.get_logger()
@@ -31,6 +33,16 @@ logger = structlog.get_logger()
 # Webhook secret for signature verification
 DEFAULT_WEBHOOK_SECRET = "mock_paypay_webhook_secret"
 
+# HTTP status behind PayPay resultInfo codes that signal overload. The SDK
+# returns the JSON body for every status, so the code is all we get.
+RESULT_CODE_STATUS = {
+    "RATE_LIMIT": 429,
+    "TOO_MANY_REQUESTS": 429,
+    "INTERNAL_SERVER_ERROR": 500,
+    "SERVICE_ERROR": 500,
+    "MAINTENANCE_MODE": 503,
+}
+
 
 class PayPayAdapter(PaymentProviderAdapter):
     """PayPay payment provider adapter using official SDK."""
@@ -41,17 +53,27 @@ class PayPayAdapter(PaymentProviderAdapter):
         api_secret: str | None = None,
         merchant_id: str | None = None,
         webhook_secret: str | None = None,
+        webhook_secrets: Sequence[str] | None = None,
         production_mode: bool = False,
+        timeout: float | None = None,
     ):
         self._api_key = api_key
         self._api_secret = api_secret
         self._merchant_id = merchant_id
-        self._webhook_secret = webhook_secret or DEFAULT_WEBHOOK_SECRET
+        # Several secrets may be active during rotation; the first is current
+        secrets = list(webhook_secrets or []) or [webhook_secret or DEFAULT_WEBHOOK_SECRET]
+        self._verifier = WebhookSignatureVerifier(self.provider_name, secrets)
         self._production_mode = production_mode
+        # Upper bound per API call; the request deadline may leave less
+        self._timeout = timeout
 
-        # Initialize PayPay client if credentials are provided
-        self._client: paypayopa.Client | None = None
+        # Initialize PayPay client if credentials are provided.
+        # The SDK (and requests/pkg_resources with it) is only imported then,
+        # so mock mode and unrelated cold starts do not pay for it.
+        self._client: Any | None = None
         if api_key and api_secret:
+            import paypayopa
+
             self._client = paypayopa.Client(
                 auth=(api_key, api_secret),
                 production_mode=production_mode,
@@ -130,11 +152,19 @@ class PayPayAdapter(PaymentProviderAdapter):
         if input.description:
             request["orderDescription"] = input.description
 
+        client = self._client
         try:
-            response = self._client.Code.create_qr_code(request)
+            # The SDK is blocking (requests): run it in a thread, bounded by
+            # the remaining request budget
+            response = await deadline.wait(
+                "paypay.create_qr_code",
+                lambda t: asyncio.to_thread(client.Code.create_qr_code, request, timeout=t),
+                cap=self._timeout,
+            )
 
             # Check response status
-            if response.get("resultInfo", {}).get("code") != "SUCCESS":
+            result_code = response.get("resultInfo", {}).get("code")
+            if result_code != "SUCCESS":
                 error_message = response.get("resultInfo", {}).get(
                     "message", "Unknown error"
                 )
@@ -146,6 +176,8 @@ class PayPayAdapter(PaymentProviderAdapter):
                 raise ProviderError(
                     provider=self.provider_name,
                     message=f"Failed to create checkout session: {error_message}",
+                    code=result_code,
+                    status_code=RESULT_CODE_STATUS.get(result_code or ""),
                 )
 
             data = response.get("data", {})
@@ -179,13 +211,33 @@ class PayPayAdapter(PaymentProviderAdapter):
                 expires_at=expires_at,
             )
 
+        except (deadline.DeadlineExceededError, ProviderError):
+            raise
         except Exception as e:
+            # A requests timeout caused by the request budget is a deadline error
+            deadline.check("paypay.create_qr_code")
             logger.error("PayPay SDK error", error=str(e))
             raise ProviderError(
                 provider=self.provider_name,
                 message=f"PayPay API error: {e}",
             ) from e
 
+    async def ping(self) -> None:
+        """Open a keep-alive connection to the PayPay API (no-op in mock mode).
+
+        A HEAD request against the API host leaves a TLS connection in the
+        SDK's requests session pool, which the next API call reuses. The
+        response status does not matter; only connection errors do.
+        """
+        client = self._client
+        if not client:
+            return
+        await deadline.wait(
+            "paypay.ping",
+            lambda t: asyncio.to_thread(client.session.head, client.base_url, timeout=t),
+            cap=self._timeout,
+        )
+
     async def verify_webhook(
         self, headers: dict[str, str], body: bytes
     ) -> WebhookVerificationResult:
@@ -204,18 +256,12 @@ class PayPayAdapter(PaymentProviderAdapter):
                 error="Missing X-PAYPAY-SIGNATURE header",
             )
 
-        # Calculate expected signature
-        expected_signature = hmac.new(
-            self._webhook_secret.encode("utf-8"),
-            body,
-            hashlib.sha256,
-        ).hexdigest()
-
-        if not hmac.compare_digest(signature, expected_signature):
-            logger.warning("PayPay webhook signature verification failed")
+        check = self._verifier.verify(signature, body)
+        if not check.valid:
+            logger.warning("PayPay webhook signature verification failed", error=check.error)
             return WebhookVerificationResult(
                 valid=False,
-                error="Invalid signature",
+                error=check.error,
             )
 
         try:
@@ -272,7 +318,7 @@ class PayPayAdapter(PaymentProviderAdapter):
 
         return NormalizedEvent(
             status=status,
-            provider_event_id=payment_id or f"evt_{uuid.uuid4().hex[:8]}",
+            provider_event_id=payment_id or payload_event_id(masked_payload),
             provider_order_id=order_id,
             raw_payload=masked_payload,
         )
@@ -4,10 +4,9 @@ This is a mock implementation for development.
 Replace with actual Rakuten Pay API integration when credentials are available.
 """
 
-import hashlib
-import hmac
 import json
 import uuid
+from collections.abc import Sequence
 from datetime import UTC, datetime, timedelta
 from typing import Any
 
@@ -19,7 +18,9 @@ from app.adapters.base import (
     NormalizedEvent,
     PaymentProviderAdapter,
     WebhookVerificationResult,
+    payload_event_id,
 )
+from app.adapters.signing import WebhookSignatureVerifier
 from app.models.donation import DonationStatus, PaymentProvider
 
 logger = structlog.get_logger()
@@ -37,11 +38,14 @@ class RakutenPayAdapter(PaymentProviderAdapter):
         service_id: str | None = None,
         api_key: str | None = None,
         webhook_secret: str | None = None,
+        webhook_secrets: Sequence[str] | None = None,
         sandbox: bool = True,
     ):
         self._service_id = service_id
         self._api_key = api_key
-        self._webhook_secret = webhook_secret or MOCK_WEBHOOK_SECRET
+        # Several secrets may be active during rotation; the first is current
+        secrets = list(webhook_secrets or []) or [webhook_secret or MOCK_WEBHOOK_SECRET]
+        self._verifier = WebhookSignatureVerifier(self.provider_name, secrets)
         self._sandbox = sandbox
         self._base_url = (
             MOCK_RAKUTEN_BASE_URL if sandbox else "https://checkout.rakuten.co.jp"
@@ -107,18 +111,12 @@ class RakutenPayAdapter(PaymentProviderAdapter):
                 error="Missing X-Rakuten-Signature header",
             )
 
-        # Calculate expected signature
-        expected_signature = hmac.new(
-            self._webhook_secret.encode("utf-8"),
-            body,
-            hashlib.sha256,
-        ).hexdigest()
-
-        if not hmac.compare_digest(signature, expected_signature):
-            logger.warning("Rakuten Pay webhook signature verification failed")
+        check = self._verifier.verify(signature, body)
+        if not check.valid:
+            logger.warning("Rakuten Pay webhook signature verification failed", error=check.error)
             return WebhookVerificationResult(
                 valid=False,
-                error="Invalid signature",
+                error=check.error,
             )
 
         try:
@@ -166,7 +164,7 @@ class RakutenPayAdapter(PaymentProviderAdapter):
 
         return NormalizedEvent(
             status=status,
-            provider_event_id=event_id or f"evt_{uuid.uuid4().hex[:8]}",
+            provider_event_id=event_id or payload_event_id(masked_payload),
             provider_order_id=order_id,
             raw_payload=masked_payload,
         )
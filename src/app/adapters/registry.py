@@ -0,0 +1,53 @@
+"""Lazily constructed payment adapter registry."""
+
+from collections.abc import Callable, Iterator, Mapping
+
+import structlog
+
+from app.adapters.base import PaymentProviderAdapter
+from app.models.donation import PaymentProvider
+
+logger = structlog.get_logger()
+
+AdapterFactory = Callable[[], PaymentProviderAdapter]
+
+
+class AdapterRegistry(Mapping[PaymentProvider, PaymentProviderAdapter]):
+    """Mapping of providers to adapters that builds each adapter on first use.
+
+    Registering a provider only stores its factory, so providers that no
+    request touches never construct SDK clients (or import their SDKs).
+    """
+
+    def __init__(self) -> None:
+        self._factories: dict[PaymentProvider, AdapterFactory] = {}
+        self._adapters: dict[PaymentProvider, PaymentProviderAdapter] = {}
+
+    def register(self, provider: PaymentProvider, factory: AdapterFactory) -> None:
+        """Register a factory for a provider (replacing any built adapter)."""
+        self._factories[provider] = factory
+        self._adapters.pop(provider, None)
+
+    @property
+    def built(self) -> list[PaymentProvider]:
+        """Providers whose adapters have been constructed."""
+        return list(self._adapters)
+
+    def __getitem__(self, provider: PaymentProvider) -> PaymentProviderAdapter:
+        adapter = self._adapters.get(provider)
+        if adapter is None:
+            factory = self._factories[provider]
+            adapter = factory()
+            self._adapters[provider] = adapter
+            logger.info("Payment adapter initialized", provider=provider.value)
+        return adapter
+
+    def __contains__(self, provider: object) -> bool:
+        # Membership must not build the adapter (Mapping's default would)
+        return provider in self._factories
+
+    def __iter__(self) -> Iterator[PaymentProvider]:
+        return iter(self._factories)
+
+    def __len__(self) -> int:
+        return len(self._factories)
@@ -0,0 +1,215 @@
+"""Admission control for checkout requests.
+
+Every checkout costs a provider API call. When a flyer QR goes viral the
+provider slows down, in-flight checkouts pile up and every donor waits for
+the full timeout. The controller caps concurrent checkouts and shrinks the
+cap while observed latency exceeds its target; requests over the cap are
+rejected immediately with a retry hint instead of queueing. Optional token
+buckets keyed by QR source and client IP protect provider quotas from a
+single noisy flyer or client.
+
+Webhooks and health checks never pass through the controller, so they keep
+being served while checkouts are shed.
+"""
+
+import math
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+
+import structlog
+
+from app.metrics import metrics
+
+logger = structlog.get_logger()
+
+# Upper bound on tracked keys per keyed limiter (least recently used are dropped)
+DEFAULT_MAX_KEYS = 10_000
+
+
+class AdmissionRejectedError(Exception):
+    """Raised when a request is shed instead of admitted."""
+
+    def __init__(self, reason: str, retry_after: float):
+        self.reason = reason
+        self.retry_after = retry_after
+        super().__init__(f"Request rejected ({reason}), retry after {retry_after:.0f}s")
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at ``rate`` tokens per second."""
+
+    def __init__(self, rate: float, burst: int, clock: Callable[[], float] = time.monotonic):
+        self._rate = rate
+        self._burst = burst
+        self._clock = clock
+        self._tokens = float(burst)
+        self._updated = clock()
+
+    def try_take(self) -> float:
+        """Take one token.
+
+        Returns:
+            0 if a token was taken, otherwise seconds until one is available
+        """
+        now = self._clock()
+        self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self._rate
+
+    def refund(self) -> None:
+        """Return a token taken for a request that was rejected afterwards."""
+        self._tokens = min(self._burst, self._tokens + 1)
+
+
+class KeyedTokenBuckets:
+    """One token bucket per key, bounded by an LRU of ``max_keys`` entries."""
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        max_keys: int = DEFAULT_MAX_KEYS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._rate = rate
+        self._burst = burst
+        self._max_keys = max_keys
+        self._clock = clock
+        self._buckets: OrderedDict[str, TokenBucket] = OrderedDict()
+
+    def try_take(self, key: str) -> float:
+        """Take one token for ``key`` (see TokenBucket.try_take)."""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self._rate, self._burst, self._clock)
+            self._buckets[key] = bucket
+            if len(self._buckets) > self._max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket.try_take()
+
+    def refund(self, key: str) -> None:
+        """Return a token taken for ``key`` (no-op if its bucket was dropped)."""
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            bucket.refund()
+
+
+@dataclass
+class AdmissionConfig:
+    """Limits for an admission controller."""
+
+    max_in_flight: int = 64
+    min_in_flight: int = 4
+    target_latency_seconds: float = 2.0
+    retry_after_seconds: float = 2.0
+    # Weight of the newest sample in the latency moving average
+    smoothing: float = 0.2
+
+
+class AdmissionController:
+    """Latency-adaptive concurrency cap with optional keyed rate limits."""
+
+    def __init__(
+        self,
+        config: AdmissionConfig | None = None,
+        source_limiter: KeyedTokenBuckets | None = None,
+        ip_limiter: KeyedTokenBuckets | None = None,
+    ):
+        self._config = config or AdmissionConfig()
+        self._source_limiter = source_limiter
+        self._ip_limiter = ip_limiter
+        self._in_flight = 0
+        self._latency: float | None = None
+        metrics.gauge_callback(
+            "admission_in_flight",
+            lambda: self._in_flight,
+            "Checkout requests currently admitted",
+        )
+        metrics.gauge_callback(
+            "admission_limit",
+            lambda: self.limit,
+            "Current checkout concurrency limit",
+        )
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def limit(self) -> int:
+        """Concurrency limit, scaled down while latency exceeds the target."""
+        config = self._config
+        if self._latency is None or self._latency <= config.target_latency_seconds:
+            return config.max_in_flight
+        scaled = math.floor(config.max_in_flight * config.target_latency_seconds / self._latency)
+        return max(config.min_in_flight, scaled)
+
+    def _reject(self, reason: str, retry_after: float) -> AdmissionRejectedError:
+        metrics.inc(
+            "admission_rejected_total",
+            description="Checkout requests shed by admission control",
+            reason=reason,
+        )
+        logger.warning(
+            "Checkout request shed",
+            reason=reason,
+            in_flight=self._in_flight,
+            limit=self.limit,
+        )
+        return AdmissionRejectedError(reason, max(retry_after, 1.0))
+
+    def try_acquire(self, source: str | None = None, client_ip: str | None = None) -> None:
+        """Admit a request or raise AdmissionRejectedError.
+
+        Rate limits are only charged for admitted requests: shed requests do
+        not drain a source's tokens, and a client over its IP limit is
+        rejected before the shared source bucket is touched. A token taken
+        from the IP bucket is returned if the source bucket then rejects.
+
+        Raises:
+            AdmissionRejectedError: If the request must be shed
+        """
+        if self._in_flight >= self.limit:
+            raise self._reject("overloaded", self._config.retry_after_seconds)
+        ip_charged = False
+        if self._ip_limiter and client_ip:
+            wait = self._ip_limiter.try_take(client_ip)
+            if wait:
+                raise self._reject("ip_rate", wait)
+            ip_charged = True
+        if self._source_limiter and source:
+            wait = self._source_limiter.try_take(source)
+            if wait:
+                if self._ip_limiter and client_ip and ip_charged:
+                    self._ip_limiter.refund(client_ip)
+                raise self._reject("source_rate", wait)
+        self._in_flight += 1
+
+    def release(self, latency: float) -> None:
+        """Release an admitted request and record how long it took."""
+        self._in_flight = max(self._in_flight - 1, 0)
+        if self._latency is None:
+            self._latency = latency
+        else:
+            alpha = self._config.smoothing
+            self._latency = alpha * latency + (1 - alpha) * self._latency
+
+    @asynccontextmanager
+    async def admit(
+        self, source: str | None = None, client_ip: str | None = None
+    ) -> AsyncIterator[None]:
+        """Hold an admission slot for the duration of the block."""
+        self.try_acquire(source, client_ip)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
@@ -1,5 +1,8 @@
 """API routers."""
 
+from app.api.campaign import router as campaign_router
 from app.api.donations import router as donations_router
+from app.api.exports import router as exports_router
+from app.api.stats import router as stats_router
 
-__all__ = ["donations_router"]
+__all__ = ["campaign_router", "donations_router", "exports_router", "stats_router"]
@@ -0,0 +1,51 @@
+"""Live campaign total API endpoints."""
+
+import os
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse
+
+from app.config import settings
+from app.services.campaign import CampaignTotalService
+from app.tenants import current_services
+
+router = APIRouter(prefix="/api", tags=["campaign"])
+
+
+_campaign_service: CampaignTotalService | None = None
+_campaign_service_pid: int | None = None
+
+
+def get_campaign_service() -> CampaignTotalService:
+    """Get the campaign total service of the request's tenant (the default one otherwise)."""
+    tenant_services = current_services()
+    if tenant_services is not None:
+        return tenant_services.campaign
+    if _campaign_service is None or _campaign_service_pid != os.getpid():
+        raise RuntimeError("CampaignTotalService not initialized in this process")
+    return _campaign_service
+
+
+def set_campaign_service(service: CampaignTotalService) -> None:
+    """Set the campaign total service instance (for initialization)."""
+    global _campaign_service, _campaign_service_pid
+    _campaign_service = service
+    _campaign_service_pid = os.getpid()
+
+
+@router.get("/campaign/total")
+async def get_campaign_total(
+    service: CampaignTotalService = Depends(get_campaign_service),
+) -> JSONResponse:
+    """Get the amount raised so far for the current campaign.
+
+    Public endpoint for event tickers. Served from a short in-process cache
+    and marked cacheable for the same duration so browsers and CDNs can
+    absorb polling bursts.
+    """
+    total = await service.get_total()
+    max_age = max(settings.campaign_total_cache_ttl_ms // 1000, 1)
+    return JSONResponse(
+        content=total.model_dump(mode="json"),
+        headers={"Cache-Control": f"public, max-age={max_age}"},
+    )
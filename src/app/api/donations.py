@@ -1,22 +1,42 @@
 """Donation API endpoints."""
 
+import contextlib
+import math
+import os
+from datetime import UTC, date, datetime, timedelta
+from email.utils import format_datetime, parsedate_to_datetime
+
 import structlog
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from fastapi.responses import JSONResponse
 
+from app import deadline
+from app.admission import AdmissionController, AdmissionRejectedError
+from app.api.exports import build_query
+from app.api.security import require_admin_token
+from app.config import settings
+from app.metrics import metrics
 from app.models.donation import (
     CheckoutRequest,
     CheckoutResponse,
+    DonationBatchRequest,
+    DonationBatchResponse,
+    DonationListResponse,
     DonationResponse,
+    DonationStatus,
     PaymentProvider,
 )
+from app.repositories.donation import DEFAULT_LIST_LIMIT
 from app.services.payment import (
     DonationNotFoundError,
+    DuplicateCheckoutError,
     DuplicateEventError,
     InvalidSignatureError,
     PaymentService,
     PaymentServiceError,
+    RequestTimeoutError,
 )
+from app.tenants import current_services
 
 logger = structlog.get_logger()
 
@@ -25,30 +45,61 @@ router = APIRouter(prefix="/api", tags=["donations"])
 
 # Dependency injection placeholder - will be replaced with actual service
 _payment_service: PaymentService | None = None
+# PID of the process that built the service; clients must not cross a fork
+_payment_service_pid: int | None = None
 
 
 def get_payment_service() -> PaymentService:
-    """Get the payment service instance."""
-    if _payment_service is None:
-        raise RuntimeError("PaymentService not initialized")
+    """Get the payment service of the request's tenant (the default one otherwise)."""
+    tenant_services = current_services()
+    if tenant_services is not None:
+        return tenant_services.payment
+    if _payment_service is None or _payment_service_pid != os.getpid():
+        raise RuntimeError("PaymentService not initialized in this process")
     return _payment_service
 
 
 def set_payment_service(service: PaymentService) -> None:
     """Set the payment service instance (for initialization)."""
-    global _payment_service
+    global _payment_service, _payment_service_pid
     _payment_service = service
+    _payment_service_pid = os.getpid()
+
+
+# Checkout admission control; None disables it
+_admission_controller: AdmissionController | None = None
+_admission_controller_pid: int | None = None
+
+
+def get_admission_controller() -> AdmissionController | None:
+    """Get the checkout admission controller, if one is configured."""
+    if _admission_controller is None:
+        return None
+    if _admission_controller_pid != os.getpid():
+        raise RuntimeError("AdmissionController not initialized in this process")
+    return _admission_controller
+
+
+def set_admission_controller(controller: AdmissionController | None) -> None:
+    """Set the checkout admission controller (None disables admission control)."""
+    global _admission_controller, _admission_controller_pid
+    _admission_controller = controller
+    _admission_controller_pid = os.getpid()
 
 
 @router.post("/donations/checkout", response_model=CheckoutResponse)
 async def create_checkout(
     request: CheckoutRequest,
+    http_request: Request,
     service: PaymentService = Depends(get_payment_service),
+    admission: AdmissionController | None = Depends(get_admission_controller),
 ) -> CheckoutResponse:
     """Create a checkout session for donation.
 
     Creates a new donation record and returns a redirect URL
-    to the payment provider's checkout page.
+    to the payment provider's checkout page. Under overload the request is
+    shed with 503 (or 429 when a per-source/per-IP rate limit is hit) and a
+    Retry-After header instead of waiting for a provider slot.
     """
     logger.info(
         "Checkout request received",
@@ -57,30 +108,212 @@ async def create_checkout(
         source=request.source,
     )
 
+    client_ip = http_request.client.host if http_request.client else None
+    slot = (
+        admission.admit(request.source, client_ip)
+        if admission
+        else contextlib.nullcontext()
+    )
     try:
-        response = await service.create_checkout(request)
+        async with slot:
+            with deadline.scope(settings.checkout_deadline_ms / 1000):
+                response = await service.create_checkout(request)
         return response
+    except AdmissionRejectedError as e:
+        overloaded = e.reason == "overloaded"
+        raise HTTPException(
+            status_code=503 if overloaded else 429,
+            detail={
+                "error": "OVERLOADED" if overloaded else "RATE_LIMITED",
+                "message": "混雑しています。しばらくしてから再度お試しください",
+            },
+            headers={"Retry-After": str(math.ceil(e.retry_after))},
+        ) from e
     except PaymentServiceError as e:
         logger.error("Checkout creation failed", code=e.code, message=e.message)
+        status_code = 503
+        if e.code == "INVALID_ARGUMENT":
+            status_code = 400
+        elif isinstance(e, DuplicateCheckoutError):
+            status_code = 409
+        elif isinstance(e, RequestTimeoutError):
+            status_code = 504
+        raise HTTPException(
+            status_code=status_code,
+            detail={"error": e.code, "message": e.message},
+            headers=(
+                {"Retry-After": str(math.ceil(e.retry_after))} if e.retry_after else None
+            ),
+        ) from e
+
+
+def _utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=UTC) if value.tzinfo is None else value.astimezone(UTC)
+
+
+def _entity_tag(updated_at: datetime) -> str:
+    """Strong ETag for a donation: every change to it moves updated_at."""
+    micros = (_utc(updated_at) - datetime(1970, 1, 1, tzinfo=UTC)) // timedelta(microseconds=1)
+    return f'"{micros:x}"'
+
+
+def _cache_headers(status: str, updated_at: datetime) -> dict[str, str]:
+    """Validators and Cache-Control for a donation status response.
+
+    Pending donations are revalidated on every request; once settled they
+    rarely change again (only completed -> refunded, or a late completion of
+    a failed/expired one), so browsers may reuse the response for a while.
+    Responses are per donor and never stored by shared caches.
+    """
+    if status == DonationStatus.PENDING.value:
+        cache_control = "private, no-cache"
+    else:
+        cache_control = f"private, max-age={settings.donation_settled_max_age_seconds}"
+    return {
+        "ETag": _entity_tag(updated_at),
+        "Last-Modified": format_datetime(_utc(updated_at), usegmt=True),
+        "Cache-Control": cache_control,
+    }
+
+
+def _is_conditional(request: Request) -> bool:
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+
+def _not_modified(request: Request, updated_at: datetime) -> bool:
+    """Evaluate If-None-Match, or If-Modified-Since when there is none (RFC 9110)."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        etag = _entity_tag(updated_at)
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    # HTTP dates have whole-second precision
+    return _utc(updated_at).replace(microsecond=0) <= _utc(since)
+
+
+@router.get(
+    "/donations",
+    response_model=DonationListResponse,
+    dependencies=[Depends(require_admin_token)],
+)
+async def list_donations(
+    start: date | None = None,
+    end: date | None = None,
+    status: DonationStatus | None = None,
+    source: str | None = None,
+    provider: PaymentProvider | None = None,
+    limit: int = DEFAULT_LIST_LIMIT,
+    cursor: str | None = None,
+    fields: str | None = None,
+    service: PaymentService = Depends(get_payment_service),
+) -> JSONResponse:
+    """List donations newest first (admin views, donor inquiries).
+
+    ``start``/``end`` are JST days matched against ``created_at``. Pass the
+    returned ``next_cursor`` as ``cursor`` for the next page; ``fields`` is
+    a comma-separated list of Donation fields to return.
+    """
+    selected = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    try:
+        query = build_query(start, end, status, source, provider)
+        with deadline.scope(settings.read_deadline_ms / 1000):
+            page = await service.list_donations(query, limit, cursor, selected)
+    except ValueError as e:
         raise HTTPException(
-            status_code=400 if e.code == "INVALID_ARGUMENT" else 503,
+            status_code=400,
+            detail={"error": "INVALID_ARGUMENT", "message": str(e)},
+        ) from e
+    except RequestTimeoutError as e:
+        raise HTTPException(
+            status_code=504,
+            detail={"error": e.code, "message": e.message},
+        ) from e
+    except PaymentServiceError as e:
+        raise HTTPException(
+            status_code=400,
+            detail={"error": e.code, "message": e.message},
+        ) from e
+    return JSONResponse(
+        content=page.model_dump(mode="json"), headers={"Cache-Control": "no-store"}
+    )
+
+
+@router.post("/donations/status:batch", response_model=DonationBatchResponse)
+async def get_donations(
+    batch: DonationBatchRequest,
+    service: PaymentService = Depends(get_payment_service),
+) -> JSONResponse:
+    """Get the status of up to MAX_BATCH_DONATION_IDS donations at once.
+
+    For screens tracking many open donations: one request and one batched
+    repository read instead of a poll per donation. Unknown IDs are listed
+    in ``not_found`` rather than failing the request.
+    """
+    try:
+        with deadline.scope(settings.read_deadline_ms / 1000):
+            result = await service.get_donations(batch.donation_ids)
+    except RequestTimeoutError as e:
+        raise HTTPException(
+            status_code=504,
             detail={"error": e.code, "message": e.message},
         ) from e
+    metrics.observe(
+        "donation_status_batch_ids",
+        len(batch.donation_ids),
+        "Donation IDs per batch status request",
+    )
+    return JSONResponse(
+        content=result.model_dump(mode="json"), headers={"Cache-Control": "no-store"}
+    )
 
 
 @router.get("/donations/{donation_id}", response_model=DonationResponse)
 async def get_donation(
     donation_id: str,
+    request: Request,
     service: PaymentService = Depends(get_payment_service),
-) -> DonationResponse:
-    """Get donation status by ID."""
+) -> Response:
+    """Get donation status by ID.
+
+    Supports conditional requests: a client that sends back the ETag or
+    Last-Modified it got gets 304 Not Modified, answered from a read of the
+    status and update time only, until the donation changes.
+    """
     try:
-        return await service.get_donation(donation_id)
+        with deadline.scope(settings.read_deadline_ms / 1000):
+            if _is_conditional(request):
+                version = await service.get_donation_version(donation_id)
+                if _not_modified(request, version.updated_at):
+                    metrics.inc(
+                        "donation_status_not_modified_total",
+                        description="Donation status requests answered with 304",
+                    )
+                    return Response(
+                        status_code=304,
+                        headers=_cache_headers(version.status, version.updated_at),
+                    )
+            donation = await service.get_donation(donation_id)
     except DonationNotFoundError as e:
         raise HTTPException(
             status_code=404,
             detail={"error": "DONATION_NOT_FOUND", "message": f"Donation not found: {donation_id}"},
         ) from e
+    except RequestTimeoutError as e:
+        raise HTTPException(
+            status_code=504,
+            detail={"error": e.code, "message": e.message},
+        ) from e
+    return JSONResponse(
+        content=donation.model_dump(mode="json"),
+        headers=_cache_headers(donation.status.value, donation.updated_at),
+    )
 
 
 @router.post("/webhooks/paypay")
@@ -98,7 +331,8 @@ async def paypay_webhook(
     logger.info("PayPay webhook received", content_length=len(body))
 
     try:
-        await service.process_webhook(PaymentProvider.PAYPAY, headers, body)
+        with deadline.scope(settings.webhook_deadline_ms / 1000):
+            await service.process_webhook(PaymentProvider.PAYPAY, headers, body)
         return JSONResponse(status_code=200, content={"status": "ok"})
     except InvalidSignatureError as e:
         logger.warning("PayPay webhook signature invalid", error=e.message)
@@ -109,6 +343,13 @@ async def paypay_webhook(
     except DuplicateEventError as e:
         logger.info("PayPay webhook duplicate event", error=e.message)
         return JSONResponse(status_code=200, content={"status": "already_processed"})
+    except RequestTimeoutError as e:
+        # Non-2xx so the provider redelivers the notification
+        logger.error("PayPay webhook timed out", message=e.message)
+        return JSONResponse(
+            status_code=503,
+            content={"error": e.code, "message": e.message},
+        )
     except PaymentServiceError as e:
         logger.error("PayPay webhook processing failed", code=e.code, message=e.message)
         return JSONResponse(
@@ -132,7 +373,8 @@ async def rakuten_webhook(
     logger.info("Rakuten Pay webhook received", content_length=len(body))
 
     try:
-        await service.process_webhook(PaymentProvider.RAKUTEN, headers, body)
+        with deadline.scope(settings.webhook_deadline_ms / 1000):
+            await service.process_webhook(PaymentProvider.RAKUTEN, headers, body)
         return JSONResponse(status_code=200, content={"status": "ok"})
     except InvalidSignatureError as e:
         logger.warning("Rakuten Pay webhook signature invalid", error=e.message)
@@ -143,6 +385,13 @@ async def rakuten_webhook(
     except DuplicateEventError as e:
         logger.info("Rakuten Pay webhook duplicate event", error=e.message)
         return JSONResponse(status_code=200, content={"status": "already_processed"})
+    except RequestTimeoutError as e:
+        # Non-2xx so the provider redelivers the notification
+        logger.error("Rakuten Pay webhook timed out", message=e.message)
+        return JSONResponse(
+            status_code=503,
+            content={"error": e.code, "message": e.message},
+        )
     except PaymentServiceError as e:
         logger.error("Rakuten Pay webhook processing failed", code=e.code, message=e.message)
         return JSONResponse(
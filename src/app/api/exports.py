@@ -0,0 +1,112 @@
+"""Donation export API endpoints (accounting)."""
+
+import os
+from datetime import date, datetime, time, timedelta
+
+import structlog
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.api.security import require_admin_token
+from app.models.donation import DonationStatus, PaymentProvider
+from app.repositories.donation import DonationQuery
+from app.repositories.rollups import JST
+from app.services.export import DonationExporter, ExportFormat
+from app.tenants import current_services
+
+logger = structlog.get_logger()
+
+router = APIRouter(
+    prefix="/api", tags=["exports"], dependencies=[Depends(require_admin_token)]
+)
+
+MEDIA_TYPES = {
+    ExportFormat.CSV: "text/csv; charset=utf-8",
+    ExportFormat.NDJSON: "application/x-ndjson",
+}
+
+
+_donation_exporter: DonationExporter | None = None
+_donation_exporter_pid: int | None = None
+
+
+def get_donation_exporter() -> DonationExporter:
+    """Get the donation exporter of the request's tenant (the default one otherwise)."""
+    tenant_services = current_services()
+    if tenant_services is not None:
+        return tenant_services.exporter
+    if _donation_exporter is None or _donation_exporter_pid != os.getpid():
+        raise RuntimeError("DonationExporter not initialized in this process")
+    return _donation_exporter
+
+
+def set_donation_exporter(exporter: DonationExporter) -> None:
+    """Set the donation exporter instance (for initialization)."""
+    global _donation_exporter, _donation_exporter_pid
+    _donation_exporter = exporter
+    _donation_exporter_pid = os.getpid()
+
+
+def build_query(
+    start: date | None,
+    end: date | None,
+    status: DonationStatus | None,
+    source: str | None,
+    provider: PaymentProvider | None,
+) -> DonationQuery:
+    """Build a donation query from JST calendar days (both inclusive)."""
+    if start and end and end < start:
+        raise ValueError("start must not be after end")
+    return DonationQuery(
+        status=status,
+        source=source,
+        provider=provider,
+        created_from=datetime.combine(start, time.min, tzinfo=JST) if start else None,
+        created_to=(
+            datetime.combine(end + timedelta(days=1), time.min, tzinfo=JST) if end else None
+        ),
+    )
+
+
+@router.get("/exports/donations")
+async def export_donations(
+    format: ExportFormat = ExportFormat.CSV,
+    start: date | None = None,
+    end: date | None = None,
+    status: DonationStatus | None = None,
+    source: str | None = None,
+    provider: PaymentProvider | None = None,
+    exporter: DonationExporter = Depends(get_donation_exporter),
+) -> StreamingResponse:
+    """Stream donations as CSV or NDJSON.
+
+    The response is sent with chunked transfer encoding while the repository
+    is paged through, so memory stays flat regardless of the export size.
+    ``start``/``end`` are JST days matched against ``created_at``.
+    """
+    try:
+        query = build_query(start, end, status, source, provider)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail={"error": "INVALID_ARGUMENT", "message": str(e)},
+        ) from e
+
+    logger.info(
+        "Donation export requested",
+        format=format.value,
+        start=start.isoformat() if start else None,
+        end=end.isoformat() if end else None,
+        status=status.value if status else None,
+        source=source,
+    )
+
+    filename = f"donations_{start or 'all'}_{end or 'latest'}.{format.value}"
+    return StreamingResponse(
+        exporter.export(query, format),
+        media_type=MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "Cache-Control": "no-store",
+        },
+    )
@@ -0,0 +1,30 @@
+"""Access control for internal (admin) API endpoints."""
+
+import hmac
+
+from fastapi import Header, HTTPException
+
+from app.config import settings
+
+
+def require_admin_token(authorization: str | None = Header(default=None)) -> None:
+    """Require ``Authorization: Bearer <ADMIN_API_TOKEN>``.
+
+    When no token is configured the check is skipped outside production,
+    and every request is rejected in production.
+    """
+    expected = settings.admin_api_token
+    if not expected:
+        if settings.is_production:
+            raise HTTPException(
+                status_code=403,
+                detail={"error": "FORBIDDEN", "message": "Admin API is not enabled"},
+            )
+        return
+
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token, expected):
+        raise HTTPException(
+            status_code=401,
+            detail={"error": "UNAUTHORIZED", "message": "Invalid admin token"},
+        )
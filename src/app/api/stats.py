@@ -0,0 +1,60 @@
+"""Aggregate statistics API endpoints."""
+
+from datetime import date, datetime, timedelta
+
+import structlog
+from fastapi import APIRouter, Depends, HTTPException
+
+from app import deadline
+from app.api.donations import get_payment_service
+from app.api.security import require_admin_token
+from app.config import settings
+from app.models.donation import PaymentProvider, StatsResponse
+from app.repositories.rollups import JST
+from app.services.payment import PaymentService, PaymentServiceError, RequestTimeoutError
+
+logger = structlog.get_logger()
+
+router = APIRouter(prefix="/api", tags=["stats"])
+
+# Default window when no start date is given
+DEFAULT_STATS_DAYS = 7
+
+
+@router.get(
+    "/stats",
+    response_model=StatsResponse,
+    dependencies=[Depends(require_admin_token)],
+)
+async def get_stats(
+    start: date | None = None,
+    end: date | None = None,
+    source: str | None = None,
+    provider: PaymentProvider | None = None,
+    service: PaymentService = Depends(get_payment_service),
+) -> StatsResponse:
+    """Get donation counts and amounts per day, source, provider and status.
+
+    Reads the pre-aggregated daily rollups (one point read per day), so the
+    cost does not depend on how many donations exist. Days are in JST and
+    default to the last 7 days including today. Revenue per source and
+    provider is internal, so this requires the admin token like the
+    listing and exports.
+    """
+    end = end or datetime.now(JST).date()
+    start = start or end - timedelta(days=DEFAULT_STATS_DAYS - 1)
+
+    try:
+        with deadline.scope(settings.read_deadline_ms / 1000):
+            return await service.get_stats(start, end, source=source, provider=provider)
+    except RequestTimeoutError as e:
+        raise HTTPException(
+            status_code=504,
+            detail={"error": e.code, "message": e.message},
+        ) from e
+    except PaymentServiceError as e:
+        logger.warning("Stats query rejected", code=e.code, message=e.message)
+        raise HTTPException(
+            status_code=400,
+            detail={"error": e.code, "message": e.message},
+        ) from e
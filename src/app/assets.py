@@ -0,0 +1,320 @@
+"""Responsive, content-hashed image assets.
+
+Source images in ``app/static/assets`` are resized and re-encoded at build
+time (``scripts/build_assets.py``, run in the Dockerfile) into WebP and AVIF
+variants plus a JPEG (or, with transparency, PNG) fallback, a favicon and an
+Apple touch icon. Every generated file is named after a hash of its content, so it
+can be served with ``immutable`` caching, and is listed in ``manifest.json``.
+
+At runtime the manifest is read once per process and ``<img>`` tags pointing
+at a source image are rewritten to ``<picture>`` elements. Without a build
+(local development) the manifest is empty and pages keep the original
+images.
+
+Pillow is only needed to build; it is the ``assets`` optional dependency.
+"""
+
+import hashlib
+import html
+import io
+import json
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+STATIC_DIR = Path(__file__).parent / "static"
+SOURCE_DIR = STATIC_DIR / "assets"
+BUILD_DIR = SOURCE_DIR / "build"
+MANIFEST_NAME = "manifest.json"
+
+# URL prefix of generated files (served by app.main)
+URL_PREFIX = "/assets/"
+# URL prefix of source images as referenced from the HTML pages
+SOURCE_URL_PREFIX = "/static/assets/"
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Formats in order of preference for <source> elements
+MODERN_FORMATS = ("avif", "webp")
+MEDIA_TYPES = {
+    "avif": "image/avif",
+    "webp": "image/webp",
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+}
+EXTENSIONS = {"avif": "avif", "webp": "webp", "jpeg": "jpg", "png": "png"}
+
+
+@dataclass(frozen=True)
+class ImageSpec:
+    """How to build one source image."""
+
+    # Output widths in pixels; widths above the source width are skipped
+    widths: tuple[int, ...]
+    # ``sizes`` attribute for the generated srcset (the CSS display width)
+    sizes: str
+
+
+# Source image -> build spec. The logo is shown at 40-48 CSS pixels.
+IMAGES: dict[str, ImageSpec] = {
+    "tadakayo-logo.jpg": ImageSpec(widths=(48, 96, 144), sizes="48px"),
+    "tadakayo-character.png": ImageSpec(widths=(480, 960, 1440), sizes="100vw"),
+}
+ICON_SOURCE = "tadakayo-logo.jpg"
+FAVICON_SIZES = (16, 32, 48)
+TOUCH_ICON_SIZE = 180
+
+# Encoder settings; AVIF reaches WebP quality at a lower setting
+QUALITY = {"avif": 55, "webp": 80, "jpeg": 82}
+
+
+@dataclass(frozen=True)
+class Variant:
+    """One generated file."""
+
+    file: str
+    format: str
+    width: int
+    height: int
+    bytes: int
+
+    @property
+    def url(self) -> str:
+        return URL_PREFIX + self.file
+
+
+@dataclass
+class ImageAsset:
+    """A source image and its generated variants."""
+
+    source: str
+    width: int
+    height: int
+    bytes: int
+    sizes: str
+    variants: list[Variant]
+
+    def srcset(self, fmt: str) -> str:
+        return ", ".join(f"{v.url} {v.width}w" for v in self.variants if v.format == fmt)
+
+    @property
+    def fallback(self) -> Variant:
+        """Largest JPEG/PNG variant, for browsers without AVIF or WebP."""
+        original = [v for v in self.variants if v.format not in MODERN_FORMATS]
+        return max(original, key=lambda v: v.width)
+
+    def smallest(self, width: int) -> Variant:
+        """Smallest file generated at the given width."""
+        return min((v for v in self.variants if v.width == width), key=lambda v: v.bytes)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "width": self.width,
+            "height": self.height,
+            "bytes": self.bytes,
+            "sizes": self.sizes,
+            "variants": [v.__dict__ for v in self.variants],
+        }
+
+
+_IMG_TAG = re.compile(r"<img\s[^>]*>", re.IGNORECASE)
+_ATTRIBUTE = re.compile(r'([\w-]+)="([^"]*)"')
+
+
+@dataclass
+class AssetManifest:
+    """Generated images and icons, keyed by source file name."""
+
+    images: dict[str, ImageAsset] = field(default_factory=dict)
+    # Icon name ("favicon.ico", "apple-touch-icon.png") -> generated file
+    icons: dict[str, Variant] = field(default_factory=dict)
+    directory: Path = BUILD_DIR
+
+    @classmethod
+    def load(cls, directory: Path = BUILD_DIR) -> "AssetManifest":
+        """Read the manifest of a build; empty when there is none."""
+        path = directory / MANIFEST_NAME
+        if not path.exists():
+            return cls(directory=directory)
+        data = json.loads(path.read_text(encoding="utf-8"))
+        images = {
+            source: ImageAsset(
+                source=source,
+                width=entry["width"],
+                height=entry["height"],
+                bytes=entry["bytes"],
+                sizes=entry["sizes"],
+                variants=[Variant(**variant) for variant in entry["variants"]],
+            )
+            for source, entry in data["images"].items()
+        }
+        icons = {name: Variant(**icon) for name, icon in data["icons"].items()}
+        return cls(images=images, icons=icons, directory=directory)
+
+    def save(self) -> Path:
+        path = self.directory / MANIFEST_NAME
+        data = {
+            "images": {source: image.to_dict() for source, image in self.images.items()},
+            "icons": {name: icon.__dict__ for name, icon in self.icons.items()},
+        }
+        path.write_text(json.dumps(data, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        return path
+
+    def __bool__(self) -> bool:
+        return bool(self.images or self.icons)
+
+    def file_path(self, file: str) -> Path | None:
+        """Path of a generated file, or None if the build did not produce it."""
+        if file in self._files:
+            return self.directory / file
+        return None
+
+    @property
+    def _files(self) -> set[str]:
+        files = {icon.file for icon in self.icons.values()}
+        for image in self.images.values():
+            files.update(v.file for v in image.variants)
+        return files
+
+    def picture(self, source: str, attributes: dict[str, str]) -> str | None:
+        """Render a ``<picture>`` for a source image, keeping the img attributes."""
+        image = self.images.get(source)
+        if image is None:
+            return None
+        fallback = image.fallback
+        img = {
+            **attributes,
+            "src": fallback.url,
+            "srcset": image.srcset(fallback.format),
+            "sizes": attributes.get("sizes", image.sizes),
+        }
+        img.setdefault("width", str(image.width))
+        img.setdefault("height", str(image.height))
+        img.setdefault("decoding", "async")
+        sources = "".join(
+            f'<source type="{MEDIA_TYPES[fmt]}" srcset="{image.srcset(fmt)}"'
+            f' sizes="{html.escape(img["sizes"])}">'
+            for fmt in MODERN_FORMATS
+            if image.srcset(fmt)
+        )
+        img_attributes = " ".join(f'{name}="{html.escape(value)}"' for name, value in img.items())
+        # display: contents keeps the page's layout of the img unchanged
+        return f'<picture style="display: contents">{sources}<img {img_attributes}></picture>'
+
+    def rewrite_html(self, page: str) -> str:
+        """Replace ``<img>`` tags of source images with responsive pictures."""
+        if not self.images:
+            return page
+
+        def replace(match: re.Match[str]) -> str:
+            attributes = {
+                name: html.unescape(value) for name, value in _ATTRIBUTE.findall(match[0])
+            }
+            src = attributes.get("src", "")
+            if not src.startswith(SOURCE_URL_PREFIX):
+                return match[0]
+            return self.picture(src.removeprefix(SOURCE_URL_PREFIX), attributes) or match[0]
+
+        return _IMG_TAG.sub(replace, page)
+
+
+def _content_name(stem: str, data: bytes, extension: str) -> str:
+    digest = hashlib.sha256(data).hexdigest()[:10]
+    return f"{stem}.{digest}.{extension}"
+
+
+def _write(directory: Path, stem: str, data: bytes, extension: str) -> str:
+    file = _content_name(stem, data, extension)
+    (directory / file).write_bytes(data)
+    return file
+
+
+def _encode(image: Any, fmt: str) -> bytes:
+    buffer = io.BytesIO()
+    if fmt == "png":
+        image.save(buffer, "PNG", optimize=True)
+    elif fmt == "jpeg":
+        image.convert("RGB").save(
+            buffer, "JPEG", quality=QUALITY["jpeg"], optimize=True, progressive=True
+        )
+    elif fmt == "webp":
+        image.save(buffer, "WEBP", quality=QUALITY["webp"], method=6)
+    else:
+        image.save(buffer, "AVIF", quality=QUALITY["avif"])
+    return buffer.getvalue()
+
+
+def build_assets(
+    source_dir: Path = SOURCE_DIR,
+    build_dir: Path = BUILD_DIR,
+    images: dict[str, ImageSpec] | None = None,
+) -> AssetManifest:
+    """Generate variants and icons for the source images and write the manifest.
+
+    Files from previous builds are removed first, so the build directory
+    only holds what the new manifest references.
+
+    Raises:
+        ImportError: If Pillow is not installed
+    """
+    from PIL import Image, features
+
+    images = IMAGES if images is None else images
+    formats = [fmt for fmt in MODERN_FORMATS if features.check(fmt)]
+
+    build_dir.mkdir(parents=True, exist_ok=True)
+    for old in build_dir.iterdir():
+        if old.is_file():
+            old.unlink()
+
+    manifest = AssetManifest(directory=build_dir)
+    for source, spec in images.items():
+        path = source_dir / source
+        stem = path.stem
+        with Image.open(path) as original:
+            original.load()
+            # Opaque images fall back to JPEG even when the source is a PNG
+            has_alpha = "A" in original.getbands() or "transparency" in original.info
+            source_format = "png" if has_alpha else "jpeg"
+            widths = sorted({min(w, original.width) for w in spec.widths})
+            variants: list[Variant] = []
+            for width in widths:
+                height = round(original.height * width / original.width)
+                resized = original.resize((width, height), Image.Resampling.LANCZOS)
+                for fmt in (*formats, source_format):
+                    data = _encode(resized, fmt)
+                    file = _write(build_dir, f"{stem}-{width}w", data, EXTENSIONS[fmt])
+                    variants.append(Variant(file, fmt, width, height, len(data)))
+            manifest.images[source] = ImageAsset(
+                source=source,
+                width=original.width,
+                height=original.height,
+                bytes=path.stat().st_size,
+                sizes=spec.sizes,
+                variants=variants,
+            )
+
+    icon_path = source_dir / ICON_SOURCE
+    if icon_path.exists():
+        with Image.open(icon_path) as logo:
+            icon = logo.convert("RGBA")
+            buffer = io.BytesIO()
+            icon.save(buffer, "ICO", sizes=[(size, size) for size in FAVICON_SIZES])
+            data = buffer.getvalue()
+            size = max(FAVICON_SIZES)
+            manifest.icons["favicon.ico"] = Variant(
+                _write(build_dir, "favicon", data, "ico"), "ico", size, size, len(data)
+            )
+            touch = icon.resize((TOUCH_ICON_SIZE, TOUCH_ICON_SIZE), Image.Resampling.LANCZOS)
+            data = _encode(touch, "png")
+            manifest.icons["apple-touch-icon.png"] = Variant(
+                _write(build_dir, "apple-touch-icon", data, "png"),
+                "png",
+                TOUCH_ICON_SIZE,
+                TOUCH_ICON_SIZE,
+                len(data),
+            )
+
+    manifest.save()
+    return manifest
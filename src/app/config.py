@@ -13,10 +13,95 @@ class Settings(BaseSettings):
     project_id: str = "tadakayo-qr-connect"
     region: str = "asia-northeast1"
 
+    # Server (see app/server.py)
+    host: str = "0.0.0.0"
+    port: int = 8080
+    web_concurrency: int = 1  # uvicorn worker processes; 0 = one per CPU
+    # Peers whose X-Forwarded-For is trusted (IPs/CIDRs, comma separated)
+    forwarded_allow_ips: str = "127.0.0.1"
+
     # API settings
     base_url: str = "http://localhost:8080"
     default_currency: str = "JPY"
-    provider_timeout_ms: int = 10000
+    provider_timeout_ms: int = 10000  # cap per provider API call
+    firestore_timeout_ms: int = 5000  # cap per Firestore RPC
+    admin_api_token: str = ""
+
+    # Donation storage: memory, file, sqlite or firestore
+    # ("" = memory in sandbox, else firestore)
+    repository_backend: str = ""
+    file_repository_dir: str = "data"  # file backend (see app/repositories/local.py)
+    file_repository_commit_delay_ms: int = 0  # wait to gather more writes per fsync
+    file_repository_compact_records: int = 20000  # log records before a new snapshot
+    sqlite_path: str = "data/donations.db"  # sqlite backend (see app/repositories/sqlite.py)
+    sqlite_pool_size: int = 4  # connections (and threads) per worker
+    sqlite_busy_timeout_ms: int = 5000  # wait for another process's write lock
+
+    # Write-behind batching of payment_events audit records
+    payment_event_write_behind: bool = False
+    payment_event_flush_ms: int = 50
+    payment_event_batch_size: int = 100
+
+    # Retention of payment_events (scripts/archive_payment_events.py)
+    payment_event_archive_uri: str = ""  # gs://bucket/prefix or a local directory
+    payment_event_retention_days: int = 30
+    payment_event_dedupe_days: int = 90  # ID markers of deleted events kept this long
+    payment_event_delete_batch_size: int = 200
+    payment_event_deletes_per_second: float = 100.0
+
+    # End-to-end request deadlines (see app/deadline.py)
+    checkout_deadline_ms: int = 12000
+    webhook_deadline_ms: int = 8000
+    read_deadline_ms: int = 3000
+
+    # Checkout admission control (see app/admission.py)
+    admission_enabled: bool = True
+    admission_max_in_flight: int = 64
+    admission_min_in_flight: int = 4
+    admission_target_latency_ms: int = 2000
+    admission_retry_after_seconds: int = 2
+    # Optional token buckets (rate per second; 0 disables)
+    checkout_source_rate: float = 0.0
+    checkout_source_burst: int = 20
+    checkout_ip_rate: float = 0.0
+    checkout_ip_burst: int = 5
+
+    # Circuit breaker around provider calls (per provider)
+    circuit_breaker_enabled: bool = True
+    circuit_breaker_window: int = 20
+    circuit_breaker_min_calls: int = 10
+    circuit_breaker_failure_rate: float = 0.5
+    circuit_breaker_slow_call_ms: int = 3000
+    circuit_breaker_slow_call_rate: float = 0.8
+    circuit_breaker_open_seconds: float = 30.0
+    circuit_breaker_half_open_probes: int = 2
+
+    # Adaptive (AIMD) concurrency limit on provider calls (per provider)
+    provider_concurrency_enabled: bool = True
+    provider_concurrency_initial: int = 10
+    provider_concurrency_min: int = 1
+    provider_concurrency_max: int = 50
+    provider_concurrency_latency_ms: int = 2000
+    provider_concurrency_backoff: float = 0.75
+    provider_concurrency_max_wait_ms: int = 1000
+
+    # Live campaign total (event tickers)
+    campaign_id: str = "default"
+    campaign_counter_shards: int = 20
+    campaign_total_cache_ttl_ms: int = 2000
+
+    # Open backend connections before accepting traffic, then keep them alive
+    warmup_enabled: bool = True
+    warmup_timeout_ms: int = 5000
+    keepalive_interval_seconds: int = 240  # 0 disables keep-alive pings
+
+    # Create the /pay/{amount} checkout on the server (302 on mobile,
+    # embedded in the streamed page on desktop) instead of from the browser
+    pay_server_checkout: bool = True
+
+    # Browser caching of GET /api/donations/{id} once a donation has left
+    # pending (pending responses are always revalidated)
+    donation_settled_max_age_seconds: int = 3600
 
     # Logging
     log_level: str = "INFO"
@@ -26,6 +111,17 @@ class Settings(BaseSettings):
     paypay_api_secret: str = ""
     paypay_merchant_id: str = ""
 
+    # Webhook secrets, comma-separated; list the current secret first and keep
+    # the previous one until the provider has switched over
+    paypay_webhook_secrets: str = ""
+    rakuten_webhook_secrets: str = ""
+
+    # Partner organizations hosted on the same instances (see app/tenants.py):
+    # a JSON list of tenants; "" serves only the organization configured above
+    tenants: str = ""
+    tenant_adapter_cache_size: int = 32  # adapters (SDK clients) kept across tenants
+    tenant_adapter_idle_seconds: int = 900  # drop a tenant's adapter after this idle time
+
     @property
     def is_production(self) -> bool:
         """Check if running in production environment."""
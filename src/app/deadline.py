@@ -0,0 +1,146 @@
+"""Request deadlines propagated through contextvars.
+
+A router opens a ``scope(seconds)`` around a request. Everything
+awaited inside it (service, adapters, repositories) reads the remaining
+budget from the context instead of using its own fixed timeout, so a slow
+Firestore read leaves less time for the provider call rather than adding to
+the total. Nested scopes can only shorten the deadline.
+"""
+
+import asyncio
+import random
+import time
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TypeVar
+
+import structlog
+
+logger = structlog.get_logger()
+
+T = TypeVar("T")
+
+# Absolute time.monotonic() value after which the current request must give up
+_deadline: ContextVar[float | None] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceededError(Exception):
+    """Raised when the request deadline has passed before or during a call."""
+
+    def __init__(self, operation: str):
+        self.operation = operation
+        super().__init__(f"Request deadline exceeded during {operation}")
+
+
+@contextmanager
+def scope(seconds: float) -> Iterator[None]:
+    """Bound all calls inside the block by ``seconds`` from now.
+
+    An enclosing deadline that expires earlier is kept.
+    """
+    expires_at = time.monotonic() + seconds
+    current = _deadline.get()
+    if current is not None:
+        expires_at = min(expires_at, current)
+    token = _deadline.set(expires_at)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> float | None:
+    """Seconds left in the current deadline, or None if no deadline is set."""
+    expires_at = _deadline.get()
+    if expires_at is None:
+        return None
+    return expires_at - time.monotonic()
+
+
+def check(operation: str) -> None:
+    """Raise DeadlineExceededError if the budget is already spent."""
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceededError(operation)
+
+
+def timeout(operation: str, cap: float | None = None) -> float | None:
+    """Timeout for the next downstream call: the remaining budget, capped.
+
+    Args:
+        operation: Name of the call (for errors and logs)
+        cap: Per-call upper bound (e.g. the provider timeout)
+
+    Returns:
+        Seconds, or None if neither a deadline nor a cap applies
+
+    Raises:
+        DeadlineExceededError: If the budget is already spent
+    """
+    check(operation)
+    left = remaining()
+    if left is None:
+        return cap
+    return left if cap is None else min(left, cap)
+
+
+async def wait(
+    operation: str,
+    call: Callable[[float | None], Awaitable[T]],
+    cap: float | None = None,
+) -> T:
+    """Run ``call(timeout)`` and await it within the remaining budget.
+
+    The timeout is passed to ``call`` as well so blocking clients can bound
+    their own I/O (the worker thread of a timed-out call otherwise keeps
+    running).
+
+    Raises:
+        DeadlineExceededError: If the request deadline expires first
+        TimeoutError: If only ``cap`` expired (the caller decides what that means)
+    """
+    call_timeout = timeout(operation, cap)
+    try:
+        return await asyncio.wait_for(call(call_timeout), call_timeout)
+    except TimeoutError:
+        check(operation)
+        raise
+
+
+async def retry_idempotent(
+    operation: str,
+    call: Callable[[], Awaitable[T]],
+    retry_on: tuple[type[BaseException], ...],
+    attempts: int = 3,
+    base_delay: float = 0.05,
+    max_delay: float = 1.0,
+) -> T:
+    """Retry an idempotent call with full-jitter backoff inside the budget.
+
+    Only use this for operations that are safe to repeat (reads, or writes
+    keyed so that a repeat is a no-op). A retry is skipped when the backoff
+    would not leave any budget for the next attempt.
+
+    Raises:
+        DeadlineExceededError: If the budget runs out between attempts
+    """
+    for attempt in range(attempts):
+        try:
+            return await call()
+        except retry_on as e:
+            if attempt == attempts - 1:
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2**attempt))
+            left = remaining()
+            if left is not None and delay >= left:
+                raise DeadlineExceededError(operation) from e
+            logger.warning(
+                "Retrying idempotent call",
+                operation=operation,
+                attempt=attempt + 1,
+                delay_ms=round(delay * 1000),
+                error=str(e),
+            )
+            await asyncio.sleep(delay)
+    raise AssertionError("unreachable")
@@ -0,0 +1,83 @@
+"""In-process keyed locks.
+
+PayPay can deliver several notifications for one order (AUTHORIZED and
+COMPLETED) within milliseconds. Handled concurrently, both read the donation
+before either updates it, and the loser's update is decided by the
+repository's transition check or contention retries rather than by arrival
+order. A KeyedLock serializes the handling of one key while different keys
+proceed fully in parallel.
+
+The lock table only holds keys that are held or waited for: an entry is
+dropped when its last user leaves, so memory is bounded by the number of
+requests in flight, not by the number of orders ever seen. The locks are
+per process; across workers and instances the repository's transition check
+remains the guard.
+"""
+
+import asyncio
+import time
+from collections.abc import AsyncIterator, Hashable
+from contextlib import asynccontextmanager
+from typing import Generic, TypeVar
+
+from app import deadline
+from app.metrics import metrics
+
+K = TypeVar("K", bound=Hashable)
+
+
+class _Entry:
+    __slots__ = ("lock", "users")
+
+    def __init__(self) -> None:
+        self.lock = asyncio.Lock()
+        # Tasks holding or waiting for the lock
+        self.users = 0
+
+
+class KeyedLock(Generic[K]):
+    """One asyncio lock per key, created on demand and dropped when unused."""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._entries: dict[K, _Entry] = {}
+
+    def __len__(self) -> int:
+        """Keys currently held or waited for."""
+        return len(self._entries)
+
+    @asynccontextmanager
+    async def hold(self, key: K) -> AsyncIterator[None]:
+        """Hold the lock of ``key`` for the duration of the block.
+
+        Waiting counts against the request deadline, if one is set.
+
+        Raises:
+            DeadlineExceededError: If the deadline expires while waiting, or
+                had already expired
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = _Entry()
+        entry.users += 1
+        try:
+            contended = entry.lock.locked()
+            started = time.perf_counter()
+            # Uncontended too, so a request whose budget is already spent
+            # stops here instead of starting work under the lock
+            await deadline.wait(self._name, lambda _: entry.lock.acquire())
+            if contended:
+                metrics.observe(
+                    "keyed_lock_wait_seconds",
+                    time.perf_counter() - started,
+                    "Time spent waiting for a key held by another task",
+                    lock=self._name,
+                )
+            try:
+                yield
+            finally:
+                entry.lock.release()
+        finally:
+            entry.users -= 1
+            if entry.users == 0:
+                del self._entries[key]
@@ -1,27 +1,93 @@
 """FastAPI application entry point."""
 
-from collections.abc import AsyncGenerator
+import functools
+import os
+import time
+from collections.abc import AsyncGenerator, Awaitable, Callable, Mapping
 from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import Any
 
 import structlog
-from fastapi import FastAPI, Request
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import Depends, FastAPI, Request
+from fastapi.responses import (
+    FileResponse,
+    HTMLResponse,
+    JSONResponse,
+    PlainTextResponse,
+    RedirectResponse,
+    StreamingResponse,
+)
 from fastapi.staticfiles import StaticFiles
 from starlette.responses import Response
 
+from app.adapters.base import PaymentProviderAdapter
+from app.adapters.circuit_breaker import (
+    CircuitBreaker,
+    CircuitBreakerAdapter,
+    CircuitBreakerConfig,
+)
+from app.adapters.concurrency_limit import (
+    AIMDLimiter,
+    ConcurrencyLimitAdapter,
+    ConcurrencyLimitConfig,
+)
 from app.adapters.paypay import PayPayAdapter
 from app.adapters.rakuten import RakutenPayAdapter
+from app.adapters.registry import AdapterRegistry
+from app.adapters.signing import parse_secrets
+from app.admission import AdmissionConfig, AdmissionController, KeyedTokenBuckets
+from app.api.campaign import router as campaign_router
+from app.api.campaign import set_campaign_service
+from app.api.donations import (
+    get_admission_controller,
+    get_payment_service,
+    set_admission_controller,
+    set_payment_service,
+)
 from app.api.donations import router as donations_router
-from app.api.donations import set_payment_service
+from app.api.exports import router as exports_router
+from app.api.exports import set_donation_exporter
+from app.api.security import require_admin_token
+from app.api.stats import router as stats_router
+from app.assets import IMMUTABLE_CACHE_CONTROL, AssetManifest
 from app.config import settings
+from app.metrics import metrics
 from app.models.donation import PaymentProvider
+from app.pages import (
+    checkout_script,
+    create_checkout,
+    is_mobile,
+    is_prefetch,
+    split_page,
+    with_api_base,
+)
+from app.repositories.counter import (
+    CampaignCounterBase,
+    FirestoreCampaignCounter,
+    InMemoryCampaignCounter,
+)
 from app.repositories.donation import (
     DonationRepositoryBase,
     FirestoreDonationRepository,
     InMemoryDonationRepository,
 )
+from app.repositories.local import FileDonationRepository
+from app.repositories.sqlite import SqliteCampaignCounter, SqliteDonationRepository
+from app.services.campaign import CampaignTotalService
+from app.services.export import DonationExporter
 from app.services.payment import PaymentService
+from app.tenants import (
+    Tenant,
+    TenantAdapterCache,
+    TenantMiddleware,
+    TenantServiceContainer,
+    TenantServices,
+    get_service_container,
+    parse_tenants,
+    set_service_container,
+)
+from app.warmup import ConnectionWarmer, Ping, RequestPhases
 
 # Configure structured logging
 structlog.configure(
@@ -39,50 +105,317 @@ structlog.configure(
 
 logger = structlog.get_logger()
 
+# Probes and scrapes, excluded from request latency (and from being "first")
+UNTIMED_PATHS = frozenset({"/health", "/metrics"})
 
-def init_services() -> None:
-    """Initialize application services."""
-    # Use in-memory repository for sandbox, Firestore for production
-    repository: DonationRepositoryBase
-    if settings.environment == "sandbox":
-        repository = InMemoryDonationRepository()
-        logger.info("Using in-memory repository for sandbox environment")
-    else:
-        repository = FirestoreDonationRepository(project_id=settings.project_id)
-        logger.info("Using Firestore repository", project_id=settings.project_id)
 
-    # Initialize payment adapters
-    adapters = {
-        PaymentProvider.PAYPAY: PayPayAdapter(
+def with_resilience(adapter: PaymentProviderAdapter) -> PaymentProviderAdapter:
+    """Wrap an adapter with the configured per-provider resilience layers.
+
+    The concurrency limiter sits outside the circuit breaker, so time spent
+    waiting for a slot is not counted as provider latency and an open
+    circuit rejects calls before they take a slot.
+    """
+    provider = adapter.provider_name
+    if settings.circuit_breaker_enabled:
+        config = CircuitBreakerConfig(
+            window_size=settings.circuit_breaker_window,
+            min_calls=settings.circuit_breaker_min_calls,
+            failure_rate_threshold=settings.circuit_breaker_failure_rate,
+            slow_call_seconds=settings.circuit_breaker_slow_call_ms / 1000,
+            slow_call_rate_threshold=settings.circuit_breaker_slow_call_rate,
+            open_seconds=settings.circuit_breaker_open_seconds,
+            half_open_probes=settings.circuit_breaker_half_open_probes,
+        )
+        adapter = CircuitBreakerAdapter(adapter, CircuitBreaker(provider, config))
+    if settings.provider_concurrency_enabled:
+        limit_config = ConcurrencyLimitConfig(
+            initial_limit=settings.provider_concurrency_initial,
+            min_limit=settings.provider_concurrency_min,
+            max_limit=settings.provider_concurrency_max,
+            latency_threshold_seconds=settings.provider_concurrency_latency_ms / 1000,
+            backoff_ratio=settings.provider_concurrency_backoff,
+            max_wait_seconds=settings.provider_concurrency_max_wait_ms / 1000,
+        )
+        adapter = ConcurrencyLimitAdapter(adapter, AIMDLimiter(provider, limit_config))
+    return adapter
+
+
+def build_paypay_adapter() -> PaymentProviderAdapter:
+    """Build the PayPay adapter from settings."""
+    return with_resilience(
+        PayPayAdapter(
             api_key=settings.paypay_api_key or None,
             api_secret=settings.paypay_api_secret or None,
             merchant_id=settings.paypay_merchant_id or None,
+            webhook_secrets=parse_secrets(settings.paypay_webhook_secrets),
+            production_mode=settings.paypay_production_mode,
+            timeout=settings.provider_timeout_ms / 1000,
+        )
+    )
+
+
+def build_rakuten_adapter() -> PaymentProviderAdapter:
+    """Build the Rakuten Pay adapter (mock implementation)."""
+    return with_resilience(
+        RakutenPayAdapter(
+            webhook_secrets=parse_secrets(settings.rakuten_webhook_secrets),
+            sandbox=True,
+        )
+    )
+
+
+def build_admission_controller() -> AdmissionController | None:
+    """Build the checkout admission controller from settings."""
+    if not settings.admission_enabled:
+        return None
+    config = AdmissionConfig(
+        max_in_flight=settings.admission_max_in_flight,
+        min_in_flight=settings.admission_min_in_flight,
+        target_latency_seconds=settings.admission_target_latency_ms / 1000,
+        retry_after_seconds=settings.admission_retry_after_seconds,
+    )
+    source_limiter = ip_limiter = None
+    if settings.checkout_source_rate > 0:
+        source_limiter = KeyedTokenBuckets(
+            settings.checkout_source_rate, settings.checkout_source_burst
+        )
+    if settings.checkout_ip_rate > 0:
+        ip_limiter = KeyedTokenBuckets(settings.checkout_ip_rate, settings.checkout_ip_burst)
+    return AdmissionController(config, source_limiter=source_limiter, ip_limiter=ip_limiter)
+
+
+def build_tenant_paypay_adapter(tenant: Tenant) -> PaymentProviderAdapter:
+    """Build a tenant's PayPay adapter; unset credentials fall back to the shared ones."""
+    return with_resilience(
+        PayPayAdapter(
+            api_key=tenant.paypay_api_key or settings.paypay_api_key or None,
+            api_secret=tenant.paypay_api_secret or settings.paypay_api_secret or None,
+            # Never the shared merchant: the tenant's payments must not land there
+            merchant_id=tenant.paypay_merchant_id,
+            webhook_secrets=(
+                list(tenant.paypay_webhook_secrets)
+                or parse_secrets(settings.paypay_webhook_secrets)
+            ),
             production_mode=settings.paypay_production_mode,
-        ),
-        PaymentProvider.RAKUTEN: RakutenPayAdapter(sandbox=True),
-    }
+            timeout=settings.provider_timeout_ms / 1000,
+        )
+    )
+
+
+def build_tenant_rakuten_adapter(tenant: Tenant) -> PaymentProviderAdapter:
+    """Build a tenant's Rakuten Pay adapter (mock implementation)."""
+    return with_resilience(
+        RakutenPayAdapter(
+            webhook_secrets=(
+                list(tenant.rakuten_webhook_secrets)
+                or parse_secrets(settings.rakuten_webhook_secrets)
+            ),
+            sandbox=True,
+        )
+    )
+
+
+def repository_backend() -> str:
+    """The configured repository backend.
+
+    In-memory for sandbox, Firestore for production, unless
+    REPOSITORY_BACKEND picks one.
+    """
+    return settings.repository_backend or (
+        "memory" if settings.environment == "sandbox" else "firestore"
+    )
+
+
+def build_repository(
+    backend: str, tenant: Tenant | None = None, firestore_client: Any | None = None
+) -> tuple[DonationRepositoryBase, CampaignCounterBase]:
+    """Build the donation repository and campaign counter of a backend.
+
+    A tenant's donations are kept apart from the default organization's: in
+    ``tenants/{tenant_id}/`` below the file backend's directory or next to
+    the SQLite database, or in Firestore collections nested under the
+    ``tenants/{tenant_id}`` document.
+    """
+    log = logger.bind(tenant=tenant.id) if tenant else logger
+    repository: DonationRepositoryBase
+    counter: CampaignCounterBase
+    if backend == "memory":
+        repository = InMemoryDonationRepository()
+        counter = InMemoryCampaignCounter()
+        log.info("Using in-memory repository", environment=settings.environment)
+    elif backend == "file":
+        directory = Path(settings.file_repository_dir)
+        if tenant:
+            directory = directory / "tenants" / tenant.id
+        repository = FileDonationRepository(
+            directory,
+            commit_delay=settings.file_repository_commit_delay_ms / 1000,
+            compact_records=settings.file_repository_compact_records,
+        )
+        counter = InMemoryCampaignCounter()
+        log.info("Using file repository", directory=str(directory))
+    elif backend == "sqlite":
+        path = Path(settings.sqlite_path)
+        if tenant:
+            path = path.parent / "tenants" / tenant.id / path.name
+        sqlite_repository = SqliteDonationRepository(
+            str(path),
+            pool_size=settings.sqlite_pool_size,
+            busy_timeout=settings.sqlite_busy_timeout_ms / 1000,
+        )
+        repository = sqlite_repository
+        counter = SqliteCampaignCounter(sqlite_repository)
+        log.info("Using SQLite repository", path=str(path))
+    elif backend == "firestore":
+        prefix = f"tenants/{tenant.id}/" if tenant else ""
+        repository = FirestoreDonationRepository(
+            project_id=settings.project_id,
+            call_timeout=settings.firestore_timeout_ms / 1000,
+            event_write_behind=settings.payment_event_write_behind,
+            event_flush_interval=settings.payment_event_flush_ms / 1000,
+            event_batch_size=settings.payment_event_batch_size,
+            collection_prefix=prefix,
+            client=firestore_client,
+        )
+        counter = FirestoreCampaignCounter(
+            project_id=settings.project_id,
+            num_shards=settings.campaign_counter_shards,
+            client=firestore_client,
+            collection_prefix=prefix,
+        )
+        log.info("Using Firestore repository", project_id=settings.project_id)
+    else:
+        raise ValueError(f"Unknown REPOSITORY_BACKEND: {backend}")
+    return repository, counter
+
+
+def build_service_container(
+    backend: str, repository: DonationRepositoryBase
+) -> TenantServiceContainer | None:
+    """Build the container for the partner organizations in TENANTS, if any."""
+    tenants = parse_tenants(settings.tenants)
+    if not tenants:
+        return None
+
+    def build_services(
+        tenant: Tenant, adapters: Mapping[PaymentProvider, PaymentProviderAdapter]
+    ) -> TenantServices:
+        # Tenants share the default repository's Firestore client (one channel)
+        client = repository.client if isinstance(repository, FirestoreDonationRepository) else None
+        tenant_repository, counter = build_repository(backend, tenant, firestore_client=client)
+        campaign = CampaignTotalService(
+            counter=counter,
+            campaign_id=settings.campaign_id,
+            cache_ttl_seconds=settings.campaign_total_cache_ttl_ms / 1000,
+        )
+        return TenantServices(
+            tenant=tenant,
+            payment=PaymentService(
+                repository=tenant_repository, adapters=adapters, campaign=campaign
+            ),
+            campaign=campaign,
+            exporter=DonationExporter(tenant_repository),
+        )
+
+    adapters = TenantAdapterCache(
+        {
+            PaymentProvider.PAYPAY: build_tenant_paypay_adapter,
+            PaymentProvider.RAKUTEN: build_tenant_rakuten_adapter,
+        },
+        max_size=settings.tenant_adapter_cache_size,
+        idle_seconds=settings.tenant_adapter_idle_seconds,
+    )
+    logger.info("Tenants configured", tenants=[tenant.id for tenant in tenants])
+    return TenantServiceContainer(tenants, build_services, adapters)
+
+
+def init_services() -> ConnectionWarmer:
+    """Initialize application services.
+
+    Called from the lifespan of every worker process, so each worker owns its
+    own Firestore/PayPay clients. Nothing here may run at import time, since
+    gRPC channels and connection pools are not safe to share across a fork.
+
+    Returns:
+        The warmer for the backend connections of the new services
+    """
+    backend = repository_backend()
+    repository, counter = build_repository(backend)
+
+    campaign = CampaignTotalService(
+        counter=counter,
+        campaign_id=settings.campaign_id,
+        cache_ttl_seconds=settings.campaign_total_cache_ttl_ms / 1000,
+    )
+    set_campaign_service(campaign)
+
+    # Register payment adapters (built on first use)
+    adapters = AdapterRegistry()
+    adapters.register(PaymentProvider.PAYPAY, build_paypay_adapter)
+    adapters.register(PaymentProvider.RAKUTEN, build_rakuten_adapter)
 
     # Log PayPay configuration status
-    if settings.paypay_api_key and settings.paypay_api_secret:
+    paypay_configured = bool(settings.paypay_api_key and settings.paypay_api_secret)
+    if paypay_configured:
         logger.info(
             "PayPay configured with API credentials",
             production_mode=settings.paypay_production_mode,
         )
     else:
         logger.warning("PayPay running in mock mode (no API credentials)")
+    if settings.is_production and not parse_secrets(settings.paypay_webhook_secrets):
+        logger.error("PAYPAY_WEBHOOK_SECRETS not set; webhooks use the mock secret")
 
     # Create and set payment service
-    payment_service = PaymentService(repository=repository, adapters=adapters)
+    payment_service = PaymentService(
+        repository=repository, adapters=adapters, campaign=campaign
+    )
     set_payment_service(payment_service)
-
-    logger.info("Services initialized", environment=settings.environment)
+    set_admission_controller(build_admission_controller())
+    set_donation_exporter(DonationExporter(repository))
+    set_service_container(build_service_container(backend, repository))
+
+    logger.info("Services initialized", environment=settings.environment, pid=os.getpid())
+
+    async def campaign_total() -> None:
+        # Opens the counter's own channel and fills the total cache
+        await campaign.get_total()
+
+    async def paypay_ping() -> None:
+        # Building the adapter is part of the warm-up (SDK import, client setup)
+        await adapters[PaymentProvider.PAYPAY].ping()
+
+    targets: dict[str, Ping] = {"donations": repository.ping, "campaign_total": campaign_total}
+    # Only a configured PayPay client has a connection to open; the mock
+    # adapters (and Rakuten Pay, still a mock) have nothing to warm up
+    if paypay_configured:
+        targets[PaymentProvider.PAYPAY.value] = paypay_ping
+    return ConnectionWarmer(
+        targets,
+        timeout=settings.warmup_timeout_ms / 1000,
+        keepalive_interval=settings.keepalive_interval_seconds,
+    )
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
-    """Application lifespan handler."""
-    init_services()
+    """Application lifespan handler.
+
+    uvicorn starts accepting connections only after startup, so the warm-up
+    runs before the instance receives traffic.
+    """
+    warmer = init_services()
+    if settings.warmup_enabled:
+        await warmer.warm_up()
+    warmer.start_keepalive()
     yield
+    await warmer.close()
+    # Commit buffered audit records before the worker exits
+    await get_payment_service().close()
+    container = get_service_container()
+    if container is not None:
+        await container.close()
 
 
 app = FastAPI(
@@ -94,8 +427,30 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+request_phases = RequestPhases()
+
+
+app.add_middleware(TenantMiddleware)
+
+
+@app.middleware("http")
+async def record_request_latency(
+    request: Request, call_next: Callable[[Request], Awaitable[Response]]
+) -> Response:
+    """Record latency, separating the first request of the process from the rest."""
+    if request.url.path in UNTIMED_PATHS:
+        return await call_next(request)
+    started = time.perf_counter()
+    response = await call_next(request)
+    request_phases.observe(time.perf_counter() - started)
+    return response
+
+
 # Include routers
 app.include_router(donations_router)
+app.include_router(campaign_router)
+app.include_router(exports_router)
+app.include_router(stats_router)
 
 # Static files directory
 STATIC_DIR = Path(__file__).parent / "static"
@@ -104,36 +459,46 @@ STATIC_DIR = Path(__file__).parent / "static"
 if STATIC_DIR.exists():
     app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
 
+# Resized, content-hashed images from scripts/build_assets.py (empty without a build)
+ASSETS = AssetManifest.load()
+if ASSETS:
+    logger.info("Asset manifest loaded", images=len(ASSETS.images), icons=len(ASSETS.icons))
+
+NO_CACHE_HEADERS = {"Cache-Control": "no-cache, no-store, must-revalidate"}
+
+
+@functools.cache
+def render_page(name: str) -> bytes:
+    """Read an HTML page once per process, with images pointing at the built assets."""
+    page = (STATIC_DIR / name).read_text(encoding="utf-8")
+    return ASSETS.rewrite_html(page).encode()
+
+
+def html_page(name: str, request: Request) -> HTMLResponse:
+    """Serve an HTML page; pages are never cached, the assets they load are."""
+    return HTMLResponse(with_api_base(render_page(name), request), headers=NO_CACHE_HEADERS)
+
 
 @app.get("/donate")
-async def donate_page() -> FileResponse:
+async def donate_page(request: Request) -> HTMLResponse:
     """Serve the donation amount selection page."""
-    return FileResponse(
-        STATIC_DIR / "donate.html",
-        headers={"Cache-Control": "no-cache, no-store, must-revalidate"},
-    )
+    return html_page("donate.html", request)
 
 
 @app.get("/thanks")
-async def thanks_page() -> FileResponse:
+async def thanks_page(request: Request) -> HTMLResponse:
     """Serve the thank you page."""
-    return FileResponse(
-        STATIC_DIR / "thanks.html",
-        headers={"Cache-Control": "no-cache, no-store, must-revalidate"},
-    )
+    return html_page("thanks.html", request)
 
 
 @app.get("/cancel")
-async def cancel_page() -> FileResponse:
+async def cancel_page(request: Request) -> HTMLResponse:
     """Serve the cancellation page."""
-    return FileResponse(
-        STATIC_DIR / "cancel.html",
-        headers={"Cache-Control": "no-cache, no-store, must-revalidate"},
-    )
+    return html_page("cancel.html", request)
 
 
 @app.get("/mock/payment/{order_id}")
-async def mock_payment_page(order_id: str) -> FileResponse:
+async def mock_payment_page(order_id: str, request: Request) -> HTMLResponse:
     """Serve the mock payment simulation page.
 
     This page simulates the PayPay checkout experience when running
@@ -142,10 +507,7 @@ async def mock_payment_page(order_id: str) -> FileResponse:
     Args:
         order_id: The mock order ID from the checkout session
     """
-    return FileResponse(
-        STATIC_DIR / "mock-payment.html",
-        headers={"Cache-Control": "no-cache, no-store, must-revalidate"},
-    )
+    return html_page("mock-payment.html", request)
 
 
 # =============================================================================
@@ -154,20 +516,17 @@ async def mock_payment_page(order_id: str) -> FileResponse:
 
 
 @app.get("/print/donate")
-async def print_donate_page() -> FileResponse:
+async def print_donate_page(request: Request) -> HTMLResponse:
     """Serve the print QR page for free amount selection.
 
     This page generates a QR code pointing to /donate.
     The QR code never expires and can be printed on flyers, business cards, etc.
     """
-    return FileResponse(
-        STATIC_DIR / "print-donate.html",
-        headers={"Cache-Control": "no-cache, no-store, must-revalidate"},
-    )
+    return html_page("print-donate.html", request)
 
 
 @app.get("/print/{amount}", response_model=None)
-async def print_qr_page(amount: int) -> Response:
+async def print_qr_page(amount: int, request: Request) -> Response:
     """Serve the print QR generation page for a fixed amount.
 
     This page generates a QR code pointing to /pay/{amount}.
@@ -184,10 +543,7 @@ async def print_qr_page(amount: int) -> Response:
                 "message": "金額は100円〜1,000,000円の範囲で指定してください",
             },
         )
-    return FileResponse(
-        STATIC_DIR / "print.html",
-        headers={"Cache-Control": "no-cache, no-store, must-revalidate"},
-    )
+    return html_page("print.html", request)
 
 
 # =============================================================================
@@ -196,12 +552,20 @@ async def print_qr_page(amount: int) -> Response:
 
 
 @app.get("/pay/{amount}", response_model=None)
-async def pay_page(amount: int) -> Response:
+async def pay_page(
+    amount: int,
+    request: Request,
+    service: PaymentService = Depends(get_payment_service),
+    admission: AdmissionController | None = Depends(get_admission_controller),
+) -> Response:
     """Serve the payment execution page for a fixed amount.
 
-    - Mobile: Automatically redirects to PayPay
+    - Mobile: Redirects (302) straight to PayPay
     - PC: Displays PayPay QR code with 5-minute expiry countdown
 
+    The checkout is created while handling this request (see app.pages);
+    with PAY_SERVER_CHECKOUT=false the page creates it from the browser.
+
     This is the page that printed QR codes should point to.
 
     Args:
@@ -215,9 +579,38 @@ async def pay_page(amount: int) -> Response:
                 "message": "金額は100円〜1,000,000円の範囲で指定してください",
             },
         )
-    return FileResponse(
-        STATIC_DIR / "pay.html",
-        headers={"Cache-Control": "no-cache, no-store, must-revalidate"},
+    if not settings.pay_server_checkout or is_prefetch(request):
+        return html_page("pay.html", request)
+
+    if is_mobile(request):
+        checkout = await create_checkout(request, amount, service, admission)
+        if checkout is None:
+            return html_page("pay.html", request)
+        metrics.inc(
+            "pay_inline_checkouts_total",
+            description="/pay checkouts created inline",
+            mode="redirect",
+        )
+        return RedirectResponse(
+            checkout.redirect_url, status_code=302, headers={"Cache-Control": "no-store"}
+        )
+
+    head, tail = split_page(with_api_base(render_page("pay.html"), request))
+
+    async def body() -> AsyncGenerator[bytes, None]:
+        # Flushed before the provider call so the browser can start rendering
+        yield head
+        checkout = await create_checkout(request, amount, service, admission)
+        if checkout is not None:
+            metrics.inc(
+                "pay_inline_checkouts_total",
+                description="/pay checkouts created inline",
+                mode="embedded",
+            )
+        yield checkout_script(checkout) + tail
+
+    return StreamingResponse(
+        body(), media_type="text/html; charset=utf-8", headers=NO_CACHE_HEADERS
     )
 
 
@@ -227,7 +620,7 @@ async def pay_page(amount: int) -> Response:
 
 
 @app.get("/qr/{amount}", response_model=None)
-async def qr_payment_page(amount: int) -> Response:
+async def qr_payment_page(amount: int, request: Request) -> Response:
     """Legacy endpoint - redirects to /pay/{amount}.
 
     This endpoint is kept for backward compatibility.
@@ -236,8 +629,6 @@ async def qr_payment_page(amount: int) -> Response:
     Args:
         amount: The donation amount in JPY (100-1,000,000)
     """
-    from starlette.responses import RedirectResponse
-
     if amount < 100 or amount > 1000000:
         return JSONResponse(
             status_code=400,
@@ -246,24 +637,59 @@ async def qr_payment_page(amount: int) -> Response:
                 "message": "金額は100円〜1,000,000円の範囲で指定してください",
             },
         )
-    return RedirectResponse(url=f"/pay/{amount}", status_code=302)
+    root_path = request.scope.get("root_path", "")
+    return RedirectResponse(url=f"{root_path}/pay/{amount}", status_code=302)
+
+
+@app.get("/assets/{file}", include_in_schema=False, response_model=None)
+async def built_asset(file: str) -> Response:
+    """Serve a content-hashed asset; its URL changes whenever its content does."""
+    path = ASSETS.file_path(file)
+    if path is None:
+        return JSONResponse(status_code=404, content={"error": "NOT_FOUND"})
+    return FileResponse(path, headers={"Cache-Control": IMMUTABLE_CACHE_CONTROL})
+
+
+def icon_response(name: str) -> FileResponse | None:
+    """Serve a built icon at its fixed URL, revalidated daily."""
+    icon = ASSETS.icons.get(name)
+    if icon is None:
+        return None
+    return FileResponse(
+        ASSETS.directory / icon.file,
+        headers={"Cache-Control": "public, max-age=86400"},
+    )
 
 
 @app.get("/favicon.ico", include_in_schema=False)
 async def favicon() -> FileResponse:
-    """Serve favicon."""
-    return FileResponse(
+    """Serve favicon (the logo JPEG when assets have not been built)."""
+    return icon_response("favicon.ico") or FileResponse(
         STATIC_DIR / "assets" / "tadakayo-logo.jpg",
         media_type="image/jpeg",
     )
 
 
+@app.get("/apple-touch-icon.png", include_in_schema=False, response_model=None)
+async def apple_touch_icon() -> Response:
+    """Serve the home screen icon iOS requests by default."""
+    return icon_response("apple-touch-icon.png") or JSONResponse(
+        status_code=404, content={"error": "NOT_FOUND"}
+    )
+
+
 @app.get("/health")
 async def health_check() -> dict[str, str]:
     """Health check endpoint for Cloud Run."""
     return {"status": "healthy", "environment": settings.environment}
 
 
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(require_admin_token)])
+async def metrics_endpoint() -> PlainTextResponse:
+    """Expose in-process metrics of this worker in Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/")
 async def root() -> dict[str, str]:
     """Root endpoint."""
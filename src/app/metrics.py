@@ -0,0 +1,135 @@
+"""In-process metrics registry with Prometheus text exposition.
+
+Counters, gauges and summaries are kept per worker process and rendered by
+``GET /metrics``. Labels are passed as keyword arguments.
+"""
+
+import threading
+from collections.abc import Callable
+
+LabelKey = tuple[tuple[str, str], ...]
+
+
+def _label_key(labels: dict[str, object]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in key) + "}"
+
+
+class MetricsRegistry:
+    """Thread-safe registry of counters, gauges and summaries."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._help: dict[str, tuple[str, str]] = {}
+        self._counters: dict[str, dict[LabelKey, float]] = {}
+        self._gauges: dict[str, dict[LabelKey, float]] = {}
+        self._gauge_callbacks: dict[str, dict[LabelKey, Callable[[], float]]] = {}
+        # name -> labels -> [count, sum, max]
+        self._summaries: dict[str, dict[LabelKey, list[float]]] = {}
+
+    def _describe(self, name: str, kind: str, description: str) -> None:
+        if name not in self._help:
+            self._help[name] = (kind, description)
+
+    def inc(self, name: str, value: float = 1.0, description: str = "", **labels: object) -> None:
+        """Increment a counter."""
+        key = _label_key(labels)
+        with self._lock:
+            self._describe(name, "counter", description)
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def set(self, name: str, value: float, description: str = "", **labels: object) -> None:
+        """Set a gauge."""
+        key = _label_key(labels)
+        with self._lock:
+            self._describe(name, "gauge", description)
+            self._gauges.setdefault(name, {})[key] = value
+
+    def gauge_callback(
+        self, name: str, callback: Callable[[], float], description: str = "", **labels: object
+    ) -> None:
+        """Register a gauge whose value is read when metrics are collected."""
+        key = _label_key(labels)
+        with self._lock:
+            self._describe(name, "gauge", description)
+            self._gauge_callbacks.setdefault(name, {})[key] = callback
+
+    def observe(self, name: str, value: float, description: str = "", **labels: object) -> None:
+        """Record an observation (e.g. a latency in seconds) in a summary."""
+        key = _label_key(labels)
+        with self._lock:
+            self._describe(name, "summary", description)
+            stats = self._summaries.setdefault(name, {}).setdefault(key, [0.0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += value
+            stats[2] = max(stats[2], value)
+
+    def get(self, name: str, **labels: object) -> float | None:
+        """Get the current value of a counter or gauge (for tests and health output)."""
+        key = _label_key(labels)
+        with self._lock:
+            for store in (self._counters, self._gauges):
+                if name in store and key in store[name]:
+                    return store[name][key]
+            callback = self._gauge_callbacks.get(name, {}).get(key)
+        return callback() if callback else None
+
+    def summary(self, name: str, **labels: object) -> tuple[int, float, float] | None:
+        """Get (count, sum, max) of a summary."""
+        key = _label_key(labels)
+        with self._lock:
+            stats = self._summaries.get(name, {}).get(key)
+            return (int(stats[0]), stats[1], stats[2]) if stats else None
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            counters = {n: dict(s) for n, s in self._counters.items()}
+            gauges = {n: dict(s) for n, s in self._gauges.items()}
+            callbacks = {n: dict(s) for n, s in self._gauge_callbacks.items()}
+            summaries = {n: {k: list(v) for k, v in s.items()} for n, s in self._summaries.items()}
+            help_text = dict(self._help)
+
+        for name, series in callbacks.items():
+            values = gauges.setdefault(name, {})
+            for key, callback in series.items():
+                values[key] = callback()
+
+        lines: list[str] = []
+        for name in sorted(help_text):
+            kind, description = help_text[name]
+            if description:
+                lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "summary":
+                for key, (count, total, _) in sorted(summaries.get(name, {}).items()):
+                    labels = _format_labels(key)
+                    lines.append(f"{name}_count{labels} {count:g}")
+                    lines.append(f"{name}_sum{labels} {total:g}")
+            else:
+                store = counters if kind == "counter" else gauges
+                for key, value in sorted(store.get(name, {}).items()):
+                    lines.append(f"{name}{_format_labels(key)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        """Clear all metrics (for tests)."""
+        with self._lock:
+            self._help.clear()
+            self._counters.clear()
+            self._gauges.clear()
+            self._gauge_callbacks.clear()
+            self._summaries.clear()
+
+
+metrics = MetricsRegistry()
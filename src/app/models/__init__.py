@@ -1,25 +1,45 @@
 """Data models for the QR Payment API."""
 
 from app.models.donation import (
+    MAX_BATCH_DONATION_IDS,
+    STATUS_TRANSITIONS,
+    CampaignTotalResponse,
     CheckoutRequest,
     CheckoutResponse,
     Donation,
+    DonationBatchRequest,
+    DonationBatchResponse,
+    DonationListResponse,
     DonationResponse,
+    DonationRollup,
     DonationStatus,
     PaymentEvent,
     PaymentProvider,
     QRSource,
     QRSourceType,
+    StatsResponse,
+    StatusTotal,
+    is_allowed_transition,
 )
 
 __all__ = [
+    "CampaignTotalResponse",
     "CheckoutRequest",
     "CheckoutResponse",
     "Donation",
+    "DonationBatchRequest",
+    "DonationBatchResponse",
+    "DonationListResponse",
     "DonationResponse",
+    "DonationRollup",
     "DonationStatus",
     "PaymentEvent",
     "PaymentProvider",
     "QRSource",
+    "MAX_BATCH_DONATION_IDS",
     "QRSourceType",
+    "STATUS_TRANSITIONS",
+    "StatsResponse",
+    "StatusTotal",
+    "is_allowed_transition",
 ]
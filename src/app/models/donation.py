@@ -1,8 +1,8 @@
 """Donation and payment event models."""
 
-from datetime import datetime
+from datetime import date, datetime
 from enum import Enum
-from typing import Any
+from typing import Annotated, Any
 
 from pydantic import BaseModel, Field
 
@@ -24,6 +24,25 @@ class DonationStatus(str, Enum):
     EXPIRED = "expired"
 
 
+# Allowed status transitions. Statuses only move forward, so a late or
+# re-delivered notification cannot regress a donation. A capture reported
+# after a failure or expiry still means the money was taken, so it wins.
+STATUS_TRANSITIONS: dict[DonationStatus, frozenset[DonationStatus]] = {
+    DonationStatus.PENDING: frozenset(
+        {DonationStatus.COMPLETED, DonationStatus.FAILED, DonationStatus.EXPIRED}
+    ),
+    DonationStatus.FAILED: frozenset({DonationStatus.COMPLETED}),
+    DonationStatus.EXPIRED: frozenset({DonationStatus.COMPLETED}),
+    DonationStatus.COMPLETED: frozenset({DonationStatus.REFUNDED}),
+    DonationStatus.REFUNDED: frozenset(),
+}
+
+
+def is_allowed_transition(old: str, new: str) -> bool:
+    """Check whether a donation may move from ``old`` to ``new`` status."""
+    return DonationStatus(new) in STATUS_TRANSITIONS[DonationStatus(old)]
+
+
 class QRSourceType(str, Enum):
     """QR code source types."""
 
@@ -64,6 +83,22 @@ class PaymentEvent(BaseModel):
     signature_valid: bool
 
 
+class DonationRollup(BaseModel):
+    """Aggregated counts for one (day, source, provider, status) bucket.
+
+    Days are calendar days in JST, keyed by the donation's ``created_at``.
+    """
+
+    model_config = {"use_enum_values": True}
+
+    day: str = Field(..., description="Calendar day in JST (YYYY-MM-DD)")
+    source: str
+    provider: PaymentProvider
+    status: DonationStatus
+    count: int = Field(default=0, description="Number of donations in this bucket")
+    amount: int = Field(default=0, description="Sum of donation amounts in JPY")
+
+
 class QRSource(BaseModel):
     """QR code source master data."""
 
@@ -108,3 +143,61 @@ class DonationResponse(BaseModel):
     provider: PaymentProvider
     source: str
     completed_at: datetime | None = None
+    updated_at: datetime
+
+
+class CampaignTotalResponse(BaseModel):
+    """Response for the live campaign total."""
+
+    campaign_id: str
+    total_amount: int = Field(..., description="Completed amount minus refunds in JPY")
+    donation_count: int
+    as_of: datetime
+
+
+# Most donation IDs one batch status request may ask for
+MAX_BATCH_DONATION_IDS = 100
+
+# A Firestore document ID (no path separators)
+DonationId = Annotated[str, Field(min_length=1, max_length=128, pattern=r"^[^/]+$")]
+
+
+class DonationBatchRequest(BaseModel):
+    """Request for the status of several donations at once."""
+
+    donation_ids: list[DonationId] = Field(
+        ..., min_length=1, max_length=MAX_BATCH_DONATION_IDS
+    )
+
+
+class DonationBatchResponse(BaseModel):
+    """Statuses of the found donations, in request order, and the missing IDs."""
+
+    donations: list[DonationResponse]
+    not_found: list[str]
+
+
+class DonationListResponse(BaseModel):
+    """One page of the admin donation listing."""
+
+    items: list[dict[str, Any]]
+    next_cursor: str | None = None
+
+
+class StatusTotal(BaseModel):
+    """Count and amount totals for a single status."""
+
+    count: int = 0
+    amount: int = 0
+
+
+class StatsResponse(BaseModel):
+    """Response for aggregate donation statistics."""
+
+    start_date: date
+    end_date: date
+    buckets: list[DonationRollup]
+    totals: dict[DonationStatus, StatusTotal]
+    total_count: int
+    success_rate: float | None = None
+    failure_rate: float | None = None
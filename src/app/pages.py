@@ -0,0 +1,124 @@
+"""Server-side checkout for the /pay/{amount} page.
+
+Printed QR codes point at /pay/{amount}. Left to the browser, a scan costs
+three sequential round trips before PayPay opens: the page, its checkout
+POST and the redirect. Instead the checkout is created while handling the
+page request:
+
+- Mobile browsers get a 302 straight to the provider's checkout URL.
+- Desktop browsers get the page streamed in two parts: everything up to the
+  page script is flushed at once (styles, header, loading spinner, the QR
+  library download), then the checkout is embedded as ``window.PAY_CHECKOUT``
+  once the provider has answered.
+
+When the inline checkout fails (overload, provider errors) the plain page is
+served, or the embedded checkout is left out, and the page falls back to
+creating the checkout itself with its own retries.
+
+Pages served under a tenant's path prefix (``/t/{id}/pay/...``) must call
+that tenant's API, so every page gets its API base as ``window.API_BASE``.
+"""
+
+import contextlib
+import json
+import re
+import uuid
+
+import structlog
+from fastapi import Request
+
+from app import deadline
+from app.admission import AdmissionController
+from app.config import settings
+from app.metrics import metrics
+from app.models.donation import CheckoutRequest, CheckoutResponse, PaymentProvider
+from app.services.payment import PaymentService
+
+logger = structlog.get_logger()
+
+# Where the server inserts the embedded checkout in pay.html
+CHECKOUT_MARKER = b"<!-- pay:checkout -->"
+# Where the server inserts the API base in every page
+API_BASE_MARKER = b"<!-- page:api-base -->"
+PAY_SOURCE = "qr_fixed"
+
+# Same rule as the page's own isMobile()
+_MOBILE_USER_AGENT = re.compile(
+    r"Android|webOS|iPhone|iPad|iPod|BlackBerry|IEMobile|Opera Mini", re.IGNORECASE
+)
+
+
+def is_mobile(request: Request) -> bool:
+    """Check whether the request comes from a mobile browser."""
+    return bool(_MOBILE_USER_AGENT.search(request.headers.get("user-agent", "")))
+
+
+def is_prefetch(request: Request) -> bool:
+    """Check for speculative loads, which must not create donations."""
+    purpose = request.headers.get("sec-purpose") or request.headers.get("purpose") or ""
+    return "prefetch" in purpose.lower()
+
+
+def _inline_json(value: object) -> str:
+    """JSON for an inline script, with "</script>" in a value kept from closing it."""
+    return json.dumps(value, ensure_ascii=False).replace("<", "\\u003c")
+
+
+def with_api_base(page: bytes, request: Request) -> bytes:
+    """Point the page's script at the API of the tenant that served the page."""
+    base = _inline_json(request.scope.get("root_path", ""))
+    script = f"<script>window.API_BASE = {base};</script>".encode()
+    return page.replace(API_BASE_MARKER, script, 1)
+
+
+def split_page(page: bytes) -> tuple[bytes, bytes]:
+    """Split pay.html into the part flushed up front and the rest."""
+    head, marker, tail = page.partition(CHECKOUT_MARKER)
+    if not marker:
+        raise ValueError("pay.html has no checkout marker")
+    return head, tail
+
+
+def checkout_script(checkout: CheckoutResponse | None) -> bytes:
+    """Inline script handing the checkout to the page (empty if there is none)."""
+    if checkout is None:
+        return b""
+    data = _inline_json(checkout.model_dump(mode="json"))
+    return f"<script>window.PAY_CHECKOUT = {data};</script>".encode()
+
+
+async def create_checkout(
+    request: Request,
+    amount: int,
+    service: PaymentService,
+    admission: AdmissionController | None,
+) -> CheckoutResponse | None:
+    """Create the checkout for a /pay request, as the page's script would.
+
+    Returns:
+        The checkout, or None when it could not be created; the page then
+        creates one itself
+    """
+    base_url = str(request.base_url).rstrip("/")
+    checkout = CheckoutRequest(
+        amount=amount,
+        source=PAY_SOURCE,
+        provider=PaymentProvider.PAYPAY,
+        return_url=f"{base_url}/thanks",
+        cancel_url=f"{base_url}/cancel",
+        idempotency_key=str(uuid.uuid4()),
+    )
+    client_ip = request.client.host if request.client else None
+    slot = admission.admit(PAY_SOURCE, client_ip) if admission else contextlib.nullcontext()
+    try:
+        async with slot:
+            with deadline.scope(settings.checkout_deadline_ms / 1000):
+                return await service.create_checkout(checkout)
+    except Exception as e:
+        # Whatever went wrong, the page's own checkout flow can still recover
+        metrics.inc(
+            "pay_inline_checkout_failures_total",
+            description="/pay requests whose inline checkout failed",
+        )
+        logger.warning("Inline /pay checkout failed", amount=amount, error=str(e))
+        return None
@@ -1,13 +1,51 @@
 """Data repositories."""
 
+from app.repositories.archive import (
+    ArchiveStore,
+    GcsArchiveStore,
+    LocalArchiveStore,
+    open_archive_store,
+)
+from app.repositories.counter import (
+    CampaignCounterBase,
+    CampaignTotal,
+    FirestoreCampaignCounter,
+    InMemoryCampaignCounter,
+)
 from app.repositories.donation import (
+    DonationPage,
+    DonationQuery,
     DonationRepositoryBase,
+    DonationVersion,
     FirestoreDonationRepository,
     InMemoryDonationRepository,
+    PaymentEventQuery,
+    StatusUpdate,
+    TransitionOutcome,
 )
+from app.repositories.local import FileDonationRepository, RepositoryCorruptedError
+from app.repositories.sqlite import SqliteCampaignCounter, SqliteDonationRepository
 
 __all__ = [
+    "ArchiveStore",
+    "CampaignCounterBase",
+    "CampaignTotal",
+    "DonationPage",
+    "DonationQuery",
     "DonationRepositoryBase",
+    "DonationVersion",
+    "FileDonationRepository",
+    "FirestoreCampaignCounter",
     "FirestoreDonationRepository",
+    "GcsArchiveStore",
+    "InMemoryCampaignCounter",
     "InMemoryDonationRepository",
+    "LocalArchiveStore",
+    "PaymentEventQuery",
+    "RepositoryCorruptedError",
+    "SqliteCampaignCounter",
+    "SqliteDonationRepository",
+    "StatusUpdate",
+    "TransitionOutcome",
+    "open_archive_store",
 ]
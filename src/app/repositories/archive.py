@@ -0,0 +1,134 @@
+"""Storage for archived records (local directory or Cloud Storage).
+
+Archives are written as finished local files and then handed to the store,
+so a store only needs whole-object upload, listing and reading. Stores are
+synchronous; async callers run them in a worker thread.
+"""
+
+import os
+import shutil
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import IO, Any
+
+
+class ArchiveStore(ABC):
+    """Write-once object storage keyed by ``/``-separated paths."""
+
+    @abstractmethod
+    def put(self, key: str, path: Path) -> None:
+        """Store a finished local file under key.
+
+        Raises:
+            FileExistsError: If the key is already taken
+        """
+        ...
+
+    @abstractmethod
+    def list(self, prefix: str) -> list[str]:
+        """List the keys starting with prefix, sorted."""
+        ...
+
+    @abstractmethod
+    def open(self, key: str) -> IO[bytes]:
+        """Open a stored object for reading."""
+        ...
+
+
+class LocalArchiveStore(ArchiveStore):
+    """Archive in a local directory (development, or a mounted volume)."""
+
+    def __init__(self, root: str | Path):
+        self._root = Path(root)
+
+    def _path(self, key: str) -> Path:
+        path = (self._root / key).resolve()
+        if not path.is_relative_to(self._root.resolve()):
+            raise ValueError(f"Archive key escapes the root: {key}")
+        return path
+
+    def put(self, key: str, path: Path) -> None:
+        target = self._path(key)
+        if target.exists():
+            raise FileExistsError(key)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        partial = target.with_name(target.name + ".partial")
+        with open(path, "rb") as source, open(partial, "wb") as copy:
+            shutil.copyfileobj(source, copy)
+            copy.flush()
+            os.fsync(copy.fileno())
+        # Readers never see a half-written file
+        os.replace(partial, target)
+
+    def list(self, prefix: str) -> list[str]:
+        if not self._root.exists():
+            return []
+        keys = (
+            path.relative_to(self._root).as_posix()
+            for path in self._root.rglob("*")
+            if path.is_file() and not path.name.endswith(".partial")
+        )
+        return sorted(key for key in keys if key.startswith(prefix))
+
+    def open(self, key: str) -> IO[bytes]:
+        return open(self._path(key), "rb")
+
+
+class GcsArchiveStore(ArchiveStore):
+    """Archive in a Cloud Storage bucket.
+
+    ``google-cloud-storage`` is an optional dependency (the ``archive``
+    extra) and is imported on first use.
+    """
+
+    def __init__(self, bucket: str, prefix: str = "", project_id: str | None = None):
+        self._bucket_name = bucket
+        self._prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        self._project_id = project_id
+        self._bucket: Any | None = None
+
+    @property
+    def _storage(self) -> Any:
+        if self._bucket is None:
+            from google.cloud import storage  # type: ignore[attr-defined]
+
+            client = storage.Client(project=self._project_id)
+            self._bucket = client.bucket(self._bucket_name)
+        return self._bucket
+
+    def put(self, key: str, path: Path) -> None:
+        from google.api_core import exceptions
+
+        blob = self._storage.blob(self._prefix + key)
+        try:
+            # Generation 0 means "only if absent"
+            blob.upload_from_filename(
+                str(path), content_type="application/gzip", if_generation_match=0
+            )
+        except exceptions.PreconditionFailed as e:
+            raise FileExistsError(key) from e
+
+    def list(self, prefix: str) -> list[str]:
+        blobs = self._storage.client.list_blobs(self._storage, prefix=self._prefix + prefix)
+        return sorted(blob.name[len(self._prefix) :] for blob in blobs)
+
+    def open(self, key: str) -> IO[bytes]:
+        return self._storage.blob(self._prefix + key).open("rb")  # type: ignore[no-any-return]
+
+
+def open_archive_store(uri: str, project_id: str | None = None) -> ArchiveStore:
+    """Build a store from ``gs://bucket/prefix``, ``file:///path`` or a plain path.
+
+    Raises:
+        ValueError: If the URI is empty or has an unsupported scheme
+    """
+    if not uri:
+        raise ValueError("No archive location configured")
+    if uri.startswith("gs://"):
+        bucket, _, prefix = uri.removeprefix("gs://").partition("/")
+        return GcsArchiveStore(bucket, prefix, project_id=project_id)
+    if uri.startswith("file://"):
+        return LocalArchiveStore(uri.removeprefix("file://"))
+    if "://" in uri:
+        raise ValueError(f"Unsupported archive location: {uri}")
+    return LocalArchiveStore(uri)
@@ -0,0 +1,138 @@
+"""Sharded campaign total counters.
+
+A single Firestore document sustains roughly one write per second, far below
+the completion rate of a room full of donors. Counters are therefore split
+into N shard documents; writers increment a random shard and readers sum all
+shards with one collection query.
+"""
+
+import asyncio
+import random
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any
+
+import structlog
+
+from app import deadline
+
+logger = structlog.get_logger()
+
+COUNTERS_COLLECTION = "campaign_counters"
+DEFAULT_NUM_SHARDS = 20
+
+
+@dataclass
+class CampaignTotal:
+    """Aggregated campaign total."""
+
+    amount: int = 0
+    count: int = 0
+
+
+class CampaignCounterBase(ABC):
+    """Abstract base class for campaign total counters."""
+
+    @abstractmethod
+    async def increment(self, campaign_id: str, amount: int, count: int) -> None:
+        """Add amount and count (both may be negative) to the campaign total."""
+        ...
+
+    @abstractmethod
+    async def get_total(self, campaign_id: str) -> CampaignTotal:
+        """Get the current campaign total."""
+        ...
+
+
+class FirestoreCampaignCounter(CampaignCounterBase):
+    """Firestore implementation using randomly selected shard documents.
+
+    Layout: ``campaign_counters/{campaign_id}/shards/{index}`` with
+    ``amount`` and ``count`` fields updated via server-side increments.
+    ``collection_prefix`` nests the counters the way it nests a tenant's
+    donations (see FirestoreDonationRepository).
+    """
+
+    def __init__(
+        self,
+        project_id: str | None = None,
+        num_shards: int = DEFAULT_NUM_SHARDS,
+        client: Any | None = None,
+        collection_prefix: str = "",
+    ):
+        self._project_id = project_id
+        self._client = client
+        self._num_shards = num_shards
+        self._collection = f"{collection_prefix}{COUNTERS_COLLECTION}"
+
+    @property
+    def _db(self) -> Any:
+        """Firestore client, constructed on first use."""
+        if self._client is None:
+            from google.cloud import firestore  # type: ignore[attr-defined]
+
+            self._client = firestore.Client(project=self._project_id)
+        return self._client
+
+    def _shards(self, campaign_id: str) -> Any:
+        return (
+            self._db.collection(self._collection)
+            .document(campaign_id)
+            .collection("shards")
+        )
+
+    async def increment(self, campaign_id: str, amount: int, count: int) -> None:
+        """Increment a random shard of the campaign counter."""
+        from google.cloud import firestore  # type: ignore[attr-defined]
+
+        shard = str(random.randrange(self._num_shards))
+        document = self._shards(campaign_id).document(shard)
+        # Increments are not idempotent: one attempt within the request budget
+        await deadline.wait(
+            "firestore.campaign_increment",
+            lambda t: asyncio.to_thread(
+                document.set,
+                {"amount": firestore.Increment(amount), "count": firestore.Increment(count)},
+                merge=True,
+                retry=None,
+                timeout=t,
+            ),
+        )
+
+        logger.info(
+            "Campaign counter incremented",
+            campaign_id=campaign_id,
+            shard=shard,
+            amount=amount,
+            count=count,
+        )
+
+    async def get_total(self, campaign_id: str) -> CampaignTotal:
+        """Sum all shards of the campaign counter."""
+        shards = self._shards(campaign_id)
+        docs = await deadline.wait(
+            "firestore.campaign_total",
+            lambda t: asyncio.to_thread(lambda: list(shards.stream(timeout=t))),
+        )
+        total = CampaignTotal()
+        for doc in docs:
+            data = doc.to_dict() or {}
+            total.amount += data.get("amount", 0)
+            total.count += data.get("count", 0)
+        return total
+
+
+class InMemoryCampaignCounter(CampaignCounterBase):
+    """In-memory implementation for testing."""
+
+    def __init__(self) -> None:
+        self._totals: dict[str, CampaignTotal] = {}
+
+    async def increment(self, campaign_id: str, amount: int, count: int) -> None:
+        total = self._totals.setdefault(campaign_id, CampaignTotal())
+        total.amount += amount
+        total.count += count
+
+    async def get_total(self, campaign_id: str) -> CampaignTotal:
+        total = self._totals.get(campaign_id, CampaignTotal())
+        return CampaignTotal(amount=total.amount, count=total.count)
@@ -1,16 +1,211 @@
 """Donation repository for Firestore operations."""
 
+import asyncio
+import base64
+import binascii
+import json
 from abc import ABC, abstractmethod
-from datetime import UTC, datetime
-from typing import Any
+from collections.abc import AsyncIterator, Callable, MutableMapping, Sequence
+from contextlib import AbstractAsyncContextManager, asynccontextmanager
+from dataclasses import dataclass
+from datetime import UTC, date, datetime, timedelta
+from enum import Enum
+from typing import Any, TypeVar
+from urllib.parse import quote
 
 import structlog
-from google.cloud import firestore  # type: ignore[attr-defined]
 
-from app.models.donation import Donation, DonationStatus, PaymentEvent, PaymentProvider
+from app import deadline
+from app.metrics import metrics
+from app.models.donation import (
+    Donation,
+    DonationRollup,
+    DonationStatus,
+    PaymentEvent,
+    PaymentProvider,
+    is_allowed_transition,
+)
+from app.repositories.rollups import (
+    ROLLUPS_COLLECTION,
+    iter_days,
+    nested_buckets,
+    parse_rollup_document,
+    rollup_changes,
+)
+from app.repositories.write_behind import (
+    DEFAULT_FLUSH_INTERVAL,
+    DEFAULT_MAX_BATCH,
+    WriteBehindBuffer,
+)
 
 logger = structlog.get_logger()
 
+T = TypeVar("T")
+
+# Donation fields by model name -> Firestore document field
+DONATION_FIELDS: dict[str, str] = {
+    "amount": "amount",
+    "currency": "currency",
+    "provider": "provider",
+    "status": "status",
+    "source": "source",
+    "provider_order_id": "providerOrderId",
+    "provider_customer_id": "providerCustomerId",
+    "idempotency_key": "idempotencyKey",
+    "created_at": "createdAt",
+    "updated_at": "updatedAt",
+    "completed_at": "completedAt",
+}
+
+DEFAULT_PAGE_SIZE = 500
+DEFAULT_LIST_LIMIT = 50
+# Document read by ping(); it does not need to exist
+PING_DOCUMENT = "_ping"
+# Attempts of an optimistic status update before giving up on contention
+STATUS_UPDATE_ATTEMPTS = 5
+# Writes per Firestore batch commit
+MAX_BATCH_WRITES = 500
+
+
+class DuplicateDonationError(Exception):
+    """Raised by create when the donation's idempotency key is already taken."""
+
+    def __init__(self, idempotency_key: str):
+        self.idempotency_key = idempotency_key
+        super().__init__(f"Idempotency key already used: {idempotency_key}")
+
+
+class TransitionOutcome(str, Enum):
+    """Result of a status update."""
+
+    APPLIED = "applied"
+    UNCHANGED = "unchanged"  # already in the requested status
+    REJECTED = "rejected"  # not allowed by STATUS_TRANSITIONS
+    NOT_FOUND = "not_found"
+
+
+@dataclass
+class StatusUpdate:
+    """Outcome of update_status() with the donation as stored afterwards."""
+
+    outcome: TransitionOutcome
+    donation: Donation | None = None
+    previous_status: str | None = None
+
+    @property
+    def applied(self) -> bool:
+        return self.outcome == TransitionOutcome.APPLIED
+
+
+def _check_transition(donation: Donation, status: str) -> StatusUpdate | None:
+    """Return the outcome for a transition that must not be written, else None."""
+    if donation.status == status:
+        return StatusUpdate(TransitionOutcome.UNCHANGED, donation, donation.status)
+    if not is_allowed_transition(donation.status, status):
+        return StatusUpdate(TransitionOutcome.REJECTED, donation, donation.status)
+    return None
+
+
+@dataclass
+class DonationVersion:
+    """Status and last update time of a donation, without the rest of it."""
+
+    status: str
+    updated_at: datetime
+
+
+@dataclass
+class DonationQuery:
+    """Filters for scanning donations, ordered by creation time."""
+
+    status: DonationStatus | None = None
+    source: str | None = None
+    provider: PaymentProvider | None = None
+    created_from: datetime | None = None  # inclusive
+    created_to: datetime | None = None  # exclusive
+
+    def matches(self, donation: Donation) -> bool:
+        """Check whether a donation satisfies the filters."""
+        return (
+            (self.status is None or donation.status == self.status.value)
+            and (self.source is None or donation.source == self.source)
+            and (self.provider is None or donation.provider == self.provider.value)
+            and (self.created_from is None or donation.created_at >= self.created_from)
+            and (self.created_to is None or donation.created_at < self.created_to)
+        )
+
+
+@dataclass
+class DonationPage:
+    """One page of a donation listing, newest first."""
+
+    items: list[dict[str, Any]]
+    # Opaque cursor of the next page; None on the last page
+    next_cursor: str | None = None
+
+
+def encode_cursor(created_at: datetime, donation_id: str) -> str:
+    """Encode the sort key of the last listed donation as a page cursor."""
+    key = json.dumps([created_at.isoformat(), donation_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(key.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    """Decode a page cursor into (created_at, donation_id).
+
+    Raises:
+        ValueError: If the cursor was not produced by encode_cursor()
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, donation_id = json.loads(raw)
+        parsed = datetime.fromisoformat(created_at)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+    if parsed.tzinfo is None or not isinstance(donation_id, str):
+        raise ValueError("Invalid cursor")
+    return parsed, donation_id
+
+
+@dataclass
+class PaymentEventQuery:
+    """Filters for scanning stored payment events, ordered by receipt time."""
+
+    provider: PaymentProvider | None = None
+    received_from: datetime | None = None  # inclusive
+    received_to: datetime | None = None  # exclusive
+
+    def matches(self, event: PaymentEvent) -> bool:
+        """Check whether an event satisfies the filters."""
+        return (
+            (self.provider is None or event.provider == self.provider.value)
+            and (self.received_from is None or event.received_at >= self.received_from)
+            and (self.received_to is None or event.received_at < self.received_to)
+        )
+
+
+def event_key(provider: str, provider_event_id: str) -> str:
+    """Document ID of the duplicate-detection marker for a provider event."""
+    # Provider event IDs may contain "/", which Firestore IDs cannot
+    return f"{provider}:{quote(provider_event_id, safe='')}"
+
+
+def _fetch_page(query: Any) -> list[Any]:
+    """Run a Firestore query to completion (called from a worker thread)."""
+    return list(query.stream())
+
+
+def _transient_errors() -> tuple[type[Exception], ...]:
+    """Firestore errors worth retrying for idempotent reads."""
+    from google.api_core import exceptions
+
+    return (
+        exceptions.Aborted,
+        exceptions.DeadlineExceeded,
+        exceptions.InternalServerError,
+        exceptions.ServiceUnavailable,
+    )
+
 
 class DonationRepositoryBase(ABC):
     """Abstract base class for donation repository."""
@@ -25,6 +220,16 @@ class DonationRepositoryBase(ABC):
         """Get donation by ID."""
         ...
 
+    @abstractmethod
+    async def get_many(self, donation_ids: Sequence[str]) -> dict[str, Donation]:
+        """Get several donations in one round trip, keyed by ID (missing IDs left out)."""
+        ...
+
+    @abstractmethod
+    async def get_version(self, donation_id: str) -> DonationVersion | None:
+        """Get a donation's status and update time with a minimal read."""
+        ...
+
     @abstractmethod
     async def get_by_provider_order_id(
         self, provider: PaymentProvider, provider_order_id: str
@@ -32,11 +237,21 @@ class DonationRepositoryBase(ABC):
         """Get donation by provider order ID."""
         ...
 
+    @abstractmethod
+    async def get_by_idempotency_key(self, idempotency_key: str) -> Donation | None:
+        """Get the donation created with an idempotency key."""
+        ...
+
     @abstractmethod
     async def update_status(
         self, donation_id: str, status: DonationStatus, completed_at: datetime | None = None
-    ) -> Donation | None:
-        """Update donation status."""
+    ) -> StatusUpdate:
+        """Move a donation to a new status if STATUS_TRANSITIONS allows it.
+
+        The check and the write are atomic with respect to concurrent updates
+        of the same donation; disallowed transitions leave it untouched.
+        ``completed_at`` is set when given; None keeps the stored value.
+        """
         ...
 
     @abstractmethod
@@ -49,14 +264,179 @@ class DonationRepositoryBase(ABC):
         """Check if a payment event already exists (for idempotency)."""
         ...
 
+    @abstractmethod
+    async def delete_payment_events(
+        self, events: Sequence[PaymentEvent], dedupe_window: timedelta | None = None
+    ) -> None:
+        """Delete archived payment events.
+
+        With ``dedupe_window`` a compact ID marker is kept for each event until
+        ``received_at + dedupe_window``, so event_exists() still reports a
+        redelivered event as a duplicate after its record is gone.
+        """
+        ...
+
+    @abstractmethod
+    async def get_rollups(self, start: date, end: date) -> list[DonationRollup]:
+        """Get daily rollup buckets for the JST days from start to end (inclusive)."""
+        ...
+
+    @abstractmethod
+    def stream_donations(
+        self,
+        query: DonationQuery,
+        fields: Sequence[str] | None = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+    ) -> AsyncIterator[dict[str, Any]]:
+        """Stream donations matching the query in (created_at, id) order.
+
+        Args:
+            query: Filters to apply
+            fields: Model field names to include (``id`` is always included);
+                all fields when None
+            page_size: Number of documents fetched per backend round trip
+
+        Yields:
+            One dict per donation keyed by model field name
+        """
+        ...
+
+    @abstractmethod
+    async def list_donations(
+        self,
+        query: DonationQuery,
+        limit: int = DEFAULT_LIST_LIMIT,
+        cursor: str | None = None,
+        fields: Sequence[str] | None = None,
+    ) -> DonationPage:
+        """List one page of donations matching the query, newest first.
+
+        Pages are keyed on (created_at, id) rather than offsets, so fetching
+        a page costs the same however deep it is. ``fields`` restricts each
+        item to those Donation fields (plus ``id``).
+
+        Raises:
+            ValueError: If the cursor is invalid
+        """
+        ...
+
+    @abstractmethod
+    def stream_payment_events(
+        self, query: PaymentEventQuery, page_size: int = DEFAULT_PAGE_SIZE
+    ) -> AsyncIterator[PaymentEvent]:
+        """Stream stored payment events matching the query in receipt order."""
+        ...
+
+    @abstractmethod
+    def transaction(self) -> AbstractAsyncContextManager[None]:
+        """Group the repository calls made inside the block where supported.
+
+        Backends with multi-statement transactions commit the calls together
+        (or roll them all back); the others run each call on its own.
+        """
+        ...
+
+    @abstractmethod
+    async def ping(self) -> None:
+        """Open and verify the backend connection with a cheap round trip."""
+        ...
+
+    @abstractmethod
+    async def close(self) -> None:
+        """Commit buffered writes before shutdown."""
+        ...
+
 
 class FirestoreDonationRepository(DonationRepositoryBase):
-    """Firestore implementation of donation repository."""
+    """Firestore implementation of donation repository.
+
+    With ``event_write_behind`` payment events are acknowledged once buffered
+    and committed in batches of up to ``event_batch_size`` every
+    ``event_flush_interval`` seconds, taking the audit write off the webhook's
+    critical path. event_exists() also checks the buffer, so duplicate
+    detection holds before a record is committed.
+
+    ``collection_prefix`` is prepended to every collection name; a tenant's
+    repository uses ``tenants/{tenant_id}/`` so its collections are nested
+    under its own document. Repositories of several tenants can share one
+    ``client``.
+    """
+
+    def __init__(
+        self,
+        project_id: str | None = None,
+        call_timeout: float | None = None,
+        event_write_behind: bool = False,
+        event_flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        event_batch_size: int = DEFAULT_MAX_BATCH,
+        collection_prefix: str = "",
+        client: Any | None = None,
+    ):
+        self._project_id = project_id
+        self._call_timeout = call_timeout
+        self._client = client
+        self._donations_collection = f"{collection_prefix}donations"
+        self._events_collection = f"{collection_prefix}payment_events"
+        self._event_ids_collection = f"{collection_prefix}payment_event_ids"
+        self._rollups_collection = f"{collection_prefix}{ROLLUPS_COLLECTION}"
+        self._event_buffer: WriteBehindBuffer[PaymentEvent] | None = None
+        if event_write_behind:
+            self._event_buffer = WriteBehindBuffer(
+                self._events_collection,
+                self._commit_payment_events,
+                flush_interval=event_flush_interval,
+                # Firestore batches hold at most 500 writes
+                max_batch=min(event_batch_size, 500),
+            )
 
-    def __init__(self, project_id: str | None = None):
-        self._db = firestore.Client(project=project_id)
-        self._donations_collection = "donations"
-        self._events_collection = "payment_events"
+    @property
+    def _db(self) -> Any:
+        """Firestore client, constructed on first use.
+
+        ``google.cloud.firestore`` is imported here rather than at module
+        level so cold starts that never touch Firestore (static pages) skip
+        the import and the credential lookup.
+        """
+        if self._client is None:
+            from google.cloud import firestore  # type: ignore[attr-defined]
+
+            self._client = firestore.Client(project=self._project_id)
+        return self._client
+
+    @property
+    def client(self) -> Any:
+        """The Firestore client, for the repositories and counters sharing it."""
+        return self._db
+
+    async def _call(
+        self,
+        operation: str,
+        call: Callable[[float | None], T],
+        idempotent: bool = False,
+    ) -> T:
+        """Run a Firestore call within the request deadline.
+
+        ``call`` receives the remaining budget (capped by ``call_timeout``) as
+        its RPC timeout and runs in a worker thread, so concurrent requests
+        (and bulk webhook replays) overlap their round trips instead of
+        blocking the event loop. Idempotent reads are retried with jittered
+        backoff while budget remains; writes are attempted once, since a
+        commit that timed out may still have been applied.
+        """
+
+        async def attempt() -> T:
+            try:
+                return await asyncio.to_thread(
+                    call, deadline.timeout(operation, self._call_timeout)
+                )
+            except _transient_errors():
+                # An RPC cut short by the request budget is a deadline error
+                deadline.check(operation)
+                raise
+
+        if idempotent:
+            return await deadline.retry_idempotent(operation, attempt, _transient_errors())
+        return await attempt()
 
     def _donation_to_dict(self, donation: Donation) -> dict[str, Any]:
         """Convert Donation model to Firestore document."""
@@ -91,10 +471,39 @@ class FirestoreDonationRepository(DonationRepositoryBase):
             completed_at=data.get("completedAt"),
         )
 
+    def _stage_rollups(
+        self,
+        batch: Any,
+        donation: Donation,
+        old_status: str | None,
+        new_status: str,
+    ) -> None:
+        """Add rollup increments for a status change to a write batch."""
+        from google.cloud import firestore  # type: ignore[attr-defined]
+
+        changes = rollup_changes(donation, old_status, new_status)
+        if not changes:
+            return
+        day = changes[0][0]
+        rollup_ref = self._db.collection(self._rollups_collection).document(day)
+        batch.set(
+            rollup_ref,
+            {"day": day, **nested_buckets(changes, firestore.Increment)},
+            merge=True,
+        )
+
     async def create(self, donation: Donation) -> Donation:
-        """Create a new donation record in Firestore."""
+        """Create a new donation record in Firestore.
+
+        The donation and its rollup increment are committed in one batch.
+        """
         doc_ref = self._db.collection(self._donations_collection).document(donation.id)
-        doc_ref.set(self._donation_to_dict(donation))
+        batch = self._db.batch()
+        batch.set(doc_ref, self._donation_to_dict(donation))
+        self._stage_rollups(batch, donation, None, donation.status)
+        await self._call(
+            "firestore.create_donation", lambda t: batch.commit(retry=None, timeout=t)
+        )
 
         logger.info(
             "Donation created",
@@ -107,13 +516,47 @@ class FirestoreDonationRepository(DonationRepositoryBase):
     async def get_by_id(self, donation_id: str) -> Donation | None:
         """Get donation by ID from Firestore."""
         doc_ref = self._db.collection(self._donations_collection).document(donation_id)
-        doc = doc_ref.get()
+        doc = await self._call(
+            "firestore.get_donation",
+            lambda t: doc_ref.get(retry=None, timeout=t),
+            idempotent=True,
+        )
 
         if not doc.exists:
             return None
 
         return self._dict_to_donation(doc.id, doc.to_dict())
 
+    async def get_many(self, donation_ids: Sequence[str]) -> dict[str, Donation]:
+        """Get donations with a single batched read (``get_all``)."""
+        collection = self._db.collection(self._donations_collection)
+        refs = [collection.document(i) for i in dict.fromkeys(donation_ids)]
+        if not refs:
+            return {}
+        docs = await self._call(
+            "firestore.get_donations",
+            lambda t: list(self._db.get_all(refs, retry=None, timeout=t)),
+            idempotent=True,
+        )
+        return {
+            doc.id: self._dict_to_donation(doc.id, doc.to_dict()) for doc in docs if doc.exists
+        }
+
+    async def get_version(self, donation_id: str) -> DonationVersion | None:
+        """Get status and update time, fetching only those two fields."""
+        doc_ref = self._db.collection(self._donations_collection).document(donation_id)
+        doc = await self._call(
+            "firestore.get_donation_version",
+            lambda t: doc_ref.get(field_paths=["status", "updatedAt"], retry=None, timeout=t),
+            idempotent=True,
+        )
+
+        if not doc.exists:
+            return None
+
+        data = doc.to_dict()
+        return DonationVersion(status=data["status"], updated_at=data["updatedAt"])
+
     async def get_by_provider_order_id(
         self, provider: PaymentProvider, provider_order_id: str
     ) -> Donation | None:
@@ -126,7 +569,30 @@ class FirestoreDonationRepository(DonationRepositoryBase):
             .limit(1)
         )
 
-        docs = list(query.stream())
+        docs = await self._call(
+            "firestore.find_donation",
+            lambda t: list(query.stream(retry=None, timeout=t)),
+            idempotent=True,
+        )
+        if not docs:
+            return None
+
+        doc = docs[0]
+        return self._dict_to_donation(doc.id, doc.to_dict())
+
+    async def get_by_idempotency_key(self, idempotency_key: str) -> Donation | None:
+        """Get donation by idempotency key."""
+        query = (
+            self._db.collection(self._donations_collection)
+            .where("idempotencyKey", "==", idempotency_key)
+            .limit(1)
+        )
+
+        docs = await self._call(
+            "firestore.find_donation_by_key",
+            lambda t: list(query.stream(retry=None, timeout=t)),
+            idempotent=True,
+        )
         if not docs:
             return None
 
@@ -135,30 +601,90 @@ class FirestoreDonationRepository(DonationRepositoryBase):
 
     async def update_status(
         self, donation_id: str, status: DonationStatus, completed_at: datetime | None = None
-    ) -> Donation | None:
-        """Update donation status in Firestore."""
+    ) -> StatusUpdate:
+        """Update donation status in Firestore with optimistic concurrency.
+
+        The transition is checked against the snapshot just read, and the
+        status change and its rollup moves are committed in one batch with a
+        precondition on the snapshot's update time instead of a transaction,
+        so no locks are held on hot donation documents. If another writer got
+        in between, the commit fails and the update is retried from a fresh
+        read. The precondition also makes a retried commit safe: if the first
+        one landed, the re-read sees the new status.
+        """
+        from google.api_core.exceptions import FailedPrecondition
+
         doc_ref = self._db.collection(self._donations_collection).document(donation_id)
+        status_val = status.value if isinstance(status, DonationStatus) else status
 
-        update_data: dict[str, Any] = {
-            "status": status.value if isinstance(status, DonationStatus) else status,
-            "updatedAt": datetime.now(UTC),
-        }
+        async def attempt() -> StatusUpdate:
+            snapshot = await self._call(
+                "firestore.get_donation",
+                lambda t: doc_ref.get(retry=None, timeout=t),
+                idempotent=True,
+            )
+            if not snapshot.exists:
+                return StatusUpdate(TransitionOutcome.NOT_FOUND)
+            current = self._dict_to_donation(snapshot.id, snapshot.to_dict() or {})
+            blocked = _check_transition(current, status_val)
+            if blocked:
+                return blocked
 
-        if completed_at:
-            update_data["completedAt"] = completed_at
+            update_data: dict[str, Any] = {
+                "status": status_val,
+                "updatedAt": datetime.now(UTC),
+            }
+            if completed_at:
+                update_data["completedAt"] = completed_at
 
-        doc_ref.update(update_data)
+            batch = self._db.batch()
+            batch.update(
+                doc_ref,
+                update_data,
+                option=self._db.write_option(last_update_time=snapshot.update_time),
+            )
+            self._stage_rollups(batch, current, current.status, status_val)
+            try:
+                await self._call(
+                    "firestore.update_status", lambda t: batch.commit(retry=None, timeout=t)
+                )
+            except FailedPrecondition:
+                metrics.inc(
+                    "firestore_update_conflicts_total",
+                    description="Status updates retried after a concurrent write",
+                )
+                raise
 
-        logger.info(
-            "Donation status updated",
-            donation_id=donation_id,
-            status=status,
-        )
+            return StatusUpdate(
+                TransitionOutcome.APPLIED,
+                current.model_copy(
+                    update={
+                        "status": status_val,
+                        "updated_at": update_data["updatedAt"],
+                        "completed_at": completed_at or current.completed_at,
+                    }
+                ),
+                current.status,
+            )
 
-        return await self.get_by_id(donation_id)
+        result = await deadline.retry_idempotent(
+            "firestore.update_status",
+            attempt,
+            (FailedPrecondition,),
+            attempts=STATUS_UPDATE_ATTEMPTS,
+            base_delay=0.01,
+        )
+        if result.applied:
+            logger.info(
+                "Donation status updated",
+                donation_id=donation_id,
+                previous_status=result.previous_status,
+                status=status_val,
+            )
+        return result
 
-    async def save_payment_event(self, event: PaymentEvent) -> PaymentEvent:
-        """Save a payment webhook event to Firestore."""
+    def _event_to_dict(self, event: PaymentEvent) -> dict[str, Any]:
+        """Convert PaymentEvent model to Firestore document."""
         provider_val = (
             event.provider.value if isinstance(event.provider, PaymentProvider)
             else event.provider
@@ -167,8 +693,7 @@ class FirestoreDonationRepository(DonationRepositoryBase):
             event.status.value if isinstance(event.status, DonationStatus)
             else event.status
         )
-        doc_ref = self._db.collection(self._events_collection).document(event.id)
-        doc_ref.set({
+        return {
             "provider": provider_val,
             "providerEventId": event.provider_event_id,
             "providerOrderId": event.provider_order_id,
@@ -176,7 +701,23 @@ class FirestoreDonationRepository(DonationRepositoryBase):
             "receivedAt": event.received_at,
             "rawPayload": event.raw_payload,
             "signatureValid": event.signature_valid,
-        })
+        }
+
+    async def save_payment_event(self, event: PaymentEvent) -> PaymentEvent:
+        """Save a payment webhook event to Firestore (or buffer it for a batch)."""
+        if self._event_buffer is not None:
+            key = (PaymentProvider(event.provider).value, event.provider_event_id)
+            await self._event_buffer.add(key, event)
+            return event
+
+        doc_ref = self._db.collection(self._events_collection).document(event.id)
+        data = self._event_to_dict(event)
+        # Overwriting the same document ID is a no-op, so this write may be retried
+        await self._call(
+            "firestore.save_payment_event",
+            lambda t: doc_ref.set(data, retry=None, timeout=t),
+            idempotent=True,
+        )
 
         logger.info(
             "Payment event saved",
@@ -186,34 +727,303 @@ class FirestoreDonationRepository(DonationRepositoryBase):
         )
         return event
 
+    async def _commit_payment_events(self, events: list[PaymentEvent]) -> None:
+        """Commit buffered payment events in one batch."""
+        collection = self._db.collection(self._events_collection)
+        writes = [(collection.document(e.id), self._event_to_dict(e)) for e in events]
+
+        def commit(timeout: float | None) -> Any:
+            # A fresh batch per attempt; every write targets a fixed document
+            # ID, so a retried commit is harmless
+            batch = self._db.batch()
+            for doc_ref, data in writes:
+                batch.set(doc_ref, data)
+            return batch.commit(retry=None, timeout=timeout)
+
+        await self._call("firestore.save_payment_events", commit, idempotent=True)
+        logger.info("Payment events saved", count=len(events))
+
     async def event_exists(self, provider: PaymentProvider, provider_event_id: str) -> bool:
-        """Check if a payment event already exists."""
+        """Check if a payment event already exists (committed or buffered)."""
         provider_val = provider.value if isinstance(provider, PaymentProvider) else provider
+        if self._event_buffer is not None and (provider_val, provider_event_id) in (
+            self._event_buffer
+        ):
+            return True
         query = (
             self._db.collection(self._events_collection)
             .where("provider", "==", provider_val)
             .where("providerEventId", "==", provider_event_id)
             .limit(1)
         )
+        marker_ref = self._db.collection(self._event_ids_collection).document(
+            event_key(provider_val, provider_event_id)
+        )
+
+        # Archived events only leave a marker; read both in parallel
+        docs, marker = await asyncio.gather(
+            self._call(
+                "firestore.event_exists",
+                lambda t: list(query.stream(retry=None, timeout=t)),
+                idempotent=True,
+            ),
+            self._call(
+                "firestore.event_marker_exists",
+                lambda t: marker_ref.get(retry=None, timeout=t),
+                idempotent=True,
+            ),
+        )
+        return len(docs) > 0 or marker.exists
 
-        docs = list(query.stream())
-        return len(docs) > 0
+    async def delete_payment_events(
+        self, events: Sequence[PaymentEvent], dedupe_window: timedelta | None = None
+    ) -> None:
+        """Delete payment events in batch commits, leaving ID markers behind.
+
+        Markers carry an ``expireAt`` timestamp for a Firestore TTL policy on
+        the payment_event_ids collection. Each marker is written before its
+        event is deleted, so a failure between batches never loses both.
+        """
+        now = datetime.now(UTC)
+        events_ref = self._db.collection(self._events_collection)
+        ids_ref = self._db.collection(self._event_ids_collection)
+        writes: list[tuple[Any, dict[str, Any] | None]] = []
+        for event in events:
+            provider_val = PaymentProvider(event.provider).value
+            if dedupe_window is not None and event.received_at + dedupe_window > now:
+                marker = {
+                    "receivedAt": event.received_at,
+                    "expireAt": event.received_at + dedupe_window,
+                }
+                marker_ref = ids_ref.document(event_key(provider_val, event.provider_event_id))
+                writes.append((marker_ref, marker))
+            writes.append((events_ref.document(event.id), None))
+
+        for start in range(0, len(writes), MAX_BATCH_WRITES):
+            chunk = writes[start : start + MAX_BATCH_WRITES]
+
+            def commit(timeout: float | None, chunk: list[Any] = chunk) -> Any:
+                # Deletes and fixed-ID sets can both be retried safely
+                batch = self._db.batch()
+                for doc_ref, data in chunk:
+                    if data is None:
+                        batch.delete(doc_ref)
+                    else:
+                        batch.set(doc_ref, data)
+                return batch.commit(retry=None, timeout=timeout)
+
+            await self._call("firestore.delete_payment_events", commit, idempotent=True)
+        logger.info("Payment events deleted", count=len(events))
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[None]:
+        """Run calls on their own.
+
+        Firestore transactions cannot span the reads and writes of several
+        calls; update_status() is transactional by itself and webhook
+        retries stay safe because the event is recorded last.
+        """
+        yield
+
+    async def ping(self) -> None:
+        """Open the gRPC channel (and fetch credentials) with a single point read."""
+        doc_ref = self._db.collection(self._donations_collection).document(PING_DOCUMENT)
+        await self._call(
+            "firestore.ping",
+            lambda t: doc_ref.get(retry=None, timeout=t),
+            idempotent=True,
+        )
+
+    async def close(self) -> None:
+        """Commit buffered payment events."""
+        if self._event_buffer is not None:
+            await self._event_buffer.close()
+
+    async def get_rollups(self, start: date, end: date) -> list[DonationRollup]:
+        """Get daily rollups with a single batched read of the day documents."""
+        collection = self._db.collection(self._rollups_collection)
+        refs = [collection.document(day) for day in iter_days(start, end)]
+
+        snapshots = await self._call(
+            "firestore.get_rollups",
+            lambda t: list(self._db.get_all(refs, retry=None, timeout=t)),
+            idempotent=True,
+        )
+        rollups: list[DonationRollup] = []
+        for snapshot in snapshots:
+            if snapshot.exists:
+                rollups.extend(parse_rollup_document(snapshot.id, snapshot.to_dict() or {}))
+        return rollups
+
+    def _donation_query(self, query: DonationQuery) -> Any:
+        """Apply the query's filters to the donations collection."""
+        base: Any = self._db.collection(self._donations_collection)
+        if query.status is not None:
+            base = base.where("status", "==", query.status.value)
+        if query.source is not None:
+            base = base.where("source", "==", query.source)
+        if query.provider is not None:
+            base = base.where("provider", "==", query.provider.value)
+        if query.created_from is not None:
+            base = base.where("createdAt", ">=", query.created_from)
+        if query.created_to is not None:
+            base = base.where("createdAt", "<", query.created_to)
+        return base
+
+    async def list_donations(
+        self,
+        query: DonationQuery,
+        limit: int = DEFAULT_LIST_LIMIT,
+        cursor: str | None = None,
+        fields: Sequence[str] | None = None,
+    ) -> DonationPage:
+        """List donations newest first, resuming after the cursor's sort key.
+
+        Ordered by ``createdAt`` then document ID, both descending, which the
+        ``<filter> + createdAt DESC`` composite indexes serve directly; the
+        cursor turns into ``start_after`` on those values, so Firestore seeks
+        to the page instead of skipping earlier documents. One document past
+        the limit is read to tell whether another page exists.
+        """
+        from google.cloud.firestore import Query  # type: ignore[attr-defined]
+
+        selected = list(fields) if fields is not None else list(DONATION_FIELDS)
+        field_paths = sorted({DONATION_FIELDS[f] for f in selected} | {"createdAt"})
+        page_query = (
+            self._donation_query(query)
+            .select(field_paths)
+            .order_by("createdAt", direction=Query.DESCENDING)
+            .order_by("__name__", direction=Query.DESCENDING)
+        )
+        if cursor is not None:
+            created_at, donation_id = decode_cursor(cursor)
+            page_query = page_query.start_after(
+                {"createdAt": created_at, "__name__": donation_id}
+            )
+        page_query = page_query.limit(limit + 1)
+
+        docs = await self._call(
+            "firestore.list_donations",
+            lambda t: list(page_query.stream(retry=None, timeout=t)),
+            idempotent=True,
+        )
+        items = []
+        for doc in docs[:limit]:
+            data = doc.to_dict() or {}
+            row: dict[str, Any] = {"id": doc.id}
+            for name in selected:
+                row[name] = data.get(DONATION_FIELDS[name])
+            items.append(row)
+        next_cursor = None
+        if len(docs) > limit:
+            last = docs[limit - 1]
+            next_cursor = encode_cursor(last.get("createdAt"), last.id)
+        return DonationPage(items, next_cursor)
+
+    async def stream_donations(
+        self,
+        query: DonationQuery,
+        fields: Sequence[str] | None = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+    ) -> AsyncIterator[dict[str, Any]]:
+        """Stream donations with cursor pagination and field projection.
+
+        Each page is a separate query resumed after the last snapshot, so only
+        one page is held in memory at a time. Page fetches run in a worker
+        thread to keep long exports from blocking the event loop.
+        """
+        selected = list(fields) if fields is not None else list(DONATION_FIELDS)
+        # createdAt is required to resume the cursor even if not exported
+        field_paths = sorted({DONATION_FIELDS[f] for f in selected} | {"createdAt"})
+
+        base = self._donation_query(query)
+        base = base.select(field_paths).order_by("createdAt").limit(page_size)
+
+        last_snapshot = None
+        while True:
+            page_query = base if last_snapshot is None else base.start_after(last_snapshot)
+            docs = await asyncio.to_thread(_fetch_page, page_query)
+            for doc in docs:
+                data = doc.to_dict() or {}
+                row: dict[str, Any] = {"id": doc.id}
+                for name in selected:
+                    row[name] = data.get(DONATION_FIELDS[name])
+                yield row
+            if len(docs) < page_size:
+                return
+            last_snapshot = docs[-1]
+
+    async def stream_payment_events(
+        self, query: PaymentEventQuery, page_size: int = DEFAULT_PAGE_SIZE
+    ) -> AsyncIterator[PaymentEvent]:
+        """Stream payment events page by page, resuming after the last snapshot."""
+        base: Any = self._db.collection(self._events_collection)
+        if query.provider is not None:
+            base = base.where("provider", "==", query.provider.value)
+        if query.received_from is not None:
+            base = base.where("receivedAt", ">=", query.received_from)
+        if query.received_to is not None:
+            base = base.where("receivedAt", "<", query.received_to)
+        base = base.order_by("receivedAt").limit(page_size)
+
+        last_snapshot = None
+        while True:
+            page_query = base if last_snapshot is None else base.start_after(last_snapshot)
+            docs = await asyncio.to_thread(_fetch_page, page_query)
+            for doc in docs:
+                data = doc.to_dict() or {}
+                yield PaymentEvent(
+                    id=doc.id,
+                    provider=data["provider"],
+                    provider_event_id=data["providerEventId"],
+                    provider_order_id=data["providerOrderId"],
+                    status=data["status"],
+                    received_at=data["receivedAt"],
+                    raw_payload=data.get("rawPayload") or {},
+                    signature_valid=data.get("signatureValid", True),
+                )
+            if len(docs) < page_size:
+                return
+            last_snapshot = docs[-1]
 
 
 class InMemoryDonationRepository(DonationRepositoryBase):
     """In-memory implementation for testing."""
 
     def __init__(self) -> None:
-        self._donations: dict[str, Donation] = {}
-        self._events: dict[str, PaymentEvent] = {}
+        self._donations: MutableMapping[str, Donation] = {}
+        self._events: MutableMapping[str, PaymentEvent] = {}
+        # (provider, provider_event_id) -> expiry of the marker of a deleted event
+        self._event_ids: dict[tuple[str, str], datetime] = {}
+        self._rollups: dict[tuple[str, str, str, str], list[int]] = {}
+
+    def _apply_rollups(
+        self, donation: Donation, old_status: str | None, new_status: str
+    ) -> None:
+        for day, source, provider, status, count, amount in rollup_changes(
+            donation, old_status, new_status
+        ):
+            totals = self._rollups.setdefault((day, source, provider, status), [0, 0])
+            totals[0] += count
+            totals[1] += amount
 
     async def create(self, donation: Donation) -> Donation:
         self._donations[donation.id] = donation
+        self._apply_rollups(donation, None, donation.status)
         return donation
 
     async def get_by_id(self, donation_id: str) -> Donation | None:
         return self._donations.get(donation_id)
 
+    async def get_many(self, donation_ids: Sequence[str]) -> dict[str, Donation]:
+        return {i: self._donations[i] for i in donation_ids if i in self._donations}
+
+    async def get_version(self, donation_id: str) -> DonationVersion | None:
+        donation = self._donations.get(donation_id)
+        if donation is None:
+            return None
+        return DonationVersion(status=donation.status, updated_at=donation.updated_at)
+
     async def get_by_provider_order_id(
         self, provider: PaymentProvider, provider_order_id: str
     ) -> Donation | None:
@@ -224,23 +1034,34 @@ class InMemoryDonationRepository(DonationRepositoryBase):
                 return donation
         return None
 
+    async def get_by_idempotency_key(self, idempotency_key: str) -> Donation | None:
+        for donation in self._donations.values():
+            if donation.idempotency_key == idempotency_key:
+                return donation
+        return None
+
     async def update_status(
         self, donation_id: str, status: DonationStatus, completed_at: datetime | None = None
-    ) -> Donation | None:
+    ) -> StatusUpdate:
         donation = self._donations.get(donation_id)
         if not donation:
-            return None
+            return StatusUpdate(TransitionOutcome.NOT_FOUND)
 
         status_val = status.value if isinstance(status, DonationStatus) else status
+        blocked = _check_transition(donation, status_val)
+        if blocked:
+            return blocked
         updated = donation.model_copy(
             update={
                 "status": status_val,
                 "updated_at": datetime.now(UTC),
-                "completed_at": completed_at,
+                # As on Firestore, None keeps the stored completion time
+                "completed_at": completed_at or donation.completed_at,
             }
         )
         self._donations[donation_id] = updated
-        return updated
+        self._apply_rollups(donation, donation.status, status_val)
+        return StatusUpdate(TransitionOutcome.APPLIED, updated, donation.status)
 
     async def save_payment_event(self, event: PaymentEvent) -> PaymentEvent:
         self._events[event.id] = event
@@ -251,4 +1072,96 @@ class InMemoryDonationRepository(DonationRepositoryBase):
         for event in self._events.values():
             if event.provider == provider_val and event.provider_event_id == provider_event_id:
                 return True
-        return False
+        expires_at = self._event_ids.get((provider_val, provider_event_id))
+        return expires_at is not None and expires_at > datetime.now(UTC)
+
+    async def delete_payment_events(
+        self, events: Sequence[PaymentEvent], dedupe_window: timedelta | None = None
+    ) -> None:
+        now = datetime.now(UTC)
+        for event in events:
+            if dedupe_window is not None and event.received_at + dedupe_window > now:
+                key = (PaymentProvider(event.provider).value, event.provider_event_id)
+                self._event_ids[key] = event.received_at + dedupe_window
+            self._events.pop(event.id, None)
+
+    async def get_rollups(self, start: date, end: date) -> list[DonationRollup]:
+        start_day, end_day = start.isoformat(), end.isoformat()
+        return [
+            DonationRollup(
+                day=day,
+                source=source,
+                provider=PaymentProvider(provider),
+                status=DonationStatus(status),
+                count=count,
+                amount=amount,
+            )
+            for (day, source, provider, status), (count, amount) in self._rollups.items()
+            if start_day <= day <= end_day
+        ]
+
+    async def stream_donations(
+        self,
+        query: DonationQuery,
+        fields: Sequence[str] | None = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+    ) -> AsyncIterator[dict[str, Any]]:
+        selected = list(fields) if fields is not None else list(DONATION_FIELDS)
+        matching = sorted(
+            (d for d in self._donations.values() if query.matches(d)),
+            key=lambda d: (d.created_at, d.id),
+        )
+        for donation in matching:
+            row: dict[str, Any] = {"id": donation.id}
+            for name in selected:
+                row[name] = getattr(donation, name)
+            yield row
+
+    async def list_donations(
+        self,
+        query: DonationQuery,
+        limit: int = DEFAULT_LIST_LIMIT,
+        cursor: str | None = None,
+        fields: Sequence[str] | None = None,
+    ) -> DonationPage:
+        after = decode_cursor(cursor) if cursor is not None else None
+        selected = list(fields) if fields is not None else list(DONATION_FIELDS)
+        matching = sorted(
+            (
+                d for d in self._donations.values()
+                if query.matches(d) and (after is None or (d.created_at, d.id) < after)
+            ),
+            key=lambda d: (d.created_at, d.id),
+            reverse=True,
+        )
+        items = []
+        for donation in matching[:limit]:
+            row: dict[str, Any] = {"id": donation.id}
+            for name in selected:
+                row[name] = getattr(donation, name)
+            items.append(row)
+        next_cursor = None
+        if len(matching) > limit:
+            last = matching[limit - 1]
+            next_cursor = encode_cursor(last.created_at, last.id)
+        return DonationPage(items, next_cursor)
+
+    async def stream_payment_events(
+        self, query: PaymentEventQuery, page_size: int = DEFAULT_PAGE_SIZE
+    ) -> AsyncIterator[PaymentEvent]:
+        matching = sorted(
+            (e for e in self._events.values() if query.matches(e)),
+            key=lambda e: (e.received_at, e.id),
+        )
+        for event in matching:
+            yield event
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[None]:
+        yield
+
+    async def ping(self) -> None:
+        return None
+
+    async def close(self) -> None:
+        return None
@@ -0,0 +1,641 @@
+"""File-backed donation repository for the sandbox and self-hosting.
+
+State lives in a directory with two kinds of files:
+
+- ``snapshot.bin``: a compacted image of every donation and payment event,
+  memory-mapped on startup. Records are JSON lines; hash indexes (sorted
+  ``(blake2b64(key), offset)`` pairs) by donation ID, provider order,
+  idempotency key and provider event let lookups binary-search the map, so opening a snapshot
+  does not parse it and takes the same time for 1M records as for ten.
+- ``wal-<seq>.ndjson``: append-only logs of every write since the snapshot.
+  Appends are group-committed: writes that arrive while an fsync is in
+  flight share the next one, so concurrent requests cost one fsync per
+  batch rather than one each.
+
+Writes are applied in memory first and acknowledged once their log record
+is on disk. Changes since the snapshot are kept as decoded models in an
+overlay on top of the mapped records. When the logs reach
+``compact_records`` records (and on close) the overlay is folded into a new
+snapshot in a worker thread, after which the covered logs are deleted.
+Recovery maps the snapshot and replays the remaining logs; a torn record at
+the end of the last log (a crash mid-append, never acknowledged) is skipped.
+
+Queries reuse InMemoryDonationRepository and scan every record; the checkout
+and webhook paths (lookup by idempotency key or provider order, duplicate
+check) go through the indexes.
+A lock file keeps a second process from opening the same directory, so run
+the file backend with a single worker.
+"""
+
+import asyncio
+import contextlib
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import struct
+from collections.abc import Iterator, MutableMapping, Sequence, ValuesView
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from typing import Any, Generic, TypeVar
+
+import structlog
+
+from app.metrics import metrics
+from app.models.donation import (
+    Donation,
+    DonationStatus,
+    PaymentEvent,
+    PaymentProvider,
+)
+from app.repositories.donation import InMemoryDonationRepository, StatusUpdate
+
+logger = structlog.get_logger()
+
+M = TypeVar("M", Donation, PaymentEvent)
+
+SNAPSHOT_MAGIC = b"QRSNAP01"
+SNAPSHOT_FILE = "snapshot.bin"
+LOCK_FILE = "LOCK"
+# Index entry: 64-bit key hash, 64-bit record offset
+_INDEX_ENTRY = struct.Struct("<QQ")
+_OFFSET = struct.Struct("<Q")
+DEFAULT_COMPACT_RECORDS = 20_000
+
+
+class RepositoryCorruptedError(Exception):
+    """Raised when a snapshot or log cannot be read back."""
+
+
+def _key_hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little")
+
+
+def _order_key(provider: str, provider_order_id: str) -> str:
+    return f"{provider}\0{provider_order_id}"
+
+
+def _event_key(provider: str, provider_event_id: str) -> str:
+    return f"{provider}\0{provider_event_id}"
+
+
+def _provider(value: PaymentProvider | str) -> str:
+    return value.value if isinstance(value, PaymentProvider) else value
+
+
+class _Snapshot:
+    """Read-only view of a memory-mapped snapshot file."""
+
+    def __init__(self, path: Path | None = None):
+        self.path = path
+        self._map: mmap.mmap | None = None
+        self.header: dict[str, Any] = {"log_seq": 0, "sections": {}, "rollups": [], "markers": []}
+        if path is None or not path.exists():
+            return
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:8] != SNAPSHOT_MAGIC:
+            raise RepositoryCorruptedError(f"{path} is not a snapshot")
+        (header_offset,) = _OFFSET.unpack_from(self._map, 8)
+        self.header = json.loads(self._map[header_offset:])
+
+    @property
+    def log_seq(self) -> int:
+        """First log sequence number not contained in the snapshot."""
+        return int(self.header["log_seq"])
+
+    def count(self, section: str) -> int:
+        return int(self.header["sections"].get(section, [0, 0])[1])
+
+    def records(self, section: str) -> Iterator[bytes]:
+        """Yield the raw JSON records of a section in file order."""
+        if self._map is None or section not in self.header["sections"]:
+            return
+        position, count = self.header["sections"][section]
+        for _ in range(count):
+            end = self._map.find(b"\n", position)
+            yield self._map[position:end]
+            position = end + 1
+
+    def record_at(self, offset: int) -> bytes:
+        assert self._map is not None
+        return self._map[offset : self._map.find(b"\n", offset)]
+
+    def find(self, index: str, key: str) -> Iterator[int]:
+        """Yield offsets of records whose index key hashes like ``key``."""
+        if self._map is None or index not in self.header["sections"]:
+            return
+        base, count = self.header["sections"][index]
+        target = _key_hash(key)
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            (value,) = _OFFSET.unpack_from(self._map, base + mid * _INDEX_ENTRY.size)
+            if value < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        while lo < count:
+            value, offset = _INDEX_ENTRY.unpack_from(self._map, base + lo * _INDEX_ENTRY.size)
+            if value != target:
+                return
+            yield offset
+            lo += 1
+
+
+class _RecordValues(ValuesView[M]):
+    _mapping: "_RecordMap[M]"
+
+    def __iter__(self) -> Iterator[M]:
+        return self._mapping.iter_values()
+
+
+class _RecordMap(MutableMapping[str, M], Generic[M]):
+    """Records by ID: a snapshot section plus an overlay of later changes."""
+
+    def __init__(self, model: type[M], snapshot: _Snapshot, section: str):
+        self._model: type[M] = model
+        self._snapshot = snapshot
+        self._section = section
+        self._overlay: dict[str, M] = {}
+        self._deleted: set[str] = set()
+        # Keys changed while a compaction is writing the next snapshot
+        self._touched: set[str] | None = None
+        self._len = snapshot.count(section)
+
+    def _from_snapshot(self, key: str) -> M | None:
+        for offset in self._snapshot.find(f"{self._section}.id", key):
+            record: M = self._model.model_validate_json(self._snapshot.record_at(offset))
+            if record.id == key:
+                return record
+        return None
+
+    def _touch(self, key: str) -> None:
+        if self._touched is not None:
+            self._touched.add(key)
+
+    def __getitem__(self, key: str) -> M:
+        if key in self._overlay:
+            return self._overlay[key]
+        record = None if key in self._deleted else self._from_snapshot(key)
+        if record is None:
+            raise KeyError(key)
+        return record
+
+    def __setitem__(self, key: str, value: M) -> None:
+        if key not in self:
+            self._len += 1
+        self._overlay[key] = value
+        self._deleted.discard(key)
+        self._touch(key)
+
+    def __delitem__(self, key: str) -> None:
+        if key not in self:
+            raise KeyError(key)
+        self._overlay.pop(key, None)
+        self._deleted.add(key)
+        self._len -= 1
+        self._touch(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return (record.id for record in self.iter_values())
+
+    def __len__(self) -> int:
+        return self._len
+
+    def values(self) -> _RecordValues[M]:
+        return _RecordValues(self)
+
+    def iter_values(self) -> Iterator[M]:
+        """Yield every record, decoding the mapped ones on the way."""
+        for raw in self._snapshot.records(self._section):
+            record = self._model.model_validate_json(raw)
+            if record.id not in self._overlay and record.id not in self._deleted:
+                yield record
+        yield from list(self._overlay.values())
+
+    def changed(self, key: str) -> bool:
+        """Whether the record was written after the snapshot."""
+        return key in self._overlay
+
+    def begin_compaction(self) -> tuple[dict[str, M], set[str]]:
+        """Capture the changes the next snapshot will contain."""
+        self._touched = set()
+        return dict(self._overlay), set(self._deleted)
+
+    def rebase(self, snapshot: _Snapshot) -> None:
+        """Switch to a new snapshot, keeping only changes it does not contain."""
+        touched = self._touched or set()
+        self._overlay = {k: v for k, v in self._overlay.items() if k in touched}
+        self._deleted &= touched
+        self._touched = None
+        self._snapshot = snapshot
+
+
+class _WriteLog:
+    """Append-only log file with group commit."""
+
+    def __init__(self, path: Path, commit_delay: float):
+        self.path = path
+        self._commit_delay = commit_delay
+        self._fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self._pending: list[bytes] = []
+        self._waiters: list[asyncio.Future[None]] = []
+        self._task: asyncio.Task[None] | None = None
+        self._error: OSError | None = None
+
+    async def append(self, record: dict[str, Any]) -> None:
+        """Queue a record and wait until it is on disk."""
+        if self._error is not None:
+            raise self._error
+        # Queued before the first await, so log order matches the order in
+        # which the changes were applied in memory
+        self._pending.append(json.dumps(record, separators=(",", ":")).encode() + b"\n")
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        if self._task is None:
+            self._task = asyncio.create_task(self._commit_loop())
+        # A cancelled request must not cancel the commit others wait for
+        await asyncio.shield(waiter)
+
+    def _write(self, data: bytes) -> None:
+        view = memoryview(data)
+        while view:
+            written = os.write(self._fd, view)
+            view = view[written:]
+        os.fsync(self._fd)
+
+    async def _commit_loop(self) -> None:
+        try:
+            while self._pending:
+                if self._commit_delay:
+                    await asyncio.sleep(self._commit_delay)
+                batch, waiters = self._pending, self._waiters
+                self._pending, self._waiters = [], []
+                try:
+                    await asyncio.to_thread(self._write, b"".join(batch))
+                except OSError as e:
+                    # Nothing after a failed write may be acknowledged
+                    self._error = e
+                    logger.error("Write log commit failed", path=str(self.path), error=str(e))
+                    for waiter in waiters + self._waiters:
+                        if not waiter.done():
+                            waiter.set_exception(e)
+                    self._pending, self._waiters = [], []
+                    return
+                metrics.observe(
+                    "file_repository_commit_records",
+                    len(batch),
+                    "Records per group commit (fsync) of the file repository",
+                )
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_result(None)
+        finally:
+            self._task = None
+
+    async def close(self) -> None:
+        """Wait for queued records to be committed and close the file."""
+        while self._task is not None:
+            await asyncio.shield(self._task)
+        os.close(self._fd)
+
+
+def _log_path(directory: Path, seq: int) -> Path:
+    return directory / f"wal-{seq:08d}.ndjson"
+
+
+def _log_seqs(directory: Path) -> list[int]:
+    return sorted(int(p.stem.removeprefix("wal-")) for p in directory.glob("wal-*.ndjson"))
+
+
+def _write_snapshot(
+    path: Path,
+    log_seq: int,
+    old: _Snapshot,
+    donations: tuple[dict[str, Donation], set[str]],
+    events: tuple[dict[str, PaymentEvent], set[str]],
+    rollups: list[list[Any]],
+    markers: list[list[Any]],
+) -> None:
+    """Write a snapshot of ``old`` plus the captured changes, then swap it in."""
+    sections: dict[str, list[int]] = {}
+    indexes: dict[str, list[tuple[int, int]]] = {
+        "donations.id": [],
+        "donations.order": [],
+        "donations.key": [],
+        "events.id": [],
+        "events.key": [],
+    }
+    partial = path.with_name(path.name + ".partial")
+    with open(partial, "wb") as f:
+        f.write(SNAPSHOT_MAGIC + _OFFSET.pack(0))
+
+        def write_section(
+            section: str, overlay: dict[str, Any], deleted: set[str], keys: Any
+        ) -> None:
+            start, count = f.tell(), 0
+
+            def write(raw: bytes, data: dict[str, Any]) -> None:
+                nonlocal count
+                offset = f.tell()
+                f.write(raw + b"\n")
+                count += 1
+                indexes[f"{section}.id"].append((_key_hash(data["id"]), offset))
+                for name, key in keys(data):
+                    indexes[f"{section}.{name}"].append((_key_hash(key), offset))
+
+            for raw in old.records(section):
+                data = json.loads(raw)
+                if data["id"] not in overlay and data["id"] not in deleted:
+                    write(raw, data)
+            for record in overlay.values():
+                write(record.model_dump_json().encode(), record.model_dump(mode="json"))
+            sections[section] = [start, count]
+
+        write_section(
+            "donations",
+            *donations,
+            lambda d: [
+                ("order", _order_key(d["provider"], d["provider_order_id"])),
+                ("key", d["idempotency_key"]),
+            ],
+        )
+        write_section(
+            "events",
+            *events,
+            lambda e: [("key", _event_key(e["provider"], e["provider_event_id"]))],
+        )
+        for name, entries in indexes.items():
+            entries.sort()
+            sections[name] = [f.tell(), len(entries)]
+            f.write(b"".join(_INDEX_ENTRY.pack(h, o) for h, o in entries))
+
+        header_offset = f.tell()
+        header = {"log_seq": log_seq, "sections": sections, "rollups": rollups, "markers": markers}
+        f.write(json.dumps(header).encode())
+        f.seek(8)
+        f.write(_OFFSET.pack(header_offset))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(partial, path)
+    directory = os.open(path.parent, os.O_RDONLY)
+    try:
+        os.fsync(directory)
+    finally:
+        os.close(directory)
+
+
+class FileDonationRepository(InMemoryDonationRepository):
+    """Durable local repository: memory-mapped snapshot plus a write log."""
+
+    def __init__(
+        self,
+        directory: str | Path,
+        commit_delay: float = 0.0,
+        compact_records: int = DEFAULT_COMPACT_RECORDS,
+    ):
+        super().__init__()
+        self._directory = Path(directory)
+        self._directory.mkdir(parents=True, exist_ok=True)
+        self._commit_delay = commit_delay
+        self._compact_records = compact_records
+        self._compaction: asyncio.Task[None] | None = None
+
+        self._lock_fd = os.open(self._directory / LOCK_FILE, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError as e:
+            os.close(self._lock_fd)
+            raise RuntimeError(
+                f"{self._directory} is in use by another process (run a single worker)"
+            ) from e
+
+        self._snapshot = _Snapshot(self._directory / SNAPSHOT_FILE)
+        self._donation_map = _RecordMap(Donation, self._snapshot, "donations")
+        self._event_map = _RecordMap(PaymentEvent, self._snapshot, "events")
+        self._donations = self._donation_map
+        self._events = self._event_map
+        # Index overlays for records not yet in the snapshot
+        self._orders: dict[str, str] = {}
+        self._idempotency_keys: dict[str, str] = {}
+        self._event_keys: dict[str, str] = {}
+        for day, source, provider, status, count, amount in self._snapshot.header["rollups"]:
+            self._rollups[(day, source, provider, status)] = [count, amount]
+        for provider, provider_event_id, expires_at in self._snapshot.header["markers"]:
+            self._event_ids[(provider, provider_event_id)] = datetime.fromisoformat(expires_at)
+
+        self._log_records = self._recover()
+        seqs = _log_seqs(self._directory)
+        self._log_seq = max([*seqs, self._snapshot.log_seq - 1]) + 1
+        self._log = _WriteLog(_log_path(self._directory, self._log_seq), commit_delay)
+
+    def _recover(self) -> int:
+        """Replay the logs written after the snapshot."""
+        seqs = [s for s in _log_seqs(self._directory) if s >= self._snapshot.log_seq]
+        replayed = 0
+        for seq in seqs:
+            path = _log_path(self._directory, seq)
+            lines = path.read_bytes().split(b"\n")
+            for number, line in enumerate(lines, start=1):
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    if seq == seqs[-1] and number == len(lines):
+                        logger.warning("Skipped torn record at the end of the log", path=str(path))
+                        continue
+                    raise RepositoryCorruptedError(f"{path}:{number}: unreadable record") from e
+                self._replay(record)
+                replayed += 1
+        logger.info(
+            "File repository opened",
+            directory=str(self._directory),
+            snapshot_donations=self._snapshot.count("donations"),
+            snapshot_events=self._snapshot.count("events"),
+            replayed=replayed,
+        )
+        return replayed
+
+    def _replay(self, record: dict[str, Any]) -> None:
+        kind = record["t"]
+        if kind == "donation":
+            self._put_donation(Donation.model_validate(record["v"]))
+        elif kind == "event":
+            self._put_event(PaymentEvent.model_validate(record["v"]))
+        elif kind == "delete_events":
+            for event_id in record["ids"]:
+                self._events.pop(event_id, None)
+            for provider, provider_event_id, expires_at in record["markers"]:
+                key = (provider, provider_event_id)
+                self._event_ids[key] = datetime.fromisoformat(expires_at)
+        else:
+            raise RepositoryCorruptedError(f"Unknown log record type: {kind}")
+
+    def _put_donation(self, donation: Donation) -> None:
+        previous = self._donations.get(donation.id)
+        self._donations[donation.id] = donation
+        self._orders[_order_key(_provider(donation.provider), donation.provider_order_id)] = (
+            donation.id
+        )
+        self._idempotency_keys[donation.idempotency_key] = donation.id
+        self._apply_rollups(donation, previous.status if previous else None, donation.status)
+
+    def _put_event(self, event: PaymentEvent) -> None:
+        self._events[event.id] = event
+        self._event_keys[_event_key(_provider(event.provider), event.provider_event_id)] = (
+            event.id
+        )
+
+    async def _append(self, record: dict[str, Any]) -> None:
+        self._log_records += 1
+        await self._log.append(record)
+        if self._log_records >= self._compact_records and self._compaction is None:
+            self._compaction = asyncio.create_task(self._compact_in_background())
+
+    async def _compact_in_background(self) -> None:
+        try:
+            await self.compact()
+        except Exception as e:
+            logger.error("Compaction failed", directory=str(self._directory), error=str(e))
+        finally:
+            self._compaction = None
+
+    async def create(self, donation: Donation) -> Donation:
+        self._put_donation(donation)
+        await self._append({"t": "donation", "v": donation.model_dump(mode="json")})
+        return donation
+
+    async def get_by_provider_order_id(
+        self, provider: PaymentProvider, provider_order_id: str
+    ) -> Donation | None:
+        key = _order_key(_provider(provider), provider_order_id)
+        donation_id = self._orders.get(key)
+        if donation_id is not None:
+            return self._donations.get(donation_id)
+        for offset in self._snapshot.find("donations.order", key):
+            record = Donation.model_validate_json(self._snapshot.record_at(offset))
+            if _order_key(_provider(record.provider), record.provider_order_id) == key:
+                # The overlay may hold a newer version
+                return self._donations.get(record.id)
+        return None
+
+    async def get_by_idempotency_key(self, idempotency_key: str) -> Donation | None:
+        donation_id = self._idempotency_keys.get(idempotency_key)
+        if donation_id is not None:
+            return self._donations.get(donation_id)
+        for offset in self._snapshot.find("donations.key", idempotency_key):
+            record = Donation.model_validate_json(self._snapshot.record_at(offset))
+            if record.idempotency_key == idempotency_key:
+                return self._donations.get(record.id)
+        return None
+
+    async def update_status(
+        self, donation_id: str, status: DonationStatus, completed_at: datetime | None = None
+    ) -> StatusUpdate:
+        result = await super().update_status(donation_id, status, completed_at)
+        if result.applied and result.donation is not None:
+            self._orders[
+                _order_key(_provider(result.donation.provider), result.donation.provider_order_id)
+            ] = donation_id
+            await self._append({"t": "donation", "v": result.donation.model_dump(mode="json")})
+        return result
+
+    async def save_payment_event(self, event: PaymentEvent) -> PaymentEvent:
+        self._put_event(event)
+        await self._append({"t": "event", "v": event.model_dump(mode="json")})
+        return event
+
+    async def event_exists(self, provider: PaymentProvider, provider_event_id: str) -> bool:
+        provider_val = _provider(provider)
+        key = _event_key(provider_val, provider_event_id)
+        event_id = self._event_keys.get(key)
+        if event_id is not None and event_id in self._events:
+            return True
+        for offset in self._snapshot.find("events.key", key):
+            record = PaymentEvent.model_validate_json(self._snapshot.record_at(offset))
+            if record.provider_event_id == provider_event_id and record.id in self._events:
+                return True
+        expires_at = self._event_ids.get((provider_val, provider_event_id))
+        return expires_at is not None and expires_at > datetime.now(UTC)
+
+    async def delete_payment_events(
+        self, events: Sequence[PaymentEvent], dedupe_window: timedelta | None = None
+    ) -> None:
+        await super().delete_payment_events(events, dedupe_window)
+        markers = []
+        for event in events:
+            key = (_provider(event.provider), event.provider_event_id)
+            if key in self._event_ids:
+                markers.append([*key, self._event_ids[key].isoformat()])
+        await self._append(
+            {"t": "delete_events", "ids": [e.id for e in events], "markers": markers}
+        )
+
+    async def compact(self) -> None:
+        """Fold the logs into a new snapshot and delete them.
+
+        Writes keep going to a fresh log while the snapshot is written in a
+        worker thread; only changes made before the switch are folded in.
+        """
+        old_log, old_snapshot = self._log, self._snapshot
+        self._log_seq += 1
+        self._log = _WriteLog(_log_path(self._directory, self._log_seq), self._commit_delay)
+        self._log_records = 0
+        donations = self._donation_map.begin_compaction()
+        events = self._event_map.begin_compaction()
+        rollups = [[*key, *totals] for key, totals in self._rollups.items() if totals[0]]
+        now = datetime.now(UTC)
+        markers = [
+            [provider, event_id, expires_at.isoformat()]
+            for (provider, event_id), expires_at in self._event_ids.items()
+            if expires_at > now
+        ]
+        await old_log.close()
+
+        path = self._directory / SNAPSHOT_FILE
+        await asyncio.to_thread(
+            _write_snapshot,
+            path,
+            self._log_seq,
+            old_snapshot,
+            donations,
+            events,
+            rollups,
+            markers,
+        )
+        snapshot = await asyncio.to_thread(_Snapshot, path)
+        self._snapshot = snapshot
+        self._donation_map.rebase(snapshot)
+        self._event_map.rebase(snapshot)
+        self._orders = {
+            k: v for k, v in self._orders.items() if self._donation_map.changed(v)
+        }
+        self._idempotency_keys = {
+            k: v for k, v in self._idempotency_keys.items() if self._donation_map.changed(v)
+        }
+        self._event_keys = {
+            k: v for k, v in self._event_keys.items() if self._event_map.changed(v)
+        }
+        for seq in _log_seqs(self._directory):
+            if seq < self._log_seq:
+                _log_path(self._directory, seq).unlink()
+        logger.info(
+            "File repository compacted",
+            donations=snapshot.count("donations"),
+            events=snapshot.count("events"),
+        )
+
+    async def close(self) -> None:
+        """Commit pending writes, compact and release the directory."""
+        if self._compaction is not None:
+            with contextlib.suppress(Exception):
+                await self._compaction
+        if self._log_records:
+            await self.compact()
+        await self._log.close()
+        if not self._log_records:
+            self._log.path.unlink()
+        os.close(self._lock_fd)
@@ -0,0 +1,95 @@
+"""Daily donation rollups for aggregate statistics.
+
+Rollups are kept per calendar day (JST) in a single document whose
+``buckets`` map is nested as ``source -> provider -> status -> {count, amount}``.
+Repositories update them in the same write as the donation itself, so a
+stats query for N days costs N point reads regardless of donation volume.
+"""
+
+from collections.abc import Iterator
+from datetime import UTC, date, datetime, timedelta, timezone
+from typing import Any
+
+from app.models.donation import Donation, DonationRollup, DonationStatus, PaymentProvider
+
+JST = timezone(timedelta(hours=9), "JST")
+
+ROLLUPS_COLLECTION = "donation_rollups"
+
+
+def rollup_day(moment: datetime) -> str:
+    """Return the JST calendar day (YYYY-MM-DD) a donation is bucketed under."""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=UTC)
+    return moment.astimezone(JST).date().isoformat()
+
+
+def iter_days(start: date, end: date) -> Iterator[str]:
+    """Yield every day from start to end (inclusive) as YYYY-MM-DD."""
+    day = start
+    while day <= end:
+        yield day.isoformat()
+        day += timedelta(days=1)
+
+
+def rollup_changes(
+    donation: Donation, old_status: str | None, new_status: str
+) -> list[tuple[str, str, str, str, int, int]]:
+    """Compute bucket deltas for a donation entering ``new_status``.
+
+    Returns (day, source, provider, status, count_delta, amount_delta) tuples.
+    ``old_status`` is None for newly created donations.
+    """
+    new_status = DonationStatus(new_status).value
+    if old_status is not None:
+        old_status = DonationStatus(old_status).value
+    if old_status == new_status:
+        return []
+
+    day = rollup_day(donation.created_at)
+    provider = (
+        donation.provider.value
+        if isinstance(donation.provider, PaymentProvider)
+        else donation.provider
+    )
+    changes = [(day, donation.source, provider, new_status, 1, donation.amount)]
+    if old_status is not None:
+        changes.append((day, donation.source, provider, old_status, -1, -donation.amount))
+    return changes
+
+
+def nested_buckets(
+    changes: list[tuple[str, str, str, str, int, int]], increment: Any
+) -> dict[str, Any]:
+    """Build a Firestore merge payload for the given changes of a single day.
+
+    Args:
+        changes: Deltas as returned by ``rollup_changes`` (all on the same day)
+        increment: Factory for server-side increments (``firestore.Increment``)
+    """
+    buckets: dict[str, Any] = {}
+    for _, source, provider, status, count, amount in changes:
+        buckets.setdefault(source, {}).setdefault(provider, {})[status] = {
+            "count": increment(count),
+            "amount": increment(amount),
+        }
+    return {"buckets": buckets}
+
+
+def parse_rollup_document(day: str, data: dict[str, Any]) -> list[DonationRollup]:
+    """Flatten a rollup document into DonationRollup rows."""
+    rollups = []
+    for source, providers in (data.get("buckets") or {}).items():
+        for provider, statuses in providers.items():
+            for status, totals in statuses.items():
+                rollups.append(
+                    DonationRollup(
+                        day=day,
+                        source=source,
+                        provider=provider,
+                        status=status,
+                        count=totals.get("count", 0),
+                        amount=totals.get("amount", 0),
+                    )
+                )
+    return rollups
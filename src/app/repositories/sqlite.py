@@ -0,0 +1,727 @@
+"""SQLite donation repository for small deployments and local load tests.
+
+The database runs in WAL mode, so readers never wait for the writer and
+several worker processes can share one file on a local disk. Connections
+come from a fixed pool, each used by one statement at a time on a dedicated
+thread pool of the same size; the event loop never blocks on SQLite. SQL
+text is kept in module constants so every connection's statement cache
+(``cached_statements``) reuses the prepared statements.
+
+Writers inside one process queue on an asyncio lock rather than on SQLite's
+busy handler, which keeps worker threads free for readers. ``busy_timeout``
+only covers other processes.
+
+transaction() pins one connection to the current task for a ``BEGIN
+IMMEDIATE`` transaction: every repository call inside it (and increments of
+SqliteCampaignCounter) joins the transaction, so a webhook's duplicate
+check, status change, campaign total and event record commit together or
+not at all.
+
+Timestamps are stored as integer microseconds since the Unix epoch (UTC).
+"""
+
+import asyncio
+import json
+import sqlite3
+from collections.abc import AsyncIterator, Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from datetime import UTC, date, datetime, timedelta
+from functools import partial
+from pathlib import Path
+from typing import Any, TypeVar
+
+import structlog
+
+from app import deadline
+from app.models.donation import (
+    Donation,
+    DonationRollup,
+    DonationStatus,
+    PaymentEvent,
+    PaymentProvider,
+)
+from app.repositories.counter import CampaignCounterBase, CampaignTotal
+from app.repositories.donation import (
+    DEFAULT_LIST_LIMIT,
+    DEFAULT_PAGE_SIZE,
+    DONATION_FIELDS,
+    DonationPage,
+    DonationQuery,
+    DonationRepositoryBase,
+    DonationVersion,
+    DuplicateDonationError,
+    PaymentEventQuery,
+    StatusUpdate,
+    TransitionOutcome,
+    _check_transition,
+    decode_cursor,
+    encode_cursor,
+)
+from app.repositories.rollups import rollup_changes
+
+logger = structlog.get_logger()
+
+T = TypeVar("T")
+
+DEFAULT_POOL_SIZE = 4
+DEFAULT_BUSY_TIMEOUT = 5.0
+# Prepared statements kept per connection
+STATEMENT_CACHE_SIZE = 256
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS donations (
+    id TEXT PRIMARY KEY,
+    amount INTEGER NOT NULL,
+    currency TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    status TEXT NOT NULL,
+    source TEXT NOT NULL,
+    provider_order_id TEXT NOT NULL,
+    provider_customer_id TEXT,
+    idempotency_key TEXT NOT NULL,
+    created_at INTEGER NOT NULL,
+    updated_at INTEGER NOT NULL,
+    completed_at INTEGER
+);
+CREATE UNIQUE INDEX IF NOT EXISTS donations_provider_order
+    ON donations (provider, provider_order_id);
+CREATE UNIQUE INDEX IF NOT EXISTS donations_idempotency_key ON donations (idempotency_key);
+CREATE INDEX IF NOT EXISTS donations_created ON donations (created_at, id);
+CREATE INDEX IF NOT EXISTS donations_status_created ON donations (status, created_at, id);
+CREATE INDEX IF NOT EXISTS donations_source_created ON donations (source, created_at, id);
+CREATE INDEX IF NOT EXISTS donations_provider_created
+    ON donations (provider, created_at, id);
+
+CREATE TABLE IF NOT EXISTS payment_events (
+    id TEXT PRIMARY KEY,
+    provider TEXT NOT NULL,
+    provider_event_id TEXT NOT NULL,
+    provider_order_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    received_at INTEGER NOT NULL,
+    raw_payload TEXT NOT NULL,
+    signature_valid INTEGER NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS payment_events_provider_event
+    ON payment_events (provider, provider_event_id);
+CREATE INDEX IF NOT EXISTS payment_events_received ON payment_events (received_at, id);
+
+CREATE TABLE IF NOT EXISTS payment_event_ids (
+    provider TEXT NOT NULL,
+    provider_event_id TEXT NOT NULL,
+    expire_at INTEGER NOT NULL,
+    PRIMARY KEY (provider, provider_event_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS donation_rollups (
+    day TEXT NOT NULL,
+    source TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    status TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    amount INTEGER NOT NULL,
+    PRIMARY KEY (day, source, provider, status)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS campaign_counters (
+    campaign_id TEXT PRIMARY KEY,
+    amount INTEGER NOT NULL,
+    count INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+DONATION_COLUMNS = ("id", *DONATION_FIELDS)
+_TIMESTAMP_COLUMNS = {"created_at", "updated_at", "completed_at", "received_at"}
+
+INSERT_DONATION = (
+    f"INSERT INTO donations ({', '.join(DONATION_COLUMNS)}) "
+    f"VALUES ({', '.join('?' * len(DONATION_COLUMNS))})"
+)
+SELECT_DONATION = f"SELECT {', '.join(DONATION_COLUMNS)} FROM donations WHERE id = ?"
+SELECT_DONATION_BY_ORDER = (
+    f"SELECT {', '.join(DONATION_COLUMNS)} FROM donations "
+    "WHERE provider = ? AND provider_order_id = ?"
+)
+SELECT_DONATION_BY_KEY = (
+    f"SELECT {', '.join(DONATION_COLUMNS)} FROM donations WHERE idempotency_key = ?"
+)
+SELECT_VERSION = "SELECT status, updated_at FROM donations WHERE id = ?"
+UPDATE_STATUS = (
+    "UPDATE donations SET status = ?, updated_at = ?, "
+    "completed_at = COALESCE(?, completed_at) WHERE id = ?"
+)
+UPSERT_ROLLUP = (
+    "INSERT INTO donation_rollups (day, source, provider, status, count, amount) "
+    "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (day, source, provider, status) "
+    "DO UPDATE SET count = count + excluded.count, amount = amount + excluded.amount"
+)
+SELECT_ROLLUPS = (
+    "SELECT day, source, provider, status, count, amount FROM donation_rollups "
+    "WHERE day BETWEEN ? AND ?"
+)
+# A duplicate event is already recorded, which is all save_payment_event promises
+INSERT_EVENT = (
+    "INSERT INTO payment_events (id, provider, provider_event_id, provider_order_id, "
+    "status, received_at, raw_payload, signature_valid) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (provider, provider_event_id) DO NOTHING"
+)
+EVENT_EXISTS = (
+    "SELECT EXISTS (SELECT 1 FROM payment_events WHERE provider = ? AND provider_event_id = ?) "
+    "OR EXISTS (SELECT 1 FROM payment_event_ids "
+    "WHERE provider = ? AND provider_event_id = ? AND expire_at > ?)"
+)
+UPSERT_EVENT_MARKER = (
+    "INSERT INTO payment_event_ids (provider, provider_event_id, expire_at) VALUES (?, ?, ?) "
+    "ON CONFLICT (provider, provider_event_id) DO UPDATE SET expire_at = excluded.expire_at"
+)
+DELETE_EVENT = "DELETE FROM payment_events WHERE id = ?"
+DELETE_EXPIRED_MARKERS = "DELETE FROM payment_event_ids WHERE expire_at <= ?"
+INCREMENT_COUNTER = (
+    "INSERT INTO campaign_counters (campaign_id, amount, count) VALUES (?, ?, ?) "
+    "ON CONFLICT (campaign_id) DO UPDATE SET "
+    "amount = amount + excluded.amount, count = count + excluded.count"
+)
+SELECT_COUNTER = "SELECT amount, count FROM campaign_counters WHERE campaign_id = ?"
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=UTC)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def to_micros(value: datetime) -> int:
+    """Encode a timestamp as integer microseconds since the epoch."""
+    return (value - _EPOCH) // _MICROSECOND
+
+
+def from_micros(value: int) -> datetime:
+    """Decode a timestamp written by to_micros()."""
+    return _EPOCH + value * _MICROSECOND
+
+
+def _enum_value(value: Any) -> Any:
+    return value.value if isinstance(value, (PaymentProvider, DonationStatus)) else value
+
+
+def _donation_row(donation: Donation) -> tuple[Any, ...]:
+    values = []
+    for column in DONATION_COLUMNS:
+        value = getattr(donation, column)
+        if column in _TIMESTAMP_COLUMNS and value is not None:
+            value = to_micros(value)
+        values.append(_enum_value(value))
+    return tuple(values)
+
+
+def _row_values(columns: Sequence[str], row: Sequence[Any]) -> dict[str, Any]:
+    values = {}
+    for column, value in zip(columns, row, strict=True):
+        if column in _TIMESTAMP_COLUMNS and value is not None:
+            value = from_micros(value)
+        values[column] = value
+    return values
+
+
+def _row_to_donation(row: Sequence[Any]) -> Donation:
+    return Donation(**_row_values(DONATION_COLUMNS, row))
+
+
+def _donation_filters(query: DonationQuery) -> tuple[list[str], list[Any]]:
+    """WHERE clauses and parameters for a donation query."""
+    clauses: list[str] = []
+    params: list[Any] = []
+    if query.status is not None:
+        clauses.append("status = ?")
+        params.append(query.status.value)
+    if query.source is not None:
+        clauses.append("source = ?")
+        params.append(query.source)
+    if query.provider is not None:
+        clauses.append("provider = ?")
+        params.append(query.provider.value)
+    if query.created_from is not None:
+        clauses.append("created_at >= ?")
+        params.append(to_micros(query.created_from))
+    if query.created_to is not None:
+        clauses.append("created_at < ?")
+        params.append(to_micros(query.created_to))
+    return clauses, params
+
+
+def _fetch_all(sql: str, params: Sequence[Any], conn: sqlite3.Connection) -> list[Any]:
+    return conn.execute(sql, params).fetchall()
+
+
+def _select_columns(fields: Sequence[str] | None) -> list[str]:
+    """Columns for a field selection, which is interpolated into SQL."""
+    selected = list(fields) if fields is not None else list(DONATION_FIELDS)
+    unknown = set(selected) - set(DONATION_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown donation fields: {sorted(unknown)}")
+    return ["id", *selected]
+
+
+def _where(clauses: list[str]) -> str:
+    return f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+
+def _apply_rollups(
+    conn: sqlite3.Connection, donation: Donation, old_status: str | None, new_status: str
+) -> None:
+    changes = rollup_changes(donation, old_status, new_status)
+    if changes:
+        conn.executemany(UPSERT_ROLLUP, changes)
+
+
+class _ConnectionPool:
+    """Fixed set of SQLite connections, each with its own worker thread."""
+
+    def __init__(self, path: str, size: int, busy_timeout: float):
+        self._path = path
+        self._size = size
+        self._busy_timeout = busy_timeout
+        self._idle: asyncio.Queue[sqlite3.Connection] | None = None
+        self._connections: list[sqlite3.Connection] = []
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="sqlite")
+        # Writers in this process take turns here instead of in busy_timeout
+        self.write_lock = asyncio.Lock()
+        # Connection of the transaction the current task is in, if any
+        self.transaction: ContextVar[sqlite3.Connection | None] = ContextVar(
+            f"sqlite_transaction_{id(self)}", default=None
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        Path(self._path).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(
+            self._path,
+            timeout=self._busy_timeout,
+            # Transactions are opened explicitly with BEGIN IMMEDIATE
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        conn.execute("PRAGMA journal_mode = WAL")
+        # Durable at checkpoints; a power loss can drop the last commits only
+        conn.execute("PRAGMA synchronous = NORMAL")
+        if not self._connections:
+            (version,) = conn.execute("PRAGMA user_version").fetchone()
+            if version < SCHEMA_VERSION:
+                conn.executescript(SCHEMA)
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        return conn
+
+    async def _open(self) -> asyncio.Queue[sqlite3.Connection]:
+        if self._idle is None:
+            idle: asyncio.Queue[sqlite3.Connection] = asyncio.Queue()
+            loop = asyncio.get_running_loop()
+            for _ in range(self._size):
+                conn = await loop.run_in_executor(self._executor, self._connect)
+                self._connections.append(conn)
+                idle.put_nowait(conn)
+            self._idle = idle
+        return self._idle
+
+    async def run(self, conn: sqlite3.Connection, call: Callable[[sqlite3.Connection], T]) -> T:
+        """Run ``call(conn)`` on the pool's threads."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, call, conn)
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[sqlite3.Connection]:
+        """Borrow an idle connection."""
+        idle = await self._open()
+        conn = await idle.get()
+        try:
+            yield conn
+        finally:
+            idle.put_nowait(conn)
+
+    async def close(self) -> None:
+        for conn in self._connections:
+            await self.run(conn, sqlite3.Connection.close)
+        self._connections = []
+        self._idle = None
+        self._executor.shutdown(wait=True)
+
+
+def _in_transaction(conn: sqlite3.Connection, call: Callable[[sqlite3.Connection], T]) -> T:
+    """Run ``call`` in its own write transaction (worker thread)."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        result = call(conn)
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+    return result
+
+
+class SqliteDonationRepository(DonationRepositoryBase):
+    """SQLite implementation (WAL mode, pooled connections)."""
+
+    def __init__(
+        self,
+        path: str,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        busy_timeout: float = DEFAULT_BUSY_TIMEOUT,
+    ):
+        self._pool = _ConnectionPool(path, pool_size, busy_timeout)
+
+    async def _read(self, operation: str, call: Callable[[sqlite3.Connection], T]) -> T:
+        deadline.check(operation)
+        conn = self._pool.transaction.get()
+        if conn is not None:
+            return await self._pool.run(conn, call)
+        async with self._pool.connection() as conn:
+            return await self._pool.run(conn, call)
+
+    async def _write(self, operation: str, call: Callable[[sqlite3.Connection], T]) -> T:
+        """Run ``call`` in the current transaction, or in a new one."""
+        deadline.check(operation)
+        conn = self._pool.transaction.get()
+        if conn is not None:
+            return await self._pool.run(conn, call)
+        async with self._pool.write_lock, self._pool.connection() as conn:
+            return await self._pool.run(conn, lambda c: _in_transaction(c, call))
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[None]:
+        """Group the calls made inside the block into one write transaction.
+
+        The write lock is held for the whole block, so keep it short, and
+        make the calls one at a time: they share a single connection.
+        Nested blocks join the outer transaction.
+        """
+        if self._pool.transaction.get() is not None:
+            yield
+            return
+        async with self._pool.write_lock, self._pool.connection() as conn:
+            await self._pool.run(conn, lambda c: c.execute("BEGIN IMMEDIATE"))
+            token = self._pool.transaction.set(conn)
+            try:
+                yield
+            except BaseException:
+                await self._pool.run(conn, lambda c: c.execute("ROLLBACK"))
+                raise
+            finally:
+                self._pool.transaction.reset(token)
+            await self._pool.run(conn, lambda c: c.execute("COMMIT"))
+
+    async def create(self, donation: Donation) -> Donation:
+        """Insert a donation and its rollup increment.
+
+        Raises:
+            DuplicateDonationError: If the idempotency key is already taken
+            sqlite3.IntegrityError: If the ID or provider order is already taken
+        """
+
+        def insert(conn: sqlite3.Connection) -> None:
+            conn.execute(INSERT_DONATION, _donation_row(donation))
+            _apply_rollups(conn, donation, None, donation.status)
+
+        try:
+            await self._write("sqlite.create_donation", insert)
+        except sqlite3.IntegrityError as e:
+            if "donations.idempotency_key" in str(e):
+                raise DuplicateDonationError(donation.idempotency_key) from e
+            raise
+        logger.info(
+            "Donation created",
+            donation_id=donation.id,
+            provider=donation.provider,
+            amount=donation.amount,
+        )
+        return donation
+
+    async def get_by_id(self, donation_id: str) -> Donation | None:
+        row = await self._read(
+            "sqlite.get_donation",
+            lambda conn: conn.execute(SELECT_DONATION, (donation_id,)).fetchone(),
+        )
+        return _row_to_donation(row) if row else None
+
+    async def get_many(self, donation_ids: Sequence[str]) -> dict[str, Donation]:
+        ids = list(dict.fromkeys(donation_ids))
+        if not ids:
+            return {}
+        sql = (
+            f"SELECT {', '.join(DONATION_COLUMNS)} FROM donations "
+            f"WHERE id IN ({', '.join('?' * len(ids))})"
+        )
+        rows = await self._read(
+            "sqlite.get_donations", lambda conn: conn.execute(sql, ids).fetchall()
+        )
+        donations = (_row_to_donation(row) for row in rows)
+        return {donation.id: donation for donation in donations}
+
+    async def get_version(self, donation_id: str) -> DonationVersion | None:
+        row = await self._read(
+            "sqlite.get_version",
+            lambda conn: conn.execute(SELECT_VERSION, (donation_id,)).fetchone(),
+        )
+        if row is None:
+            return None
+        return DonationVersion(status=row[0], updated_at=from_micros(row[1]))
+
+    async def get_by_provider_order_id(
+        self, provider: PaymentProvider, provider_order_id: str
+    ) -> Donation | None:
+        params = (_enum_value(provider), provider_order_id)
+        row = await self._read(
+            "sqlite.get_by_order",
+            lambda conn: conn.execute(SELECT_DONATION_BY_ORDER, params).fetchone(),
+        )
+        return _row_to_donation(row) if row else None
+
+    async def get_by_idempotency_key(self, idempotency_key: str) -> Donation | None:
+        row = await self._read(
+            "sqlite.get_by_key",
+            lambda conn: conn.execute(SELECT_DONATION_BY_KEY, (idempotency_key,)).fetchone(),
+        )
+        return _row_to_donation(row) if row else None
+
+    async def update_status(
+        self, donation_id: str, status: DonationStatus, completed_at: datetime | None = None
+    ) -> StatusUpdate:
+        """Check the transition and write it in one transaction.
+
+        A None ``completed_at`` keeps the stored value.
+        """
+        status_val = _enum_value(status)
+
+        def update(conn: sqlite3.Connection) -> StatusUpdate:
+            row = conn.execute(SELECT_DONATION, (donation_id,)).fetchone()
+            if row is None:
+                return StatusUpdate(TransitionOutcome.NOT_FOUND)
+            current = _row_to_donation(row)
+            blocked = _check_transition(current, status_val)
+            if blocked:
+                return blocked
+            updated = current.model_copy(
+                update={
+                    "status": status_val,
+                    "updated_at": datetime.now(UTC),
+                    "completed_at": completed_at or current.completed_at,
+                }
+            )
+            conn.execute(
+                UPDATE_STATUS,
+                (
+                    status_val,
+                    to_micros(updated.updated_at),
+                    to_micros(completed_at) if completed_at else None,
+                    donation_id,
+                ),
+            )
+            _apply_rollups(conn, current, current.status, status_val)
+            return StatusUpdate(TransitionOutcome.APPLIED, updated, current.status)
+
+        return await self._write("sqlite.update_status", update)
+
+    async def save_payment_event(self, event: PaymentEvent) -> PaymentEvent:
+        params = (
+            event.id,
+            _enum_value(event.provider),
+            event.provider_event_id,
+            event.provider_order_id,
+            _enum_value(event.status),
+            to_micros(event.received_at),
+            json.dumps(event.raw_payload, ensure_ascii=False, separators=(",", ":")),
+            int(event.signature_valid),
+        )
+        await self._write(
+            "sqlite.save_event", lambda conn: conn.execute(INSERT_EVENT, params)
+        )
+        return event
+
+    async def event_exists(self, provider: PaymentProvider, provider_event_id: str) -> bool:
+        provider_val = _enum_value(provider)
+        params = (
+            provider_val,
+            provider_event_id,
+            provider_val,
+            provider_event_id,
+            to_micros(datetime.now(UTC)),
+        )
+        row = await self._read(
+            "sqlite.event_exists", lambda conn: conn.execute(EVENT_EXISTS, params).fetchone()
+        )
+        return bool(row[0])
+
+    async def delete_payment_events(
+        self, events: Sequence[PaymentEvent], dedupe_window: timedelta | None = None
+    ) -> None:
+        """Delete events and write their ID markers in one transaction.
+
+        Expired markers are dropped in the same transaction (there is no TTL
+        policy as on Firestore).
+        """
+        now = datetime.now(UTC)
+        markers = [
+            (
+                _enum_value(e.provider),
+                e.provider_event_id,
+                to_micros(e.received_at + dedupe_window),
+            )
+            for e in events
+            if dedupe_window is not None and e.received_at + dedupe_window > now
+        ]
+
+        def delete(conn: sqlite3.Connection) -> None:
+            conn.executemany(UPSERT_EVENT_MARKER, markers)
+            conn.executemany(DELETE_EVENT, [(e.id,) for e in events])
+            conn.execute(DELETE_EXPIRED_MARKERS, (to_micros(now),))
+
+        await self._write("sqlite.delete_events", delete)
+
+    async def get_rollups(self, start: date, end: date) -> list[DonationRollup]:
+        params = (start.isoformat(), end.isoformat())
+        rows = await self._read(
+            "sqlite.get_rollups", lambda conn: conn.execute(SELECT_ROLLUPS, params).fetchall()
+        )
+        return [
+            DonationRollup(
+                day=day,
+                source=source,
+                provider=PaymentProvider(provider),
+                status=DonationStatus(status),
+                count=count,
+                amount=amount,
+            )
+            for day, source, provider, status, count, amount in rows
+        ]
+
+    async def stream_donations(
+        self,
+        query: DonationQuery,
+        fields: Sequence[str] | None = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+    ) -> AsyncIterator[dict[str, Any]]:
+        """Stream donations page by page, resuming after the last (created_at, id)."""
+        columns = _select_columns(fields)
+        clauses, params = _donation_filters(query)
+        after: tuple[int, str] | None = None
+        while True:
+            page_clauses, page_params = list(clauses), list(params)
+            if after is not None:
+                page_clauses.append("(created_at, id) > (?, ?)")
+                page_params.extend(after)
+            sql = (
+                f"SELECT {', '.join(columns)}, created_at AS _created, id AS _id "
+                f"FROM donations{_where(page_clauses)} ORDER BY created_at, id LIMIT ?"
+            )
+            page_params.append(page_size)
+            rows = await self._read(
+                "sqlite.stream_donations",
+                partial(_fetch_all, sql, page_params),
+            )
+            for row in rows:
+                yield _row_values(columns, row[:-2])
+            if len(rows) < page_size:
+                return
+            after = (rows[-1][-2], rows[-1][-1])
+
+    async def list_donations(
+        self,
+        query: DonationQuery,
+        limit: int = DEFAULT_LIST_LIMIT,
+        cursor: str | None = None,
+        fields: Sequence[str] | None = None,
+    ) -> DonationPage:
+        columns = _select_columns(fields)
+        clauses, params = _donation_filters(query)
+        if cursor is not None:
+            created_at, donation_id = decode_cursor(cursor)
+            clauses.append("(created_at, id) < (?, ?)")
+            params.extend([to_micros(created_at), donation_id])
+        sql = (
+            f"SELECT {', '.join(columns)}, created_at AS _created FROM donations"
+            f"{_where(clauses)} ORDER BY created_at DESC, id DESC LIMIT ?"
+        )
+        params.append(limit + 1)
+        rows = await self._read(
+            "sqlite.list_donations", lambda conn: conn.execute(sql, params).fetchall()
+        )
+        items = [_row_values(columns, row[:-1]) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = encode_cursor(from_micros(last[-1]), last[0])
+        return DonationPage(items, next_cursor)
+
+    async def stream_payment_events(
+        self, query: PaymentEventQuery, page_size: int = DEFAULT_PAGE_SIZE
+    ) -> AsyncIterator[PaymentEvent]:
+        clauses: list[str] = []
+        params: list[Any] = []
+        if query.provider is not None:
+            clauses.append("provider = ?")
+            params.append(query.provider.value)
+        if query.received_from is not None:
+            clauses.append("received_at >= ?")
+            params.append(to_micros(query.received_from))
+        if query.received_to is not None:
+            clauses.append("received_at < ?")
+            params.append(to_micros(query.received_to))
+        after: tuple[int, str] | None = None
+        while True:
+            page_clauses, page_params = list(clauses), list(params)
+            if after is not None:
+                page_clauses.append("(received_at, id) > (?, ?)")
+                page_params.extend(after)
+            sql = (
+                "SELECT id, provider, provider_event_id, provider_order_id, status, "
+                "received_at, raw_payload, signature_valid FROM payment_events"
+                f"{_where(page_clauses)} ORDER BY received_at, id LIMIT ?"
+            )
+            page_params.append(page_size)
+            rows = await self._read(
+                "sqlite.stream_events",
+                partial(_fetch_all, sql, page_params),
+            )
+            for row in rows:
+                yield PaymentEvent(
+                    id=row[0],
+                    provider=row[1],
+                    provider_event_id=row[2],
+                    provider_order_id=row[3],
+                    status=row[4],
+                    received_at=from_micros(row[5]),
+                    raw_payload=json.loads(row[6]),
+                    signature_valid=bool(row[7]),
+                )
+            if len(rows) < page_size:
+                return
+            after = (rows[-1][5], rows[-1][0])
+
+    async def ping(self) -> None:
+        """Open the pool's connections with a trivial query."""
+        await self._read("sqlite.ping", lambda conn: conn.execute("SELECT 1").fetchone())
+
+    async def close(self) -> None:
+        await self._pool.close()
+
+
+class SqliteCampaignCounter(CampaignCounterBase):
+    """Campaign totals in the SQLite repository's database.
+
+    Increments made inside the repository's transaction() commit with it.
+    """
+
+    def __init__(self, repository: SqliteDonationRepository):
+        self._repository = repository
+
+    async def increment(self, campaign_id: str, amount: int, count: int) -> None:
+        await self._repository._write(
+            "sqlite.increment_counter",
+            lambda conn: conn.execute(INCREMENT_COUNTER, (campaign_id, amount, count)),
+        )
+
+    async def get_total(self, campaign_id: str) -> CampaignTotal:
+        row = await self._repository._read(
+            "sqlite.get_counter",
+            lambda conn: conn.execute(SELECT_COUNTER, (campaign_id,)).fetchone(),
+        )
+        if row is None:
+            return CampaignTotal()
+        return CampaignTotal(amount=row[0], count=row[1])
@@ -0,0 +1,139 @@
+"""Write-behind buffering for append-only records.
+
+Records are acknowledged as soon as they are buffered and committed in the
+background in groups, once ``max_batch`` records are waiting or
+``flush_interval`` seconds after the first one arrived, whichever comes
+first. Records stay visible through ``__contains__`` until their batch is
+committed, so lookups against the buffer and the backend together never miss
+a record that was acknowledged.
+
+Buffered records live in process memory: a crash loses at most one flush
+interval of them, and another process cannot see them before they commit.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import time
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Generic, TypeVar
+
+import structlog
+
+from app.metrics import metrics
+
+logger = structlog.get_logger()
+
+T = TypeVar("T")
+
+DEFAULT_FLUSH_INTERVAL = 0.05
+DEFAULT_MAX_BATCH = 100
+DEFAULT_MAX_PENDING = 2_000
+
+
+class WriteBehindBuffer(Generic[T]):
+    """Batches keyed records and commits them from a background task."""
+
+    def __init__(
+        self,
+        name: str,
+        commit: Callable[[list[T]], Awaitable[None]],
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        max_batch: int = DEFAULT_MAX_BATCH,
+        max_pending: int = DEFAULT_MAX_PENDING,
+    ):
+        self._name = name
+        self._commit = commit
+        self._flush_interval = flush_interval
+        self._max_batch = max_batch
+        self._max_pending = max_pending
+        # key -> (record, monotonic time buffered), in arrival order
+        self._pending: dict[Hashable, tuple[T, float]] = {}
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: asyncio.Task[None] | None = None
+        self._closed = False
+        metrics.gauge_callback(
+            "write_behind_pending",
+            lambda: len(self._pending),
+            "Records buffered but not yet committed",
+            buffer=name,
+        )
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._pending
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def add(self, key: Hashable, record: T) -> None:
+        """Buffer a record for the next batch.
+
+        Applies back-pressure: when ``max_pending`` records are waiting (the
+        backend is slow or failing), flushes inline and lets a commit error
+        reach the caller.
+        """
+        if self._closed:
+            raise RuntimeError(f"Write-behind buffer {self._name} is closed")
+        if len(self._pending) >= self._max_pending:
+            await self.flush(raise_errors=True)
+        self._pending.setdefault(key, (record, time.monotonic()))
+        if self._task is None or self._task.done():
+            # A fresh context keeps the request's deadline out of the flusher
+            self._task = asyncio.create_task(self._run(), context=contextvars.Context())
+        if len(self._pending) >= self._max_batch:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while self._pending:
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), self._flush_interval)
+            self._wakeup.clear()
+            await self.flush()
+            if self._pending:
+                # Commit failed; wait a full interval before retrying
+                await asyncio.sleep(self._flush_interval)
+
+    async def flush(self, raise_errors: bool = False) -> None:
+        """Commit everything buffered so far, in batches of ``max_batch``."""
+        async with self._flush_lock:
+            while self._pending:
+                keys = list(self._pending)[: self._max_batch]
+                entries = [self._pending[key] for key in keys]
+                try:
+                    await self._commit([record for record, _ in entries])
+                except Exception as e:
+                    metrics.inc(
+                        "write_behind_commit_failures_total",
+                        description="Failed write-behind batch commits",
+                        buffer=self._name,
+                    )
+                    logger.error(
+                        "Write-behind commit failed",
+                        buffer=self._name,
+                        records=len(keys),
+                        error=str(e),
+                    )
+                    if raise_errors:
+                        raise
+                    return
+                now = time.monotonic()
+                for key, (_, buffered_at) in zip(keys, entries, strict=True):
+                    del self._pending[key]
+                    metrics.observe(
+                        "write_behind_lag_seconds",
+                        now - buffered_at,
+                        "Time from buffering a record to committing it",
+                        buffer=self._name,
+                    )
+
+    async def close(self) -> None:
+        """Stop the background task and commit what is left."""
+        self._closed = True
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+        if self._pending:
+            await self.flush(raise_errors=True)
+        logger.info("Write-behind buffer closed", buffer=self._name)
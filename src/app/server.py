@@ -0,0 +1,75 @@
+"""Server entry point for Cloud Run.
+
+Runs uvicorn with ``WEB_CONCURRENCY`` worker processes so an instance can use
+every vCPU Cloud Run allocates. Workers are spawned (not forked) by uvicorn,
+and each one builds its own Firestore and PayPay clients in the FastAPI
+lifespan, so no gRPC channel or HTTP connection pool is shared across
+processes.
+
+The client address is taken from X-Forwarded-For only when the connection
+comes from ``FORWARDED_ALLOW_IPS`` (the load balancer or Cloud Run front
+end), and then as the rightmost hop that is not one of those proxies.
+Entries further left are whatever the client sent, so trusting them would
+let a client pick its own address and evade the per-IP rate limit.
+
+Usage:
+    python -m app.server
+"""
+
+import importlib.util
+import os
+
+import structlog
+import uvicorn
+
+from app.config import settings
+
+logger = structlog.get_logger()
+
+
+def available_cpus() -> int:
+    """Return the number of CPUs this process may run on."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # pragma: no cover - not available on macOS
+        return os.cpu_count() or 1
+
+
+def resolve_workers() -> int:
+    """Resolve the worker count (``WEB_CONCURRENCY``; 0 means one per CPU)."""
+    workers = settings.web_concurrency or available_cpus()
+    if workers > 1 and settings.environment == "sandbox":
+        logger.warning(
+            "Sandbox uses an in-memory repository; state is not shared between workers",
+            workers=workers,
+        )
+    return workers
+
+
+def _implementation(module: str, preferred: str) -> str:
+    """Use the preferred uvicorn implementation if its module is installed."""
+    return preferred if importlib.util.find_spec(module) is not None else "auto"
+
+
+def main() -> None:
+    """Run the API server."""
+    workers = resolve_workers()
+    loop = _implementation("uvloop", "uvloop")
+    http = _implementation("httptools", "httptools")
+    logger.info("Starting server", workers=workers, loop=loop, http=http, port=settings.port)
+
+    uvicorn.run(
+        "app.main:app",
+        host=settings.host,
+        port=settings.port,
+        workers=workers,
+        loop=loop,
+        http=http,
+        proxy_headers=True,
+        forwarded_allow_ips=settings.forwarded_allow_ips,
+        log_level=settings.log_level.lower(),
+    )
+
+
+if __name__ == "__main__":
+    main()
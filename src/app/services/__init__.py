@@ -1,17 +1,37 @@
 """Business logic services."""
 
+from app.services.campaign import CampaignTotalService
+from app.services.export import DonationExporter, ExportFormat, ExportStats
 from app.services.payment import (
     DonationNotFoundError,
+    DuplicateCheckoutError,
     DuplicateEventError,
+    EventApplication,
     InvalidSignatureError,
     PaymentService,
     PaymentServiceError,
+    RequestTimeoutError,
 )
+from app.services.replay import ReplayEvent, ReplayStats, WebhookReplayer
+from app.services.retention import PaymentEventArchiver, RetentionStats, read_archive
 
 __all__ = [
+    "CampaignTotalService",
+    "DonationExporter",
     "DonationNotFoundError",
+    "DuplicateCheckoutError",
     "DuplicateEventError",
+    "EventApplication",
+    "ExportFormat",
+    "ExportStats",
     "InvalidSignatureError",
+    "PaymentEventArchiver",
     "PaymentService",
     "PaymentServiceError",
+    "ReplayEvent",
+    "ReplayStats",
+    "RequestTimeoutError",
+    "RetentionStats",
+    "WebhookReplayer",
+    "read_archive",
 ]
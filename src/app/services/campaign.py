@@ -0,0 +1,80 @@
+"""Live campaign total service for event-time donation tickers."""
+
+import asyncio
+import time
+from collections.abc import Callable
+from datetime import UTC, datetime
+
+import structlog
+
+from app.models.donation import CampaignTotalResponse, DonationStatus
+from app.repositories.counter import CampaignCounterBase, CampaignTotal
+
+logger = structlog.get_logger()
+
+
+class CampaignTotalService:
+    """Maintains and serves the live "raised so far" total of a campaign.
+
+    Writes go to a sharded counter. Reads are served from a short in-process
+    cache; when it expires a single coroutine refreshes it while concurrent
+    readers wait for that refresh instead of issuing their own queries.
+    """
+
+    def __init__(
+        self,
+        counter: CampaignCounterBase,
+        campaign_id: str,
+        cache_ttl_seconds: float = 2.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._counter = counter
+        self._campaign_id = campaign_id
+        self._cache_ttl = cache_ttl_seconds
+        self._clock = clock
+        self._lock = asyncio.Lock()
+        self._cached: CampaignTotalResponse | None = None
+        self._expires_at = 0.0
+
+    @property
+    def campaign_id(self) -> str:
+        return self._campaign_id
+
+    async def record_status_change(
+        self, old_status: str, new_status: str, amount: int
+    ) -> None:
+        """Apply a donation status transition to the campaign total.
+
+        Completion adds the amount; a refund of a completed donation removes it.
+        Any other transition leaves the total unchanged.
+        """
+        old = DonationStatus(old_status)
+        new = DonationStatus(new_status)
+        if old == new:
+            return
+
+        if new == DonationStatus.COMPLETED:
+            await self._counter.increment(self._campaign_id, amount, 1)
+        elif new == DonationStatus.REFUNDED and old == DonationStatus.COMPLETED:
+            await self._counter.increment(self._campaign_id, -amount, -1)
+
+    async def get_total(self) -> CampaignTotalResponse:
+        """Get the campaign total, served from cache while it is fresh."""
+        cached = self._cached
+        if cached is not None and self._clock() < self._expires_at:
+            return cached
+
+        async with self._lock:
+            # Another reader may have refreshed while we waited for the lock
+            if self._cached is not None and self._clock() < self._expires_at:
+                return self._cached
+
+            total: CampaignTotal = await self._counter.get_total(self._campaign_id)
+            self._cached = CampaignTotalResponse(
+                campaign_id=self._campaign_id,
+                total_amount=total.amount,
+                donation_count=total.count,
+                as_of=datetime.now(UTC),
+            )
+            self._expires_at = self._clock() + self._cache_ttl
+            return self._cached
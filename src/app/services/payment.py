@@ -1,31 +1,62 @@
 """Payment service for handling checkout and webhook processing."""
 
 import uuid
-from datetime import UTC, datetime
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+from datetime import UTC, date, datetime
+from typing import Any
 
 import structlog
 
-from app.adapters.base import CheckoutSessionInput, PaymentProviderAdapter, ProviderError
+from app.adapters.base import (
+    CheckoutSessionInput,
+    NormalizedEvent,
+    PaymentProviderAdapter,
+    ProviderError,
+)
+from app.deadline import DeadlineExceededError
+from app.locks import KeyedLock
+from app.metrics import metrics
 from app.models.donation import (
     CheckoutRequest,
     CheckoutResponse,
     Donation,
+    DonationBatchResponse,
+    DonationListResponse,
     DonationResponse,
     DonationStatus,
     PaymentEvent,
     PaymentProvider,
+    StatsResponse,
+    StatusTotal,
+    is_allowed_transition,
+)
+from app.repositories.donation import (
+    DEFAULT_LIST_LIMIT,
+    DonationQuery,
+    DonationRepositoryBase,
+    DonationVersion,
+    DuplicateDonationError,
+    TransitionOutcome,
 )
-from app.repositories.donation import DonationRepositoryBase
+from app.services.campaign import CampaignTotalService
+from app.services.export import EXPORT_FIELDS
 
 logger = structlog.get_logger()
 
+# Upper bound on the day range of a stats query (one rollup read per day)
+MAX_STATS_DAYS = 92
+# Largest page of the donation listing
+MAX_LIST_LIMIT = 200
+
 
 class PaymentServiceError(Exception):
     """Base exception for payment service errors."""
 
-    def __init__(self, code: str, message: str):
+    def __init__(self, code: str, message: str, retry_after: float | None = None):
         self.code = code
         self.message = message
+        self.retry_after = retry_after
         super().__init__(message)
 
 
@@ -36,6 +67,15 @@ class DonationNotFoundError(PaymentServiceError):
         super().__init__("DONATION_NOT_FOUND", f"Donation not found: {donation_id}")
 
 
+class DuplicateCheckoutError(PaymentServiceError):
+    """Raised when a checkout was already created with the idempotency key."""
+
+    def __init__(self, idempotency_key: str):
+        super().__init__(
+            "DUPLICATE_CHECKOUT", f"Checkout already created for key: {idempotency_key}"
+        )
+
+
 class DuplicateEventError(PaymentServiceError):
     """Raised when a webhook event is already processed."""
 
@@ -50,16 +90,74 @@ class InvalidSignatureError(PaymentServiceError):
         super().__init__("SIGNATURE_INVALID", f"Invalid signature for {provider}: {error}")
 
 
+class RequestTimeoutError(PaymentServiceError):
+    """Raised when the request deadline expires before the work is done."""
+
+    def __init__(self, operation: str):
+        super().__init__("DEADLINE_EXCEEDED", f"Request deadline exceeded during {operation}")
+
+
+@dataclass
+class EventApplication:
+    """What applying a normalized event did (or, in a dry run, would do)."""
+
+    provider: PaymentProvider
+    provider_event_id: str
+    provider_order_id: str
+    new_status: DonationStatus
+    donation_id: str | None = None  # None when no donation matches the order
+    old_status: str | None = None
+    stale: bool = False  # the donation was updated after the event was received
+    rejected: bool = False  # the status transition is not allowed
+    recorded: bool = False  # the event was newly saved to payment_events
+
+    @property
+    def found(self) -> bool:
+        return self.donation_id is not None
+
+    @property
+    def changed(self) -> bool:
+        return (
+            self.found
+            and not self.stale
+            and not self.rejected
+            and self.old_status != self.new_status.value
+        )
+
+
+def _donation_response(donation: Donation) -> DonationResponse:
+    return DonationResponse(
+        donation_id=donation.id,
+        status=DonationStatus(donation.status),
+        amount=donation.amount,
+        currency=donation.currency,
+        provider=PaymentProvider(donation.provider),
+        source=donation.source,
+        completed_at=donation.completed_at,
+        updated_at=donation.updated_at,
+    )
+
+
 class PaymentService:
     """Service for handling payment operations."""
 
     def __init__(
         self,
         repository: DonationRepositoryBase,
-        adapters: dict[PaymentProvider, PaymentProviderAdapter],
+        adapters: Mapping[PaymentProvider, PaymentProviderAdapter],
+        campaign: CampaignTotalService | None = None,
     ):
         self._repository = repository
         self._adapters = adapters
+        self._campaign = campaign
+        # Notifications of one order are handled one at a time
+        self._order_locks: KeyedLock[tuple[PaymentProvider, str]] = KeyedLock(
+            "webhook.order_lock"
+        )
+
+    async def close(self) -> None:
+        """Commit buffered repository writes (called on shutdown)."""
+        await self._repository.close()
 
     def _get_adapter(self, provider: PaymentProvider) -> PaymentProviderAdapter:
         """Get adapter for the specified provider."""
@@ -70,6 +168,12 @@ class PaymentService:
             )
         return adapter
 
+    def normalize_event(
+        self, provider: PaymentProvider, event: dict[str, Any]
+    ) -> NormalizedEvent:
+        """Normalize a provider notification payload with the provider's adapter."""
+        return self._get_adapter(provider).normalize_event(event)
+
     async def create_checkout(self, request: CheckoutRequest) -> CheckoutResponse:
         """Create a checkout session and return redirect URL.
 
@@ -80,10 +184,24 @@ class PaymentService:
             CheckoutResponse with redirect URL and donation ID
 
         Raises:
+            DuplicateCheckoutError: If the idempotency key was already used
             PaymentServiceError: If checkout creation fails
         """
         adapter = self._get_adapter(request.provider)
 
+        # A retried request must not open a second provider session
+        try:
+            existing = await self._repository.get_by_idempotency_key(request.idempotency_key)
+        except DeadlineExceededError as e:
+            raise RequestTimeoutError(e.operation) from e
+        if existing is not None:
+            logger.info(
+                "Checkout retried with a used idempotency key",
+                donation_id=existing.id,
+                provider=request.provider.value,
+            )
+            raise DuplicateCheckoutError(request.idempotency_key)
+
         # Generate donation ID
         donation_id = f"don_{uuid.uuid4().hex[:16]}"
 
@@ -114,7 +232,16 @@ class PaymentService:
                 provider=request.provider.value,
                 error=str(e),
             )
-            raise PaymentServiceError("PROVIDER_UNAVAILABLE", str(e)) from e
+            raise PaymentServiceError(
+                "PROVIDER_UNAVAILABLE", str(e), retry_after=getattr(e, "retry_after", None)
+            ) from e
+        except DeadlineExceededError as e:
+            logger.error(
+                "Checkout deadline exceeded at provider",
+                donation_id=donation_id,
+                provider=request.provider.value,
+            )
+            raise RequestTimeoutError(e.operation) from e
 
         # Create donation record
         now = datetime.now(UTC)
@@ -131,7 +258,24 @@ class PaymentService:
             updated_at=now,
         )
 
-        await self._repository.create(donation)
+        try:
+            await self._repository.create(donation)
+        except DeadlineExceededError as e:
+            # The provider session exists but is never handed to the donor
+            logger.error(
+                "Checkout deadline exceeded before donation was saved",
+                donation_id=donation_id,
+                provider_order_id=session_result.provider_order_id,
+            )
+            raise RequestTimeoutError(e.operation) from e
+        except DuplicateDonationError as e:
+            # A concurrent request with the same key saved its donation first
+            logger.warning(
+                "Checkout raced a request with the same idempotency key",
+                donation_id=donation_id,
+                provider_order_id=session_result.provider_order_id,
+            )
+            raise DuplicateCheckoutError(request.idempotency_key) from e
 
         logger.info(
             "Checkout session created",
@@ -159,19 +303,211 @@ class PaymentService:
 
         Raises:
             DonationNotFoundError: If donation is not found
+            RequestTimeoutError: If the request deadline expires
         """
-        donation = await self._repository.get_by_id(donation_id)
+        try:
+            donation = await self._repository.get_by_id(donation_id)
+        except DeadlineExceededError as e:
+            raise RequestTimeoutError(e.operation) from e
         if not donation:
             raise DonationNotFoundError(donation_id)
+        return _donation_response(donation)
+
+    async def get_donations(self, donation_ids: Sequence[str]) -> DonationBatchResponse:
+        """Get the status of several donations with one repository read.
 
-        return DonationResponse(
-            donation_id=donation.id,
-            status=DonationStatus(donation.status),
-            amount=donation.amount,
-            currency=donation.currency,
-            provider=PaymentProvider(donation.provider),
-            source=donation.source,
-            completed_at=donation.completed_at,
+        Returns:
+            Found donations in request order (duplicates once) and the IDs
+            that do not exist
+
+        Raises:
+            RequestTimeoutError: If the request deadline expires
+        """
+        try:
+            found = await self._repository.get_many(donation_ids)
+        except DeadlineExceededError as e:
+            raise RequestTimeoutError(e.operation) from e
+
+        unique = list(dict.fromkeys(donation_ids))
+        return DonationBatchResponse(
+            donations=[_donation_response(found[i]) for i in unique if i in found],
+            not_found=[i for i in unique if i not in found],
+        )
+
+    async def get_donation_version(self, donation_id: str) -> DonationVersion:
+        """Get a donation's status and update time for cache revalidation.
+
+        Cheaper than get_donation(): only the two fields are read.
+
+        Raises:
+            DonationNotFoundError: If donation is not found
+            RequestTimeoutError: If the request deadline expires
+        """
+        try:
+            version = await self._repository.get_version(donation_id)
+        except DeadlineExceededError as e:
+            raise RequestTimeoutError(e.operation) from e
+        if not version:
+            raise DonationNotFoundError(donation_id)
+        return version
+
+    async def list_donations(
+        self,
+        query: DonationQuery,
+        limit: int = DEFAULT_LIST_LIMIT,
+        cursor: str | None = None,
+        fields: Sequence[str] | None = None,
+    ) -> DonationListResponse:
+        """List donations newest first, one keyset page at a time.
+
+        Args:
+            query: Filters on status, source, provider and creation time
+            limit: Page size (1 to MAX_LIST_LIMIT)
+            cursor: ``next_cursor`` of the previous page
+            fields: Donation fields per item; defaults to the export columns,
+                which are also the only ones allowed
+
+        Raises:
+            PaymentServiceError: If the limit, fields or cursor are invalid
+            RequestTimeoutError: If the request deadline expires
+        """
+        if not 1 <= limit <= MAX_LIST_LIMIT:
+            raise PaymentServiceError(
+                "INVALID_ARGUMENT", f"limit must be between 1 and {MAX_LIST_LIMIT}"
+            )
+        selected = list(fields) if fields else list(EXPORT_FIELDS)
+        unknown = sorted(set(selected) - set(EXPORT_FIELDS))
+        if unknown:
+            raise PaymentServiceError("INVALID_ARGUMENT", f"Unknown fields: {', '.join(unknown)}")
+
+        try:
+            page = await self._repository.list_donations(query, limit, cursor, selected)
+        except ValueError as e:
+            raise PaymentServiceError("INVALID_ARGUMENT", str(e)) from e
+        except DeadlineExceededError as e:
+            raise RequestTimeoutError(e.operation) from e
+        return DonationListResponse(items=page.items, next_cursor=page.next_cursor)
+
+    async def get_stats(
+        self,
+        start: date,
+        end: date,
+        source: str | None = None,
+        provider: PaymentProvider | None = None,
+    ) -> StatsResponse:
+        """Get aggregate donation statistics from the daily rollups.
+
+        Args:
+            start: First JST day (inclusive)
+            end: Last JST day (inclusive)
+            source: Optional QR source filter
+            provider: Optional provider filter
+
+        Returns:
+            StatsResponse with per-bucket rows, per-status totals and rates
+
+        Raises:
+            PaymentServiceError: If the date range is invalid
+            RequestTimeoutError: If the request deadline expires
+        """
+        if end < start:
+            raise PaymentServiceError("INVALID_ARGUMENT", "start must not be after end")
+        if (end - start).days + 1 > MAX_STATS_DAYS:
+            raise PaymentServiceError(
+                "INVALID_ARGUMENT", f"Date range must not exceed {MAX_STATS_DAYS} days"
+            )
+
+        try:
+            rollups = await self._repository.get_rollups(start, end)
+        except DeadlineExceededError as e:
+            raise RequestTimeoutError(e.operation) from e
+        buckets = sorted(
+            (
+                rollup
+                for rollup in rollups
+                if rollup.count
+                and (source is None or rollup.source == source)
+                and (provider is None or rollup.provider == provider.value)
+            ),
+            key=lambda r: (r.day, r.source, r.provider, r.status),
+        )
+
+        totals = {status: StatusTotal() for status in DonationStatus}
+        for bucket in buckets:
+            total = totals[DonationStatus(bucket.status)]
+            total.count += bucket.count
+            total.amount += bucket.amount
+
+        total_count = sum(total.count for total in totals.values())
+        success_rate = failure_rate = None
+        if total_count:
+            success_rate = totals[DonationStatus.COMPLETED].count / total_count
+            failure_rate = (
+                totals[DonationStatus.FAILED].count + totals[DonationStatus.EXPIRED].count
+            ) / total_count
+
+        return StatsResponse(
+            start_date=start,
+            end_date=end,
+            buckets=buckets,
+            totals=totals,
+            total_count=total_count,
+            success_rate=success_rate,
+            failure_rate=failure_rate,
+        )
+
+    async def _record_campaign_change(
+        self, donation: Donation, old_status: str, new_status: DonationStatus
+    ) -> None:
+        """Update the live campaign total (best effort; rollups stay authoritative)."""
+        if not self._campaign:
+            return
+        try:
+            await self._campaign.record_status_change(old_status, new_status, donation.amount)
+        except Exception as e:
+            logger.error(
+                "Failed to update campaign total",
+                donation_id=donation.id,
+                campaign_id=self._campaign.campaign_id,
+                error=str(e),
+            )
+
+    async def _update_status(
+        self, donation: Donation, new_status: DonationStatus, result: EventApplication
+    ) -> None:
+        """Apply a status change through the repository's transition check."""
+        completed_at = datetime.now(UTC) if new_status == DonationStatus.COMPLETED else None
+        update = await self._repository.update_status(donation.id, new_status, completed_at)
+        if update.previous_status is not None:
+            # The stored status may have moved since the donation was read
+            result.old_status = update.previous_status
+        if update.outcome == TransitionOutcome.REJECTED:
+            result.rejected = True
+        elif update.applied:
+            logger.info(
+                "Donation status updated from webhook",
+                donation_id=donation.id,
+                old_status=update.previous_status,
+                new_status=new_status.value,
+            )
+            await self._record_campaign_change(
+                donation, update.previous_status or donation.status, new_status
+            )
+
+    def _record_rejection(self, result: EventApplication) -> None:
+        metrics.inc(
+            "donation_status_rejected_total",
+            description="Status changes refused by the transition table",
+            provider=result.provider.value,
+            from_status=result.old_status,
+            to_status=result.new_status.value,
+        )
+        logger.warning(
+            "Donation status transition rejected",
+            donation_id=result.donation_id,
+            provider_event_id=result.provider_event_id,
+            old_status=result.old_status,
+            new_status=result.new_status.value,
         )
 
     async def process_webhook(
@@ -187,7 +523,21 @@ class PaymentService:
         Raises:
             InvalidSignatureError: If signature verification fails
             DuplicateEventError: If event was already processed
+            RequestTimeoutError: If the request deadline expires (the provider retries)
         """
+        try:
+            await self._process_webhook(provider, headers, body)
+        except DeadlineExceededError as e:
+            logger.error(
+                "Webhook deadline exceeded",
+                provider=provider.value,
+                operation=e.operation,
+            )
+            raise RequestTimeoutError(e.operation) from e
+
+    async def _process_webhook(
+        self, provider: PaymentProvider, headers: dict[str, str], body: bytes
+    ) -> None:
         adapter = self._get_adapter(provider)
 
         # Verify signature
@@ -210,47 +560,96 @@ class PaymentService:
             status=normalized.status.value,
         )
 
-        # Check for duplicate event
-        if await self._repository.event_exists(provider, normalized.provider_event_id):
-            raise DuplicateEventError(provider.value, normalized.provider_event_id)
+        # Notifications of the same order (AUTHORIZED and COMPLETED can arrive
+        # together) are applied in arrival order instead of racing between the
+        # donation read and the status update. The lock is taken outside the
+        # transaction so a waiting webhook holds no database lock. One
+        # transaction where the backend has them: the duplicate check, status
+        # change and event record commit together.
+        async with (
+            self._order_locks.hold((provider, normalized.provider_order_id)),
+            self._repository.transaction(),
+        ):
+            if await self._repository.event_exists(provider, normalized.provider_event_id):
+                raise DuplicateEventError(provider.value, normalized.provider_event_id)
+
+            await self.apply_event(provider, normalized, recorded=False)
+
+    async def apply_event(
+        self,
+        provider: PaymentProvider,
+        normalized: NormalizedEvent,
+        dry_run: bool = False,
+        recorded: bool | None = None,
+        received_at: datetime | None = None,
+    ) -> EventApplication:
+        """Apply a normalized event to its donation and record it.
+
+        Safe to repeat, which is what makes webhook replays idempotent: a
+        donation already in the event's status is left untouched, and an event
+        whose provider_event_id is already in payment_events is not saved again.
 
-        # Save payment event
-        event_id = f"evt_{uuid.uuid4().hex[:16]}"
-        payment_event = PaymentEvent(
-            id=event_id,
+        Args:
+            provider: The payment provider
+            normalized: Event returned by the adapter's normalize_event()
+            dry_run: Only read; report the change that would be made
+            recorded: Whether the event is already stored (looked up when None)
+            received_at: When the event was originally received; an event
+                older than the donation's last update is skipped as stale
+
+        Returns:
+            EventApplication describing the status change and event record
+        """
+        result = EventApplication(
             provider=provider,
             provider_event_id=normalized.provider_event_id,
             provider_order_id=normalized.provider_order_id,
-            status=normalized.status,
-            received_at=datetime.now(UTC),
-            raw_payload=normalized.raw_payload,
-            signature_valid=True,
+            new_status=normalized.status,
         )
-        await self._repository.save_payment_event(payment_event)
-
-        # Update donation status
         donation = await self._repository.get_by_provider_order_id(
             provider, normalized.provider_order_id
         )
 
         if donation:
-            completed_at = (
-                datetime.now(UTC)
-                if normalized.status == DonationStatus.COMPLETED
-                else None
-            )
-            await self._repository.update_status(
-                donation.id, normalized.status, completed_at
-            )
-            logger.info(
-                "Donation status updated from webhook",
-                donation_id=donation.id,
-                old_status=donation.status,
-                new_status=normalized.status.value,
-            )
+            result.donation_id = donation.id
+            result.old_status = donation.status
+            result.stale = received_at is not None and donation.updated_at > received_at
+            if not result.stale and donation.status != normalized.status.value:
+                if dry_run:
+                    result.rejected = not is_allowed_transition(
+                        donation.status, normalized.status
+                    )
+                else:
+                    await self._update_status(donation, normalized.status, result)
+            if result.rejected:
+                self._record_rejection(result)
         else:
             logger.warning(
                 "Donation not found for webhook event",
                 provider=provider.value,
                 provider_order_id=normalized.provider_order_id,
             )
+
+        if recorded is None:
+            recorded = await self._repository.event_exists(
+                provider, normalized.provider_event_id
+            )
+        result.recorded = not recorded
+        if recorded or dry_run:
+            return result
+
+        # Record the event last: it marks the webhook as processed, so a
+        # request cut short before this point is redone by the provider's retry
+        event_id = f"evt_{uuid.uuid4().hex[:16]}"
+        payment_event = PaymentEvent(
+            id=event_id,
+            provider=provider,
+            provider_event_id=normalized.provider_event_id,
+            provider_order_id=normalized.provider_order_id,
+            status=normalized.status,
+            received_at=received_at or datetime.now(UTC),
+            raw_payload=normalized.raw_payload,
+            signature_valid=True,
+        )
+        await self._repository.save_payment_event(payment_event)
+        return result
@@ -0,0 +1,307 @@
+"""Bulk replay of stored or exported webhook events.
+
+Re-applies events after an incident without POSTing them one at a time:
+events are normalized with the provider adapter and pushed through the same
+status-update path as live webhooks (PaymentService.apply_event), which is
+idempotent per provider_event_id. Signatures are not re-verified; replayed
+events come from our own store or from the provider's exported logs.
+
+Events for the same provider order always go to the same worker, in input
+order, so concurrent workers never race on one donation and the final status
+matches the last event. Inputs are expected in receipt order (stored events
+are streamed that way). Events with a receipt time older than the donation's
+last update are skipped as stale, so replaying a range twice does not walk
+donations back through earlier statuses.
+"""
+
+import asyncio
+import json
+import time
+import zlib
+from collections.abc import AsyncIterable, AsyncIterator, Callable, Iterable, Iterator
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from typing import Any
+
+import structlog
+
+from app.adapters.base import NormalizedEvent
+from app.models.donation import PaymentProvider, is_allowed_transition
+from app.repositories.donation import DonationRepositoryBase, PaymentEventQuery
+from app.services.payment import EventApplication, PaymentService
+
+logger = structlog.get_logger()
+
+DEFAULT_PARALLELISM = 16
+# Events buffered per worker before the reader waits
+WORKER_QUEUE_SIZE = 256
+
+
+@dataclass
+class ReplayEvent:
+    """One provider notification to replay."""
+
+    provider: PaymentProvider
+    payload: dict[str, Any]
+    # ID of an already stored event; overrides the one derived from the payload
+    provider_event_id: str | None = None
+    received_at: datetime | None = None
+
+
+@dataclass
+class ReplayStats:
+    """Outcome counts and throughput of a replay."""
+
+    events: int = 0
+    changed: int = 0
+    unchanged: int = 0
+    not_found: int = 0
+    stale: int = 0
+    rejected: int = 0
+    recorded: int = 0
+    failed: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+    finished_at: float | None = None
+
+    @property
+    def elapsed_seconds(self) -> float:
+        end = self.finished_at if self.finished_at is not None else time.perf_counter()
+        return end - self.started_at
+
+    @property
+    def events_per_second(self) -> float:
+        elapsed = self.elapsed_seconds
+        return self.events / elapsed if elapsed > 0 else 0.0
+
+    def add(self, result: EventApplication) -> None:
+        self.events += 1
+        if not result.found:
+            self.not_found += 1
+        elif result.stale:
+            self.stale += 1
+        elif result.rejected:
+            self.rejected += 1
+        elif result.changed:
+            self.changed += 1
+        else:
+            self.unchanged += 1
+        if result.recorded:
+            self.recorded += 1
+
+
+def _parse_time(value: Any) -> datetime | None:
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=UTC)
+
+
+def read_ndjson(
+    lines: Iterable[str | bytes], provider: PaymentProvider | None = None
+) -> Iterator[ReplayEvent]:
+    """Parse replay events from NDJSON lines.
+
+    A line is either a stored payment event (with ``provider``,
+    ``raw_payload``/``rawPayload`` and optionally the event ID and ISO 8601
+    receipt time) or a raw provider notification, which needs ``provider``
+    to be given. Blank lines are skipped.
+
+    Raises:
+        ValueError: If a line is not a JSON object or its provider is unknown
+    """
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        if not isinstance(record, dict):
+            raise ValueError(f"Line {number}: expected a JSON object")
+        payload = record.get("raw_payload", record.get("rawPayload"))
+        if isinstance(payload, dict):
+            yield ReplayEvent(
+                provider=PaymentProvider(record.get("provider") or provider),
+                payload=payload,
+                provider_event_id=record.get(
+                    "provider_event_id", record.get("providerEventId")
+                ),
+                received_at=_parse_time(record.get("received_at", record.get("receivedAt"))),
+            )
+        elif provider is not None:
+            yield ReplayEvent(provider=provider, payload=record)
+        else:
+            raise ValueError(f"Line {number}: raw notification needs a provider")
+
+
+async def stored_events(
+    repository: DonationRepositoryBase, query: PaymentEventQuery
+) -> AsyncIterator[ReplayEvent]:
+    """Replay events from the payment_events collection in receipt order."""
+    async for event in repository.stream_payment_events(query):
+        yield ReplayEvent(
+            provider=PaymentProvider(event.provider),
+            payload=event.raw_payload,
+            provider_event_id=event.provider_event_id,
+            received_at=event.received_at,
+        )
+
+
+# A normalized event for a worker, or None to stop it
+_WorkItem = tuple[ReplayEvent, NormalizedEvent] | None
+
+
+async def _iterate(
+    events: AsyncIterable[ReplayEvent] | Iterable[ReplayEvent],
+) -> AsyncIterator[ReplayEvent]:
+    if isinstance(events, AsyncIterable):
+        async for event in events:
+            yield event
+    else:
+        for event in events:
+            yield event
+
+
+class WebhookReplayer:
+    """Applies replay events with bounded parallelism.
+
+    In a dry run nothing is written. Each result then describes the change
+    the event would make given the events before it in the same replay, so
+    the reported changes form a diff of the whole backfill.
+    """
+
+    def __init__(
+        self,
+        service: PaymentService,
+        parallelism: int = DEFAULT_PARALLELISM,
+        dry_run: bool = False,
+    ):
+        if parallelism < 1:
+            raise ValueError("parallelism must be at least 1")
+        self._service = service
+        self._parallelism = parallelism
+        self._dry_run = dry_run
+        # Dry run only: simulated status per order and event IDs seen so far
+        self._simulated: dict[tuple[str, str], str] = {}
+        self._seen: set[tuple[str, str]] = set()
+
+    def _normalize(self, event: ReplayEvent) -> NormalizedEvent:
+        normalized = self._service.normalize_event(event.provider, event.payload)
+        if event.provider_event_id:
+            # Stored events keep their ID even when the payload lacks one
+            normalized.provider_event_id = event.provider_event_id
+        return normalized
+
+    async def _apply(self, event: ReplayEvent, normalized: NormalizedEvent) -> EventApplication:
+        result = await self._service.apply_event(
+            event.provider, normalized, dry_run=self._dry_run, received_at=event.received_at
+        )
+        if self._dry_run:
+            order = (event.provider.value, normalized.provider_order_id)
+            if result.found and not result.stale and result.old_status is not None:
+                old_status = self._simulated.get(order, result.old_status)
+                new_status = normalized.status.value
+                result.old_status = old_status
+                result.rejected = old_status != new_status and not is_allowed_transition(
+                    old_status, new_status
+                )
+                if result.changed:
+                    self._simulated[order] = new_status
+            event_key = (event.provider.value, normalized.provider_event_id)
+            if event_key in self._seen:
+                result.recorded = False
+            self._seen.add(event_key)
+        return result
+
+    async def replay(
+        self,
+        events: AsyncIterable[ReplayEvent] | Iterable[ReplayEvent],
+        on_result: Callable[[EventApplication], None] | None = None,
+        on_progress: Callable[[ReplayStats, float], None] | None = None,
+        progress_interval: float = 1.0,
+        stats: ReplayStats | None = None,
+    ) -> ReplayStats:
+        """Replay events and return the outcome counts.
+
+        Args:
+            events: Events in receipt order
+            on_result: Called with every applied (or planned) event
+            on_progress: Called every ``progress_interval`` seconds with the
+                stats and the events per second since the previous call
+            progress_interval: Seconds between progress callbacks
+            stats: Optional stats object to update in place
+
+        Returns:
+            The final stats; events that failed are counted and logged
+        """
+        stats = stats or ReplayStats()
+        queues: list[asyncio.Queue[_WorkItem]] = [
+            asyncio.Queue(WORKER_QUEUE_SIZE) for _ in range(self._parallelism)
+        ]
+
+        async def worker(queue: asyncio.Queue[_WorkItem]) -> None:
+            while (item := await queue.get()) is not None:
+                event, normalized = item
+                try:
+                    result = await self._apply(event, normalized)
+                except Exception as e:
+                    stats.failed += 1
+                    logger.error(
+                        "Webhook replay failed",
+                        provider=event.provider.value,
+                        provider_event_id=normalized.provider_event_id,
+                        provider_order_id=normalized.provider_order_id,
+                        error=str(e),
+                    )
+                    continue
+                stats.add(result)
+                if on_result:
+                    on_result(result)
+
+        async def report() -> None:
+            assert on_progress is not None
+            last_count, last_time = 0, time.perf_counter()
+            while True:
+                await asyncio.sleep(progress_interval)
+                now = time.perf_counter()
+                done = stats.events + stats.failed
+                on_progress(stats, (done - last_count) / (now - last_time))
+                last_count, last_time = done, now
+
+        workers = [asyncio.create_task(worker(queue)) for queue in queues]
+        reporter = asyncio.create_task(report()) if on_progress else None
+        try:
+            async for event in _iterate(events):
+                try:
+                    normalized = self._normalize(event)
+                except Exception as e:
+                    stats.failed += 1
+                    logger.error(
+                        "Webhook replay event could not be normalized",
+                        provider=event.provider.value,
+                        error=str(e),
+                    )
+                    continue
+                key = f"{event.provider.value}:{normalized.provider_order_id}".encode()
+                await queues[zlib.crc32(key) % len(queues)].put((event, normalized))
+            for queue in queues:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+            if reporter:
+                reporter.cancel()
+            stats.finished_at = time.perf_counter()
+
+        logger.info(
+            "Webhook replay finished",
+            dry_run=self._dry_run,
+            events=stats.events,
+            changed=stats.changed,
+            unchanged=stats.unchanged,
+            not_found=stats.not_found,
+            stale=stats.stale,
+            rejected=stats.rejected,
+            recorded=stats.recorded,
+            failed=stats.failed,
+            events_per_second=round(stats.events_per_second),
+        )
+        return stats
@@ -0,0 +1,201 @@
+"""Retention of payment_events: archive to compressed NDJSON, then delete.
+
+payment_events gets one document per webhook with the full (masked) payload,
+but is only read for duplicate detection and incident replays. Events older
+than the retention age are streamed in receipt order into gzip NDJSON files
+partitioned by JST receipt day::
+
+    payment_events/date=2026-10-01/20261019T031500Z-0000.ndjson.gz
+
+Each line is a stored event (``PaymentEvent`` as JSON), the shape
+scripts/replay_webhooks.py reads. A file is in the archive store before any
+of its events are deleted, and deletes go out in batches throttled to
+``deletes_per_second`` so the job does not compete with live webhooks for
+Firestore write capacity. A run interrupted after an upload archives the
+rest again under a new run ID; read_archive() skips those duplicates.
+
+Deleted events leave a compact ID marker for ``dedupe_window`` (see
+DonationRepositoryBase.delete_payment_events), so a provider redelivering an
+archived notification is still recognized as a duplicate.
+"""
+
+import asyncio
+import contextlib
+import gzip
+import tempfile
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from datetime import UTC, date, datetime, timedelta
+from pathlib import Path
+
+import structlog
+
+from app.models.donation import PaymentEvent, PaymentProvider
+from app.repositories.archive import ArchiveStore
+from app.repositories.donation import DonationRepositoryBase, PaymentEventQuery
+from app.repositories.rollups import iter_days, rollup_day
+
+logger = structlog.get_logger()
+
+ARCHIVE_PREFIX = "payment_events"
+DEFAULT_DELETE_BATCH = 200
+DEFAULT_DELETES_PER_SECOND = 100.0
+# Events per archive file before another part is started
+DEFAULT_EVENTS_PER_FILE = 50_000
+
+
+def partition_prefix(day: str) -> str:
+    """Key prefix of the archive files for a JST day (YYYY-MM-DD)."""
+    return f"{ARCHIVE_PREFIX}/date={day}/"
+
+
+@dataclass
+class RetentionStats:
+    """Outcome of an archival run."""
+
+    archived: int = 0
+    deleted: int = 0
+    files: list[str] = field(default_factory=list)
+    started_at: float = field(default_factory=time.perf_counter)
+    finished_at: float | None = None
+
+    @property
+    def elapsed_seconds(self) -> float:
+        end = self.finished_at if self.finished_at is not None else time.perf_counter()
+        return end - self.started_at
+
+
+class _ArchiveFile:
+    """One gzip NDJSON part, written to a temporary file until uploaded."""
+
+    def __init__(self, key: str, directory: str, files: contextlib.ExitStack):
+        self.key = key
+        self.path = Path(directory) / key.replace("/", "_")
+        # Closed once complete, or by the stack if the run fails first
+        self._file = files.enter_context(gzip.GzipFile(self.path, "wb"))
+        # Payloads are dropped once written; deletion only needs the IDs
+        self.events: list[PaymentEvent] = []
+
+    def add(self, event: PaymentEvent) -> None:
+        self._file.write(event.model_dump_json().encode() + b"\n")
+        self.events.append(event.model_copy(update={"raw_payload": {}}))
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class PaymentEventArchiver:
+    """Moves payment events older than the retention age to an archive store."""
+
+    def __init__(
+        self,
+        repository: DonationRepositoryBase,
+        store: ArchiveStore,
+        retention: timedelta,
+        dedupe_window: timedelta | None = None,
+        delete_batch_size: int = DEFAULT_DELETE_BATCH,
+        deletes_per_second: float = DEFAULT_DELETES_PER_SECOND,
+        events_per_file: int = DEFAULT_EVENTS_PER_FILE,
+    ):
+        if delete_batch_size < 1 or deletes_per_second <= 0 or events_per_file < 1:
+            raise ValueError("batch size, delete rate and file size must be positive")
+        self._repository = repository
+        self._store = store
+        self._retention = retention
+        self._dedupe_window = dedupe_window
+        self._delete_batch_size = delete_batch_size
+        self._deletes_per_second = deletes_per_second
+        self._events_per_file = events_per_file
+
+    async def run(self, now: datetime | None = None) -> RetentionStats:
+        """Archive and delete every event received before ``now - retention``."""
+        now = (now or datetime.now(UTC)).astimezone(UTC)
+        cutoff = now - self._retention
+        run_id = now.strftime("%Y%m%dT%H%M%SZ")
+        stats = RetentionStats()
+
+        with tempfile.TemporaryDirectory() as directory, contextlib.ExitStack() as files:
+            current: _ArchiveFile | None = None
+            day = ""
+            part = 0
+            events = self._repository.stream_payment_events(
+                PaymentEventQuery(received_to=cutoff)
+            )
+            # Events arrive in receipt order, so each day is one contiguous run
+            async for event in events:
+                event_day = rollup_day(event.received_at)
+                if current is not None and (
+                    event_day != day or len(current.events) >= self._events_per_file
+                ):
+                    await self._finish(current, stats)
+                    current = None
+                if current is None:
+                    part = part + 1 if event_day == day else 0
+                    day = event_day
+                    key = f"{partition_prefix(day)}{run_id}-{part:04d}.ndjson.gz"
+                    current = _ArchiveFile(key, directory, files)
+                current.add(event)
+            if current is not None:
+                await self._finish(current, stats)
+
+        stats.finished_at = time.perf_counter()
+        logger.info(
+            "Payment events archived",
+            cutoff=cutoff.isoformat(),
+            archived=stats.archived,
+            deleted=stats.deleted,
+            files=len(stats.files),
+            seconds=round(stats.elapsed_seconds, 1),
+        )
+        return stats
+
+    async def _finish(self, archive: _ArchiveFile, stats: RetentionStats) -> None:
+        """Upload a finished file, then delete its events at the throttled rate."""
+        archive.close()
+        await asyncio.to_thread(self._store.put, archive.key, archive.path)
+        archive.path.unlink()
+        stats.files.append(archive.key)
+        stats.archived += len(archive.events)
+        logger.info("Archive file stored", key=archive.key, events=len(archive.events))
+
+        for start in range(0, len(archive.events), self._delete_batch_size):
+            batch = archive.events[start : start + self._delete_batch_size]
+            started = time.perf_counter()
+            await self._repository.delete_payment_events(batch, self._dedupe_window)
+            stats.deleted += len(batch)
+            pause = len(batch) / self._deletes_per_second - (time.perf_counter() - started)
+            if pause > 0:
+                await asyncio.sleep(pause)
+
+
+def read_archive(
+    store: ArchiveStore,
+    start: date,
+    end: date,
+    provider: PaymentProvider | None = None,
+    provider_order_id: str | None = None,
+) -> Iterator[PaymentEvent]:
+    """Yield archived events received on the JST days from start to end (inclusive).
+
+    Days are read in order and each event is yielded once, even if an
+    interrupted run archived it twice.
+    """
+    for day in iter_days(start, end):
+        seen: set[str] = set()
+        for key in store.list(partition_prefix(day)):
+            with store.open(key) as raw, gzip.open(raw, "rt", encoding="utf-8") as lines:
+                for line in lines:
+                    if not line.strip():
+                        continue
+                    event = PaymentEvent.model_validate_json(line)
+                    if event.id in seen:
+                        continue
+                    seen.add(event.id)
+                    if provider is not None and event.provider != provider:
+                        continue
+                    if provider_order_id is not None and (
+                        event.provider_order_id != provider_order_id
+                    ):
+                        continue
+                    yield event
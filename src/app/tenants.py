@@ -0,0 +1,372 @@
+"""Hosting several partner organizations (tenants) on the same instances.
+
+Each tenant has its own PayPay merchant (and optionally its own API key and
+webhook secrets) and its own donations, isolated in separate repository
+collections, files or databases. A request belongs to a tenant when its Host
+header is one of the tenant's hosts or its path starts with
+``/t/{tenant_id}``; every other request is served by the default services,
+exactly as without tenants.
+
+TenantMiddleware resolves the tenant once per request and makes its services
+current, so the ``get_*`` dependencies of the API modules return them
+without knowing about tenants. A tenant's services are built on its first
+request and kept. Its adapters (and the SDK clients inside them) are held in
+a bounded LRU shared by all tenants, built on first use and dropped after
+sitting idle, so a long tail of rarely used tenants does not keep a client
+and connection pool each.
+"""
+
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Iterator, Mapping, Sequence
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+import structlog
+from pydantic import TypeAdapter
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.adapters.base import PaymentProviderAdapter
+from app.adapters.signing import DEFAULT_MAX_KEYS
+from app.metrics import metrics
+from app.models.donation import PaymentProvider
+from app.services.campaign import CampaignTotalService
+from app.services.export import DonationExporter
+from app.services.payment import PaymentService
+
+logger = structlog.get_logger()
+
+# Requests under /t/{tenant_id}/... belong to that tenant
+PATH_PREFIX = "/t/"
+# Tenant IDs end up in collection names, directories and URL paths
+TENANT_ID_PATTERN = re.compile(r"[a-z0-9][a-z0-9_-]{0,62}")
+
+DEFAULT_MAX_ADAPTERS = 32
+DEFAULT_ADAPTER_IDLE_SECONDS = 900.0
+
+
+@dataclass(frozen=True)
+class Tenant:
+    """A partner organization and its provider credentials.
+
+    Unset credentials fall back to the shared PAYPAY_* settings; a tenant
+    that only has a merchant ID is served through the shared API key with
+    ``set_assume_merchant``.
+    """
+
+    id: str
+    hosts: tuple[str, ...] = ()
+    paypay_merchant_id: str | None = None
+    paypay_api_key: str | None = None
+    paypay_api_secret: str | None = None
+    paypay_webhook_secrets: tuple[str, ...] = ()
+    rakuten_webhook_secrets: tuple[str, ...] = ()
+
+
+class UnknownTenantError(LookupError):
+    """Raised when a request names a tenant that is not configured."""
+
+    def __init__(self, tenant_id: str):
+        self.tenant_id = tenant_id
+        super().__init__(f"Unknown tenant: {tenant_id}")
+
+
+def parse_tenants(raw: str) -> list[Tenant]:
+    """Parse the TENANTS setting: a JSON list of tenant objects ("" = none).
+
+    Raises:
+        ValueError: If the JSON is malformed, an ID or host is invalid or
+            repeated, only half of a PayPay key pair is set, or more webhook
+            secrets are listed than are checked
+    """
+    if not raw.strip():
+        return []
+    try:
+        tenants = TypeAdapter(list[Tenant]).validate_python(json.loads(raw))
+    except json.JSONDecodeError as e:
+        raise ValueError(f"TENANTS is not valid JSON: {e}") from e
+    ids: set[str] = set()
+    hosts: set[str] = set()
+    for tenant in tenants:
+        if not TENANT_ID_PATTERN.fullmatch(tenant.id):
+            raise ValueError(f"Invalid tenant ID: {tenant.id!r}")
+        if tenant.id in ids:
+            raise ValueError(f"Duplicate tenant ID: {tenant.id}")
+        ids.add(tenant.id)
+        if bool(tenant.paypay_api_key) != bool(tenant.paypay_api_secret):
+            raise ValueError(f"Tenant {tenant.id}: set both PayPay API key and secret, or neither")
+        secrets = max(len(tenant.paypay_webhook_secrets), len(tenant.rakuten_webhook_secrets))
+        if secrets > DEFAULT_MAX_KEYS:
+            raise ValueError(f"Tenant {tenant.id}: at most {DEFAULT_MAX_KEYS} webhook secrets")
+        for host in map(_host_name, tenant.hosts):
+            if host in hosts:
+                raise ValueError(f"Host assigned to more than one tenant: {host}")
+            hosts.add(host)
+    return tenants
+
+
+def _host_name(host: str) -> str:
+    """Lower-cased host without the port ("[::1]:8080" -> "[::1]")."""
+    host = host.lower()
+    if ":" in host and not host.endswith("]"):
+        host = host.rpartition(":")[0]
+    return host
+
+
+class TenantResolver:
+    """Map a request's host and path to a tenant."""
+
+    def __init__(self, tenants: Sequence[Tenant]):
+        self._by_id = {tenant.id: tenant for tenant in tenants}
+        self._by_host = {
+            _host_name(host): tenant for tenant in tenants for host in tenant.hosts
+        }
+
+    def resolve(self, host: str | None, path: str) -> tuple[Tenant | None, str]:
+        """Resolve the tenant of a request.
+
+        A ``/t/{tenant_id}`` path prefix takes precedence over the host.
+
+        Args:
+            host: The Host header, if any
+            path: The request path below the application's root path
+
+        Returns:
+            The tenant (None for the default services) and the path prefix
+            that selected it ("" when resolved by host)
+
+        Raises:
+            UnknownTenantError: If the path names a tenant that does not exist
+        """
+        if path.startswith(PATH_PREFIX):
+            tenant_id = path[len(PATH_PREFIX) :].partition("/")[0]
+            tenant = self._by_id.get(tenant_id)
+            if tenant is None:
+                raise UnknownTenantError(tenant_id)
+            return tenant, PATH_PREFIX + tenant_id
+        if host:
+            return self._by_host.get(_host_name(host)), ""
+        return None, ""
+
+
+@dataclass
+class TenantServices:
+    """The services of one tenant, built on its first request."""
+
+    tenant: Tenant
+    payment: PaymentService
+    campaign: CampaignTotalService
+    exporter: DonationExporter
+
+
+TenantAdapterFactory = Callable[[Tenant], PaymentProviderAdapter]
+TenantServicesFactory = Callable[
+    [Tenant, Mapping[PaymentProvider, PaymentProviderAdapter]], TenantServices
+]
+
+
+@dataclass
+class _CachedAdapter:
+    adapter: PaymentProviderAdapter
+    last_used: float
+
+
+class TenantAdapterCache:
+    """LRU of per-tenant adapters, built on first use and evicted when idle.
+
+    Holds at most ``max_size`` adapters across all tenants. An adapter that
+    has not been used for ``idle_seconds`` is dropped on the next lookup; a
+    request still holding it finishes with it, and the tenant's next request
+    builds a fresh one. Evicting an adapter also resets its circuit breaker
+    and concurrency limit, which is what an idle tenant would see anyway.
+    """
+
+    def __init__(
+        self,
+        factories: Mapping[PaymentProvider, TenantAdapterFactory],
+        max_size: int = DEFAULT_MAX_ADAPTERS,
+        idle_seconds: float = DEFAULT_ADAPTER_IDLE_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._factories = dict(factories)
+        self._max_size = max_size
+        self._idle_seconds = idle_seconds
+        self._clock = clock
+        self._adapters: OrderedDict[tuple[str, PaymentProvider], _CachedAdapter] = (
+            OrderedDict()
+        )
+
+    @property
+    def providers(self) -> list[PaymentProvider]:
+        """Providers with a registered factory."""
+        return list(self._factories)
+
+    def __len__(self) -> int:
+        return len(self._adapters)
+
+    def get(self, tenant: Tenant, provider: PaymentProvider) -> PaymentProviderAdapter:
+        """Get the tenant's adapter for a provider, building it if needed.
+
+        Raises:
+            KeyError: If no factory is registered for the provider
+        """
+        now = self._clock()
+        self._evict_idle(now)
+        key = (tenant.id, provider)
+        cached = self._adapters.get(key)
+        if cached is not None:
+            cached.last_used = now
+            self._adapters.move_to_end(key)
+            return cached.adapter
+        adapter = self._factories[provider](tenant)
+        self._adapters[key] = _CachedAdapter(adapter, now)
+        metrics.inc(
+            "tenant_adapters_built_total",
+            description="Tenant adapters built (first use or after eviction)",
+            provider=provider.value,
+        )
+        logger.info("Tenant adapter initialized", tenant=tenant.id, provider=provider.value)
+        while len(self._adapters) > self._max_size:
+            self._evict("capacity")
+        return adapter
+
+    def _evict_idle(self, now: float) -> None:
+        # Least recently used first: stop at the first adapter still in use
+        while self._adapters:
+            oldest = next(iter(self._adapters.values()))
+            if now - oldest.last_used < self._idle_seconds:
+                return
+            self._evict("idle")
+
+    def _evict(self, reason: str) -> None:
+        (tenant_id, provider), _ = self._adapters.popitem(last=False)
+        metrics.inc(
+            "tenant_adapter_evictions_total",
+            description="Tenant adapters dropped from the cache",
+            reason=reason,
+        )
+        logger.info(
+            "Tenant adapter evicted", tenant=tenant_id, provider=provider.value, reason=reason
+        )
+
+
+class TenantAdapters(Mapping[PaymentProvider, PaymentProviderAdapter]):
+    """A tenant's view of the adapter cache, passed to its PaymentService."""
+
+    def __init__(self, cache: TenantAdapterCache, tenant: Tenant):
+        self._cache = cache
+        self._tenant = tenant
+
+    def __getitem__(self, provider: PaymentProvider) -> PaymentProviderAdapter:
+        return self._cache.get(self._tenant, provider)
+
+    def __contains__(self, provider: object) -> bool:
+        # Membership must not build the adapter (Mapping's default would)
+        return provider in self._cache.providers
+
+    def __iter__(self) -> Iterator[PaymentProvider]:
+        return iter(self._cache.providers)
+
+    def __len__(self) -> int:
+        return len(self._cache.providers)
+
+
+class TenantServiceContainer:
+    """Resolves tenants and holds the services built for them."""
+
+    def __init__(
+        self,
+        tenants: Sequence[Tenant],
+        build_services: TenantServicesFactory,
+        adapters: TenantAdapterCache,
+    ):
+        self.resolver = TenantResolver(tenants)
+        self.adapters = adapters
+        self._build_services = build_services
+        self._services: dict[str, TenantServices] = {}
+
+    def services(self, tenant: Tenant) -> TenantServices:
+        """Get the tenant's services, building them on first use."""
+        services = self._services.get(tenant.id)
+        if services is None:
+            services = self._build_services(tenant, TenantAdapters(self.adapters, tenant))
+            self._services[tenant.id] = services
+            logger.info("Tenant services initialized", tenant=tenant.id)
+        return services
+
+    async def close(self) -> None:
+        """Close the services built so far (commits buffered writes)."""
+        for services in self._services.values():
+            await services.payment.close()
+
+
+_current_services: ContextVar[TenantServices | None] = ContextVar(
+    "tenant_services", default=None
+)
+
+
+def current_services() -> TenantServices | None:
+    """The services of the current request's tenant (None outside tenants)."""
+    return _current_services.get()
+
+
+_service_container: TenantServiceContainer | None = None
+_service_container_pid: int | None = None
+
+
+def get_service_container() -> TenantServiceContainer | None:
+    """Get this process's tenant container (None when no tenants are configured)."""
+    if _service_container_pid != os.getpid():
+        return None
+    return _service_container
+
+
+def set_service_container(container: TenantServiceContainer | None) -> None:
+    """Set the tenant container (for initialization)."""
+    global _service_container, _service_container_pid
+    _service_container = container
+    _service_container_pid = os.getpid()
+
+
+class TenantMiddleware:
+    """Make the services of the request's tenant current.
+
+    Requests under ``/t/{tenant_id}`` have the prefix moved into the root
+    path, so the routes match as they do for the default services. A prefix
+    naming an unknown tenant is answered with 404.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        container = get_service_container()
+        if scope["type"] != "http" or container is None:
+            await self.app(scope, receive, send)
+            return
+        root_path = scope.get("root_path", "")
+        path = scope["path"].removeprefix(root_path)
+        try:
+            tenant, prefix = container.resolver.resolve(Headers(scope=scope).get("host"), path)
+        except UnknownTenantError as e:
+            response = JSONResponse(
+                status_code=404,
+                content={"error": "UNKNOWN_TENANT", "message": str(e)},
+            )
+            await response(scope, receive, send)
+            return
+        if tenant is None:
+            await self.app(scope, receive, send)
+            return
+        if prefix:
+            scope = {**scope, "root_path": root_path + prefix}
+        token = _current_services.set(container.services(tenant))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current_services.reset(token)
@@ -0,0 +1,129 @@
+"""Connection warm-up and keep-alive for backend clients.
+
+Clients are built lazily, so on a fresh instance the first request would
+open the Firestore gRPC channel (credential lookup included) and the TLS
+connection to PayPay. The warm-up runs every target's ping once from the
+lifespan handler, before uvicorn starts accepting connections, so Cloud Run
+only routes traffic to an instance whose connections are already open.
+A failed ping is logged and counted but does not stop the instance from
+starting; the first request then opens the connection as before.
+
+Afterwards the pings repeat every ``keepalive_interval`` seconds so idle
+connections are not dropped by NAT or the remote end. On Cloud Run this
+only runs between requests when CPU is always allocated; with request-based
+billing the loop simply resumes when traffic does.
+
+Request latency is recorded per process as ``phase="first"`` for the first
+request and ``phase="steady"`` afterwards, to compare cold and warm paths.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import time
+from collections.abc import Awaitable, Callable
+
+import structlog
+
+from app.metrics import metrics
+
+logger = structlog.get_logger()
+
+Ping = Callable[[], Awaitable[None]]
+
+DEFAULT_TIMEOUT = 5.0
+DEFAULT_KEEPALIVE_INTERVAL = 240.0
+
+
+class ConnectionWarmer:
+    """Runs named connection pings at startup and then periodically."""
+
+    def __init__(
+        self,
+        targets: dict[str, Ping],
+        timeout: float = DEFAULT_TIMEOUT,
+        keepalive_interval: float = DEFAULT_KEEPALIVE_INTERVAL,
+    ):
+        self._targets = targets
+        self._timeout = timeout
+        self._keepalive_interval = keepalive_interval
+        self._task: asyncio.Task[None] | None = None
+
+    async def _ping(self, name: str, ping: Ping, phase: str) -> bool:
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(ping(), self._timeout)
+        except Exception as e:
+            metrics.inc(
+                "connection_ping_failures_total",
+                description="Failed warm-up and keep-alive pings",
+                target=name,
+                phase=phase,
+            )
+            logger.warning("Connection ping failed", target=name, phase=phase, error=str(e))
+            return False
+        elapsed = time.perf_counter() - started
+        metrics.observe(
+            "connection_ping_seconds",
+            elapsed,
+            "Round trip of warm-up and keep-alive pings",
+            target=name,
+            phase=phase,
+        )
+        return True
+
+    async def _ping_all(self, phase: str) -> dict[str, bool]:
+        results = await asyncio.gather(
+            *(self._ping(name, ping, phase) for name, ping in self._targets.items())
+        )
+        return dict(zip(self._targets, results, strict=True))
+
+    async def warm_up(self) -> dict[str, bool]:
+        """Ping every target concurrently once.
+
+        Returns:
+            Whether each target answered within the timeout
+        """
+        started = time.perf_counter()
+        results = await self._ping_all("warmup")
+        elapsed = time.perf_counter() - started
+        metrics.set("warmup_seconds", elapsed, "Duration of the startup warm-up")
+        logger.info("Connections warmed up", seconds=round(elapsed, 3), targets=results)
+        return results
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self._keepalive_interval)
+            await self._ping_all("keepalive")
+
+    def start_keepalive(self) -> None:
+        """Start the periodic pings (no-op if the interval is 0)."""
+        if self._keepalive_interval <= 0 or self._task is not None:
+            return
+        # A fresh context keeps any deadline of the caller out of the loop
+        self._task = asyncio.create_task(self._run(), context=contextvars.Context())
+
+    async def close(self) -> None:
+        """Stop the periodic pings."""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+
+class RequestPhases:
+    """Labels the first request of a process ``first`` and later ones ``steady``."""
+
+    def __init__(self) -> None:
+        self._first_seen = False
+
+    def observe(self, seconds: float) -> None:
+        phase = "steady" if self._first_seen else "first"
+        self._first_seen = True
+        metrics.observe(
+            "http_request_seconds",
+            seconds,
+            "Request latency; phase=first is the first request of the process",
+            phase=phase,
+        )
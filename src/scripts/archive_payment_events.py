@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""Archive old payment_events to compressed NDJSON and delete them.
+
+Usage:
+    export PROJECT_ID="tadakayo-qr-connect"
+    export PAYMENT_EVENT_ARCHIVE_URI="gs://tadakayo-qr-connect-archive/firestore"
+    python scripts/archive_payment_events.py
+
+    # Keep 60 days instead of PAYMENT_EVENT_RETENTION_DAYS, archive locally
+    python scripts/archive_payment_events.py --retention-days 60 --archive ./archive
+
+Meant to run daily (Cloud Run job + Cloud Scheduler). Events received more
+than the retention age ago are written to date-partitioned gzip NDJSON files
+in the archive and then deleted in throttled batches. A summary is printed
+on stderr.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from datetime import timedelta
+
+# Add src to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings
+from app.repositories.archive import open_archive_store
+from app.repositories.donation import FirestoreDonationRepository
+from app.services.retention import PaymentEventArchiver
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Archive and delete old payment events")
+    parser.add_argument(
+        "--archive",
+        default=settings.payment_event_archive_uri,
+        help="gs://bucket/prefix or a local directory",
+    )
+    parser.add_argument(
+        "--retention-days", type=int, default=settings.payment_event_retention_days
+    )
+    parser.add_argument("--dedupe-days", type=int, default=settings.payment_event_dedupe_days)
+    parser.add_argument(
+        "--deletes-per-second",
+        type=float,
+        default=settings.payment_event_deletes_per_second,
+    )
+    parser.add_argument("--project-id", default=settings.project_id)
+    args = parser.parse_args()
+    if not args.archive:
+        parser.error("set PAYMENT_EVENT_ARCHIVE_URI or give --archive")
+    if args.retention_days < 1:
+        parser.error("--retention-days must be at least 1")
+    return args
+
+
+async def main() -> None:
+    """Run one archival pass."""
+    args = parse_args()
+    archiver = PaymentEventArchiver(
+        FirestoreDonationRepository(
+            project_id=args.project_id,
+            call_timeout=settings.firestore_timeout_ms / 1000,
+        ),
+        open_archive_store(args.archive, project_id=args.project_id),
+        retention=timedelta(days=args.retention_days),
+        dedupe_window=timedelta(days=args.dedupe_days),
+        delete_batch_size=settings.payment_event_delete_batch_size,
+        deletes_per_second=args.deletes_per_second,
+    )
+    stats = await archiver.run()
+
+    print(
+        f"Archived {stats.archived:,} events into {len(stats.files)} files and deleted "
+        f"{stats.deleted:,} in {stats.elapsed_seconds:.1f}s",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""Scan-to-PayPay latency of /pay/{amount}: browser checkout vs server checkout.
+
+Usage:
+    python scripts/bench_pay.py --requests 200 --rtt-ms 80
+
+Starts the server twice in sandbox mode (mock PayPay), once with
+PAY_SERVER_CHECKOUT=false and once with the default, and replays what a
+browser does after scanning a printed QR code until it knows the PayPay URL:
+
+- browser checkout (current page): GET /pay/1000, then POST
+  /api/donations/checkout, then the page's 500 ms redirect delay on mobile
+- server checkout, mobile: GET /pay/1000 answered with a 302 to PayPay
+- server checkout, desktop: GET /pay/1000 until the embedded checkout
+  arrives (time to the flushed first chunk is reported too)
+
+``--rtt-ms`` adds a simulated network round trip to every request, which is
+what dominates on a phone. Script parsing and the QR library download of
+the browser flow are not simulated, so its numbers are a lower bound.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections.abc import Awaitable, Callable
+
+import httpx
+from bench_server import free_port, wait_ready
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MOBILE_UA = "Mozilla/5.0 (iPhone; CPU iPhone OS 18_0 like Mac OS X) Mobile/15E148"
+DESKTOP_UA = "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
+# pay.html waits this long before leaving for PayPay on mobile
+PAGE_REDIRECT_DELAY = 0.5
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark scan-to-PayPay latency")
+    parser.add_argument("--requests", type=int, default=200, help="Scans per flow")
+    parser.add_argument("--rtt-ms", type=float, default=0.0, help="Simulated network RTT")
+    parser.add_argument("--amount", type=int, default=1000)
+    return parser.parse_args()
+
+
+def start_server(port: int, server_checkout: bool) -> subprocess.Popen[bytes]:
+    env = {
+        **os.environ,
+        "ENVIRONMENT": "sandbox",
+        "WEB_CONCURRENCY": "1",
+        "PORT": str(port),
+        "HOST": "127.0.0.1",
+        "LOG_LEVEL": "WARNING",
+        "PAY_SERVER_CHECKOUT": str(server_checkout).lower(),
+    }
+    return subprocess.Popen([sys.executable, "-m", "app.server"], cwd=SRC_DIR, env=env)
+
+
+class Browser:
+    """HTTP client that pays one simulated round trip per request."""
+
+    def __init__(self, client: httpx.AsyncClient, rtt: float):
+        self._client = client
+        self._rtt = rtt
+
+    async def round_trip(self) -> None:
+        if self._rtt:
+            await asyncio.sleep(self._rtt)
+
+    async def browser_checkout(self, amount: int) -> float:
+        started = time.perf_counter()
+        await self.round_trip()
+        page = await self._client.get(f"/pay/{amount}", headers={"User-Agent": MOBILE_UA})
+        page.raise_for_status()
+        await self.round_trip()
+        response = await self._client.post(
+            "/api/donations/checkout",
+            json={
+                "amount": amount,
+                "source": "qr_fixed",
+                "provider": "paypay",
+                "return_url": "https://example.com/thanks",
+                "cancel_url": "https://example.com/cancel",
+                "idempotency_key": f"bench-{time.perf_counter_ns()}",
+            },
+        )
+        response.raise_for_status()
+        return time.perf_counter() - started + PAGE_REDIRECT_DELAY
+
+    async def server_redirect(self, amount: int) -> float:
+        started = time.perf_counter()
+        await self.round_trip()
+        response = await self._client.get(f"/pay/{amount}", headers={"User-Agent": MOBILE_UA})
+        if response.status_code != 302:
+            raise RuntimeError(f"expected a redirect, got {response.status_code}")
+        return time.perf_counter() - started
+
+    async def server_page(self, amount: int, first_chunk: list[float]) -> float:
+        started = time.perf_counter()
+        await self.round_trip()
+        headers = {"User-Agent": DESKTOP_UA}
+        async with self._client.stream("GET", f"/pay/{amount}", headers=headers) as response:
+            body = b""
+            async for chunk in response.aiter_bytes():
+                if not body:
+                    first_chunk.append(time.perf_counter() - started)
+                body += chunk
+        if b"window.PAY_CHECKOUT =" not in body:
+            raise RuntimeError("checkout was not embedded")
+        return time.perf_counter() - started
+
+
+async def measure(
+    base_url: str, requests: int, scan: Callable[[Browser], Awaitable[float]], rtt: float
+) -> list[float]:
+    async with httpx.AsyncClient(base_url=base_url, timeout=30.0) as client:
+        browser = Browser(client, rtt)
+        # Warm up the worker (lazy adapters, first Firestore/PayPay clients)
+        for _ in range(5):
+            await scan(browser)
+        return [await scan(browser) for _ in range(requests)]
+
+
+def report(label: str, latencies: list[float]) -> None:
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(
+        f"{label:<28} p50 {quantiles[49] * 1000:7.1f} ms | "
+        f"p95 {quantiles[94] * 1000:7.1f} ms"
+    )
+
+
+async def run(server_checkout: bool, args: argparse.Namespace) -> None:
+    rtt = args.rtt_ms / 1000
+    port = free_port()
+    process = start_server(port, server_checkout)
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        await wait_ready(base_url)
+        if not server_checkout:
+            report(
+                "browser checkout (mobile)",
+                await measure(
+                    base_url, args.requests, lambda b: b.browser_checkout(args.amount), rtt
+                ),
+            )
+            return
+        report(
+            "server checkout (mobile)",
+            await measure(base_url, args.requests, lambda b: b.server_redirect(args.amount), rtt),
+        )
+        first_chunk: list[float] = []
+        page = await measure(
+            base_url, args.requests, lambda b: b.server_page(args.amount, first_chunk), rtt
+        )
+        report("server checkout (desktop)", page)
+        report("  first chunk flushed", first_chunk[-args.requests :])
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+async def main() -> None:
+    """Run both flows and print their latency."""
+    args = parse_args()
+    print(f"requests={args.requests} rtt={args.rtt_ms:.0f}ms amount={args.amount}")
+    await run(False, args)
+    await run(True, args)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
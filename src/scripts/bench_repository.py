@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""Repository benchmark: write throughput, recovery time and webhook lookups.
+
+Usage:
+    python scripts/bench_repository.py
+    python scripts/bench_repository.py --records 100000 --concurrency 64
+
+    # Include Firestore (emulator only; a small record count is plenty)
+    export FIRESTORE_EMULATOR_HOST=localhost:8081
+    python scripts/bench_repository.py --records 20000 --firestore-records 2000
+
+For each backend, creates ``--records`` donations with ``--concurrency``
+writes in flight and reports:
+
+- writes per second
+- for the file backend, the time to reopen from the write log alone (a
+  crash before any compaction) and from a compacted snapshot
+- the mean latency of get_by_provider_order_id and event_exists, the two
+  reads on the webhook path
+
+The file and SQLite backends write to a temporary directory unless ``--dir``
+is given.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from collections.abc import Awaitable, Callable
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.donation import Donation, PaymentEvent, PaymentProvider
+from app.repositories.donation import DonationRepositoryBase, InMemoryDonationRepository
+from app.repositories.local import FileDonationRepository
+from app.repositories.sqlite import SqliteDonationRepository
+
+STARTED = datetime(2026, 1, 1, tzinfo=UTC)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the donation repositories")
+    parser.add_argument("--records", type=int, default=1_000_000)
+    parser.add_argument("--concurrency", type=int, default=32, help="Writes in flight")
+    parser.add_argument("--lookups", type=int, default=10_000)
+    parser.add_argument("--dir", help="Directory for the local backends (default: temporary)")
+    parser.add_argument("--commit-delay-ms", type=float, default=0.0)
+    parser.add_argument(
+        "--firestore-records",
+        type=int,
+        default=2_000,
+        help="Records for Firestore (only run if FIRESTORE_EMULATOR_HOST is set)",
+    )
+    return parser.parse_args()
+
+
+def make_donation(number: int) -> Donation:
+    created_at = STARTED + timedelta(seconds=number)
+    return Donation(
+        id=f"bench_{number:08d}",
+        amount=1000,
+        provider=PaymentProvider.PAYPAY,
+        source="bench",
+        provider_order_id=f"order_{number:08d}",
+        idempotency_key=f"key_{number:08d}",
+        created_at=created_at,
+        updated_at=created_at,
+    )
+
+
+def make_event(number: int) -> PaymentEvent:
+    return PaymentEvent(
+        id=f"evt_{number:08d}",
+        provider=PaymentProvider.PAYPAY,
+        provider_event_id=f"paypay/{number:08d}",
+        provider_order_id=f"order_{number:08d}",
+        status="completed",
+        received_at=STARTED + timedelta(seconds=number),
+        raw_payload={"merchantPaymentId": f"order_{number:08d}"},
+        signature_valid=True,
+    )
+
+
+async def write(repository: DonationRepositoryBase, records: int, concurrency: int) -> float:
+    """Create donations (and one event per ten), returning writes per second."""
+    started = time.perf_counter()
+    for start in range(0, records, concurrency):
+        batch: list[Awaitable[object]] = []
+        for number in range(start, min(start + concurrency, records)):
+            batch.append(repository.create(make_donation(number)))
+            if number % 10 == 0:
+                batch.append(repository.save_payment_event(make_event(number)))
+        await asyncio.gather(*batch)
+    return records / (time.perf_counter() - started)
+
+
+async def lookups(repository: DonationRepositoryBase, records: int, count: int) -> float:
+    """Mean seconds per webhook-path read."""
+    step = max(records // count, 1)
+    numbers = range(0, records, step)
+    started = time.perf_counter()
+    for number in numbers:
+        await repository.get_by_provider_order_id(
+            PaymentProvider.PAYPAY, f"order_{number:08d}"
+        )
+        await repository.event_exists(PaymentProvider.PAYPAY, f"paypay/{number:08d}")
+    return (time.perf_counter() - started) / (2 * len(numbers))
+
+
+def timed(build: Callable[[], FileDonationRepository]) -> tuple[FileDonationRepository, float]:
+    started = time.perf_counter()
+    repository = build()
+    return repository, time.perf_counter() - started
+
+
+async def bench_memory(args: argparse.Namespace) -> None:
+    repository = InMemoryDonationRepository()
+    rate = await write(repository, args.records, args.concurrency)
+    # The in-memory scan is O(n), so look up fewer records
+    latency = await lookups(repository, args.records, min(args.lookups, 100))
+    print(f"memory     writes/s {rate:>10,.0f}   lookup {latency * 1e6:>10,.1f} us")
+
+
+async def bench_file(args: argparse.Namespace, directory: Path) -> None:
+    def build() -> FileDonationRepository:
+        return FileDonationRepository(
+            directory,
+            commit_delay=args.commit_delay_ms / 1000,
+            # Keep everything in the log to measure replay
+            compact_records=args.records * 2 + 1,
+        )
+
+    repository = build()
+    rate = await write(repository, args.records, args.concurrency)
+    # Release without compacting, as if the process had been killed
+    await repository._log.close()
+    os.close(repository._lock_fd)
+
+    repository, replay = timed(build)
+    compact_started = time.perf_counter()
+    await repository.compact()
+    compact = time.perf_counter() - compact_started
+    await repository.close()
+
+    repository, reopen = timed(build)
+    latency = await lookups(repository, args.records, args.lookups)
+    await repository.close()
+    size = sum(p.stat().st_size for p in directory.iterdir())
+    print(
+        f"file       writes/s {rate:>10,.0f}   lookup {latency * 1e6:>10,.1f} us   "
+        f"replay {replay:.2f}s   compact {compact:.2f}s   reopen {reopen:.3f}s   "
+        f"{size / 1e6:,.0f} MB"
+    )
+
+
+async def bench_sqlite(args: argparse.Namespace, directory: Path) -> None:
+    path = str(directory / "donations.db")
+    repository = SqliteDonationRepository(path)
+    rate = await write(repository, args.records, args.concurrency)
+    await repository.close()
+
+    started = time.perf_counter()
+    repository = SqliteDonationRepository(path)
+    await repository.ping()
+    reopen = time.perf_counter() - started
+    latency = await lookups(repository, args.records, args.lookups)
+    await repository.close()
+    size = sum(p.stat().st_size for p in directory.glob("donations.db*"))
+    print(
+        f"sqlite     writes/s {rate:>10,.0f}   lookup {latency * 1e6:>10,.1f} us   "
+        f"reopen {reopen:.3f}s   {size / 1e6:,.0f} MB"
+    )
+
+
+async def bench_firestore(args: argparse.Namespace) -> None:
+    from app.repositories.donation import FirestoreDonationRepository
+
+    repository = FirestoreDonationRepository(project_id="bench-repository")
+    records = args.firestore_records
+    rate = await write(repository, records, args.concurrency)
+    latency = await lookups(repository, records, min(args.lookups, records))
+    await repository.close()
+    print(f"firestore  writes/s {rate:>10,.0f}   lookup {latency * 1e6:>10,.1f} us")
+
+
+async def main() -> None:
+    args = parse_args()
+    print(f"{args.records:,} records, {args.concurrency} writes in flight")
+    await bench_memory(args)
+    for bench in (bench_file, bench_sqlite):
+        if args.dir:
+            directory = Path(args.dir) / bench.__name__.removeprefix("bench_")
+            directory.mkdir(parents=True, exist_ok=True)
+            await bench(args, directory)
+        else:
+            with tempfile.TemporaryDirectory() as temporary:
+                await bench(args, Path(temporary))
+    if os.environ.get("FIRESTORE_EMULATOR_HOST"):
+        await bench_firestore(args)
+    else:
+        print("firestore  skipped (set FIRESTORE_EMULATOR_HOST)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""Throughput benchmark for the multi-worker server runtime.
+
+Usage:
+    python scripts/bench_server.py --cpus 1 2 4 --duration 20 --concurrency 64
+
+For each CPU count N the script starts ``python -m app.server`` pinned to N
+CPUs (taskset) with ``WEB_CONCURRENCY=N`` in sandbox mode, drives it with
+concurrent HTTP requests, and prints requests/second and latency
+percentiles. Run the load generator on CPUs that are not used by the server
+(``--client-cpus``) or point ``--url`` at a deployed instance instead, e.g.
+a Cloud Run revision with ``cpu = 1/2/4`` and matching ``web_concurrency``.
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHECKOUT_BODY = {
+    "amount": 1000,
+    "source": "bench",
+    "provider": "paypay",
+    "return_url": "https://example.com/thanks",
+    "cancel_url": "https://example.com/cancel",
+    "idempotency_key": "bench",
+}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark server throughput")
+    parser.add_argument("--cpus", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per run")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument(
+        "--endpoint",
+        choices=["checkout", "pay", "health"],
+        default="checkout",
+        help="checkout = POST /api/donations/checkout (mock PayPay), pay = GET /pay/1000",
+    )
+    parser.add_argument("--client-cpus", help="CPU list for this load generator (taskset)")
+    parser.add_argument("--url", help="Benchmark an already running server instead")
+    return parser.parse_args()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return int(sock.getsockname()[1])
+
+
+def start_server(cpus: int, port: int) -> subprocess.Popen[bytes]:
+    env = {
+        **os.environ,
+        "ENVIRONMENT": "sandbox",
+        "WEB_CONCURRENCY": str(cpus),
+        "PORT": str(port),
+        "HOST": "127.0.0.1",
+        "LOG_LEVEL": "WARNING",
+    }
+    command = [sys.executable, "-m", "app.server"]
+    if shutil.which("taskset"):
+        command = ["taskset", "-c", f"0-{cpus - 1}", *command]
+    return subprocess.Popen(command, cwd=SRC_DIR, env=env)
+
+
+async def wait_ready(base_url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(f"{base_url}/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not become ready")
+
+
+async def run_load(
+    base_url: str, endpoint: str, duration: float, concurrency: int
+) -> tuple[int, int, list[float]]:
+    latencies: list[float] = []
+    errors = 0
+    stop_at = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+
+        async def worker() -> None:
+            nonlocal errors
+            while time.monotonic() < stop_at:
+                started = time.perf_counter()
+                if endpoint == "checkout":
+                    response = await client.post("/api/donations/checkout", json=CHECKOUT_BODY)
+                elif endpoint == "pay":
+                    response = await client.get("/pay/1000")
+                else:
+                    response = await client.get("/health")
+                latencies.append(time.perf_counter() - started)
+                if response.status_code >= 400:
+                    errors += 1
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    return len(latencies), errors, latencies
+
+
+def report(label: str, count: int, errors: int, latencies: list[float], duration: float) -> None:
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0.0] * 99
+    print(
+        f"{label:>8} | {count / duration:>9,.0f} req/s | "
+        f"p50 {quantiles[49] * 1000:6.1f} ms | p99 {quantiles[98] * 1000:6.1f} ms | "
+        f"errors {errors}"
+    )
+
+
+async def main() -> None:
+    """Run the benchmark."""
+    args = parse_args()
+    if args.client_cpus and hasattr(os, "sched_setaffinity"):
+        cpus = {int(c) for c in args.client_cpus.split(",")}
+        os.sched_setaffinity(0, cpus)
+
+    print(f"endpoint={args.endpoint} concurrency={args.concurrency} duration={args.duration}s")
+    if args.url:
+        await wait_ready(args.url)
+        report("remote", *await run_load(
+            args.url, args.endpoint, args.duration, args.concurrency
+        ), args.duration)
+        return
+
+    for cpus in args.cpus:
+        port = free_port()
+        process = start_server(cpus, port)
+        try:
+            base_url = f"http://127.0.0.1:{port}"
+            await wait_ready(base_url)
+            # Warm up every worker before measuring
+            await run_load(base_url, args.endpoint, 2.0, args.concurrency)
+            count, errors, latencies = await run_load(
+                base_url, args.endpoint, args.duration, args.concurrency
+            )
+            report(f"{cpus} vCPU", count, errors, latencies, args.duration)
+        finally:
+            process.terminate()
+            process.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""Cold-start benchmark: import time per module and time to first response.
+
+Usage:
+    python scripts/bench_startup.py
+    python scripts/bench_startup.py --budget-ms 1500 --runs 5
+
+1. Runs ``python -X importtime -c "import app.main"`` and prints the
+   cumulative import time of the application modules and the heaviest
+   third-party packages.
+2. Starts ``python -m app.server`` (one worker, sandbox) and measures the time
+   from process start until ``GET /pay/1000`` returns 200.
+
+Exits non-zero if the median time to first response exceeds ``--budget-ms``.
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Packages reported individually, whether or not they are imported
+WATCHED_PACKAGES = (
+    "fastapi",
+    "pydantic",
+    "pydantic_settings",
+    "structlog",
+    "uvicorn",
+    "google.cloud.firestore",
+    "paypayopa",
+    "requests",
+    "pkg_resources",
+)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Measure cold-start cost")
+    parser.add_argument("--runs", type=int, default=3, help="Server start measurements")
+    parser.add_argument("--budget-ms", type=float, default=1500.0)
+    parser.add_argument("--path", default="/pay/1000", help="First request path")
+    return parser.parse_args()
+
+
+def import_times() -> dict[str, int]:
+    """Return cumulative import time in microseconds per module."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=SRC_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times: dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, module = line.split("|")
+        if cumulative.strip().isdigit():
+            times[module.strip()] = int(cumulative.strip())
+    return times
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return int(sock.getsockname()[1])
+
+
+def time_to_first_response(path: str, timeout: float = 30.0) -> float:
+    """Start the server and return seconds until ``path`` answers 200."""
+    port = free_port()
+    env = {
+        **os.environ,
+        "ENVIRONMENT": "sandbox",
+        "WEB_CONCURRENCY": "1",
+        "PORT": str(port),
+        "HOST": "127.0.0.1",
+        "LOG_LEVEL": "WARNING",
+    }
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "app.server"],
+        cwd=SRC_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}") as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.01)
+        raise RuntimeError("Server did not answer in time")
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def main() -> None:
+    """Run the benchmark."""
+    args = parse_args()
+
+    times = import_times()
+    print("Import time (cumulative)")
+    app_modules = sorted(m for m in times if m == "app" or m.startswith("app."))
+    for module in [*app_modules, *WATCHED_PACKAGES]:
+        value = times.get(module)
+        label = f"{value / 1000:8.1f} ms" if value is not None else "  (not imported)"
+        print(f"  {module:<32} {label}")
+
+    results = [time_to_first_response(args.path) for _ in range(args.runs)]
+    median_ms = statistics.median(results) * 1000
+    print(f"\nTime to first response ({args.path}, {args.runs} runs)")
+    print(f"  median {median_ms:.0f} ms, min {min(results) * 1000:.0f} ms, "
+          f"max {max(results) * 1000:.0f} ms, budget {args.budget_ms:.0f} ms")
+
+    if median_ms > args.budget_ms:
+        print("Startup budget exceeded", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""Per-request cost of multi-tenant resolution.
+
+Usage:
+    python scripts/bench_tenants.py
+    python scripts/bench_tenants.py --tenants 200 --requests 5000
+
+Configures ``--tenants`` tenants in-process (in-memory repositories, PayPay
+clients with dummy credentials; nothing is sent to PayPay) and reports:
+
+- resolving a tenant from the Host header and from the /t/{tenant} prefix
+- a tenant adapter lookup when cached, and when the PayPay client has to be
+  built (SDK client construction, i.e. what the LRU saves)
+- the latency of GET /api/campaign/total through the whole ASGI app for the
+  default organization and for tenants by host and by path, so the
+  difference is the middleware's overhead per request
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from collections.abc import Callable
+
+import httpx
+
+# Add src to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.api.campaign import set_campaign_service
+from app.config import settings
+from app.main import app, build_service_container, build_tenant_paypay_adapter
+from app.models.donation import PaymentProvider
+from app.repositories.counter import InMemoryCampaignCounter
+from app.repositories.donation import InMemoryDonationRepository
+from app.services.campaign import CampaignTotalService
+from app.tenants import Tenant, TenantAdapterCache, set_service_container
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark tenant resolution")
+    parser.add_argument("--tenants", type=int, default=100)
+    parser.add_argument("--lookups", type=int, default=100_000)
+    parser.add_argument("--requests", type=int, default=2_000)
+    return parser.parse_args()
+
+
+def tenants_json(count: int) -> str:
+    return "[" + ",".join(
+        f'{{"id":"t{n:04d}","hosts":["t{n:04d}.example"],"paypay_merchant_id":"m{n:04d}"}}'
+        for n in range(count)
+    ) + "]"
+
+
+def per_call(call: Callable[[int], object], count: int) -> float:
+    """Mean seconds per call of ``call(n)`` for n in range(count)."""
+    started = time.perf_counter()
+    for n in range(count):
+        call(n)
+    return (time.perf_counter() - started) / count
+
+
+async def requests(
+    client: httpx.AsyncClient,
+    url: Callable[[int], str],
+    host: Callable[[int], str],
+    count: int,
+) -> float:
+    """Median seconds per sequential GET."""
+    latencies = []
+    for n in range(count):
+        started = time.perf_counter()
+        response = await client.get(url(n), headers={"host": host(n)})
+        latencies.append(time.perf_counter() - started)
+        response.raise_for_status()
+    return statistics.median(latencies)
+
+
+async def main() -> None:
+    args = parse_args()
+    settings.tenants = tenants_json(args.tenants)
+    settings.paypay_api_key = "bench_key"
+    settings.paypay_api_secret = "bench_secret"
+    settings.tenant_adapter_cache_size = args.tenants
+    container = build_service_container("memory", InMemoryDonationRepository())
+    assert container is not None
+    set_service_container(container)
+    set_campaign_service(
+        CampaignTotalService(InMemoryCampaignCounter(), settings.campaign_id, cache_ttl_seconds=1)
+    )
+    tenants = [Tenant(id=f"t{n:04d}") for n in range(args.tenants)]
+    resolver = container.resolver
+    print(f"{args.tenants} tenants")
+
+    host = per_call(
+        lambda n: resolver.resolve(f"t{n % args.tenants:04d}.example", "/api/x"), args.lookups
+    )
+    path = per_call(
+        lambda n: resolver.resolve("localhost", f"/t/t{n % args.tenants:04d}/api/x"),
+        args.lookups,
+    )
+    print(f"resolve by host          {host * 1e6:8.2f} us")
+    print(f"resolve by path          {path * 1e6:8.2f} us")
+
+    # Cold: a cache too small to keep anything, so every lookup builds
+    factories = {PaymentProvider.PAYPAY: build_tenant_paypay_adapter}
+    cold_cache = TenantAdapterCache(factories, max_size=1)
+    cold = per_call(lambda n: cold_cache.get(tenants[n % 2], PaymentProvider.PAYPAY), 200)
+    for tenant in tenants:
+        container.adapters.get(tenant, PaymentProvider.PAYPAY)
+    hit = per_call(
+        lambda n: container.adapters.get(tenants[n % args.tenants], PaymentProvider.PAYPAY),
+        args.lookups,
+    )
+    print(f"adapter lookup (cached)  {hit * 1e6:8.2f} us")
+    print(f"adapter build (evicted)  {cold * 1e6:8.2f} us")
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Build every tenant's services before timing
+        for n in range(args.tenants):
+            await client.get("/api/campaign/total", headers={"host": f"t{n:04d}.example"})
+        default = await requests(
+            client, lambda n: "/api/campaign/total", lambda n: "localhost", args.requests
+        )
+        by_host = await requests(
+            client,
+            lambda n: "/api/campaign/total",
+            lambda n: f"t{n % args.tenants:04d}.example",
+            args.requests,
+        )
+        by_path = await requests(
+            client,
+            lambda n: f"/t/t{n % args.tenants:04d}/api/campaign/total",
+            lambda n: "localhost",
+            args.requests,
+        )
+    print(f"GET default              {default * 1e6:8.1f} us")
+    print(f"GET tenant by host       {by_host * 1e6:8.1f} us   (+{(by_host - default) * 1e6:.1f})")
+    print(f"GET tenant by path       {by_path * 1e6:8.1f} us   (+{(by_path - default) * 1e6:.1f})")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""Build responsive, content-hashed image assets.
+
+Usage:
+    pip install -e ".[assets]"
+    python scripts/build_assets.py
+
+Writes WebP/AVIF variants, a fallback in the source format, the favicon and
+the Apple touch icon to app/static/assets/build/ together with manifest.json,
+then reports how many bytes each image saves. The Dockerfile runs this at
+image build time; without a build the pages keep serving the source images.
+"""
+
+import os
+import sys
+
+# Add src to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.assets import AssetManifest, build_assets
+
+
+def report(manifest: AssetManifest) -> None:
+    """Print source vs smallest generated size for every image and width."""
+    for image in manifest.images.values():
+        print(f"{image.source}: {image.width}x{image.height}, {image.bytes:,} bytes")
+        for width in sorted({v.width for v in image.variants}):
+            best = image.smallest(width)
+            saved = 1 - best.bytes / image.bytes
+            print(
+                f"  {width:>5}w  {best.format:<5} {best.bytes:>10,} bytes"
+                f"  ({saved:.1%} smaller)  {best.file}"
+            )
+    for name, icon in manifest.icons.items():
+        print(f"{name}: {icon.bytes:,} bytes  {icon.file}")
+
+    if manifest.images:
+        # What a page pays for each image at 2x density, before and after
+        before = sum(image.bytes for image in manifest.images.values())
+        after = 0
+        for image in manifest.images.values():
+            widths = sorted({v.width for v in image.variants})
+            after += image.smallest(widths[min(1, len(widths) - 1)]).bytes
+        print(
+            f"Total: {before:,} -> {after:,} bytes at 2x "
+            f"({1 - after / before:.1%} smaller)"
+        )
+
+
+def main() -> None:
+    """Build the assets and print the savings."""
+    try:
+        manifest = build_assets()
+    except ImportError:
+        sys.exit('Pillow is required: pip install -e ".[assets]"')
+    report(manifest)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""Export donations from Firestore as CSV or NDJSON.
+
+Usage:
+    export PROJECT_ID="tadakayo-qr-connect"
+    python scripts/export_donations.py --start 2026-01-01 --end 2026-01-31 \
+        --format csv --output donations_2026-01.csv
+
+Streams the export page by page, so memory stays flat regardless of size.
+Throughput is reported on stderr when the export finishes.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import os
+import sys
+from datetime import date
+
+# Add src to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.api.exports import build_query
+from app.config import settings
+from app.models.donation import DonationStatus, PaymentProvider
+from app.repositories.donation import FirestoreDonationRepository
+from app.services.export import DonationExporter, ExportFormat, ExportStats
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Export donations for accounting")
+    parser.add_argument("--start", type=date.fromisoformat, help="First JST day (YYYY-MM-DD)")
+    parser.add_argument("--end", type=date.fromisoformat, help="Last JST day (YYYY-MM-DD)")
+    parser.add_argument(
+        "--status", type=DonationStatus, choices=[s.value for s in DonationStatus]
+    )
+    parser.add_argument("--source", help="QR source ID")
+    parser.add_argument(
+        "--provider", type=PaymentProvider, choices=[p.value for p in PaymentProvider]
+    )
+    parser.add_argument(
+        "--format",
+        type=ExportFormat,
+        choices=[f.value for f in ExportFormat],
+        default=ExportFormat.CSV,
+    )
+    parser.add_argument("--output", help="Output file (default: stdout)")
+    parser.add_argument("--project-id", default=settings.project_id)
+    return parser.parse_args()
+
+
+async def main() -> None:
+    """Run the export."""
+    args = parse_args()
+    query = build_query(args.start, args.end, args.status, args.source, args.provider)
+    exporter = DonationExporter(FirestoreDonationRepository(project_id=args.project_id))
+    stats = ExportStats()
+
+    with contextlib.ExitStack() as stack:
+        output = (
+            stack.enter_context(open(args.output, "wb")) if args.output else sys.stdout.buffer
+        )
+        async for chunk in exporter.export(query, args.format, stats=stats):
+            output.write(chunk)
+
+    print(
+        f"Exported {stats.rows} rows ({stats.bytes / 1024 / 1024:.1f} MiB) "
+        f"in {stats.elapsed_seconds:.1f}s: {stats.rows_per_second:,.0f} rows/s",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
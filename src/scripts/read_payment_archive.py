@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""Read archived payment events for audits.
+
+Usage:
+    export PAYMENT_EVENT_ARCHIVE_URI="gs://tadakayo-qr-connect-archive/firestore"
+
+    # Every archived event of one order
+    python scripts/read_payment_archive.py --start 2026-07-01 --end 2026-07-31 \
+        --order-id ORDER123 > events.ndjson
+
+Prints one stored event per line as NDJSON, in receipt order. The output
+can be fed back to scripts/replay_webhooks.py.
+"""
+
+import argparse
+import os
+import sys
+from datetime import date
+
+# Add src to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings
+from app.models.donation import PaymentProvider
+from app.repositories.archive import open_archive_store
+from app.services.retention import read_archive
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Read archived payment events")
+    parser.add_argument(
+        "--start", type=date.fromisoformat, required=True, help="First JST day (YYYY-MM-DD)"
+    )
+    parser.add_argument(
+        "--end", type=date.fromisoformat, required=True, help="Last JST day (YYYY-MM-DD)"
+    )
+    parser.add_argument(
+        "--provider", type=PaymentProvider, choices=[p.value for p in PaymentProvider]
+    )
+    parser.add_argument("--order-id", help="Provider order ID")
+    parser.add_argument(
+        "--archive",
+        default=settings.payment_event_archive_uri,
+        help="gs://bucket/prefix or a local directory",
+    )
+    parser.add_argument("--project-id", default=settings.project_id)
+    args = parser.parse_args()
+    if not args.archive:
+        parser.error("set PAYMENT_EVENT_ARCHIVE_URI or give --archive")
+    return args
+
+
+def main() -> None:
+    """Print the matching events."""
+    args = parse_args()
+    store = open_archive_store(args.archive, project_id=args.project_id)
+    count = 0
+    for event in read_archive(store, args.start, args.end, args.provider, args.order_id):
+        print(event.model_dump_json())
+        count += 1
+    print(f"{count:,} events", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""Replay stored or exported webhook events against the donation repository.
+
+Usage:
+    export PROJECT_ID="tadakayo-qr-connect"
+    export REPOSITORY_BACKEND=firestore  # or file / sqlite, as the service uses
+
+    # Preview what re-applying stored events would change (writes nothing)
+    python scripts/replay_webhooks.py --stored --since 2026-10-01T00:00:00+09:00 \
+        --until 2026-10-02T00:00:00+09:00 --dry-run > diff.ndjson
+
+    # Backfill from a provider notification log, 32 events in flight
+    python scripts/replay_webhooks.py --provider paypay --parallelism 32 \
+        paypay_notifications.ndjson
+
+Events go through the same status-update path as live webhooks and are
+idempotent per provider event ID, so a replay can be repeated safely (raw
+notifications without an ID of their own get one derived from the payload).
+The repository is the one the service would use: REPOSITORY_BACKEND, or
+memory in sandbox and Firestore otherwise. Status
+changes (or, with --dry-run, planned changes) are written to stdout as
+NDJSON; progress and throughput are reported on stderr.
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import sys
+from collections.abc import AsyncIterator, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# Add src to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.adapters.paypay import PayPayAdapter
+from app.adapters.rakuten import RakutenPayAdapter
+from app.config import settings
+from app.main import build_repository, repository_backend
+from app.models.donation import PaymentProvider
+from app.repositories.donation import PaymentEventQuery
+from app.services.campaign import CampaignTotalService
+from app.services.payment import EventApplication, PaymentService
+from app.services.replay import (
+    DEFAULT_PARALLELISM,
+    ReplayEvent,
+    ReplayStats,
+    WebhookReplayer,
+    read_ndjson,
+    stored_events,
+)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Replay webhook events")
+    parser.add_argument(
+        "files", nargs="*", help="NDJSON files of events (.gz archives are read as is)"
+    )
+    parser.add_argument(
+        "--stored", action="store_true", help="Replay the payment_events collection"
+    )
+    parser.add_argument(
+        "--provider",
+        type=PaymentProvider,
+        choices=[p.value for p in PaymentProvider],
+        help="Provider of raw notifications in the files (filter with --stored)",
+    )
+    parser.add_argument(
+        "--since", type=datetime.fromisoformat, help="Stored events received at or after"
+    )
+    parser.add_argument(
+        "--until", type=datetime.fromisoformat, help="Stored events received before"
+    )
+    parser.add_argument("--parallelism", type=int, default=DEFAULT_PARALLELISM)
+    parser.add_argument("--dry-run", action="store_true", help="Report changes only")
+    parser.add_argument("--project-id", default=settings.project_id)
+    args = parser.parse_args()
+    if args.stored == bool(args.files):
+        parser.error("give either NDJSON files or --stored")
+    return args
+
+
+async def file_events(
+    paths: Iterable[str], provider: PaymentProvider | None
+) -> AsyncIterator[ReplayEvent]:
+    for path in paths:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as lines:
+            for event in read_ndjson(lines, provider):
+                yield event
+
+
+def print_change(result: EventApplication) -> None:
+    if not result.changed:
+        return
+    change = {
+        "donation_id": result.donation_id,
+        "provider": result.provider.value,
+        "provider_order_id": result.provider_order_id,
+        "provider_event_id": result.provider_event_id,
+        "from": result.old_status,
+        "to": result.new_status.value,
+    }
+    print(json.dumps(change, ensure_ascii=False))
+
+
+def print_progress(stats: ReplayStats, rate: float) -> None:
+    print(f"{stats.events:,} events, {rate:,.0f} events/s", file=sys.stderr)
+
+
+async def main() -> None:
+    """Run the replay."""
+    args = parse_args()
+    # Repository calls run in worker threads; size the pool to the parallelism
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=args.parallelism)
+    )
+
+    settings.project_id = args.project_id
+    backend = repository_backend()
+    print(f"Repository backend: {backend}", file=sys.stderr)
+    repository, counter = build_repository(backend)
+    campaign = CampaignTotalService(counter=counter, campaign_id=settings.campaign_id)
+    # Adapters are only used to normalize payloads
+    service = PaymentService(
+        repository=repository,
+        adapters={
+            PaymentProvider.PAYPAY: PayPayAdapter(production_mode=False),
+            PaymentProvider.RAKUTEN: RakutenPayAdapter(sandbox=True),
+        },
+        campaign=campaign,
+    )
+
+    if args.stored:
+        query = PaymentEventQuery(
+            provider=args.provider, received_from=args.since, received_to=args.until
+        )
+        events = stored_events(repository, query)
+    else:
+        events = file_events(args.files, args.provider)
+
+    replayer = WebhookReplayer(service, parallelism=args.parallelism, dry_run=args.dry_run)
+    try:
+        stats = await replayer.replay(
+            events, on_result=print_change, on_progress=print_progress
+        )
+    finally:
+        # Commit buffered event writes (file backend, write-behind)
+        await service.close()
+
+    print(
+        f"{'Planned' if args.dry_run else 'Replayed'} {stats.events:,} events "
+        f"in {stats.elapsed_seconds:.1f}s ({stats.events_per_second:,.0f} events/s): "
+        f"{stats.changed:,} changed, {stats.unchanged:,} unchanged, "
+        f"{stats.not_found:,} without donation, {stats.stale:,} stale, "
+        f"{stats.rejected:,} rejected, "
+        f"{stats.recorded:,} newly recorded, {stats.failed:,} failed",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -7,11 +7,19 @@ from app.adapters.paypay import PayPayAdapter
 from app.adapters.rakuten import RakutenPayAdapter
 from app.api.donations import set_payment_service
 from app.main import app
+from app.metrics import metrics
 from app.models.donation import PaymentProvider
 from app.repositories.donation import InMemoryDonationRepository
 from app.services.payment import PaymentService
 
 
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    """Start every test with an empty metrics registry."""
+    metrics.reset()
+    yield
+
+
 @pytest.fixture
 def in_memory_repository():
     """Create an in-memory repository for testing."""
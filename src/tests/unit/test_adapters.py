@@ -9,6 +9,9 @@ import pytest
 from app.adapters.base import CheckoutSessionInput
 from app.adapters.paypay import PayPayAdapter
 from app.adapters.rakuten import RakutenPayAdapter
+from app.adapters.registry import AdapterRegistry
+from app.adapters.signing import WebhookSignatureVerifier, key_id, parse_secrets
+from app.metrics import metrics
 from app.models.donation import DonationStatus, PaymentProvider
 
 
@@ -160,3 +163,110 @@ class TestRakutenPayAdapter:
         assert normalized.status == DonationStatus.COMPLETED
         assert normalized.provider_order_id == "don_123"
         assert normalized.provider_event_id == "evt_456"
+
+
+class TestAdapterRegistry:
+    """Tests for lazily built adapters."""
+
+    def test_adapters_are_built_on_first_use(self):
+        """Test that factories run once, on first lookup only."""
+        calls = []
+
+        def factory():
+            calls.append(1)
+            return RakutenPayAdapter(sandbox=True)
+
+        registry = AdapterRegistry()
+        registry.register(PaymentProvider.RAKUTEN, factory)
+
+        assert PaymentProvider.RAKUTEN in registry
+        assert registry.built == []
+        assert calls == []
+
+        adapter = registry.get(PaymentProvider.RAKUTEN)
+        assert registry[PaymentProvider.RAKUTEN] is adapter
+        assert registry.built == [PaymentProvider.RAKUTEN]
+        assert calls == [1]
+
+    def test_unregistered_provider(self):
+        """Test that unregistered providers resolve to None."""
+        assert AdapterRegistry().get(PaymentProvider.PAYPAY) is None
+
+
+def sign(secret: str, body: bytes) -> str:
+    return hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+
+
+class TestWebhookSignatureVerifier:
+    """Tests for multi-key webhook signature verification."""
+
+    BODY = b'{"state": "COMPLETED"}'
+
+    def test_accepts_any_active_secret(self):
+        """Test that both the current and the previous secret verify during rotation."""
+        verifier = WebhookSignatureVerifier(PaymentProvider.PAYPAY, ["new", "old"])
+
+        for secret in ("new", "old"):
+            check = verifier.verify(sign(secret, self.BODY), self.BODY)
+            assert check.valid
+            assert check.key_id == key_id(secret)
+
+        assert not verifier.verify(sign("retired", self.BODY), self.BODY).valid
+
+    def test_accepts_uppercase_hex(self):
+        """Test that hex case does not matter."""
+        verifier = WebhookSignatureVerifier(PaymentProvider.PAYPAY, ["secret"])
+        assert verifier.verify(sign("secret", self.BODY).upper(), self.BODY).valid
+
+    def test_tries_last_matching_key_first(self):
+        """Test that the secret that matched last is tried first."""
+        verifier = WebhookSignatureVerifier(PaymentProvider.PAYPAY, ["a", "b", "c"])
+        verifier.verify(sign("c", self.BODY), self.BODY)
+
+        assert verifier._order()[0] == 2
+
+    def test_rejects_more_secrets_than_max_keys(self):
+        """Test that a secret beyond max_keys is a configuration error, not ignored."""
+        with pytest.raises(ValueError):
+            WebhookSignatureVerifier(PaymentProvider.PAYPAY, ["a", "b", "c"], max_keys=2)
+
+    def test_key_id_is_not_a_plain_hash(self):
+        """Test that key IDs are stable but not a prefix of the secret's SHA-256."""
+        assert key_id("secret") == key_id("secret") != key_id("other")
+        assert key_id("secret") != hashlib.sha256(b"secret").hexdigest()[:8]
+
+    def test_rejects_malformed_and_oversized_without_hashing(self):
+        """Test that cheap prechecks reject junk before any HMAC work."""
+        verifier = WebhookSignatureVerifier(
+            PaymentProvider.PAYPAY, ["secret"], max_body_bytes=16
+        )
+        verifier._contexts = []  # any HMAC attempt would raise IndexError
+
+        assert verifier.verify("not-hex", self.BODY).error == "Invalid signature: malformed"
+        assert verifier.verify("zz" * 32, self.BODY).error == "Invalid signature: malformed"
+        assert verifier.verify("ab" * 32, self.BODY).error == "Payload too large"
+        assert metrics.get(
+            "webhook_signature_failures_total", provider="paypay", reason="malformed"
+        ) == 2
+
+    def test_requires_a_secret(self):
+        """Test that an empty secret list is a configuration error."""
+        with pytest.raises(ValueError):
+            WebhookSignatureVerifier(PaymentProvider.PAYPAY, [])
+
+    def test_parse_secrets(self):
+        """Test parsing of the comma-separated setting."""
+        assert parse_secrets(" new , old,,") == ["new", "old"]
+        assert parse_secrets("") == []
+
+    @pytest.mark.asyncio
+    async def test_adapter_uses_rotated_secrets(self):
+        """Test that adapters accept webhooks signed with any active secret."""
+        adapter = RakutenPayAdapter(webhook_secrets=["new", "old"])
+        body = json.dumps({"event_type": "order.captured"}).encode("utf-8")
+
+        result = await adapter.verify_webhook(
+            headers={"x-rakuten-signature": sign("old", body)}, body=body
+        )
+
+        assert result.valid is True
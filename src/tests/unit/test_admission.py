@@ -0,0 +1,236 @@
+"""Unit tests for checkout admission control."""
+
+import asyncio
+import hashlib
+import hmac
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.admission import (
+    AdmissionConfig,
+    AdmissionController,
+    AdmissionRejectedError,
+    KeyedTokenBuckets,
+    TokenBucket,
+)
+from app.api.donations import set_admission_controller, set_payment_service
+from app.main import app
+from app.metrics import metrics
+
+CHECKOUT_BODY = {
+    "amount": 1000,
+    "source": "flyer_a",
+    "provider": "paypay",
+    "return_url": "https://example.com/thanks",
+    "cancel_url": "https://example.com/cancel",
+    "idempotency_key": "admission-key",
+}
+
+
+class TestTokenBucket:
+    """Tests for token buckets."""
+
+    def test_burst_then_refill(self):
+        """Test that a bucket allows its burst and refills at its rate."""
+        clock = [0.0]
+        bucket = TokenBucket(rate=2.0, burst=2, clock=lambda: clock[0])
+
+        assert bucket.try_take() == 0
+        assert bucket.try_take() == 0
+        assert bucket.try_take() == pytest.approx(0.5)
+
+        clock[0] = 0.5
+        assert bucket.try_take() == 0
+
+    def test_keyed_buckets_are_independent_and_bounded(self):
+        """Test that keys do not share tokens and old keys are evicted."""
+        buckets = KeyedTokenBuckets(rate=1.0, burst=1, max_keys=2, clock=lambda: 0.0)
+
+        assert buckets.try_take("a") == 0
+        assert buckets.try_take("a") > 0
+        assert buckets.try_take("b") == 0
+        assert buckets.try_take("c") == 0
+        # "a" was evicted, so it starts with a fresh bucket
+        assert buckets.try_take("a") == 0
+
+
+class TestAdmissionController:
+    """Tests for the adaptive concurrency cap."""
+
+    def test_rejects_over_limit(self):
+        """Test that requests beyond the in-flight limit are shed."""
+        controller = AdmissionController(AdmissionConfig(max_in_flight=2))
+        controller.try_acquire()
+        controller.try_acquire()
+
+        with pytest.raises(AdmissionRejectedError) as exc_info:
+            controller.try_acquire()
+        assert exc_info.value.reason == "overloaded"
+        assert metrics.get("admission_rejected_total", reason="overloaded") == 1
+
+        controller.release(0.1)
+        controller.try_acquire()
+
+    def test_limit_shrinks_with_latency(self):
+        """Test that latency above the target lowers the limit."""
+        controller = AdmissionController(
+            AdmissionConfig(
+                max_in_flight=40,
+                min_in_flight=4,
+                target_latency_seconds=1.0,
+                smoothing=1.0,
+            )
+        )
+        assert controller.limit == 40
+
+        controller.try_acquire()
+        controller.release(4.0)
+        assert controller.limit == 10
+        assert metrics.get("admission_limit") == 10
+
+        controller.try_acquire()
+        controller.release(100.0)
+        assert controller.limit == 4
+
+        controller.try_acquire()
+        controller.release(0.5)
+        assert controller.limit == 40
+
+    def test_rate_limits_only_charge_admitted_requests(self):
+        """Test that per-source tokens are not spent by shed requests."""
+        controller = AdmissionController(
+            AdmissionConfig(max_in_flight=1),
+            source_limiter=KeyedTokenBuckets(rate=0.001, burst=2),
+        )
+        controller.try_acquire(source="flyer_a")
+        with pytest.raises(AdmissionRejectedError) as exc_info:
+            controller.try_acquire(source="flyer_a")
+        assert exc_info.value.reason == "overloaded"
+
+        controller.release(0.1)
+        controller.try_acquire(source="flyer_a")
+        controller.release(0.1)
+        with pytest.raises(AdmissionRejectedError) as exc_info:
+            controller.try_acquire(source="flyer_a")
+        assert exc_info.value.reason == "source_rate"
+        controller.try_acquire(source="flyer_b")
+
+    def test_ip_rejection_does_not_drain_source(self):
+        """Test that one client over its IP limit cannot use up a shared source."""
+        controller = AdmissionController(
+            source_limiter=KeyedTokenBuckets(rate=0.001, burst=2, clock=lambda: 0.0),
+            ip_limiter=KeyedTokenBuckets(rate=0.001, burst=1, clock=lambda: 0.0),
+        )
+        controller.try_acquire(source="flyer_a", client_ip="198.51.100.1")
+        for _ in range(5):
+            with pytest.raises(AdmissionRejectedError) as exc_info:
+                controller.try_acquire(source="flyer_a", client_ip="198.51.100.1")
+            assert exc_info.value.reason == "ip_rate"
+
+        # The source still has the token the abusive client was refused
+        controller.try_acquire(source="flyer_a", client_ip="203.0.113.2")
+
+    def test_source_rejection_refunds_ip_token(self):
+        """Test that a request shed by the source limit keeps its IP token."""
+        controller = AdmissionController(
+            source_limiter=KeyedTokenBuckets(rate=0.001, burst=1, clock=lambda: 0.0),
+            ip_limiter=KeyedTokenBuckets(rate=0.001, burst=1, clock=lambda: 0.0),
+        )
+        controller.try_acquire(source="flyer_a", client_ip="198.51.100.1")
+        with pytest.raises(AdmissionRejectedError) as exc_info:
+            controller.try_acquire(source="flyer_a", client_ip="203.0.113.2")
+        assert exc_info.value.reason == "source_rate"
+
+        controller.try_acquire(source="flyer_b", client_ip="203.0.113.2")
+
+    @pytest.mark.asyncio
+    async def test_admit_releases_on_error(self):
+        """Test that the slot is released when the request fails."""
+        controller = AdmissionController(AdmissionConfig(max_in_flight=1))
+        with pytest.raises(RuntimeError):
+            async with controller.admit():
+                assert controller.in_flight == 1
+                raise RuntimeError("provider down")
+        assert controller.in_flight == 0
+
+
+class TestCheckoutShedding:
+    """Tests for admission control on the HTTP routes."""
+
+    @pytest.fixture
+    def client(self, payment_service):
+        set_payment_service(payment_service)
+        yield TestClient(app)
+        set_admission_controller(None)
+
+    def test_overload_returns_503_with_retry_after(self, client):
+        """Test that a saturated checkout route sheds with Retry-After."""
+        controller = AdmissionController(
+            AdmissionConfig(max_in_flight=1, retry_after_seconds=3)
+        )
+        set_admission_controller(controller)
+        controller.try_acquire()  # a checkout stuck at the provider
+
+        response = client.post("/api/donations/checkout", json=CHECKOUT_BODY)
+
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "3"
+        assert response.json()["detail"]["error"] == "OVERLOADED"
+
+    def test_ip_rate_limit_returns_429(self, client):
+        """Test that a client over its token bucket gets 429."""
+        set_admission_controller(
+            AdmissionController(ip_limiter=KeyedTokenBuckets(rate=0.5, burst=1))
+        )
+
+        first = client.post("/api/donations/checkout", json=CHECKOUT_BODY)
+        second = client.post(
+            "/api/donations/checkout", json={**CHECKOUT_BODY, "idempotency_key": "k2"}
+        )
+
+        assert first.status_code == 200
+        assert second.status_code == 429
+        assert second.json()["detail"]["error"] == "RATE_LIMITED"
+        assert int(second.headers["Retry-After"]) >= 1
+
+    def test_webhooks_and_health_bypass_admission(self, client):
+        """Test that webhooks and health checks are served while checkouts shed."""
+        controller = AdmissionController(AdmissionConfig(max_in_flight=1))
+        set_admission_controller(controller)
+        controller.try_acquire()
+
+        body = json.dumps({"state": "COMPLETED", "payment_id": "p1", "order_id": "x"}).encode()
+        signature = hmac.new(b"test_paypay_secret", body, hashlib.sha256).hexdigest()
+        webhook = client.post(
+            "/api/webhooks/paypay",
+            content=body,
+            headers={"X-PAYPAY-SIGNATURE": signature, "Content-Type": "application/json"},
+        )
+
+        assert webhook.status_code == 200
+        assert client.get("/health").status_code == 200
+        assert client.post("/api/donations/checkout", json=CHECKOUT_BODY).status_code == 503
+
+    @pytest.mark.asyncio
+    async def test_in_flight_is_bounded_under_burst(self):
+        """Test that a burst never exceeds the limit concurrently."""
+        controller = AdmissionController(AdmissionConfig(max_in_flight=3))
+        peak = 0
+
+        async def checkout():
+            nonlocal peak
+            try:
+                async with controller.admit():
+                    peak = max(peak, controller.in_flight)
+                    await asyncio.sleep(0.01)
+                return "ok"
+            except AdmissionRejectedError:
+                return "shed"
+
+        results = await asyncio.gather(*(checkout() for _ in range(10)))
+
+        assert peak == 3
+        assert results.count("ok") == 3
+        assert results.count("shed") == 7
@@ -9,11 +9,19 @@ from fastapi.testclient import TestClient
 
 from app.adapters.paypay import PayPayAdapter
 from app.adapters.rakuten import RakutenPayAdapter
-from app.api.donations import set_payment_service
+from app.api.campaign import set_campaign_service
+from app.api.donations import get_payment_service, set_payment_service
+from app.api.exports import set_donation_exporter
+from app.config import settings
+from app.deadline import DeadlineExceededError
 from app.main import app
-from app.models.donation import PaymentProvider
+from app.metrics import metrics
+from app.models.donation import MAX_BATCH_DONATION_IDS, DonationStatus, PaymentProvider
+from app.repositories.counter import InMemoryCampaignCounter
 from app.repositories.donation import InMemoryDonationRepository
-from app.services.payment import PaymentService
+from app.services.campaign import CampaignTotalService
+from app.services.export import DonationExporter
+from app.services.payment import PaymentService, PaymentServiceError
 
 
 @pytest.fixture
@@ -63,6 +71,24 @@ class TestCheckoutEndpoint:
         assert data["status"] == "pending"
         assert "redirect_url" in data
 
+    def test_create_checkout_reused_key_is_409(self, client):
+        """Test that a retry with a used idempotency key is a conflict."""
+        body = {
+            "amount": 1000,
+            "source": "flyer_a",
+            "provider": "paypay",
+            "return_url": "https://example.com/thanks",
+            "cancel_url": "https://example.com/cancel",
+            "idempotency_key": "test-key-reused",
+        }
+        assert client.post("/api/donations/checkout", json=body).status_code == 200
+
+        response = client.post("/api/donations/checkout", json=body)
+
+        assert response.status_code == 409
+        assert response.json()["detail"]["error"] == "DUPLICATE_CHECKOUT"
+        assert len(get_payment_service()._repository._donations) == 1
+
     def test_create_checkout_invalid_amount(self, client):
         """Test checkout with invalid amount."""
         response = client.post(
@@ -124,6 +150,141 @@ class TestDonationEndpoint:
         data = response.json()
         assert data["detail"]["error"] == "DONATION_NOT_FOUND"
 
+    def create_donation(self, client) -> str:
+        response = client.post(
+            "/api/donations/checkout",
+            json={
+                "amount": 1000,
+                "source": "flyer_a",
+                "provider": "paypay",
+                "return_url": "https://example.com/thanks",
+                "cancel_url": "https://example.com/cancel",
+                "idempotency_key": "test-key-conditional",
+            },
+        )
+        return response.json()["donation_id"]
+
+    def test_get_donation_revalidates_with_etag(self, client):
+        """Test that a pending donation is revalidated and answered with 304."""
+        donation_id = self.create_donation(client)
+
+        response = client.get(f"/api/donations/{donation_id}")
+        assert response.headers["cache-control"] == "private, no-cache"
+        etag = response.headers["etag"]
+
+        cached = client.get(f"/api/donations/{donation_id}", headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+        assert cached.content == b""
+        assert cached.headers["etag"] == etag
+        assert metrics.get("donation_status_not_modified_total") == 1
+
+    @pytest.mark.asyncio
+    async def test_get_donation_changes_validators_on_update(self, client):
+        """Test that a status change invalidates the ETag and Last-Modified."""
+        donation_id = self.create_donation(client)
+        first = client.get(f"/api/donations/{donation_id}")
+
+        repository = get_payment_service()._repository
+        await repository.update_status(donation_id, DonationStatus.COMPLETED)
+
+        response = client.get(
+            f"/api/donations/{donation_id}",
+            headers={"If-None-Match": first.headers["etag"]},
+        )
+        assert response.status_code == 200
+        assert response.json()["status"] == "completed"
+        assert response.headers["etag"] != first.headers["etag"]
+        assert response.headers["cache-control"] == (
+            f"private, max-age={settings.donation_settled_max_age_seconds}"
+        )
+
+        cached = client.get(
+            f"/api/donations/{donation_id}",
+            headers={"If-Modified-Since": response.headers["last-modified"]},
+        )
+        assert cached.status_code == 304
+
+    def test_batch_status_marks_missing_ids(self, client):
+        """Test that a batch returns found donations in order and lists unknown IDs."""
+        donation_id = self.create_donation(client)
+
+        response = client.post(
+            "/api/donations/status:batch",
+            json={"donation_ids": ["don_missing", donation_id, donation_id]},
+        )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert [d["donation_id"] for d in data["donations"]] == [donation_id]
+        assert data["donations"][0]["status"] == "pending"
+        assert data["not_found"] == ["don_missing"]
+        assert response.headers["cache-control"] == "no-store"
+
+    def test_batch_status_limits_ids(self, client):
+        """Test that empty, oversized and malformed batches are rejected."""
+        for ids in ([], [f"don_{i}" for i in range(MAX_BATCH_DONATION_IDS + 1)], ["a/b"]):
+            response = client.post("/api/donations/status:batch", json={"donation_ids": ids})
+            assert response.status_code == 422
+
+
+class TestPayPage:
+    """Tests for the server-side checkout of /pay/{amount}."""
+
+    MOBILE = {"User-Agent": "Mozilla/5.0 (iPhone; CPU iPhone OS 18_0 like Mac OS X)"}
+    DESKTOP = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"}
+
+    def donations(self):
+        return list(get_payment_service()._repository._donations.values())
+
+    def test_mobile_redirects_to_provider(self, client):
+        """Test that a phone gets a 302 to the checkout without loading the page."""
+        response = client.get("/pay/1000", headers=self.MOBILE, follow_redirects=False)
+
+        assert response.status_code == 302
+        [donation] = self.donations()
+        assert (donation.amount, donation.source) == (1000, "qr_fixed")
+        assert donation.provider_order_id in response.headers["location"]
+        assert response.headers["cache-control"] == "no-store"
+
+    def test_desktop_page_embeds_checkout(self, client):
+        """Test that the streamed page carries the checkout for the QR code."""
+        response = client.get("/pay/1000", headers=self.DESKTOP)
+
+        assert response.status_code == 200
+        [donation] = self.donations()
+        assert f'"donation_id": "{donation.id}"' in response.text
+        assert response.text.index("window.PAY_CHECKOUT") < response.text.index(
+            "const embeddedCheckout"
+        )
+        assert "pay:checkout" not in response.text
+
+    def test_prefetch_does_not_create_donation(self, client):
+        """Test that speculative loads get the plain page."""
+        response = client.get("/pay/1000", headers={**self.MOBILE, "Sec-Purpose": "prefetch"})
+
+        assert response.status_code == 200
+        assert self.donations() == []
+
+    def test_failed_checkout_falls_back_to_page(self, client, monkeypatch):
+        """Test that the page's own checkout flow takes over on errors."""
+
+        async def fail(request):
+            raise PaymentServiceError("PROVIDER_UNAVAILABLE", "down")
+
+        monkeypatch.setattr(get_payment_service(), "create_checkout", fail)
+
+        mobile = client.get("/pay/1000", headers=self.MOBILE, follow_redirects=False)
+        desktop = client.get("/pay/1000", headers=self.DESKTOP)
+
+        assert mobile.status_code == 200
+        assert "const embeddedCheckout" in mobile.text
+        assert desktop.status_code == 200
+        assert "window.PAY_CHECKOUT =" not in desktop.text
+        # The fallback posts to the API of the organization that served the page
+        assert 'window.API_BASE = "";' in desktop.text
+        assert "`${apiBase}/api/donations/checkout`" in desktop.text
+        assert metrics.get("pay_inline_checkout_failures_total") == 2
+
 
 class TestWebhookEndpoints:
     """Tests for webhook endpoints."""
@@ -197,3 +358,171 @@ class TestWebhookEndpoints:
             },
         )
         assert response.status_code == 200
+
+
+class TestStatsEndpoint:
+    """Tests for aggregate stats endpoint."""
+
+    def test_get_stats_counts_checkouts(self, client):
+        """Test that new checkouts appear as pending in today's stats."""
+        client.post(
+            "/api/donations/checkout",
+            json={
+                "amount": 500,
+                "source": "card_b",
+                "provider": "paypay",
+                "return_url": "https://example.com/thanks",
+                "cancel_url": "https://example.com/cancel",
+                "idempotency_key": "test-key-stats",
+            },
+        )
+
+        response = client.get("/api/stats", params={"source": "card_b"})
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total_count"] == 1
+        assert data["totals"]["pending"] == {"count": 1, "amount": 500}
+        assert data["buckets"][0]["source"] == "card_b"
+
+    def test_get_stats_invalid_range(self, client):
+        """Test that an inverted date range is rejected."""
+        response = client.get("/api/stats", params={"start": "2026-02-01", "end": "2026-01-01"})
+        assert response.status_code == 400
+        assert response.json()["detail"]["error"] == "INVALID_ARGUMENT"
+
+    def test_get_stats_requires_admin_token(self, client, monkeypatch):
+        """Test that revenue stats are not public once a token is configured."""
+        monkeypatch.setattr(settings, "admin_api_token", "secret-token")
+
+        assert client.get("/api/stats").status_code == 401
+        response = client.get("/api/stats", headers={"Authorization": "Bearer secret-token"})
+        assert response.status_code == 200
+
+    def test_get_stats_deadline_is_504(self, client, monkeypatch):
+        """Test that a rollup read past the deadline is a 504, not a 500."""
+        repository = get_payment_service()._repository
+
+        async def slow_rollups(start, end):
+            raise DeadlineExceededError("firestore.get_rollups")
+
+        monkeypatch.setattr(repository, "get_rollups", slow_rollups)
+
+        response = client.get("/api/stats")
+        assert response.status_code == 504
+        assert response.json()["detail"]["error"] == "DEADLINE_EXCEEDED"
+
+
+class TestCampaignTotalEndpoint:
+    """Tests for live campaign total endpoint."""
+
+    def test_get_campaign_total(self, client):
+        """Test that the total is public and cacheable."""
+        set_campaign_service(CampaignTotalService(InMemoryCampaignCounter(), "event_2026"))
+
+        response = client.get("/api/campaign/total")
+        assert response.status_code == 200
+        assert response.headers["cache-control"].startswith("public, max-age=")
+        data = response.json()
+        assert data["campaign_id"] == "event_2026"
+        assert data["total_amount"] == 0
+
+
+class TestExportEndpoint:
+    """Tests for donation export endpoint."""
+
+    @pytest.fixture
+    def export_client(self):
+        repository = InMemoryDonationRepository()
+        service = PaymentService(
+            repository=repository,
+            adapters={
+                PaymentProvider.PAYPAY: PayPayAdapter(
+                    webhook_secret="test_secret", production_mode=False
+                ),
+            },
+        )
+        set_payment_service(service)
+        set_donation_exporter(DonationExporter(repository))
+        return TestClient(app)
+
+    def test_export_ndjson(self, export_client):
+        """Test streaming an NDJSON export of created donations."""
+        export_client.post(
+            "/api/donations/checkout",
+            json={
+                "amount": 1000,
+                "source": "flyer_a",
+                "provider": "paypay",
+                "return_url": "https://example.com/thanks",
+                "cancel_url": "https://example.com/cancel",
+                "idempotency_key": "test-key-export",
+            },
+        )
+
+        response = export_client.get("/api/exports/donations", params={"format": "ndjson"})
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert len(rows) == 1
+        assert rows[0]["amount"] == 1000
+        assert rows[0]["status"] == "pending"
+
+    def test_export_requires_admin_token(self, export_client, monkeypatch):
+        """Test that a configured admin token is enforced."""
+        monkeypatch.setattr(settings, "admin_api_token", "secret-token")
+
+        response = export_client.get("/api/exports/donations")
+        assert response.status_code == 401
+
+        response = export_client.get(
+            "/api/exports/donations", headers={"Authorization": "Bearer secret-token"}
+        )
+        assert response.status_code == 200
+        assert response.text.startswith("id,amount,")
+
+
+    def test_list_donations(self, export_client, monkeypatch):
+        """Test the admin listing with a field mask and an invalid cursor."""
+        for key in ("list-a", "list-b"):
+            export_client.post(
+                "/api/donations/checkout",
+                json={
+                    "amount": 1000,
+                    "source": "flyer_a",
+                    "provider": "paypay",
+                    "return_url": "https://example.com/thanks",
+                    "cancel_url": "https://example.com/cancel",
+                    "idempotency_key": key,
+                },
+            )
+
+        first = export_client.get(
+            "/api/donations", params={"limit": 1, "fields": "amount,status"}
+        )
+        assert first.status_code == 200
+        assert first.headers["cache-control"] == "no-store"
+        body = first.json()
+        assert set(body["items"][0]) == {"id", "amount", "status"}
+        second = export_client.get(
+            "/api/donations", params={"limit": 1, "cursor": body["next_cursor"]}
+        ).json()
+        assert second["items"][0]["id"] != body["items"][0]["id"]
+        assert second["next_cursor"] is None
+
+        assert export_client.get("/api/donations", params={"cursor": "x"}).status_code == 400
+        monkeypatch.setattr(settings, "admin_api_token", "secret-token")
+        assert export_client.get("/api/donations").status_code == 401
+
+
+class TestMetricsEndpoint:
+    """Tests for the metrics endpoint."""
+
+    def test_metrics_prometheus_format(self, client):
+        """Test that recorded metrics are rendered as Prometheus text."""
+        metrics.inc("test_requests_total", description="Test counter", route="/x")
+
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert "# TYPE test_requests_total counter" in response.text
+        assert 'test_requests_total{route="/x"} 1' in response.text
@@ -0,0 +1,97 @@
+"""Unit tests for the responsive image asset pipeline."""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.assets import IMMUTABLE_CACHE_CONTROL, SOURCE_DIR, AssetManifest, ImageSpec, build_assets
+
+pytest.importorskip("PIL")
+
+LOGO = "tadakayo-logo.jpg"
+
+
+@pytest.fixture(scope="module")
+def manifest(tmp_path_factory):
+    """Build the logo once into a temporary directory."""
+    build_dir = tmp_path_factory.mktemp("build")
+    return build_assets(
+        SOURCE_DIR, build_dir, images={LOGO: ImageSpec(widths=(48, 96, 2000), sizes="48px")}
+    )
+
+
+class TestBuildAssets:
+    """Tests for building variants and the manifest."""
+
+    def test_variants_are_smaller_and_content_hashed(self, manifest):
+        """Test that every width gets AVIF/WebP/JPEG files named by content hash."""
+        image = manifest.images[LOGO]
+
+        # 2000 is clamped to the source width instead of upscaling
+        assert sorted({v.width for v in image.variants}) == [48, 96, 900]
+        assert {v.format for v in image.variants} == {"avif", "webp", "jpeg"}
+        assert image.smallest(96).bytes < image.bytes / 10
+        for variant in image.variants:
+            data = (manifest.directory / variant.file).read_bytes()
+            assert len(data) == variant.bytes
+        assert set(manifest.icons) == {"favicon.ico", "apple-touch-icon.png"}
+
+    def test_manifest_round_trips(self, manifest):
+        """Test that a loaded manifest serves exactly the files of the build."""
+        loaded = AssetManifest.load(manifest.directory)
+
+        assert loaded.images[LOGO].variants == manifest.images[LOGO].variants
+        favicon = loaded.icons["favicon.ico"].file
+        assert loaded.file_path(favicon) == manifest.directory / favicon
+        assert loaded.file_path("manifest.json") is None
+        assert loaded.file_path("../" + favicon) is None
+
+
+class TestRewriteHtml:
+    """Tests for pointing pages at the built assets."""
+
+    def test_img_becomes_picture(self, manifest):
+        """Test that a source image is replaced and other images are kept."""
+        page = (
+            f'<img src="/static/assets/{LOGO}" alt="タダカヨ" class="header-logo">'
+            '<img src="/static/other.png" alt="">'
+        )
+
+        rewritten = manifest.rewrite_html(page)
+
+        image = manifest.images[LOGO]
+        assert rewritten.count("<picture") == 1
+        assert f'srcset="{image.srcset("avif")}"' in rewritten
+        assert 'class="header-logo"' in rewritten
+        assert f'src="{image.fallback.url}"' in rewritten
+        assert rewritten.endswith('<img src="/static/other.png" alt="">')
+
+    def test_without_build_pages_are_unchanged(self, tmp_path):
+        """Test that an empty manifest leaves pages as they are."""
+        page = f'<img src="/static/assets/{LOGO}" alt="">'
+
+        assert AssetManifest.load(tmp_path).rewrite_html(page) == page
+
+
+class TestAssetRoutes:
+    """Tests for serving built assets."""
+
+    def test_hashed_assets_are_immutable(self, manifest, monkeypatch):
+        """Test that pages link built files, served with immutable caching."""
+        monkeypatch.setattr(main, "ASSETS", manifest)
+        main.render_page.cache_clear()
+        client = TestClient(main.app)
+        try:
+            page = client.get("/thanks")
+            fallback = manifest.images[LOGO].fallback
+
+            assert fallback.url in page.text
+            response = client.get(fallback.url)
+            assert response.status_code == 200
+            assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+            assert client.get("/assets/manifest.json").status_code == 404
+            assert client.get("/favicon.ico").headers["content-type"] == (
+                "image/vnd.microsoft.icon"
+            )
+        finally:
+            main.render_page.cache_clear()
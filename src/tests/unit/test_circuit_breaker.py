@@ -0,0 +1,238 @@
+"""Unit tests for the provider circuit breaker."""
+
+import asyncio
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from app.adapters.base import (
+    CheckoutSessionInput,
+    CheckoutSessionResult,
+    NormalizedEvent,
+    PaymentProviderAdapter,
+    ProviderError,
+    WebhookVerificationResult,
+)
+from app.adapters.circuit_breaker import (
+    CircuitBreaker,
+    CircuitBreakerAdapter,
+    CircuitBreakerConfig,
+    CircuitOpenError,
+    CircuitState,
+)
+from app.deadline import DeadlineExceededError
+from app.metrics import metrics
+from app.models.donation import (
+    CheckoutRequest,
+    DonationStatus,
+    PaymentProvider,
+)
+from app.repositories.donation import InMemoryDonationRepository
+from app.services.payment import PaymentService, PaymentServiceError
+
+
+class FaultInjectingAdapter(PaymentProviderAdapter):
+    """Fake adapter whose failures and latency are controlled by the test."""
+
+    def __init__(self) -> None:
+        self.fail = False
+        # Raised instead of the default failure when set
+        self.error: Exception | None = None
+        self.delay = 0.0
+        self.calls = 0
+
+    @property
+    def provider_name(self) -> PaymentProvider:
+        return PaymentProvider.PAYPAY
+
+    async def create_checkout_session(
+        self, input: CheckoutSessionInput
+    ) -> CheckoutSessionResult:
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        if self.fail:
+            raise ProviderError(self.provider_name, "injected failure")
+        return CheckoutSessionResult(
+            redirect_url="https://example.com/pay",
+            provider_order_id=f"fake_{self.calls}",
+            expires_at=datetime.now(UTC) + timedelta(minutes=5),
+        )
+
+    async def verify_webhook(
+        self, headers: dict[str, str], body: bytes
+    ) -> WebhookVerificationResult:
+        return WebhookVerificationResult(valid=False, error="not supported")
+
+    def normalize_event(self, event: dict) -> NormalizedEvent:
+        return NormalizedEvent(DonationStatus.PENDING, "evt", "order", event)
+
+
+SESSION_INPUT = CheckoutSessionInput(
+    amount=1000,
+    currency="JPY",
+    order_id="don_cb",
+    return_url="https://example.com/thanks",
+    cancel_url="https://example.com/cancel",
+)
+
+
+class TestCircuitBreaker:
+    """Tests for CircuitBreaker with a fault-injecting adapter."""
+
+    @pytest.fixture
+    def clock(self):
+        return [0.0]
+
+    @pytest.fixture
+    def fake(self):
+        return FaultInjectingAdapter()
+
+    @pytest.fixture
+    def adapter(self, fake, clock):
+        config = CircuitBreakerConfig(
+            window_size=10,
+            min_calls=4,
+            failure_rate_threshold=0.5,
+            slow_call_seconds=0.05,
+            slow_call_rate_threshold=0.75,
+            open_seconds=30,
+            half_open_probes=2,
+        )
+        breaker = CircuitBreaker(PaymentProvider.PAYPAY, config, clock=lambda: clock[0])
+        return CircuitBreakerAdapter(fake, breaker)
+
+    async def _call(self, adapter):
+        try:
+            await adapter.create_checkout_session(SESSION_INPUT)
+            return "ok"
+        except CircuitOpenError:
+            return "rejected"
+        except ProviderError:
+            return "failed"
+
+    @pytest.mark.asyncio
+    async def test_opens_on_failure_rate_and_fails_fast(self, adapter, fake):
+        """Test that the circuit opens and stops calling the provider."""
+        fake.fail = True
+        results = [await self._call(adapter) for _ in range(6)]
+
+        assert results == ["failed"] * 4 + ["rejected"] * 2
+        assert fake.calls == 4
+        assert adapter.breaker.state == CircuitState.OPEN
+        assert metrics.get("circuit_breaker_state", provider="paypay") == 2
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        "error",
+        [
+            ProviderError(PaymentProvider.PAYPAY, "bad amount", code="INVALID_PARAMS"),
+            ProviderError(PaymentProvider.PAYPAY, "bad request", status_code=400),
+            ProviderError(PaymentProvider.PAYPAY, "throttled", status_code=429),
+            DeadlineExceededError("paypay.create_qr_code"),
+        ],
+    )
+    async def test_caller_errors_do_not_open(self, adapter, fake, error):
+        """Test that rejected requests and spent client deadlines are not provider failures."""
+        fake.error = error
+        for _ in range(8):
+            with pytest.raises(type(error)):
+                await adapter.create_checkout_session(SESSION_INPUT)
+
+        assert fake.calls == 8
+        assert adapter.breaker.state == CircuitState.CLOSED
+
+    @pytest.mark.asyncio
+    async def test_server_errors_open(self, adapter, fake):
+        """Test that 5xx responses count as provider failures."""
+        fake.error = ProviderError(PaymentProvider.PAYPAY, "maintenance", status_code=503)
+        results = [await self._call(adapter) for _ in range(5)]
+
+        assert results == ["failed"] * 4 + ["rejected"]
+
+    @pytest.mark.asyncio
+    async def test_opens_on_slow_calls(self, adapter, fake):
+        """Test that consistently slow calls open the circuit."""
+        fake.delay = 0.06
+        for _ in range(4):
+            assert await self._call(adapter) == "ok"
+
+        assert adapter.breaker.state == CircuitState.OPEN
+
+    @pytest.mark.asyncio
+    async def test_half_open_probes_close_circuit(self, adapter, fake, clock):
+        """Test that successful probes after the cool-down close the circuit."""
+        fake.fail = True
+        for _ in range(4):
+            await self._call(adapter)
+        assert adapter.breaker.state == CircuitState.OPEN
+
+        clock[0] = 31
+        fake.fail = False
+        assert adapter.breaker.state == CircuitState.HALF_OPEN
+        assert await self._call(adapter) == "ok"
+        assert adapter.breaker.state == CircuitState.HALF_OPEN
+        assert await self._call(adapter) == "ok"
+        assert adapter.breaker.state == CircuitState.CLOSED
+        assert (
+            metrics.get(
+                "circuit_breaker_transitions_total",
+                provider="paypay",
+                from_state="half_open",
+                to_state="closed",
+            )
+            >= 1
+        )
+
+    @pytest.mark.asyncio
+    async def test_failed_probe_reopens_circuit(self, adapter, fake, clock):
+        """Test that a failing probe sends the circuit back to open."""
+        fake.fail = True
+        for _ in range(4):
+            await self._call(adapter)
+
+        clock[0] = 31
+        assert await self._call(adapter) == "failed"
+        assert adapter.breaker.state == CircuitState.OPEN
+        assert await self._call(adapter) == "rejected"
+
+    @pytest.mark.asyncio
+    async def test_half_open_limits_concurrent_probes(self, adapter, fake, clock):
+        """Test that only the configured number of probes run at once."""
+        fake.fail = True
+        for _ in range(4):
+            await self._call(adapter)
+
+        clock[0] = 31
+        fake.fail = False
+        fake.delay = 0.01
+        results = await asyncio.gather(*(self._call(adapter) for _ in range(5)))
+
+        assert sorted(results) == ["ok", "ok", "rejected", "rejected", "rejected"]
+
+    @pytest.mark.asyncio
+    async def test_service_reports_provider_unavailable(self, adapter, fake):
+        """Test that an open circuit surfaces as PROVIDER_UNAVAILABLE with retry hint."""
+        service = PaymentService(
+            repository=InMemoryDonationRepository(),
+            adapters={PaymentProvider.PAYPAY: adapter},
+        )
+        fake.fail = True
+        request = CheckoutRequest(
+            amount=1000,
+            source="flyer_a",
+            provider=PaymentProvider.PAYPAY,
+            return_url="https://example.com/thanks",
+            cancel_url="https://example.com/cancel",
+            idempotency_key="cb-key",
+        )
+        for _ in range(4):
+            with pytest.raises(PaymentServiceError):
+                await service.create_checkout(request)
+
+        with pytest.raises(PaymentServiceError) as exc_info:
+            await service.create_checkout(request)
+        assert exc_info.value.code == "PROVIDER_UNAVAILABLE"
+        assert exc_info.value.retry_after == 30
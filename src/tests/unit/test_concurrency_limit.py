@@ -0,0 +1,203 @@
+"""Unit tests for the adaptive provider concurrency limiter."""
+
+import asyncio
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from app.adapters.base import (
+    CheckoutSessionInput,
+    CheckoutSessionResult,
+    NormalizedEvent,
+    PaymentProviderAdapter,
+    ProviderError,
+    WebhookVerificationResult,
+)
+from app.adapters.concurrency_limit import (
+    AIMDLimiter,
+    ConcurrencyLimitAdapter,
+    ConcurrencyLimitConfig,
+    ConcurrencyLimitExceededError,
+    is_overload,
+)
+from app.metrics import metrics
+from app.models.donation import DonationStatus, PaymentProvider
+
+
+class LatencyInjectingProvider(PaymentProviderAdapter):
+    """Fake provider that slows down past ``capacity`` and 429s past ``rate_limit``."""
+
+    def __init__(self, capacity: int, rate_limit: int, base_latency: float = 0.005):
+        self.capacity = capacity
+        self.rate_limit = rate_limit
+        self.base_latency = base_latency
+        self.in_flight = 0
+        self.peak = 0
+        self.calls = 0
+        self.rate_limited = 0
+
+    @property
+    def provider_name(self) -> PaymentProvider:
+        return PaymentProvider.PAYPAY
+
+    async def create_checkout_session(
+        self, input: CheckoutSessionInput
+    ) -> CheckoutSessionResult:
+        self.calls += 1
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            if self.in_flight > self.rate_limit:
+                self.rate_limited += 1
+                raise ProviderError(
+                    self.provider_name, "Too many requests", code="RATE_LIMIT", status_code=429
+                )
+            await asyncio.sleep(self.base_latency * max(1.0, self.in_flight / self.capacity))
+            return CheckoutSessionResult(
+                redirect_url="https://example.com/pay",
+                provider_order_id=f"fake_{self.calls}",
+                expires_at=datetime.now(UTC) + timedelta(minutes=5),
+            )
+        finally:
+            self.in_flight -= 1
+
+    async def verify_webhook(
+        self, headers: dict[str, str], body: bytes
+    ) -> WebhookVerificationResult:
+        return WebhookVerificationResult(valid=False, error="not supported")
+
+    def normalize_event(self, event: dict) -> NormalizedEvent:
+        return NormalizedEvent(DonationStatus.PENDING, "evt", "order", event)
+
+
+SESSION_INPUT = CheckoutSessionInput(
+    amount=1000,
+    currency="JPY",
+    order_id="don_limit",
+    return_url="https://example.com/thanks",
+    cancel_url="https://example.com/cancel",
+)
+
+
+async def run_load(adapter: PaymentProviderAdapter, clients: int, calls_each: int) -> dict:
+    """Drive ``clients`` concurrent callers and count outcomes."""
+    outcomes = {"ok": 0, "rate_limited": 0, "shed": 0}
+
+    async def client() -> None:
+        for _ in range(calls_each):
+            try:
+                await adapter.create_checkout_session(SESSION_INPUT)
+                outcomes["ok"] += 1
+            except ConcurrencyLimitExceededError:
+                outcomes["shed"] += 1
+            except ProviderError:
+                outcomes["rate_limited"] += 1
+
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return outcomes
+
+
+class TestAIMDLimiter:
+    """Tests for limit adjustment."""
+
+    def test_overload_classification(self):
+        """Test which provider errors count as overload signals."""
+        provider = PaymentProvider.PAYPAY
+        assert is_overload(ProviderError(provider, "x", status_code=429))
+        assert is_overload(ProviderError(provider, "x", status_code=503))
+        assert is_overload(ProviderError(provider, "connection reset"))
+        assert is_overload(TimeoutError())
+        assert not is_overload(ProviderError(provider, "x", code="INVALID_PARAMS"))
+        assert not is_overload(ProviderError(provider, "x", status_code=400))
+
+    @pytest.mark.asyncio
+    async def test_grows_only_while_utilized(self):
+        """Test that fast calls grow the limit only when it is in use."""
+        limiter = AIMDLimiter(PaymentProvider.PAYPAY, ConcurrencyLimitConfig(initial_limit=4))
+
+        permit = await limiter.acquire()
+        await limiter.release(permit, overloaded=False)
+        assert limiter.limit == 4  # one call in flight out of four
+
+        permits = [await limiter.acquire() for _ in range(4)]
+        for permit in permits:
+            await limiter.release(permit, overloaded=False)
+        assert limiter.limit > 4
+        assert metrics.get("provider_concurrency_limit", provider="paypay") == limiter.limit
+
+    @pytest.mark.asyncio
+    async def test_backs_off_once_per_burst(self):
+        """Test that errors from calls already in flight back off only once."""
+        limiter = AIMDLimiter(
+            PaymentProvider.PAYPAY,
+            ConcurrencyLimitConfig(initial_limit=8, backoff_ratio=0.5),
+        )
+        permits = [await limiter.acquire() for _ in range(8)]
+        for permit in permits:
+            await limiter.release(permit, overloaded=True)
+        assert limiter.limit == 4
+
+        permit = await limiter.acquire()
+        await limiter.release(permit, overloaded=True)
+        assert limiter.limit == 2
+
+    @pytest.mark.asyncio
+    async def test_rejects_when_no_slot_frees(self):
+        """Test that a call over the limit waits, then fails without calling out."""
+        limiter = AIMDLimiter(
+            PaymentProvider.PAYPAY,
+            ConcurrencyLimitConfig(initial_limit=1, max_wait_seconds=0.01),
+        )
+        held = await limiter.acquire()
+
+        with pytest.raises(ConcurrencyLimitExceededError) as exc_info:
+            await limiter.acquire()
+        assert exc_info.value.retry_after == 0.01
+        assert metrics.get("provider_concurrency_rejected_total", provider="paypay") == 1
+
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        await limiter.release(held, overloaded=None)
+        permit = await asyncio.wait_for(waiter, 1)
+        assert permit.in_flight == 1
+
+
+class TestSimulation:
+    """Load simulation against a latency-injecting fake provider."""
+
+    @pytest.mark.asyncio
+    async def test_unlimited_load_hits_rate_limit(self):
+        """Baseline: without a limiter the burst trips the provider's rate limit."""
+        provider = LatencyInjectingProvider(capacity=4, rate_limit=10)
+
+        outcomes = await run_load(provider, clients=30, calls_each=5)
+
+        assert provider.rate_limited == outcomes["rate_limited"]
+        assert outcomes["rate_limited"] > outcomes["ok"]
+
+    @pytest.mark.asyncio
+    async def test_limiter_converges_below_rate_limit(self):
+        """Test that the limit settles near the provider's limits and avoids most 429s."""
+        provider = LatencyInjectingProvider(capacity=4, rate_limit=10)
+        limiter = AIMDLimiter(
+            PaymentProvider.PAYPAY,
+            ConcurrencyLimitConfig(
+                initial_limit=2,
+                max_limit=50,
+                # 2x the unloaded latency: reached above 2x capacity
+                latency_threshold_seconds=provider.base_latency * 2,
+                backoff_ratio=0.75,
+                max_wait_seconds=5.0,
+            ),
+        )
+        adapter = ConcurrencyLimitAdapter(provider, limiter)
+
+        outcomes = await run_load(adapter, clients=30, calls_each=5)
+
+        assert outcomes["shed"] == 0
+        assert outcomes["ok"] + outcomes["rate_limited"] == 150
+        assert outcomes["rate_limited"] < 15
+        assert provider.peak <= provider.rate_limit + 1
+        # Oscillates around the point where 429s start instead of running away
+        assert 2 <= limiter.limit < 2 * provider.rate_limit
+        assert limiter.in_flight == 0
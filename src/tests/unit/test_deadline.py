@@ -0,0 +1,327 @@
+"""Unit tests for request deadline propagation."""
+
+import asyncio
+import hashlib
+import hmac
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import deadline
+from app.adapters.base import CheckoutSessionInput, ProviderError
+from app.adapters.paypay import PayPayAdapter
+from app.api.donations import set_payment_service
+from app.config import settings
+from app.main import app
+from app.models.donation import CheckoutRequest, DonationStatus, PaymentProvider
+from app.repositories.counter import FirestoreCampaignCounter
+from app.repositories.donation import InMemoryDonationRepository
+from app.services.payment import PaymentService, RequestTimeoutError
+
+
+class TestDeadlineScope:
+    """Tests for the deadline context helpers."""
+
+    def test_no_deadline_uses_cap(self):
+        """Test that without a deadline the per-call cap applies."""
+        assert deadline.remaining() is None
+        assert deadline.timeout("op", cap=2.0) == 2.0
+        assert deadline.timeout("op") is None
+
+    def test_timeout_is_remaining_budget_capped(self):
+        """Test that the timeout is the smaller of budget and cap."""
+        with deadline.scope(1.0):
+            assert deadline.timeout("op", cap=5.0) <= 1.0
+            assert deadline.timeout("op", cap=0.1) == 0.1
+        assert deadline.remaining() is None
+
+    def test_nested_scope_cannot_extend(self):
+        """Test that an inner scope keeps the earlier outer deadline."""
+        with deadline.scope(0.5), deadline.scope(10.0):
+            assert deadline.remaining() <= 0.5
+
+    def test_expired_budget_raises(self):
+        """Test that calls after the deadline fail without a timeout."""
+        with deadline.scope(0.0), pytest.raises(deadline.DeadlineExceededError) as exc_info:
+            deadline.timeout("firestore.get_donation")
+        assert exc_info.value.operation == "firestore.get_donation"
+
+    @pytest.mark.asyncio
+    async def test_wait_distinguishes_deadline_from_cap(self):
+        """Test that only an exhausted budget raises DeadlineExceededError."""
+        with deadline.scope(0.02), pytest.raises(deadline.DeadlineExceededError):
+            await deadline.wait("slow", lambda t: asyncio.sleep(1))
+
+        with deadline.scope(5.0), pytest.raises(TimeoutError):
+            await deadline.wait("slow", lambda t: asyncio.sleep(1), cap=0.02)
+
+    @pytest.mark.asyncio
+    async def test_retry_idempotent_retries_transient_errors(self):
+        """Test that transient failures are retried within the budget."""
+        calls = []
+
+        async def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise ConnectionError("unavailable")
+            return "ok"
+
+        with deadline.scope(5.0):
+            result = await deadline.retry_idempotent(
+                "read", flaky, (ConnectionError,), base_delay=0.001
+            )
+        assert result == "ok"
+        assert len(calls) == 3
+
+    @pytest.mark.asyncio
+    async def test_retry_stops_when_budget_is_spent(self):
+        """Test that no retry is attempted when the backoff exceeds the budget."""
+        calls = []
+
+        async def failing():
+            calls.append(1)
+            raise ConnectionError("unavailable")
+
+        with deadline.scope(0.001), pytest.raises(deadline.DeadlineExceededError):
+            await deadline.retry_idempotent(
+                "read", failing, (ConnectionError,), base_delay=1.0, max_delay=1.0
+            )
+        assert len(calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_retry_ignores_other_errors(self):
+        """Test that non-transient errors are raised immediately."""
+        calls = []
+
+        async def broken():
+            calls.append(1)
+            raise ValueError("bad request")
+
+        with pytest.raises(ValueError):
+            await deadline.retry_idempotent("read", broken, (ConnectionError,))
+        assert len(calls) == 1
+
+
+class SlowSDK:
+    """Stand-in for the blocking PayPay SDK client."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.timeouts: list[float | None] = []
+        self.Code = SimpleNamespace(create_qr_code=self.create_qr_code)
+
+    def create_qr_code(self, request, timeout=None):
+        self.timeouts.append(timeout)
+        time.sleep(self.delay)
+        return {
+            "resultInfo": {"code": "SUCCESS"},
+            "data": {"url": "https://qr.paypay.ne.jp/x", "codeId": "code_1"},
+        }
+
+
+SESSION_INPUT = CheckoutSessionInput(
+    amount=1000,
+    currency="JPY",
+    order_id="don_deadline",
+    return_url="https://example.com/thanks",
+    cancel_url="https://example.com/cancel",
+)
+
+
+class TestPayPayDeadline:
+    """Tests for the PayPay SDK call under a deadline."""
+
+    @pytest.mark.asyncio
+    async def test_sdk_receives_remaining_budget(self):
+        """Test that the SDK call is given the remaining budget as its timeout."""
+        adapter = PayPayAdapter(timeout=10.0)
+        adapter._client = SlowSDK(delay=0)
+
+        with deadline.scope(2.0):
+            result = await adapter.create_checkout_session(SESSION_INPUT)
+
+        assert result.provider_order_id == "code_1"
+        assert 0 < adapter._client.timeouts[0] <= 2.0
+
+    @pytest.mark.asyncio
+    async def test_slow_sdk_exceeds_deadline(self):
+        """Test that a slow SDK call fails with a deadline error, not a hang."""
+        adapter = PayPayAdapter(timeout=10.0)
+        adapter._client = SlowSDK(delay=0.2)
+
+        with deadline.scope(0.05), pytest.raises(deadline.DeadlineExceededError):
+            await adapter.create_checkout_session(SESSION_INPUT)
+
+    @pytest.mark.asyncio
+    async def test_provider_cap_is_provider_error(self):
+        """Test that hitting the per-call cap with budget left is a provider error."""
+        adapter = PayPayAdapter(timeout=0.05)
+        adapter._client = SlowSDK(delay=0.2)
+
+        with deadline.scope(5.0), pytest.raises(ProviderError):
+            await adapter.create_checkout_session(SESSION_INPUT)
+
+
+class SlowShards:
+    """Stand-in for a blocking Firestore shards collection (and its client)."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.timeouts: list[float | None] = []
+
+    def collection(self, name):
+        return self
+
+    def document(self, name):
+        return self
+
+    def set(self, data, merge=False, retry=None, timeout=None):
+        self.timeouts.append(timeout)
+        time.sleep(self.delay)
+
+    def stream(self, timeout=None):
+        self.timeouts.append(timeout)
+        time.sleep(self.delay)
+        return iter([SimpleNamespace(to_dict=lambda: {"amount": 1000, "count": 1})])
+
+
+class TestFirestoreCounterDeadline:
+    """Tests for the campaign counter's Firestore calls under a deadline."""
+
+    @pytest.mark.asyncio
+    async def test_calls_receive_remaining_budget(self):
+        """Test that increments and totals pass the remaining budget as timeout."""
+        shards = SlowShards(delay=0)
+        counter = FirestoreCampaignCounter(client=shards, num_shards=1)
+
+        with deadline.scope(2.0):
+            await counter.increment("default", 1000, 1)
+            total = await counter.get_total("default")
+
+        assert (total.amount, total.count) == (1000, 1)
+        assert all(0 < t <= 2.0 for t in shards.timeouts)
+
+    @pytest.mark.asyncio
+    async def test_slow_firestore_does_not_block_the_loop(self):
+        """Test that a slow shard read fails at the deadline while the loop runs."""
+        counter = FirestoreCampaignCounter(client=SlowShards(delay=0.2))
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        running = asyncio.create_task(ticker())
+        with deadline.scope(0.05), pytest.raises(deadline.DeadlineExceededError):
+            await counter.get_total("default")
+        running.cancel()
+
+        assert ticks > 2
+
+
+class InterruptingRepository(InMemoryDonationRepository):
+    """Repository whose first status update outlives the request deadline."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.stall_next_update = True
+
+    async def update_status(self, donation_id, status, completed_at=None):
+        if self.stall_next_update:
+            self.stall_next_update = False
+            await asyncio.sleep(0.05)
+            deadline.check("update_status")
+        return await super().update_status(donation_id, status, completed_at)
+
+
+def make_request(key: str) -> CheckoutRequest:
+    return CheckoutRequest(
+        amount=1000,
+        source="flyer_a",
+        provider=PaymentProvider.PAYPAY,
+        return_url="https://example.com/thanks",
+        cancel_url="https://example.com/cancel",
+        idempotency_key=key,
+    )
+
+
+class TestServiceDeadline:
+    """Tests for deadline handling in PaymentService."""
+
+    @pytest.mark.asyncio
+    async def test_checkout_fails_cleanly(self):
+        """Test that a checkout past its deadline raises and saves nothing."""
+        repository = InMemoryDonationRepository()
+        adapter = PayPayAdapter()
+        adapter._client = SlowSDK(delay=0.2)
+        service = PaymentService(
+            repository=repository, adapters={PaymentProvider.PAYPAY: adapter}
+        )
+
+        with deadline.scope(0.02), pytest.raises(RequestTimeoutError) as exc_info:
+            await service.create_checkout(make_request("deadline-key"))
+
+        assert exc_info.value.code == "DEADLINE_EXCEEDED"
+        assert repository._donations == {}
+
+    @pytest.mark.asyncio
+    async def test_interrupted_webhook_is_redone_on_retry(self, paypay_adapter):
+        """Test that a webhook cut short is not marked processed."""
+        repository = InterruptingRepository()
+        service = PaymentService(
+            repository=repository, adapters={PaymentProvider.PAYPAY: paypay_adapter}
+        )
+        checkout = await service.create_checkout(make_request("webhook-deadline"))
+        donation = await repository.get_by_id(checkout.donation_id)
+
+        body = (
+            '{"state": "COMPLETED", "payment_id": "pay_1", '
+            f'"merchant_payment_id": "{donation.provider_order_id}"}}'
+        ).encode()
+        signature = hmac.new(b"test_paypay_secret", body, hashlib.sha256).hexdigest()
+        headers = {"x-paypay-signature": signature}
+
+        with deadline.scope(0.02), pytest.raises(RequestTimeoutError):
+            await service.process_webhook(PaymentProvider.PAYPAY, headers, body)
+        assert not await repository.event_exists(PaymentProvider.PAYPAY, "pay_1")
+
+        # Provider redelivers the notification
+        await service.process_webhook(PaymentProvider.PAYPAY, headers, body)
+        updated = await repository.get_by_id(checkout.donation_id)
+        assert updated.status == DonationStatus.COMPLETED
+        assert await repository.event_exists(PaymentProvider.PAYPAY, "pay_1")
+
+
+class TestCheckoutEndpointDeadline:
+    """Tests for the deadline set by the checkout router."""
+
+    def test_checkout_timeout_returns_504(self, monkeypatch):
+        """Test that an exhausted checkout budget maps to 504."""
+        adapter = PayPayAdapter()
+        adapter._client = SlowSDK(delay=0.2)
+        set_payment_service(
+            PaymentService(
+                repository=InMemoryDonationRepository(),
+                adapters={PaymentProvider.PAYPAY: adapter},
+            )
+        )
+        monkeypatch.setattr(settings, "checkout_deadline_ms", 20)
+
+        response = TestClient(app).post(
+            "/api/donations/checkout",
+            json={
+                "amount": 1000,
+                "source": "flyer_a",
+                "provider": "paypay",
+                "return_url": "https://example.com/thanks",
+                "cancel_url": "https://example.com/cancel",
+                "idempotency_key": "deadline-api",
+            },
+        )
+
+        assert response.status_code == 504
+        assert response.json()["detail"]["error"] == "DEADLINE_EXCEEDED"
@@ -0,0 +1,201 @@
+"""Unit tests for the file-backed donation repository."""
+
+import asyncio
+import os
+from datetime import UTC, date, datetime, timedelta
+
+import pytest
+
+from app.metrics import metrics
+from app.models.donation import Donation, DonationStatus, PaymentEvent, PaymentProvider
+from app.repositories.donation import DonationQuery, TransitionOutcome
+from app.repositories.local import FileDonationRepository, RepositoryCorruptedError
+
+NOW = datetime(2026, 10, 19, 3, 0, tzinfo=UTC)
+
+
+def make_donation(number: int) -> Donation:
+    return Donation(
+        id=f"don_{number}",
+        amount=1000 + number,
+        provider=PaymentProvider.PAYPAY,
+        source="web",
+        provider_order_id=f"order_{number}",
+        idempotency_key=f"key_{number}",
+        created_at=NOW + timedelta(seconds=number),
+        updated_at=NOW + timedelta(seconds=number),
+    )
+
+
+def make_event(number: int) -> PaymentEvent:
+    return PaymentEvent(
+        id=f"evt_{number}",
+        provider=PaymentProvider.PAYPAY,
+        provider_event_id=f"paypay/{number}",
+        provider_order_id=f"order_{number}",
+        status=DonationStatus.COMPLETED,
+        received_at=NOW + timedelta(seconds=number),
+        raw_payload={"merchantPaymentId": f"order_{number}"},
+        signature_valid=True,
+    )
+
+
+async def fill(repository: FileDonationRepository, count: int) -> None:
+    for number in range(count):
+        await repository.create(make_donation(number))
+        await repository.save_payment_event(make_event(number))
+    await repository.update_status("don_1", DonationStatus.COMPLETED, NOW)
+
+
+async def crash(repository: FileDonationRepository) -> None:
+    """Release the directory like a killed process: no compaction."""
+    await repository._log.close()
+    os.close(repository._lock_fd)
+
+
+async def check_contents(repository: FileDonationRepository, count: int) -> None:
+    assert len(repository._donations) == count
+    completed = await repository.get_by_provider_order_id(PaymentProvider.PAYPAY, "order_1")
+    assert completed is not None
+    assert (completed.id, completed.status) == ("don_1", DonationStatus.COMPLETED)
+    assert await repository.get_by_id(f"don_{count - 1}") is not None
+    assert await repository.event_exists(PaymentProvider.PAYPAY, "paypay/0")
+    assert not await repository.event_exists(PaymentProvider.PAYPAY, "paypay/missing")
+    rollups = await repository.get_rollups(date(2026, 10, 19), date(2026, 10, 19))
+    assert {r.status: r.count for r in rollups} == {
+        DonationStatus.PENDING: count - 1,
+        DonationStatus.COMPLETED: 1,
+    }
+    page = await repository.list_donations(DonationQuery(), limit=2)
+    assert [item["id"] for item in page.items] == [f"don_{count - 1}", f"don_{count - 2}"]
+
+
+class TestFileDonationRepository:
+    """Tests for persistence, recovery and compaction."""
+
+    @pytest.mark.asyncio
+    async def test_reopen_replays_the_log(self, tmp_path):
+        """Test that writes survive a restart without a compaction."""
+        repository = FileDonationRepository(tmp_path)
+        await fill(repository, 5)
+        await crash(repository)
+
+        reopened = FileDonationRepository(tmp_path)
+
+        assert not (tmp_path / "snapshot.bin").exists()
+        await check_contents(reopened, 5)
+        await reopened.close()
+
+    @pytest.mark.asyncio
+    async def test_close_compacts_into_snapshot(self, tmp_path):
+        """Test that close folds the log into an indexed snapshot."""
+        repository = FileDonationRepository(tmp_path)
+        await fill(repository, 5)
+        await repository.close()
+
+        reopened = FileDonationRepository(tmp_path)
+
+        assert reopened._snapshot.count("donations") == 5
+        assert reopened._log_records == 0
+        assert [p.name for p in tmp_path.glob("wal-*.ndjson")] == [reopened._log.path.name]
+        await check_contents(reopened, 5)
+        # Changes on top of the snapshot are replayed over it
+        await reopened.update_status("don_2", DonationStatus.FAILED)
+        await reopened.delete_payment_events([make_event(0)], timedelta(days=1000))
+        await crash(reopened)
+
+        again = FileDonationRepository(tmp_path)
+        donation = await again.get_by_provider_order_id(PaymentProvider.PAYPAY, "order_2")
+        assert donation is not None and donation.status == DonationStatus.FAILED
+        assert await again.get_by_idempotency_key("key_2") == donation
+        assert "evt_0" not in again._events
+        assert await again.event_exists(PaymentProvider.PAYPAY, "paypay/0")
+        await again.close()
+
+    @pytest.mark.asyncio
+    async def test_background_compaction_keeps_concurrent_writes(self, tmp_path):
+        """Test that writes made during a compaction land in the next snapshot."""
+        repository = FileDonationRepository(tmp_path)
+        await fill(repository, 5)
+        compaction = asyncio.create_task(repository.compact())
+        # Let the compaction switch logs and start writing the snapshot
+        await asyncio.sleep(0)
+        await repository.create(make_donation(5))
+        await repository.update_status("don_0", DonationStatus.FAILED)
+        await compaction
+        assert repository._snapshot.count("donations") == 5
+        await crash(repository)
+
+        reopened = FileDonationRepository(tmp_path)
+
+        assert len(reopened._donations) == 6
+        donation = await reopened.get_by_provider_order_id(PaymentProvider.PAYPAY, "order_0")
+        assert donation is not None and donation.status == DonationStatus.FAILED
+        rollups = await reopened.get_rollups(date(2026, 10, 19), date(2026, 10, 19))
+        assert {r.status: r.count for r in rollups if r.count} == {
+            DonationStatus.PENDING: 4,
+            DonationStatus.COMPLETED: 1,
+            DonationStatus.FAILED: 1,
+        }
+        await reopened.close()
+
+    @pytest.mark.asyncio
+    async def test_log_size_triggers_compaction(self, tmp_path):
+        """Test that a compaction starts once the log reaches the limit."""
+        repository = FileDonationRepository(tmp_path, compact_records=4)
+        await fill(repository, 2)
+
+        assert repository._compaction is not None
+        await repository._compaction
+        assert repository._snapshot.count("donations") == 2
+        await repository.close()
+
+    @pytest.mark.asyncio
+    async def test_torn_tail_is_skipped(self, tmp_path):
+        """Test that a half-written last record is dropped, but not one mid-log."""
+        repository = FileDonationRepository(tmp_path)
+        await fill(repository, 3)
+        await crash(repository)
+        log = next(tmp_path.glob("wal-*.ndjson"))
+        with open(log, "ab") as f:
+            f.write(b'{"t":"donation","v":{"id":"don_')
+
+        reopened = FileDonationRepository(tmp_path)
+
+        await check_contents(reopened, 3)
+        await crash(reopened)
+        log.write_bytes(log.read_bytes().replace(b"\n", b"\n{\n", 1))
+        with pytest.raises(RepositoryCorruptedError):
+            FileDonationRepository(tmp_path)
+
+    @pytest.mark.asyncio
+    async def test_concurrent_writes_share_fsyncs(self, tmp_path):
+        """Test that writes arriving during a commit are committed together."""
+        repository = FileDonationRepository(tmp_path, commit_delay=0.01)
+
+        await asyncio.gather(*(repository.create(make_donation(n)) for n in range(20)))
+
+        count, total, _ = metrics.summary("file_repository_commit_records")
+        assert total == 20
+        assert count < 20
+        await repository.close()
+
+    @pytest.mark.asyncio
+    async def test_transition_rules_still_apply(self, tmp_path):
+        """Test that the in-memory status rules hold for the file backend."""
+        repository = FileDonationRepository(tmp_path)
+        await repository.create(make_donation(0))
+        await repository.update_status("don_0", DonationStatus.COMPLETED, NOW)
+
+        result = await repository.update_status("don_0", DonationStatus.PENDING)
+
+        assert result.outcome != TransitionOutcome.APPLIED
+        await repository.close()
+
+    def test_directory_is_locked(self, tmp_path):
+        """Test that a second process cannot open the same directory."""
+        repository = FileDonationRepository(tmp_path)
+
+        with pytest.raises(RuntimeError, match="single worker"):
+            FileDonationRepository(tmp_path)
+        asyncio.run(repository.close())
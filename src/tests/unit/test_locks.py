@@ -0,0 +1,101 @@
+"""Unit tests for keyed locks."""
+
+import asyncio
+
+import pytest
+
+from app import deadline
+from app.deadline import DeadlineExceededError
+from app.locks import KeyedLock
+from app.metrics import metrics
+
+
+class TestKeyedLock:
+    """Tests for per-key serialization and the lock table."""
+
+    @pytest.mark.asyncio
+    async def test_same_key_serialized_other_keys_parallel(self):
+        """Test that one key runs one block at a time while others overlap."""
+        locks: KeyedLock[str] = KeyedLock("test")
+        log: list[str] = []
+
+        async def work(key: str, name: str) -> None:
+            async with locks.hold(key):
+                log.append(f"{name} in")
+                await asyncio.sleep(0.01)
+                log.append(f"{name} out")
+
+        await asyncio.gather(work("a", "a1"), work("a", "a2"), work("b", "b1"))
+
+        assert log.index("a1 out") < log.index("a2 in")
+        assert log.index("b1 in") < log.index("a1 out")
+        assert len(locks) == 0
+        count, _, _ = metrics.summary("keyed_lock_wait_seconds", lock="test")
+        assert count == 1
+
+    @pytest.mark.asyncio
+    async def test_entries_dropped_after_errors_and_cancellation(self):
+        """Test that failed holders and cancelled waiters leave nothing behind."""
+        locks: KeyedLock[str] = KeyedLock("test")
+        holding = asyncio.Event()
+        release = asyncio.Event()
+
+        async def holder() -> None:
+            async with locks.hold("a"):
+                holding.set()
+                await release.wait()
+                raise RuntimeError("handler failed")
+
+        async def waiter() -> None:
+            async with locks.hold("a"):
+                pytest.fail("waiter should have been cancelled")
+
+        held = asyncio.create_task(holder())
+        await holding.wait()
+        waiting = asyncio.create_task(waiter())
+        await asyncio.sleep(0)
+        assert len(locks) == 1
+        waiting.cancel()
+        release.set()
+
+        with pytest.raises(RuntimeError):
+            await held
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert len(locks) == 0
+        async with locks.hold("a"):
+            pass
+
+    @pytest.mark.asyncio
+    async def test_wait_bounded_by_deadline(self):
+        """Test that a waiter gives up when its request deadline expires."""
+        locks: KeyedLock[str] = KeyedLock("test.lock")
+        release = asyncio.Event()
+
+        async def holder() -> None:
+            async with locks.hold("a"):
+                await release.wait()
+
+        held = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+
+        with deadline.scope(0.01), pytest.raises(DeadlineExceededError) as exc_info:
+            async with locks.hold("a"):
+                pass
+
+        assert exc_info.value.operation == "test.lock"
+        assert len(locks) == 1
+        release.set()
+        await held
+        assert len(locks) == 0
+
+    @pytest.mark.asyncio
+    async def test_expired_deadline_stops_uncontended_acquire(self):
+        """Test that a free key is not taken once the deadline has expired."""
+        locks: KeyedLock[str] = KeyedLock("test.lock")
+
+        with deadline.scope(0.0), pytest.raises(DeadlineExceededError):
+            async with locks.hold("a"):
+                pytest.fail("block should not run past the deadline")
+
+        assert len(locks) == 0
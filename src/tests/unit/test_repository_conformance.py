@@ -0,0 +1,469 @@
+"""Conformance tests run against every donation repository backend.
+
+The same scenarios run on the in-memory, file and SQLite backends, and on
+Firestore when FIRESTORE_EMULATOR_HOST points at an emulator. Operation
+budgets count the repository calls a service call costs, so an extra round
+trip on the checkout or webhook path fails a test instead of showing up as
+latency in production.
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import uuid
+from collections import Counter
+from collections.abc import AsyncIterator, Sequence
+from contextlib import AbstractAsyncContextManager
+from dataclasses import dataclass
+from datetime import UTC, date, datetime, timedelta
+from typing import Any
+
+import pytest
+
+from app.adapters.paypay import PayPayAdapter
+from app.models.donation import (
+    CheckoutRequest,
+    Donation,
+    DonationRollup,
+    DonationStatus,
+    PaymentEvent,
+    PaymentProvider,
+)
+from app.repositories.donation import (
+    DEFAULT_LIST_LIMIT,
+    DEFAULT_PAGE_SIZE,
+    DonationPage,
+    DonationQuery,
+    DonationRepositoryBase,
+    DonationVersion,
+    FirestoreDonationRepository,
+    InMemoryDonationRepository,
+    PaymentEventQuery,
+    StatusUpdate,
+    TransitionOutcome,
+)
+from app.repositories.local import FileDonationRepository
+from app.repositories.sqlite import SqliteDonationRepository
+from app.services.payment import DuplicateCheckoutError, DuplicateEventError, PaymentService
+
+NOW = datetime(2026, 10, 19, 3, 0, 0, 250000, tzinfo=UTC)
+TODAY = date(2026, 10, 19)
+
+BACKENDS = ["memory", "file", "sqlite", "firestore"]
+READS = {
+    "get_by_id",
+    "get_many",
+    "get_version",
+    "get_by_provider_order_id",
+    "get_by_idempotency_key",
+    "event_exists",
+    "get_rollups",
+    "stream_donations",
+    "list_donations",
+    "stream_payment_events",
+}
+WRITES = {"create", "update_status", "save_payment_event", "delete_payment_events"}
+
+
+@dataclass
+class Budget:
+    """Most repository calls a service call may make."""
+
+    reads: int
+    writes: int
+
+
+# Repository calls per service call
+# The idempotency key lookup, then the insert
+CHECKOUT_BUDGET = Budget(reads=1, writes=1)
+DUPLICATE_CHECKOUT_BUDGET = Budget(reads=1, writes=0)
+WEBHOOK_BUDGET = Budget(reads=2, writes=2)
+DUPLICATE_WEBHOOK_BUDGET = Budget(reads=1, writes=0)
+STATUS_BUDGET = Budget(reads=1, writes=0)
+
+
+class CountingRepository(DonationRepositoryBase):
+    """Delegates to a backend and counts the calls by method."""
+
+    def __init__(self, inner: DonationRepositoryBase):
+        self.inner = inner
+        self.calls: Counter[str] = Counter()
+
+    @property
+    def reads(self) -> int:
+        return sum(self.calls[name] for name in READS)
+
+    @property
+    def writes(self) -> int:
+        return sum(self.calls[name] for name in WRITES)
+
+    def reset(self) -> None:
+        self.calls.clear()
+
+    def assert_within(self, budget: Budget) -> None:
+        assert self.reads <= budget.reads and self.writes <= budget.writes, dict(self.calls)
+
+    async def create(self, donation: Donation) -> Donation:
+        self.calls["create"] += 1
+        return await self.inner.create(donation)
+
+    async def get_by_id(self, donation_id: str) -> Donation | None:
+        self.calls["get_by_id"] += 1
+        return await self.inner.get_by_id(donation_id)
+
+    async def get_many(self, donation_ids: Sequence[str]) -> dict[str, Donation]:
+        self.calls["get_many"] += 1
+        return await self.inner.get_many(donation_ids)
+
+    async def get_version(self, donation_id: str) -> DonationVersion | None:
+        self.calls["get_version"] += 1
+        return await self.inner.get_version(donation_id)
+
+    async def get_by_provider_order_id(
+        self, provider: PaymentProvider, provider_order_id: str
+    ) -> Donation | None:
+        self.calls["get_by_provider_order_id"] += 1
+        return await self.inner.get_by_provider_order_id(provider, provider_order_id)
+
+    async def get_by_idempotency_key(self, idempotency_key: str) -> Donation | None:
+        self.calls["get_by_idempotency_key"] += 1
+        return await self.inner.get_by_idempotency_key(idempotency_key)
+
+    async def update_status(
+        self, donation_id: str, status: DonationStatus, completed_at: datetime | None = None
+    ) -> StatusUpdate:
+        self.calls["update_status"] += 1
+        return await self.inner.update_status(donation_id, status, completed_at)
+
+    async def save_payment_event(self, event: PaymentEvent) -> PaymentEvent:
+        self.calls["save_payment_event"] += 1
+        return await self.inner.save_payment_event(event)
+
+    async def event_exists(self, provider: PaymentProvider, provider_event_id: str) -> bool:
+        self.calls["event_exists"] += 1
+        return await self.inner.event_exists(provider, provider_event_id)
+
+    async def delete_payment_events(
+        self, events: Sequence[PaymentEvent], dedupe_window: timedelta | None = None
+    ) -> None:
+        self.calls["delete_payment_events"] += 1
+        await self.inner.delete_payment_events(events, dedupe_window)
+
+    async def get_rollups(self, start: date, end: date) -> list[DonationRollup]:
+        self.calls["get_rollups"] += 1
+        return await self.inner.get_rollups(start, end)
+
+    def stream_donations(
+        self,
+        query: DonationQuery,
+        fields: Sequence[str] | None = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+    ) -> AsyncIterator[dict[str, Any]]:
+        self.calls["stream_donations"] += 1
+        return self.inner.stream_donations(query, fields, page_size)
+
+    async def list_donations(
+        self,
+        query: DonationQuery,
+        limit: int = DEFAULT_LIST_LIMIT,
+        cursor: str | None = None,
+        fields: Sequence[str] | None = None,
+    ) -> DonationPage:
+        self.calls["list_donations"] += 1
+        return await self.inner.list_donations(query, limit, cursor, fields)
+
+    def stream_payment_events(
+        self, query: PaymentEventQuery, page_size: int = DEFAULT_PAGE_SIZE
+    ) -> AsyncIterator[PaymentEvent]:
+        self.calls["stream_payment_events"] += 1
+        return self.inner.stream_payment_events(query, page_size)
+
+    def transaction(self) -> AbstractAsyncContextManager[None]:
+        return self.inner.transaction()
+
+    async def ping(self) -> None:
+        await self.inner.ping()
+
+    async def close(self) -> None:
+        await self.inner.close()
+
+
+def make_donation(number: int, **overrides: Any) -> Donation:
+    values = {
+        "id": f"don_{number}",
+        "amount": 1000 * (number + 1),
+        "provider": PaymentProvider.PAYPAY,
+        "source": "flyer_a" if number % 2 else "flyer_b",
+        "provider_order_id": f"order_{number}",
+        "idempotency_key": f"key_{number}",
+        "created_at": NOW + timedelta(minutes=number),
+        "updated_at": NOW + timedelta(minutes=number),
+    }
+    return Donation(**(values | overrides))
+
+
+def make_event(number: int, **overrides: Any) -> PaymentEvent:
+    values = {
+        "id": f"evt_{number}",
+        "provider": PaymentProvider.PAYPAY,
+        "provider_event_id": f"paypay/{number}",
+        "provider_order_id": f"order_{number}",
+        "status": DonationStatus.COMPLETED,
+        "received_at": NOW + timedelta(minutes=number),
+        "raw_payload": {"merchantPaymentId": f"order_{number}"},
+        "signature_valid": True,
+    }
+    return PaymentEvent(**(values | overrides))
+
+
+def buckets(rollups: list[DonationRollup]) -> dict[tuple[str, str], tuple[int, int]]:
+    """Non-empty rollup buckets by (source, status)."""
+    return {(r.source, r.status): (r.count, r.amount) for r in rollups if r.count}
+
+
+@pytest.fixture(params=BACKENDS)
+async def repository(request, tmp_path):
+    backend = request.param
+    if backend == "memory":
+        repository: DonationRepositoryBase = InMemoryDonationRepository()
+    elif backend == "file":
+        repository = FileDonationRepository(tmp_path / "file")
+    elif backend == "sqlite":
+        repository = SqliteDonationRepository(str(tmp_path / "donations.db"))
+    else:
+        if not os.environ.get("FIRESTORE_EMULATOR_HOST"):
+            pytest.skip("FIRESTORE_EMULATOR_HOST is not set")
+        # A project per test keeps the emulator's data apart
+        repository = FirestoreDonationRepository(project_id=f"test-{uuid.uuid4().hex[:12]}")
+    yield repository
+    await repository.close()
+
+
+class TestRepositoryConformance:
+    """Scenarios every backend must pass the same way."""
+
+    @pytest.mark.asyncio
+    async def test_donations_read_back_as_written(self, repository):
+        """Test reads by ID, IDs, version, provider order and idempotency key."""
+        donations = [make_donation(n) for n in range(3)]
+        for donation in donations:
+            assert await repository.create(donation) == donation
+
+        assert await repository.get_by_id("don_1") == donations[1]
+        assert await repository.get_by_id("don_missing") is None
+        assert await repository.get_many(["don_2", "don_missing", "don_0"]) == {
+            "don_0": donations[0],
+            "don_2": donations[2],
+        }
+        assert await repository.get_version("don_1") == DonationVersion(
+            status=DonationStatus.PENDING, updated_at=donations[1].updated_at
+        )
+        assert await repository.get_version("don_missing") is None
+        assert await repository.get_by_provider_order_id(
+            PaymentProvider.PAYPAY, "order_2"
+        ) == donations[2]
+        assert await repository.get_by_provider_order_id(PaymentProvider.RAKUTEN, "order_2") is None
+        assert await repository.get_by_idempotency_key("key_0") == donations[0]
+        assert await repository.get_by_idempotency_key("key_missing") is None
+
+    @pytest.mark.asyncio
+    async def test_status_transitions(self, repository):
+        """Test outcomes of update_status and that None keeps completed_at."""
+        await repository.create(make_donation(0))
+
+        completed = await repository.update_status("don_0", DonationStatus.COMPLETED, NOW)
+        unchanged = await repository.update_status("don_0", DonationStatus.COMPLETED)
+        rejected = await repository.update_status("don_0", DonationStatus.PENDING)
+        refunded = await repository.update_status("don_0", DonationStatus.REFUNDED)
+        missing = await repository.update_status("don_missing", DonationStatus.COMPLETED)
+
+        assert (completed.outcome, completed.previous_status) == (
+            TransitionOutcome.APPLIED,
+            DonationStatus.PENDING,
+        )
+        assert completed.donation.completed_at == NOW
+        assert unchanged.outcome == TransitionOutcome.UNCHANGED
+        assert rejected.outcome == TransitionOutcome.REJECTED
+        assert (refunded.outcome, refunded.previous_status) == (
+            TransitionOutcome.APPLIED,
+            DonationStatus.COMPLETED,
+        )
+        assert missing.outcome == TransitionOutcome.NOT_FOUND
+        stored = await repository.get_by_id("don_0")
+        assert stored.status == DonationStatus.REFUNDED
+        assert stored.completed_at == NOW
+        assert stored.updated_at > NOW
+        assert stored == refunded.donation
+
+    @pytest.mark.asyncio
+    async def test_rollups_follow_creates_and_transitions(self, repository):
+        """Test that daily buckets move with each status change."""
+        for number in range(3):
+            await repository.create(make_donation(number))
+        await repository.update_status("don_0", DonationStatus.COMPLETED, NOW)
+        await repository.update_status("don_1", DonationStatus.FAILED)
+        # Rejected and unchanged updates leave the buckets alone
+        await repository.update_status("don_0", DonationStatus.PENDING)
+        await repository.update_status("don_1", DonationStatus.FAILED)
+
+        rollups = await repository.get_rollups(TODAY, TODAY)
+
+        assert buckets(rollups) == {
+            ("flyer_b", DonationStatus.COMPLETED): (1, 1000),
+            ("flyer_a", DonationStatus.FAILED): (1, 2000),
+            ("flyer_b", DonationStatus.PENDING): (1, 3000),
+        }
+        assert await repository.get_rollups(date(2026, 10, 20), date(2026, 10, 21)) == []
+
+    @pytest.mark.asyncio
+    async def test_payment_events(self, repository):
+        """Test event scans, duplicate checks and markers of deleted events."""
+        events = [make_event(n) for n in range(3)]
+        for event in reversed(events):
+            await repository.save_payment_event(event)
+
+        streamed = [e async for e in repository.stream_payment_events(PaymentEventQuery(), 2)]
+        assert streamed == events
+        recent = PaymentEventQuery(
+            provider=PaymentProvider.PAYPAY, received_from=NOW + timedelta(minutes=1)
+        )
+        assert [e.id async for e in repository.stream_payment_events(recent)] == [
+            "evt_1",
+            "evt_2",
+        ]
+        assert await repository.event_exists(PaymentProvider.PAYPAY, "paypay/0")
+        assert not await repository.event_exists(PaymentProvider.RAKUTEN, "paypay/0")
+
+        await repository.delete_payment_events(events[:2], dedupe_window=timedelta(days=10000))
+        await repository.delete_payment_events(events[2:])
+
+        assert [e async for e in repository.stream_payment_events(PaymentEventQuery())] == []
+        assert await repository.event_exists(PaymentProvider.PAYPAY, "paypay/1")
+        assert not await repository.event_exists(PaymentProvider.PAYPAY, "paypay/2")
+
+    @pytest.mark.asyncio
+    async def test_listing_and_streaming(self, repository):
+        """Test newest-first pages, oldest-first streams, filters and fields."""
+        for number in range(5):
+            await repository.create(make_donation(number))
+        await repository.update_status("don_3", DonationStatus.COMPLETED, NOW)
+
+        first = await repository.list_donations(DonationQuery(), limit=2, fields=["amount"])
+        rest = await repository.list_donations(DonationQuery(), limit=5, cursor=first.next_cursor)
+        completed = await repository.list_donations(
+            DonationQuery(status=DonationStatus.COMPLETED)
+        )
+
+        assert first.items == [{"id": "don_4", "amount": 5000}, {"id": "don_3", "amount": 4000}]
+        assert [item["id"] for item in rest.items] == ["don_2", "don_1", "don_0"]
+        assert rest.next_cursor is None
+        assert [item["id"] for item in completed.items] == ["don_3"]
+        assert completed.items[0]["status"] == DonationStatus.COMPLETED
+
+        query = DonationQuery(source="flyer_b", created_to=NOW + timedelta(minutes=4))
+        rows = [row async for row in repository.stream_donations(query, ["amount"], 1)]
+        assert rows == [{"id": "don_0", "amount": 1000}, {"id": "don_2", "amount": 3000}]
+
+    @pytest.mark.asyncio
+    async def test_transaction_commits_its_calls(self, repository):
+        """Test that calls made in a transaction are visible once it ends."""
+        await repository.create(make_donation(0))
+
+        async with repository.transaction():
+            assert not await repository.event_exists(PaymentProvider.PAYPAY, "paypay/0")
+            await repository.update_status("don_0", DonationStatus.COMPLETED, NOW)
+            await repository.save_payment_event(make_event(0))
+
+        assert (await repository.get_by_id("don_0")).status == DonationStatus.COMPLETED
+        assert await repository.event_exists(PaymentProvider.PAYPAY, "paypay/0")
+        await repository.ping()
+
+
+class TestOperationBudgets:
+    """Repository calls per service call, on every backend."""
+
+    @pytest.fixture
+    def counting(self, repository):
+        return CountingRepository(repository)
+
+    @pytest.fixture
+    def service(self, counting):
+        adapters = {
+            PaymentProvider.PAYPAY: PayPayAdapter(
+                webhook_secret="test_secret", production_mode=False
+            ),
+        }
+        return PaymentService(repository=counting, adapters=adapters)
+
+    async def _webhook(self, service, order_id: str) -> None:
+        body = json.dumps(
+            {"state": "COMPLETED", "order_id": order_id, "payment_id": f"pay_{order_id}"}
+        ).encode()
+        signature = hmac.new(b"test_secret", body, hashlib.sha256).hexdigest()
+        await service.process_webhook(
+            PaymentProvider.PAYPAY, {"x-paypay-signature": signature}, body
+        )
+
+    @pytest.mark.asyncio
+    async def test_checkout_and_webhook(self, service, counting):
+        """Test the checkout, webhook and redelivery budgets."""
+        checkout = await service.create_checkout(
+            CheckoutRequest(
+                amount=1000,
+                source="flyer_a",
+                provider=PaymentProvider.PAYPAY,
+                return_url="https://example.com/thanks",
+                cancel_url="https://example.com/cancel",
+                idempotency_key="budget-key",
+            )
+        )
+        counting.assert_within(CHECKOUT_BUDGET)
+        donation = await counting.inner.get_by_id(checkout.donation_id)
+
+        counting.reset()
+        await self._webhook(service, donation.provider_order_id)
+        counting.assert_within(WEBHOOK_BUDGET)
+        assert counting.calls["update_status"] == 1
+
+        counting.reset()
+        with pytest.raises(DuplicateEventError):
+            await self._webhook(service, donation.provider_order_id)
+        counting.assert_within(DUPLICATE_WEBHOOK_BUDGET)
+
+        counting.reset()
+        status = await service.get_donation(checkout.donation_id)
+        assert status.status == DonationStatus.COMPLETED
+        counting.assert_within(STATUS_BUDGET)
+
+        counting.reset()
+        await service.get_donations([checkout.donation_id, "don_missing"])
+        counting.assert_within(STATUS_BUDGET)
+
+    @pytest.mark.asyncio
+    async def test_retried_checkout(self, service, counting, monkeypatch):
+        """Test that a reused idempotency key is refused before the provider is called."""
+        request = CheckoutRequest(
+            amount=1000,
+            source="flyer_a",
+            provider=PaymentProvider.PAYPAY,
+            return_url="https://example.com/thanks",
+            cancel_url="https://example.com/cancel",
+            idempotency_key="retried-key",
+        )
+        checkout = await service.create_checkout(request)
+
+        async def second_session(session_input):
+            raise AssertionError("a second provider session was opened")
+
+        monkeypatch.setattr(
+            service._get_adapter(PaymentProvider.PAYPAY), "create_checkout_session", second_session
+        )
+
+        counting.reset()
+        with pytest.raises(DuplicateCheckoutError):
+            await service.create_checkout(request)
+        counting.assert_within(DUPLICATE_CHECKOUT_BUDGET)
+        assert await counting.inner.get_by_idempotency_key("retried-key") == (
+            await counting.inner.get_by_id(checkout.donation_id)
+        )
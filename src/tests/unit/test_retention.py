@@ -0,0 +1,177 @@
+"""Unit tests for payment_events retention and archive reads."""
+
+from datetime import UTC, date, datetime, timedelta
+
+import pytest
+
+from app.models.donation import DonationStatus, PaymentEvent, PaymentProvider
+from app.repositories.archive import GcsArchiveStore, LocalArchiveStore, open_archive_store
+from app.repositories.donation import InMemoryDonationRepository
+from app.services.replay import read_ndjson
+from app.services.retention import PaymentEventArchiver, read_archive
+
+NOW = datetime(2026, 10, 19, 3, 0, tzinfo=UTC)
+
+
+def make_event(number: int, received_at: datetime, order_id: str = "order_1") -> PaymentEvent:
+    return PaymentEvent(
+        id=f"evt_{number}",
+        provider=PaymentProvider.PAYPAY,
+        provider_event_id=f"paypay/{number}",
+        provider_order_id=order_id,
+        status=DonationStatus.COMPLETED,
+        received_at=received_at,
+        raw_payload={"merchantPaymentId": order_id, "state": "COMPLETED"},
+        signature_valid=True,
+    )
+
+
+@pytest.fixture
+async def repository():
+    repository = InMemoryDonationRepository()
+    # Two old JST days (the second starts at 15:00 UTC) and one recent event
+    received = [
+        datetime(2026, 8, 1, 1, 0, tzinfo=UTC),
+        datetime(2026, 8, 1, 2, 0, tzinfo=UTC),
+        datetime(2026, 8, 1, 16, 0, tzinfo=UTC),
+        NOW - timedelta(days=1),
+    ]
+    for number, received_at in enumerate(received):
+        await repository.save_payment_event(
+            make_event(number, received_at, order_id=f"order_{number % 2}")
+        )
+    return repository
+
+
+class TestPaymentEventArchiver:
+    """Tests for archiving and deleting old events."""
+
+    @pytest.mark.asyncio
+    async def test_old_events_move_to_daily_archives(self, repository, tmp_path):
+        """Test that old events are archived per JST day and then deleted."""
+        store = LocalArchiveStore(tmp_path)
+        archiver = PaymentEventArchiver(
+            repository, store, retention=timedelta(days=30), deletes_per_second=1000
+        )
+
+        stats = await archiver.run(now=NOW)
+
+        assert (stats.archived, stats.deleted) == (3, 3)
+        assert stats.files == [
+            "payment_events/date=2026-08-01/20261019T030000Z-0000.ndjson.gz",
+            "payment_events/date=2026-08-02/20261019T030000Z-0000.ndjson.gz",
+        ]
+        assert store.list("payment_events/") == stats.files
+        assert list(tmp_path.rglob("*.partial")) == []
+        assert [e.id for e in repository._events.values()] == ["evt_3"]
+
+        archived = list(read_archive(store, date(2026, 8, 1), date(2026, 8, 2)))
+        assert [e.id for e in archived] == ["evt_0", "evt_1", "evt_2"]
+        assert archived[0].raw_payload == {"merchantPaymentId": "order_0", "state": "COMPLETED"}
+        only_order = read_archive(
+            store, date(2026, 8, 1), date(2026, 8, 2), provider_order_id="order_1"
+        )
+        assert [e.id for e in only_order] == ["evt_1"]
+
+    @pytest.mark.asyncio
+    async def test_rerun_archives_nothing_twice(self, repository, tmp_path):
+        """Test that a second run finds nothing and a re-archived event is read once."""
+        store = LocalArchiveStore(tmp_path)
+        archiver = PaymentEventArchiver(
+            repository, store, retention=timedelta(days=30), deletes_per_second=1000
+        )
+        await archiver.run(now=NOW)
+        # As if a run died after its upload: the event is archived again
+        await repository.save_payment_event(make_event(0, datetime(2026, 8, 1, 1, 0, tzinfo=UTC)))
+
+        stats = await archiver.run(now=NOW + timedelta(hours=1))
+
+        assert stats.archived == 1
+        archived = list(read_archive(store, date(2026, 8, 1), date(2026, 8, 1)))
+        assert [e.id for e in archived] == ["evt_0", "evt_1"]
+
+    @pytest.mark.asyncio
+    async def test_deleted_events_stay_duplicates_within_window(self, repository, tmp_path):
+        """Test that ID markers keep redeliveries detected until the window ends."""
+        archiver = PaymentEventArchiver(
+            repository,
+            LocalArchiveStore(tmp_path),
+            retention=timedelta(days=30),
+            dedupe_window=timedelta(days=80),
+            deletes_per_second=1000,
+        )
+        await archiver.run(now=NOW)
+
+        # Received 2026-08-01, so the marker lasts until 2026-10-20
+        assert await repository.event_exists(PaymentProvider.PAYPAY, "paypay/0")
+        repository._event_ids[("paypay", "paypay/0")] = NOW - timedelta(seconds=1)
+        assert not await repository.event_exists(PaymentProvider.PAYPAY, "paypay/0")
+
+    @pytest.mark.asyncio
+    async def test_deletes_are_throttled(self, repository, tmp_path):
+        """Test that deletes are spread out to the configured rate."""
+        deleted: list[int] = []
+        delete = repository.delete_payment_events
+
+        async def record(events, dedupe_window=None):
+            deleted.append(len(events))
+            await delete(events, dedupe_window)
+
+        repository.delete_payment_events = record
+        archiver = PaymentEventArchiver(
+            repository,
+            LocalArchiveStore(tmp_path),
+            retention=timedelta(days=30),
+            delete_batch_size=1,
+            deletes_per_second=50,
+        )
+
+        stats = await archiver.run(now=NOW)
+
+        assert deleted == [1, 1, 1]
+        assert stats.elapsed_seconds >= 3 / 50
+
+
+class TestArchiveStores:
+    """Tests for archive locations and the archive format."""
+
+    def test_open_archive_store(self, tmp_path):
+        """Test that URIs select the store."""
+        assert isinstance(open_archive_store(str(tmp_path)), LocalArchiveStore)
+        assert isinstance(open_archive_store(f"file://{tmp_path}"), LocalArchiveStore)
+        assert isinstance(open_archive_store("gs://bucket/events"), GcsArchiveStore)
+        with pytest.raises(ValueError):
+            open_archive_store("")
+        with pytest.raises(ValueError):
+            open_archive_store("s3://bucket")
+
+    def test_local_store_is_write_once(self, tmp_path):
+        """Test that keys are never overwritten or resolved outside the root."""
+        source = tmp_path / "source"
+        source.write_bytes(b"data")
+        store = LocalArchiveStore(tmp_path / "archive")
+        store.put("a/b.gz", source)
+
+        with pytest.raises(FileExistsError):
+            store.put("a/b.gz", source)
+        with pytest.raises(ValueError):
+            store.put("../escape.gz", source)
+        with store.open("a/b.gz") as stored:
+            assert stored.read() == b"data"
+
+    @pytest.mark.asyncio
+    async def test_archived_lines_can_be_replayed(self, repository, tmp_path):
+        """Test that archive lines parse as stored events for the replay tool."""
+        store = LocalArchiveStore(tmp_path)
+        archiver = PaymentEventArchiver(
+            repository, store, retention=timedelta(days=30), deletes_per_second=1000
+        )
+        stats = await archiver.run(now=NOW)
+
+        archived = read_archive(store, date(2026, 8, 1), date(2026, 8, 1))
+        lines = [e.model_dump_json() for e in archived]
+        events = list(read_ndjson(lines))
+
+        assert stats.files
+        assert [e.provider_event_id for e in events] == ["paypay/0", "paypay/1"]
+        assert events[0].received_at == datetime(2026, 8, 1, 1, 0, tzinfo=UTC)
@@ -0,0 +1,109 @@
+"""Unit tests for the server runtime."""
+
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
+
+from app import server
+from app.admission import AdmissionController, KeyedTokenBuckets
+from app.api import donations
+from app.config import settings
+from app.main import app
+
+CHECKOUT_BODY = {
+    "amount": 1000,
+    "source": "flyer_a",
+    "provider": "paypay",
+    "return_url": "https://example.com/thanks",
+    "cancel_url": "https://example.com/cancel",
+}
+
+
+class TestResolveWorkers:
+    """Tests for worker count resolution."""
+
+    def test_explicit_worker_count(self, monkeypatch):
+        """Test that WEB_CONCURRENCY is used as-is."""
+        monkeypatch.setattr(settings, "web_concurrency", 4)
+        assert server.resolve_workers() == 4
+
+    def test_zero_means_one_per_cpu(self, monkeypatch):
+        """Test that 0 resolves to the number of usable CPUs."""
+        monkeypatch.setattr(settings, "web_concurrency", 0)
+        monkeypatch.setattr(server, "available_cpus", lambda: 2)
+        assert server.resolve_workers() == 2
+
+
+class TestForkSafety:
+    """Tests for per-process service initialization."""
+
+    def test_service_from_other_process_is_rejected(self, payment_service, monkeypatch):
+        """Test that a service inherited across a fork is not reused."""
+        donations.set_payment_service(payment_service)
+        assert donations.get_payment_service() is payment_service
+
+        monkeypatch.setattr(donations, "_payment_service_pid", -1)
+        with pytest.raises(RuntimeError):
+            donations.get_payment_service()
+
+
+class TestColdStart:
+    """Tests for the cold-start import budget."""
+
+    def test_heavy_sdks_are_not_imported_at_startup(self):
+        """Test that importing the app does not import provider or Firestore SDKs."""
+        code = (
+            "import sys, app.main; "
+            "print(','.join(m for m in ('paypayopa', 'google.cloud.firestore', 'requests') "
+            "if m in sys.modules))"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=Path(__file__).resolve().parents[2],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        assert result.stdout.strip() == ""
+
+
+class TestProxyHeaders:
+    """Tests for the client address behind the Cloud Run front end."""
+
+    @pytest.fixture
+    def uvicorn_options(self, monkeypatch):
+        """The options main() passes to uvicorn.run."""
+        options = {}
+        monkeypatch.setattr(settings, "forwarded_allow_ips", "169.254.0.0/16")
+        monkeypatch.setattr(server.uvicorn, "run", lambda target, **kw: options.update(kw))
+        server.main()
+        return options
+
+    def test_spoofed_forwarded_for_is_still_rate_limited(
+        self, payment_service, uvicorn_options
+    ):
+        """Test that prepending addresses to X-Forwarded-For does not evade the IP limit."""
+        donations.set_payment_service(payment_service)
+        donations.set_admission_controller(
+            AdmissionController(ip_limiter=KeyedTokenBuckets(rate=0.5, burst=1))
+        )
+        proxied = ProxyHeadersMiddleware(
+            app, trusted_hosts=uvicorn_options["forwarded_allow_ips"]
+        )
+        client = TestClient(proxied, client=("169.254.1.1", 40000))
+
+        statuses = [
+            client.post(
+                "/api/donations/checkout",
+                json={**CHECKOUT_BODY, "idempotency_key": f"spoof-{n}"},
+                headers={"X-Forwarded-For": f"198.51.100.{n}, 203.0.113.7"},
+            ).status_code
+            for n in range(3)
+        ]
+        donations.set_admission_controller(None)
+
+        assert statuses == [200, 429, 429]
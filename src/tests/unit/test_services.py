@@ -1,8 +1,11 @@
 """Unit tests for payment service."""
 
+import csv
 import hashlib
 import hmac
+import io
 import json
+from datetime import UTC, date, datetime, timedelta
 
 import pytest
 
@@ -10,16 +13,27 @@ from app.adapters.paypay import PayPayAdapter
 from app.adapters.rakuten import RakutenPayAdapter
 from app.models.donation import (
     CheckoutRequest,
+    Donation,
     DonationStatus,
     PaymentProvider,
 )
-from app.repositories.donation import InMemoryDonationRepository
+from app.repositories.counter import InMemoryCampaignCounter
+from app.repositories.donation import (
+    DonationQuery,
+    InMemoryDonationRepository,
+    PaymentEventQuery,
+)
+from app.repositories.rollups import rollup_day
+from app.services.campaign import CampaignTotalService
+from app.services.export import DonationExporter, ExportFormat, ExportStats
 from app.services.payment import (
     DonationNotFoundError,
     DuplicateEventError,
     InvalidSignatureError,
     PaymentService,
+    PaymentServiceError,
 )
+from app.services.replay import ReplayEvent, WebhookReplayer, read_ndjson, stored_events
 
 
 class TestPaymentService:
@@ -197,3 +211,383 @@ class TestPaymentService:
                 headers={"x-paypay-signature": signature},
                 body=body,
             )
+
+    @pytest.mark.asyncio
+    async def test_get_stats_tracks_status_transitions(self, service, repository):
+        """Test that rollups move between status buckets on webhooks."""
+        for key in ("stats-1", "stats-2"):
+            await service.create_checkout(
+                CheckoutRequest(
+                    amount=1000,
+                    source="flyer_a",
+                    provider=PaymentProvider.PAYPAY,
+                    return_url="https://example.com/thanks",
+                    cancel_url="https://example.com/cancel",
+                    idempotency_key=key,
+                )
+            )
+        donation = next(iter(repository._donations.values()))
+
+        payload = {
+            "notification_type": "CAPTURED",
+            "merchant_payment_id": donation.provider_order_id,
+            "payment_id": "pay_stats",
+        }
+        body = json.dumps(payload).encode("utf-8")
+        signature = hmac.new(b"test_secret", body, hashlib.sha256).hexdigest()
+        await service.process_webhook(
+            provider=PaymentProvider.PAYPAY,
+            headers={"x-paypay-signature": signature},
+            body=body,
+        )
+
+        today = rollup_day(donation.created_at)
+        stats = await service.get_stats(date.fromisoformat(today), date.fromisoformat(today))
+
+        assert stats.total_count == 2
+        assert stats.totals[DonationStatus.PENDING].count == 1
+        assert stats.totals[DonationStatus.COMPLETED].count == 1
+        assert stats.totals[DonationStatus.COMPLETED].amount == 1000
+        assert stats.success_rate == 0.5
+
+    @pytest.mark.asyncio
+    async def test_get_stats_rejects_long_range(self, service):
+        """Test that stats queries are bounded in days."""
+        with pytest.raises(PaymentServiceError):
+            await service.get_stats(date(2026, 1, 1), date(2026, 12, 31))
+
+
+class TestCampaignTotalService:
+    """Tests for the live campaign total."""
+
+    @pytest.fixture
+    def counter(self):
+        return InMemoryCampaignCounter()
+
+    @pytest.fixture
+    def repository(self):
+        return InMemoryDonationRepository()
+
+    @pytest.fixture
+    def service(self, repository, counter):
+        campaign = CampaignTotalService(counter, "test_campaign", cache_ttl_seconds=0)
+        adapters = {
+            PaymentProvider.PAYPAY: PayPayAdapter(
+                webhook_secret="test_secret", production_mode=False
+            ),
+        }
+        return PaymentService(repository=repository, adapters=adapters, campaign=campaign)
+
+    async def _send_webhook(self, service, order_id, state, payment_id):
+        body = json.dumps(
+            {"state": state, "order_id": order_id, "payment_id": payment_id}
+        ).encode("utf-8")
+        signature = hmac.new(b"test_secret", body, hashlib.sha256).hexdigest()
+        await service.process_webhook(
+            provider=PaymentProvider.PAYPAY,
+            headers={"x-paypay-signature": signature},
+            body=body,
+        )
+
+    @pytest.mark.asyncio
+    async def test_completion_and_refund_update_total(self, service, repository, counter):
+        """Test that completion adds and refund removes the donation amount."""
+        checkout = await service.create_checkout(
+            CheckoutRequest(
+                amount=3000,
+                source="event_a",
+                provider=PaymentProvider.PAYPAY,
+                return_url="https://example.com/thanks",
+                cancel_url="https://example.com/cancel",
+                idempotency_key="campaign-key",
+            )
+        )
+        donation = await repository.get_by_id(checkout.donation_id)
+
+        await self._send_webhook(service, donation.provider_order_id, "COMPLETED", "pay_c1")
+        total = await counter.get_total("test_campaign")
+        assert (total.amount, total.count) == (3000, 1)
+
+        await self._send_webhook(service, donation.provider_order_id, "REFUNDED", "pay_c2")
+        total = await counter.get_total("test_campaign")
+        assert (total.amount, total.count) == (0, 0)
+
+    @pytest.mark.asyncio
+    async def test_get_total_is_cached(self, counter):
+        """Test that reads within the TTL do not hit the counter."""
+        now = [0.0]
+        campaign = CampaignTotalService(
+            counter, "cached", cache_ttl_seconds=2.0, clock=lambda: now[0]
+        )
+        await counter.increment("cached", 1000, 1)
+        assert (await campaign.get_total()).total_amount == 1000
+
+        await counter.increment("cached", 500, 1)
+        assert (await campaign.get_total()).total_amount == 1000
+
+        now[0] = 2.5
+        total = await campaign.get_total()
+        assert total.total_amount == 1500
+        assert total.donation_count == 2
+
+
+class TestDonationExporter:
+    """Tests for streaming donation export."""
+
+    @pytest.fixture
+    async def repository(self):
+        repository = InMemoryDonationRepository()
+        base = datetime(2026, 1, 10, 3, 0, tzinfo=UTC)
+        for i in range(50):
+            await repository.create(
+                Donation(
+                    id=f"don_{i:04d}",
+                    amount=100 + i,
+                    provider=PaymentProvider.PAYPAY,
+                    status=DonationStatus.COMPLETED if i % 2 else DonationStatus.PENDING,
+                    source="flyer_a",
+                    provider_order_id=f"paypay_{i}",
+                    idempotency_key=f"key-{i}",
+                    created_at=base + timedelta(hours=i),
+                    updated_at=base + timedelta(hours=i),
+                )
+            )
+        return repository
+
+    async def _collect(self, exporter, query, export_format):
+        return [chunk async for chunk in exporter.export(query, export_format)]
+
+    @pytest.mark.asyncio
+    async def test_export_csv_filters_and_orders(self, repository):
+        """Test CSV export with a status filter."""
+        exporter = DonationExporter(repository)
+        chunks = await self._collect(
+            exporter, DonationQuery(status=DonationStatus.COMPLETED), ExportFormat.CSV
+        )
+
+        rows = list(csv.reader(io.StringIO(b"".join(chunks).decode("utf-8"))))
+        assert rows[0][:3] == ["id", "amount", "currency"]
+        assert len(rows) == 26
+        assert [row[0] for row in rows[1:3]] == ["don_0001", "don_0003"]
+        assert "idempotency_key" not in rows[0]
+
+    @pytest.mark.asyncio
+    async def test_export_csv_neutralizes_formulas(self, repository):
+        """Test that a formula in a free-text field is exported as text."""
+        source = '=HYPERLINK("https://evil.example","x")'
+        await repository.create(
+            Donation(
+                id="don_9999",
+                amount=1000,
+                provider=PaymentProvider.PAYPAY,
+                source=source,
+                provider_order_id="@SUM(1+1)",
+                idempotency_key="key-formula",
+                created_at=datetime(2026, 1, 9, tzinfo=UTC),
+                updated_at=datetime(2026, 1, 9, tzinfo=UTC),
+            )
+        )
+        exporter = DonationExporter(repository)
+
+        csv_chunks = await self._collect(exporter, DonationQuery(), ExportFormat.CSV)
+        ndjson_chunks = await self._collect(exporter, DonationQuery(), ExportFormat.NDJSON)
+
+        rows = list(csv.DictReader(io.StringIO(b"".join(csv_chunks).decode("utf-8"))))
+        row = next(row for row in rows if row["id"] == "don_9999")
+        assert row["source"] == "'" + source
+        assert row["provider_order_id"] == "'@SUM(1+1)"
+        assert row["amount"] == "1000"
+        # NDJSON is not opened in spreadsheets and keeps the value as stored
+        records = [json.loads(line) for line in b"".join(ndjson_chunks).splitlines()]
+        assert next(r for r in records if r["id"] == "don_9999")["source"] == source
+
+    @pytest.mark.asyncio
+    async def test_export_ndjson_streams_bounded_chunks(self, repository):
+        """Test that NDJSON output is emitted in bounded chunks."""
+        exporter = DonationExporter(repository, chunk_size=1024)
+        stats = ExportStats()
+        query = DonationQuery(created_to=datetime(2026, 1, 11, 3, 0, tzinfo=UTC))
+
+        chunks = [
+            chunk
+            async for chunk in exporter.export(query, ExportFormat.NDJSON, stats=stats)
+        ]
+
+        assert len(chunks) > 1
+        assert all(len(chunk) < 1024 + 512 for chunk in chunks)
+        lines = b"".join(chunks).decode("utf-8").splitlines()
+        assert len(lines) == stats.rows == 24
+        assert json.loads(lines[0])["created_at"] == "2026-01-10T03:00:00+00:00"
+        assert stats.bytes == sum(len(chunk) for chunk in chunks)
+
+
+class TestDonationListing:
+    """Tests for keyset-paginated donation listing."""
+
+    @pytest.fixture
+    async def service(self):
+        repository = InMemoryDonationRepository()
+        base = datetime(2026, 1, 10, 3, 0, tzinfo=UTC)
+        for i in range(25):
+            await repository.create(
+                Donation(
+                    id=f"don_{i:04d}",
+                    amount=100 + i,
+                    provider=PaymentProvider.PAYPAY,
+                    status=DonationStatus.COMPLETED if i % 2 else DonationStatus.PENDING,
+                    source="flyer_a",
+                    provider_order_id=f"paypay_{i}",
+                    idempotency_key=f"key-{i}",
+                    # Pairs share a timestamp, so pages must break ties by ID
+                    created_at=base + timedelta(hours=i // 2),
+                    updated_at=base,
+                )
+            )
+        return PaymentService(repository=repository, adapters={})
+
+    @pytest.mark.asyncio
+    async def test_pages_cover_every_donation_once(self, service):
+        """Test that following cursors lists all matches newest first."""
+        ids: list[str] = []
+        cursor = None
+        while True:
+            page = await service.list_donations(
+                DonationQuery(), limit=4, cursor=cursor, fields=["amount"]
+            )
+            ids.extend(item["id"] for item in page.items)
+            if page.next_cursor is None:
+                break
+            cursor = page.next_cursor
+
+        assert ids == [f"don_{i:04d}" for i in reversed(range(25))]
+        assert page.items[-1] == {"id": "don_0000", "amount": 100}
+
+    @pytest.mark.asyncio
+    async def test_filters_and_default_fields(self, service):
+        """Test status filtering and that internal fields are not listed."""
+        page = await service.list_donations(
+            DonationQuery(status=DonationStatus.COMPLETED), limit=20
+        )
+
+        assert len(page.items) == 12
+        assert page.next_cursor is None
+        assert page.items[0]["id"] == "don_0023"
+        assert "idempotency_key" not in page.items[0]
+
+    @pytest.mark.asyncio
+    async def test_invalid_arguments(self, service):
+        """Test that bad cursors, fields and limits are rejected."""
+        for kwargs in (
+            {"cursor": "not-a-cursor"},
+            {"fields": ["idempotency_key"]},
+            {"limit": 0},
+        ):
+            with pytest.raises(PaymentServiceError) as exc_info:
+                await service.list_donations(DonationQuery(), **kwargs)
+            assert exc_info.value.code == "INVALID_ARGUMENT"
+
+
+class TestWebhookReplayer:
+    """Tests for bulk webhook replay."""
+
+    @pytest.fixture
+    async def repository(self):
+        repository = InMemoryDonationRepository()
+        now = datetime.now(UTC)
+        for i in range(20):
+            await repository.create(
+                Donation(
+                    id=f"don_{i:04d}",
+                    amount=1000,
+                    provider=PaymentProvider.PAYPAY,
+                    source="flyer_a",
+                    provider_order_id=f"order_{i}",
+                    idempotency_key=f"key-{i}",
+                    created_at=now,
+                    updated_at=now,
+                )
+            )
+        return repository
+
+    @pytest.fixture
+    def service(self, repository):
+        adapters = {
+            PaymentProvider.PAYPAY: PayPayAdapter(production_mode=False),
+            PaymentProvider.RAKUTEN: RakutenPayAdapter(sandbox=True),
+        }
+        return PaymentService(repository=repository, adapters=adapters)
+
+    def _events(self):
+        """Completion for every order, then refunds for the first five."""
+        lines = [
+            json.dumps({"state": "COMPLETED", "order_id": f"order_{i}", "payment_id": f"p{i}"})
+            for i in range(20)
+        ]
+        lines += [
+            json.dumps(
+                {"notification_type": "REFUNDED", "order_id": f"order_{i}", "payment_id": f"r{i}"}
+            )
+            for i in range(5)
+        ]
+        lines.append(json.dumps({"state": "COMPLETED", "order_id": "unknown", "payment_id": "x"}))
+        return list(read_ndjson(lines, PaymentProvider.PAYPAY))
+
+    @pytest.mark.asyncio
+    async def test_replay_applies_in_order_per_donation(self, service, repository):
+        """Test that parallel replay keeps each order's events in sequence."""
+        stats = await WebhookReplayer(service, parallelism=4).replay(self._events())
+
+        assert (stats.events, stats.changed, stats.not_found) == (26, 25, 1)
+        assert stats.recorded == 26
+        assert (await repository.get_by_id("don_0000")).status == DonationStatus.REFUNDED.value
+        assert (await repository.get_by_id("don_0019")).status == DonationStatus.COMPLETED.value
+
+    @pytest.mark.asyncio
+    async def test_replay_is_idempotent(self, service, repository):
+        """Test that replaying stored events again changes and records nothing."""
+        replayer = WebhookReplayer(service, parallelism=4)
+        await replayer.replay(self._events())
+
+        stats = await replayer.replay(stored_events(repository, PaymentEventQuery()))
+
+        assert stats.events == 26
+        # Completions received before the refunds are not re-applied
+        assert stats.stale == 5
+        assert stats.changed == stats.recorded == stats.failed == 0
+
+    @pytest.mark.asyncio
+    async def test_replay_without_event_id_is_idempotent(self, service, repository):
+        """Test that a notification without payment_id is recorded once across replays."""
+        line = json.dumps({"state": "COMPLETED", "order_id": "order_0"})
+        replayer = WebhookReplayer(service)
+
+        first = await replayer.replay(read_ndjson([line], PaymentProvider.PAYPAY))
+        again = await replayer.replay(read_ndjson([line], PaymentProvider.PAYPAY))
+
+        assert (first.changed, first.recorded) == (1, 1)
+        assert (again.changed, again.recorded) == (0, 0)
+
+    @pytest.mark.asyncio
+    async def test_dry_run_reports_diff_without_writing(self, service, repository):
+        """Test that a dry run plans chained changes but writes nothing."""
+        changes = []
+        stats = await WebhookReplayer(service, parallelism=4, dry_run=True).replay(
+            self._events(), on_result=lambda r: changes.append(r) if r.changed else None
+        )
+
+        assert stats.changed == 25
+        refund = next(c for c in changes if c.provider_event_id == "r0")
+        assert (refund.old_status, refund.new_status) == ("completed", DonationStatus.REFUNDED)
+        assert (await repository.get_by_id("don_0000")).status == DonationStatus.PENDING.value
+        assert not await repository.event_exists(PaymentProvider.PAYPAY, "p0")
+
+    @pytest.mark.asyncio
+    async def test_invalid_events_are_counted(self, service):
+        """Test that an event that cannot be applied does not stop the replay."""
+        events = [ReplayEvent(provider=PaymentProvider.RAKUTEN, payload={})]
+        stats = await WebhookReplayer(
+            PaymentService(service._repository, adapters={})
+        ).replay(events)
+
+        assert stats.failed == 1
+        assert stats.events == 0
@@ -0,0 +1,232 @@
+"""Unit tests for the SQLite donation repository."""
+
+import hashlib
+import hmac
+import json
+import sqlite3
+from datetime import UTC, date, datetime, timedelta
+
+import pytest
+
+from app.adapters.paypay import PayPayAdapter
+from app.models.donation import (
+    CheckoutRequest,
+    Donation,
+    DonationStatus,
+    PaymentEvent,
+    PaymentProvider,
+)
+from app.repositories.donation import (
+    DonationQuery,
+    DuplicateDonationError,
+    PaymentEventQuery,
+    TransitionOutcome,
+)
+from app.repositories.sqlite import SqliteCampaignCounter, SqliteDonationRepository
+from app.services.campaign import CampaignTotalService
+from app.services.payment import DuplicateCheckoutError, DuplicateEventError, PaymentService
+
+NOW = datetime(2026, 10, 19, 3, 0, 0, 123456, tzinfo=UTC)
+
+
+def make_donation(number: int, **overrides) -> Donation:
+    values = {
+        "id": f"don_{number}",
+        "amount": 1000 + number,
+        "provider": PaymentProvider.PAYPAY,
+        "source": "flyer_a" if number % 2 else "flyer_b",
+        "provider_order_id": f"order_{number}",
+        "idempotency_key": f"key_{number}",
+        "created_at": NOW + timedelta(seconds=number),
+        "updated_at": NOW + timedelta(seconds=number),
+    }
+    return Donation(**(values | overrides))
+
+
+def make_event(number: int) -> PaymentEvent:
+    return PaymentEvent(
+        id=f"evt_{number}",
+        provider=PaymentProvider.PAYPAY,
+        provider_event_id=f"paypay/{number}",
+        provider_order_id=f"order_{number}",
+        status=DonationStatus.COMPLETED,
+        received_at=NOW + timedelta(seconds=number),
+        raw_payload={"merchantPaymentId": f"order_{number}", "note": "寄付"},
+        signature_valid=True,
+    )
+
+
+@pytest.fixture
+async def repository(tmp_path):
+    repository = SqliteDonationRepository(str(tmp_path / "donations.db"), pool_size=2)
+    yield repository
+    await repository.close()
+
+
+class TestSqliteDonationRepository:
+    """Tests for the SQLite backend."""
+
+    @pytest.mark.asyncio
+    async def test_donations_round_trip(self, repository):
+        """Test that donations read back as written, by ID and by provider order."""
+        donation = make_donation(1)
+        await repository.create(donation)
+
+        assert await repository.get_by_id("don_1") == donation
+        assert await repository.get_by_provider_order_id(
+            PaymentProvider.PAYPAY, "order_1"
+        ) == donation
+        assert await repository.get_by_provider_order_id(PaymentProvider.RAKUTEN, "order_1") is None
+        assert list(await repository.get_many(["don_1", "don_9", "don_1"])) == ["don_1"]
+        version = await repository.get_version("don_1")
+        assert version is not None and version.updated_at == donation.updated_at
+
+    @pytest.mark.asyncio
+    async def test_unique_indexes(self, repository):
+        """Test that provider orders and idempotency keys cannot repeat."""
+        await repository.create(make_donation(1))
+
+        with pytest.raises(sqlite3.IntegrityError):
+            await repository.create(make_donation(2, provider_order_id="order_1"))
+        with pytest.raises(DuplicateDonationError):
+            await repository.create(make_donation(3, idempotency_key="key_1"))
+        # A failed insert leaves no rollup behind
+        rollups = await repository.get_rollups(date(2026, 10, 19), date(2026, 10, 19))
+        assert [(r.count, r.amount) for r in rollups] == [(1, 1001)]
+
+    @pytest.mark.asyncio
+    async def test_status_updates(self, repository):
+        """Test transitions, completed_at and rollups."""
+        await repository.create(make_donation(1))
+
+        completed = await repository.update_status("don_1", DonationStatus.COMPLETED, NOW)
+        refunded = await repository.update_status("don_1", DonationStatus.REFUNDED)
+        rejected = await repository.update_status("don_1", DonationStatus.PENDING)
+
+        assert completed.applied and completed.previous_status == DonationStatus.PENDING
+        assert refunded.applied and refunded.donation.completed_at == NOW
+        assert rejected.outcome == TransitionOutcome.REJECTED
+        stored = await repository.get_by_id("don_1")
+        assert (stored.status, stored.completed_at) == (DonationStatus.REFUNDED, NOW)
+        rollups = await repository.get_rollups(date(2026, 10, 19), date(2026, 10, 19))
+        assert {r.status: r.count for r in rollups} == {
+            DonationStatus.PENDING: 0,
+            DonationStatus.COMPLETED: 0,
+            DonationStatus.REFUNDED: 1,
+        }
+        missing = await repository.update_status("don_9", DonationStatus.COMPLETED)
+        assert missing.outcome == TransitionOutcome.NOT_FOUND
+
+    @pytest.mark.asyncio
+    async def test_payment_events(self, repository):
+        """Test event records, duplicates and ID markers of deleted events."""
+        for number in range(3):
+            await repository.save_payment_event(make_event(number))
+        # Same provider event under a new ID: already recorded, not stored again
+        await repository.save_payment_event(make_event(0).model_copy(update={"id": "evt_x"}))
+
+        events = [e async for e in repository.stream_payment_events(PaymentEventQuery(), 2)]
+        assert [e.id for e in events] == ["evt_0", "evt_1", "evt_2"]
+        assert events[0] == make_event(0)
+
+        await repository.delete_payment_events(events[:2], dedupe_window=timedelta(days=10000))
+        await repository.delete_payment_events(events[2:], dedupe_window=None)
+
+        assert [e async for e in repository.stream_payment_events(PaymentEventQuery())] == []
+        assert await repository.event_exists(PaymentProvider.PAYPAY, "paypay/0")
+        assert not await repository.event_exists(PaymentProvider.PAYPAY, "paypay/2")
+
+    @pytest.mark.asyncio
+    async def test_listing_and_streaming(self, repository):
+        """Test keyset pages in both directions with filters and field selection."""
+        for number in range(5):
+            await repository.create(make_donation(number))
+
+        first = await repository.list_donations(DonationQuery(), limit=2, fields=["amount"])
+        second = await repository.list_donations(DonationQuery(), limit=2, cursor=first.next_cursor)
+        last = await repository.list_donations(DonationQuery(), limit=2, cursor=second.next_cursor)
+
+        assert first.items == [{"id": "don_4", "amount": 1004}, {"id": "don_3", "amount": 1003}]
+        assert [item["id"] for item in second.items + last.items] == ["don_2", "don_1", "don_0"]
+        assert last.next_cursor is None
+
+        query = DonationQuery(source="flyer_b", created_from=NOW + timedelta(seconds=1))
+        rows = [row async for row in repository.stream_donations(query, page_size=1)]
+        assert [row["id"] for row in rows] == ["don_2", "don_4"]
+        assert rows[0]["created_at"] == NOW + timedelta(seconds=2)
+        with pytest.raises(ValueError):
+            await repository.list_donations(DonationQuery(), fields=["id; DROP TABLE donations"])
+
+    @pytest.mark.asyncio
+    async def test_transaction_rolls_back_every_call(self, repository):
+        """Test that calls and counter increments inside a failed block are undone."""
+        counter = SqliteCampaignCounter(repository)
+        await repository.create(make_donation(1))
+
+        with pytest.raises(RuntimeError):
+            async with repository.transaction():
+                await repository.update_status("don_1", DonationStatus.COMPLETED, NOW)
+                await counter.increment("campaign", 1001, 1)
+                await repository.save_payment_event(make_event(1))
+                assert await repository.event_exists(PaymentProvider.PAYPAY, "paypay/1")
+                raise RuntimeError("cut short")
+
+        assert (await repository.get_by_id("don_1")).status == DonationStatus.PENDING
+        assert not await repository.event_exists(PaymentProvider.PAYPAY, "paypay/1")
+        assert (await counter.get_total("campaign")).count == 0
+
+    @pytest.mark.asyncio
+    async def test_webhook_commits_as_one_transaction(self, repository):
+        """Test a webhook end to end on SQLite, then its redelivery."""
+        counter = SqliteCampaignCounter(repository)
+        service = PaymentService(
+            repository=repository,
+            adapters={
+                PaymentProvider.PAYPAY: PayPayAdapter(
+                    webhook_secret="test_secret", production_mode=False
+                )
+            },
+            campaign=CampaignTotalService(counter, "campaign", cache_ttl_seconds=0),
+        )
+        await repository.create(make_donation(1))
+        body = json.dumps(
+            {"state": "COMPLETED", "order_id": "order_1", "payment_id": "pay_1"}
+        ).encode()
+        headers = {"x-paypay-signature": hmac.new(b"test_secret", body, hashlib.sha256).hexdigest()}
+
+        await service.process_webhook(PaymentProvider.PAYPAY, headers, body)
+        with pytest.raises(DuplicateEventError):
+            await service.process_webhook(PaymentProvider.PAYPAY, headers, body)
+
+        assert (await repository.get_by_id("don_1")).status == DonationStatus.COMPLETED
+        assert (await counter.get_total("campaign")).amount == 1001
+
+    @pytest.mark.asyncio
+    async def test_checkout_racing_same_key(self, repository, monkeypatch):
+        """Test that losing the insert race on a key is a duplicate, not a 500."""
+        service = PaymentService(
+            repository=repository,
+            adapters={
+                PaymentProvider.PAYPAY: PayPayAdapter(
+                    webhook_secret="test_secret", production_mode=False
+                )
+            },
+        )
+        await repository.create(make_donation(1))
+
+        async def not_yet_saved(idempotency_key):
+            return None
+
+        # The other request saves its donation after this one's lookup
+        monkeypatch.setattr(repository, "get_by_idempotency_key", not_yet_saved)
+        with pytest.raises(DuplicateCheckoutError):
+            await service.create_checkout(
+                CheckoutRequest(
+                    amount=1000,
+                    source="web",
+                    provider=PaymentProvider.PAYPAY,
+                    return_url="https://example.com/thanks",
+                    cancel_url="https://example.com/cancel",
+                    idempotency_key="key_1",
+                )
+            )
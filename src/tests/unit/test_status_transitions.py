@@ -0,0 +1,397 @@
+"""Unit tests for the donation status state machine."""
+
+import asyncio
+import copy
+import hashlib
+import hmac
+import json
+import random
+import threading
+import time
+from datetime import UTC, datetime
+from typing import Any
+
+import pytest
+from google.api_core.exceptions import FailedPrecondition
+from google.cloud.firestore_v1.transforms import Increment
+
+from app.adapters.paypay import PayPayAdapter
+from app.metrics import metrics
+from app.models.donation import (
+    Donation,
+    DonationStatus,
+    PaymentProvider,
+    is_allowed_transition,
+)
+from app.repositories.counter import InMemoryCampaignCounter
+from app.repositories.donation import (
+    FirestoreDonationRepository,
+    InMemoryDonationRepository,
+    TransitionOutcome,
+)
+from app.repositories.rollups import ROLLUPS_COLLECTION
+from app.services.campaign import CampaignTotalService
+from app.services.payment import DuplicateEventError, PaymentService
+
+
+def make_donation(donation_id: str = "don_1", order_id: str = "order_1") -> Donation:
+    now = datetime.now(UTC)
+    return Donation(
+        id=donation_id,
+        amount=1000,
+        provider=PaymentProvider.PAYPAY,
+        source="flyer_a",
+        provider_order_id=order_id,
+        idempotency_key="key",
+        created_at=now,
+        updated_at=now,
+    )
+
+
+class FakeSnapshot:
+    def __init__(self, doc_id: str, data: dict[str, Any] | None, update_time: int | None):
+        self.id = doc_id
+        self.exists = data is not None
+        self.update_time = update_time
+        self._data = data
+
+    def to_dict(self) -> dict[str, Any] | None:
+        return copy.deepcopy(self._data)
+
+
+class FakeDocument:
+    def __init__(self, db: "FakeFirestore", path: str):
+        self._db = db
+        self.id = path.rsplit("/", 1)[1]
+        self.path = path
+
+    def get(self, retry: Any = None, timeout: Any = None) -> FakeSnapshot:
+        # Slow reads let concurrent updaters all see the same version
+        time.sleep(self._db.read_delay)
+        with self._db.lock:
+            data, update_time = self._db.docs.get(self.path, (None, None))
+            return FakeSnapshot(self.id, copy.deepcopy(data), update_time)
+
+
+class FakeCollection:
+    def __init__(self, db: "FakeFirestore", name: str):
+        self._db = db
+        self._name = name
+
+    def document(self, doc_id: str) -> FakeDocument:
+        return FakeDocument(self._db, f"{self._name}/{doc_id}")
+
+
+def merge(target: dict[str, Any], data: dict[str, Any]) -> None:
+    for key, value in data.items():
+        if isinstance(value, dict):
+            merge(target.setdefault(key, {}), value)
+        elif isinstance(value, Increment):
+            target[key] = target.get(key, 0) + value.value
+        else:
+            target[key] = value
+
+
+class FakeBatch:
+    def __init__(self, db: "FakeFirestore"):
+        self._db = db
+        self._writes: list[tuple[str, FakeDocument, dict[str, Any], Any]] = []
+
+    def set(self, ref: FakeDocument, data: dict[str, Any], merge: bool = False) -> None:
+        self._writes.append(("set", ref, data, None))
+
+    def update(self, ref: FakeDocument, data: dict[str, Any], option: Any = None) -> None:
+        self._writes.append(("update", ref, data, option))
+
+    def commit(self, retry: Any = None, timeout: Any = None) -> None:
+        db = self._db
+        with db.lock:
+            for kind, ref, _, option in self._writes:
+                if kind == "update" and option is not None and db.docs[ref.path][1] != option:
+                    raise FailedPrecondition("update time mismatch")
+            db.clock += 1
+            for _, ref, data, _ in self._writes:
+                current = copy.deepcopy(db.docs.get(ref.path, ({}, None))[0])
+                merge(current, data)
+                db.docs[ref.path] = (current, db.clock)
+
+
+class FakeFirestore:
+    """Thread-safe subset of the Firestore client used by update_status()."""
+
+    def __init__(self, read_delay: float = 0.0):
+        self.docs: dict[str, tuple[dict[str, Any], int]] = {}
+        self.lock = threading.Lock()
+        self.clock = 0
+        self.read_delay = read_delay
+
+    def collection(self, name: str) -> FakeCollection:
+        return FakeCollection(self, name)
+
+    def batch(self) -> FakeBatch:
+        return FakeBatch(self)
+
+    def write_option(self, last_update_time: int) -> int:
+        return last_update_time
+
+
+class TestTransitionTable:
+    """Tests for the allowed transitions."""
+
+    def test_statuses_only_move_forward(self):
+        """Test that late pending/failed notifications cannot regress a donation."""
+        assert is_allowed_transition("pending", "completed")
+        assert is_allowed_transition("completed", "refunded")
+        assert is_allowed_transition("expired", "completed")
+        assert not is_allowed_transition("completed", "pending")
+        assert not is_allowed_transition("completed", "failed")
+        assert not is_allowed_transition("pending", "refunded")
+        assert not is_allowed_transition("refunded", "completed")
+
+    @pytest.mark.asyncio
+    async def test_in_memory_update_reports_outcome(self):
+        """Test that the in-memory repository enforces the table."""
+        repository = InMemoryDonationRepository()
+        await repository.create(make_donation())
+
+        applied = await repository.update_status("don_1", DonationStatus.COMPLETED)
+        regressed = await repository.update_status("don_1", DonationStatus.PENDING)
+        repeated = await repository.update_status("don_1", DonationStatus.COMPLETED)
+        missing = await repository.update_status("don_x", DonationStatus.COMPLETED)
+
+        assert (applied.outcome, applied.previous_status) == (
+            TransitionOutcome.APPLIED,
+            "pending",
+        )
+        assert regressed.outcome == TransitionOutcome.REJECTED
+        assert regressed.donation.status == "completed"
+        assert repeated.outcome == TransitionOutcome.UNCHANGED
+        assert missing.outcome == TransitionOutcome.NOT_FOUND
+
+
+class TestFirestoreOptimisticUpdate:
+    """Tests for update-time preconditions in the Firestore repository."""
+
+    @pytest.fixture
+    async def repository(self):
+        repository = FirestoreDonationRepository(project_id="test")
+        repository._client = FakeFirestore()
+        await repository.create(make_donation())
+        return repository
+
+    def rollup_counts(self, repository) -> dict[str, int]:
+        rollups = [
+            data
+            for path, (data, _) in repository._client.docs.items()
+            if path.startswith(ROLLUPS_COLLECTION)
+        ]
+        statuses = rollups[0]["buckets"]["flyer_a"]["paypay"]
+        return {status: totals["count"] for status, totals in statuses.items()}
+
+    @pytest.mark.asyncio
+    async def test_regression_is_rejected_without_writing(self, repository):
+        """Test that a late pending notification leaves a completed donation alone."""
+        await repository.update_status("don_1", DonationStatus.COMPLETED)
+        version = repository._client.clock
+
+        update = await repository.update_status("don_1", DonationStatus.PENDING)
+
+        assert update.outcome == TransitionOutcome.REJECTED
+        assert update.previous_status == "completed"
+        assert repository._client.clock == version
+
+    @pytest.mark.asyncio
+    async def test_concurrent_updates_retry_on_conflict(self, repository):
+        """Test that racing updates serialize into one valid chain of transitions."""
+        repository._client.read_delay = 0.002
+        statuses = [
+            DonationStatus.PENDING,
+            DonationStatus.COMPLETED,
+            DonationStatus.COMPLETED,
+            DonationStatus.FAILED,
+            DonationStatus.EXPIRED,
+            DonationStatus.REFUNDED,
+            DonationStatus.PENDING,
+            DonationStatus.FAILED,
+        ]
+        random.Random(7).shuffle(statuses)
+
+        updates = await asyncio.gather(
+            *(repository.update_status("don_1", status) for status in statuses)
+        )
+
+        assert metrics.get("firestore_update_conflicts_total") >= 1
+        applied = [u for u in updates if u.applied]
+        assert applied
+        # Each applied update starts from the status the previous one left
+        chain = sorted(applied, key=lambda u: u.donation.updated_at)
+        current = "pending"
+        for update in chain:
+            assert update.previous_status == current
+            assert is_allowed_transition(current, update.donation.status)
+            current = update.donation.status
+        stored = await repository.get_by_id("don_1")
+        assert stored.status == current
+        # Rollups count the donation exactly once, in its final status
+        counts = self.rollup_counts(repository)
+        assert counts.pop(current) == 1
+        assert all(count == 0 for count in counts.values())
+
+
+class YieldingRepository(InMemoryDonationRepository):
+    """In-memory repository that yields on lookups so webhooks interleave."""
+
+    async def get_by_provider_order_id(self, provider, provider_order_id):
+        await asyncio.sleep(0)
+        return await super().get_by_provider_order_id(provider, provider_order_id)
+
+
+class TestOutOfOrderWebhooks:
+    """Parallel, out-of-order webhooks through the payment service."""
+
+    @pytest.mark.asyncio
+    async def test_late_notifications_do_not_regress_completion(self):
+        """Test that CREATED/AUTHORIZED arriving around COMPLETED end completed."""
+        repository = YieldingRepository()
+        counter = InMemoryCampaignCounter()
+        service = PaymentService(
+            repository=repository,
+            adapters={PaymentProvider.PAYPAY: PayPayAdapter(webhook_secret="secret")},
+            campaign=CampaignTotalService(counter, "test", cache_ttl_seconds=0),
+        )
+        await repository.create(make_donation())
+
+        states = ["CREATED", "AUTHORIZED", "COMPLETED", "CREATED", "AUTHORIZED", "CANCELED"]
+        random.Random(3).shuffle(states)
+        bodies = [
+            json.dumps({"state": state, "order_id": "order_1", "payment_id": f"pay_{i}"})
+            for i, state in enumerate(states)
+        ]
+
+        async def send(body: str) -> None:
+            signature = hmac.new(b"secret", body.encode(), hashlib.sha256).hexdigest()
+            await service.process_webhook(
+                PaymentProvider.PAYPAY, {"x-paypay-signature": signature}, body.encode()
+            )
+
+        await asyncio.gather(*(send(body) for body in bodies))
+
+        donation = await repository.get_by_id("don_1")
+        assert donation.status == DonationStatus.COMPLETED.value
+        total = await counter.get_total("test")
+        assert (total.amount, total.count) == (1000, 1)
+        rejected = metrics.get(
+            "donation_status_rejected_total",
+            provider="paypay",
+            from_status="completed",
+            to_status="pending",
+        )
+        assert rejected >= 1
+
+
+class SlowRepository(InMemoryDonationRepository):
+    """In-memory repository with a fixed latency per call on the webhook path.
+
+    Also records how many webhooks of one order were between reading the
+    donation and recording their event at the same time, and how many
+    different orders were.
+    """
+
+    def __init__(self, latency: float):
+        super().__init__()
+        self._latency = latency
+        self.active: dict[str, int] = {}
+        self.max_active = 0
+        self.max_orders_active = 0
+
+    async def get_by_provider_order_id(self, provider, provider_order_id):
+        self.active[provider_order_id] = self.active.get(provider_order_id, 0) + 1
+        self.max_active = max(self.max_active, self.active[provider_order_id])
+        orders_active = sum(count > 0 for count in self.active.values())
+        self.max_orders_active = max(self.max_orders_active, orders_active)
+        await asyncio.sleep(self._latency)
+        return await super().get_by_provider_order_id(provider, provider_order_id)
+
+    async def update_status(self, donation_id, new_status, completed_at=None):
+        await asyncio.sleep(self._latency)
+        return await super().update_status(donation_id, new_status, completed_at)
+
+    async def event_exists(self, provider, provider_event_id):
+        await asyncio.sleep(self._latency)
+        return await super().event_exists(provider, provider_event_id)
+
+    async def save_payment_event(self, event):
+        await asyncio.sleep(self._latency)
+        self.active[event.provider_order_id] -= 1
+        return await super().save_payment_event(event)
+
+
+class TestWebhookBursts:
+    """Stress test: interleaved bursts of notifications for many orders."""
+
+    ORDERS = 100
+    LATENCY = 0.002
+
+    @pytest.mark.asyncio
+    async def test_orders_serialized_and_processed_in_parallel(self):
+        """Test arrival-order results per order, duplicates and parallelism."""
+        repository = SlowRepository(self.LATENCY)
+        counter = InMemoryCampaignCounter()
+        service = PaymentService(
+            repository=repository,
+            adapters={PaymentProvider.PAYPAY: PayPayAdapter(webhook_secret="secret")},
+            campaign=CampaignTotalService(counter, "test", cache_ttl_seconds=0),
+        )
+        rng = random.Random(7)
+        deliveries: list[tuple[int, str, str]] = []
+        for n in range(self.ORDERS):
+            await repository.create(make_donation(f"don_{n}", f"order_{n}"))
+            states = ["AUTHORIZED", "COMPLETED", "COMPLETED"]
+            if n % 3 == 0:
+                states.append("REFUNDED")
+            if n % 5 == 0:
+                states.append("CANCELED")
+            # The second COMPLETED is a redelivery of the first
+            ids = {"AUTHORIZED": "auth", "COMPLETED": "done", "REFUNDED": "refund"}
+            deliveries += [(n, s, f"pay_{n}_{ids.get(s, 'cancel')}") for s in states]
+        rng.shuffle(deliveries)
+
+        async def send(n: int, state: str, payment_id: str) -> str:
+            body = json.dumps(
+                {"state": state, "order_id": f"order_{n}", "payment_id": payment_id}
+            ).encode()
+            signature = hmac.new(b"secret", body, hashlib.sha256).hexdigest()
+            try:
+                await service.process_webhook(
+                    PaymentProvider.PAYPAY, {"x-paypay-signature": signature}, body
+                )
+            except DuplicateEventError:
+                return "duplicate"
+            return "processed"
+
+        outcomes = await asyncio.gather(*(send(*delivery) for delivery in deliveries))
+
+        # Each order's notifications took effect one at a time, in arrival order
+        assert repository.max_active == 1
+        expected: dict[int, DonationStatus] = {}
+        seen: set[str] = set()
+        for n, state, payment_id in deliveries:
+            if payment_id in seen:
+                continue
+            seen.add(payment_id)
+            status = PayPayAdapter().normalize_event({"state": state}).status
+            current = expected.get(n, DonationStatus.PENDING)
+            if is_allowed_transition(current, status):
+                expected[n] = status
+        for n in range(self.ORDERS):
+            donation = await repository.get_by_id(f"don_{n}")
+            assert donation.status == expected.get(n, DonationStatus.PENDING).value
+        assert outcomes.count("duplicate") == self.ORDERS
+        assert len(repository._events) == len(deliveries) - self.ORDERS
+        completed = sum(status == DonationStatus.COMPLETED for status in expected.values())
+        total = await counter.get_total("test")
+        assert (total.amount, total.count) == (completed * 1000, completed)
+        assert len(service._order_locks) == 0
+
+        # Different orders were not serialized behind each other
+        assert repository.max_orders_active > self.ORDERS // 2
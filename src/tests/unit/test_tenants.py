@@ -0,0 +1,283 @@
+"""Unit tests for multi-tenant hosting."""
+
+import json
+from urllib.parse import quote
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.adapters.paypay import PayPayAdapter
+from app.adapters.rakuten import RakutenPayAdapter
+from app.api.campaign import set_campaign_service
+from app.api.donations import get_payment_service, set_payment_service
+from app.config import settings
+from app.main import app, build_repository, build_tenant_paypay_adapter
+from app.metrics import metrics
+from app.models.donation import PaymentProvider
+from app.repositories.counter import InMemoryCampaignCounter
+from app.repositories.donation import InMemoryDonationRepository
+from app.services.campaign import CampaignTotalService
+from app.services.export import DonationExporter
+from app.services.payment import PaymentService
+from app.tenants import (
+    Tenant,
+    TenantAdapterCache,
+    TenantResolver,
+    TenantServiceContainer,
+    TenantServices,
+    UnknownTenantError,
+    get_service_container,
+    parse_tenants,
+    set_service_container,
+)
+
+ACME = Tenant(id="acme", hosts=("donate.acme.example",), paypay_merchant_id="m_acme")
+BETA = Tenant(id="beta", hosts=("Beta.Example:8443",))
+
+CHECKOUT = {
+    "amount": 1000,
+    "source": "flyer_a",
+    "provider": "paypay",
+    "return_url": "https://example.com/thanks",
+    "cancel_url": "https://example.com/cancel",
+    "idempotency_key": "tenant-key",
+}
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def mock_adapter(tenant: Tenant) -> PayPayAdapter:
+    return PayPayAdapter(webhook_secret=f"{tenant.id}_secret", production_mode=False)
+
+
+def build_services(tenant, adapters) -> TenantServices:
+    repository = InMemoryDonationRepository()
+    campaign = CampaignTotalService(InMemoryCampaignCounter(), "default", cache_ttl_seconds=0)
+    return TenantServices(
+        tenant=tenant,
+        payment=PaymentService(repository=repository, adapters=adapters, campaign=campaign),
+        campaign=campaign,
+        exporter=DonationExporter(repository),
+    )
+
+
+@pytest.fixture
+def client():
+    """A test client serving a default organization and two tenants."""
+    repository = InMemoryDonationRepository()
+    adapters = {
+        PaymentProvider.PAYPAY: PayPayAdapter(webhook_secret="test_secret", production_mode=False),
+        PaymentProvider.RAKUTEN: RakutenPayAdapter(webhook_secret="test_secret", sandbox=True),
+    }
+    campaign = CampaignTotalService(InMemoryCampaignCounter(), "default", cache_ttl_seconds=0)
+    set_payment_service(PaymentService(repository=repository, adapters=adapters))
+    set_campaign_service(campaign)
+    container = TenantServiceContainer(
+        [ACME, BETA],
+        build_services,
+        TenantAdapterCache({PaymentProvider.PAYPAY: mock_adapter}),
+    )
+    set_service_container(container)
+    yield TestClient(app)
+    set_service_container(None)
+
+
+class TestParseTenants:
+    """Tests for the TENANTS setting."""
+
+    def test_parses_tenants(self):
+        """Test that the JSON list becomes tenants, and empty means none."""
+        raw = json.dumps(
+            [
+                {"id": "acme", "hosts": ["donate.acme.example"], "paypay_merchant_id": "m1"},
+                {"id": "beta", "paypay_webhook_secrets": ["s1", "s0"]},
+            ]
+        )
+
+        tenants = parse_tenants(raw)
+
+        assert tenants[0] == Tenant(
+            id="acme", hosts=("donate.acme.example",), paypay_merchant_id="m1"
+        )
+        assert tenants[1].paypay_webhook_secrets == ("s1", "s0")
+        assert parse_tenants("") == []
+
+    @pytest.mark.parametrize(
+        "tenants",
+        [
+            [{"id": "Acme"}],
+            [{"id": "acme/x"}],
+            [{"id": "acme"}, {"id": "acme"}],
+            [{"id": "a", "hosts": ["x.example"]}, {"id": "b", "hosts": ["X.example:443"]}],
+            [{"id": "acme", "paypay_api_key": "key"}],
+            [{"id": "acme", "rakuten_webhook_secrets": ["s3", "s2", "s1", "s0"]}],
+        ],
+    )
+    def test_rejects_invalid_tenants(self, tenants):
+        """Test invalid IDs, repeated IDs and hosts, half a key pair, too many secrets."""
+        with pytest.raises(ValueError):
+            parse_tenants(json.dumps(tenants))
+
+    def test_rejects_malformed_json(self):
+        """Test that malformed JSON is a ValueError."""
+        with pytest.raises(ValueError):
+            parse_tenants("[{")
+
+
+class TestTenantResolver:
+    """Tests for resolving a request's tenant."""
+
+    def test_resolves_by_host_and_path(self):
+        """Test hosts without case or port, and the path prefix."""
+        resolver = TenantResolver([ACME, BETA])
+
+        assert resolver.resolve("DONATE.acme.example:443", "/api/x") == (ACME, "")
+        assert resolver.resolve("beta.example", "/pay/1000") == (BETA, "")
+        assert resolver.resolve("donate.acme.example", "/t/beta/api/x") == (BETA, "/t/beta")
+        assert resolver.resolve("localhost:8080", "/api/x") == (None, "")
+        assert resolver.resolve(None, "/t/acme") == (ACME, "/t/acme")
+
+    def test_unknown_path_tenant(self):
+        """Test that a path naming no tenant is an error, not the default."""
+        with pytest.raises(UnknownTenantError):
+            TenantResolver([ACME]).resolve("donate.acme.example", "/t/nobody/api/x")
+
+
+class TestTenantAdapterCache:
+    """Tests for the LRU of tenant adapters."""
+
+    def test_builds_once_and_evicts_least_recently_used(self):
+        """Test reuse, and that the least recently used adapter goes at capacity."""
+        cache = TenantAdapterCache({PaymentProvider.PAYPAY: mock_adapter}, max_size=2)
+        acme = cache.get(ACME, PaymentProvider.PAYPAY)
+        beta = cache.get(BETA, PaymentProvider.PAYPAY)
+
+        assert cache.get(ACME, PaymentProvider.PAYPAY) is acme
+        cache.get(Tenant(id="gamma"), PaymentProvider.PAYPAY)
+
+        assert len(cache) == 2
+        assert cache.get(ACME, PaymentProvider.PAYPAY) is acme
+        assert cache.get(BETA, PaymentProvider.PAYPAY) is not beta
+        assert metrics.get("tenant_adapters_built_total", provider="paypay") == 4
+        assert metrics.get("tenant_adapter_evictions_total", reason="capacity") == 2
+
+    def test_idle_adapters_are_dropped(self):
+        """Test that adapters unused for the idle time are rebuilt."""
+        clock = FakeClock()
+        cache = TenantAdapterCache(
+            {PaymentProvider.PAYPAY: mock_adapter}, idle_seconds=60, clock=clock
+        )
+        acme = cache.get(ACME, PaymentProvider.PAYPAY)
+        clock.now = 30
+        beta = cache.get(BETA, PaymentProvider.PAYPAY)
+        clock.now = 80
+
+        # acme has been idle for 80s, beta for 50s
+        assert cache.get(BETA, PaymentProvider.PAYPAY) is beta
+        assert len(cache) == 1
+        assert cache.get(ACME, PaymentProvider.PAYPAY) is not acme
+        assert metrics.get("tenant_adapter_evictions_total", reason="idle") == 1
+
+    def test_unknown_provider(self):
+        """Test that a provider without a factory is not in the tenant's adapters."""
+        container = TenantServiceContainer(
+            [ACME], build_services, TenantAdapterCache({PaymentProvider.PAYPAY: mock_adapter})
+        )
+        adapters = container.services(ACME).payment._adapters
+
+        assert PaymentProvider.RAKUTEN not in adapters
+        assert list(adapters) == [PaymentProvider.PAYPAY]
+        assert len(container.adapters) == 0
+
+    def test_assume_merchant_on_shared_credentials(self, monkeypatch):
+        """Test that a tenant without its own key uses the shared one as its merchant."""
+        monkeypatch.setattr(settings, "paypay_api_key", "shared_key")
+        monkeypatch.setattr(settings, "paypay_api_secret", "shared_secret")
+        monkeypatch.setattr(settings, "circuit_breaker_enabled", False)
+        monkeypatch.setattr(settings, "provider_concurrency_enabled", False)
+
+        adapter = build_tenant_paypay_adapter(ACME)
+
+        assert isinstance(adapter, PayPayAdapter)
+        assert adapter._client.assume_merchant == "m_acme"
+
+
+class TestTenantRequests:
+    """Tests for requests served through the tenant middleware."""
+
+    def test_tenants_have_separate_donations(self, client):
+        """Test that a donation is only visible to the tenant that took it."""
+        by_path = client.post("/t/acme/api/donations/checkout", json=CHECKOUT)
+        by_host = client.post(
+            "/api/donations/checkout",
+            json=CHECKOUT,
+            headers={"host": "beta.example:8443"},
+        )
+        default = client.post("/api/donations/checkout", json=CHECKOUT)
+        assert {by_path.status_code, by_host.status_code, default.status_code} == {200}
+
+        acme_id = by_path.json()["donation_id"]
+        assert client.get(f"/t/acme/api/donations/{acme_id}").status_code == 200
+        assert client.get(f"/api/donations/{acme_id}").status_code == 404
+        assert client.get(
+            f"/api/donations/{acme_id}", headers={"host": "donate.acme.example"}
+        ).status_code == 200
+        assert client.get(f"/t/beta/api/donations/{acme_id}").status_code == 404
+        assert len(get_payment_service()._repository._donations) == 1
+
+    def test_unknown_tenant_is_not_found(self, client):
+        """Test that an unknown tenant prefix never reaches the default services."""
+        response = client.post("/t/nobody/api/donations/checkout", json=CHECKOUT)
+
+        assert response.status_code == 404
+        assert response.json()["error"] == "UNKNOWN_TENANT"
+        assert get_payment_service()._repository._donations == {}
+
+    def test_pay_page_under_path_prefix(self, client):
+        """Test that /t/{id}/pay charges, returns to and polls that tenant only."""
+        desktop = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"}
+        page = client.get("/t/acme/pay/1000", headers=desktop)
+
+        assert page.status_code == 200
+        assert 'window.API_BASE = "/t/acme";' in page.text
+        [donation] = get_service_container().services(ACME).payment._repository._donations.values()
+        assert quote("http://testserver/t/acme/thanks") in page.text
+        assert get_payment_service()._repository._donations == {}
+
+        thanks = client.get(f"/t/acme/thanks?donation_id={donation.id}")
+        assert thanks.status_code == 200
+        assert 'window.API_BASE = "/t/acme";' in thanks.text
+        assert client.get(f"/t/acme/api/donations/{donation.id}").status_code == 200
+        assert client.get(f"/api/donations/{donation.id}").status_code == 404
+
+    def test_campaign_total_per_tenant(self, client):
+        """Test that the campaign endpoint reads the tenant's own counter."""
+        response = client.get("/t/acme/api/campaign/total")
+
+        assert response.status_code == 200
+        assert (response.json()["total_amount"], response.json()["donation_count"]) == (0, 0)
+
+
+class TestTenantRepositories:
+    """Tests for where tenants' data is stored."""
+
+    @pytest.mark.asyncio
+    async def test_local_backends_use_tenant_directories(self, tmp_path, monkeypatch):
+        """Test that file and SQLite data of a tenant go below tenants/{id}."""
+        monkeypatch.setattr(settings, "file_repository_dir", str(tmp_path / "data"))
+        monkeypatch.setattr(settings, "sqlite_path", str(tmp_path / "db" / "donations.db"))
+
+        file_repository, _ = build_repository("file", ACME)
+        sqlite_repository, _ = build_repository("sqlite", ACME)
+        await sqlite_repository.ping()
+
+        assert (tmp_path / "data" / "tenants" / "acme").is_dir()
+        assert (tmp_path / "db" / "tenants" / "acme" / "donations.db").exists()
+        await file_repository.close()
+        await sqlite_repository.close()
@@ -0,0 +1,141 @@
+"""Unit tests for connection warm-up and keep-alive."""
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.adapters.paypay import PayPayAdapter
+from app.config import settings
+from app.main import app
+from app.metrics import metrics
+from app.warmup import ConnectionWarmer, RequestPhases
+
+
+class CountingPing:
+    """Ping that counts calls and can fail or hang."""
+
+    def __init__(self, error: Exception | None = None, delay: float = 0.0):
+        self.calls = 0
+        self._error = error
+        self._delay = delay
+
+    async def __call__(self) -> None:
+        self.calls += 1
+        await asyncio.sleep(self._delay)
+        if self._error:
+            raise self._error
+
+
+class FakeSession:
+    def __init__(self) -> None:
+        self.heads: list[tuple[str, float | None]] = []
+
+    def head(self, url: str, timeout: float | None = None) -> None:
+        self.heads.append((url, timeout))
+
+
+class FakePayPayClient:
+    base_url = "https://stg-api.sandbox.paypay.ne.jp"
+
+    def __init__(self) -> None:
+        self.session = FakeSession()
+
+
+class TestConnectionWarmer:
+    """Tests for startup pings and keep-alive."""
+
+    @pytest.mark.asyncio
+    async def test_warm_up_reports_each_target(self):
+        """Test that failing or hanging targets are counted without raising."""
+        ok = CountingPing()
+        warmer = ConnectionWarmer(
+            {
+                "ok": ok,
+                "broken": CountingPing(error=ConnectionError("refused")),
+                "slow": CountingPing(delay=1),
+            },
+            timeout=0.01,
+        )
+
+        results = await warmer.warm_up()
+
+        assert results == {"ok": True, "broken": False, "slow": False}
+        assert metrics.summary("connection_ping_seconds", target="ok", phase="warmup")[0] == 1
+        for target in ("broken", "slow"):
+            assert metrics.get(
+                "connection_ping_failures_total", target=target, phase="warmup"
+            ) == 1
+        assert metrics.get("warmup_seconds") < 1
+
+    @pytest.mark.asyncio
+    async def test_keepalive_repeats_until_closed(self):
+        """Test that pings repeat every interval and stop on close."""
+        ping = CountingPing()
+        warmer = ConnectionWarmer({"ok": ping}, keepalive_interval=0.01)
+
+        warmer.start_keepalive()
+        await asyncio.sleep(0.05)
+        await warmer.close()
+        calls = ping.calls
+        await asyncio.sleep(0.03)
+
+        assert calls >= 2
+        assert ping.calls == calls
+
+    def test_request_phases(self):
+        """Test that only the first request of the process is labelled first."""
+        phases = RequestPhases()
+        for seconds in (0.5, 0.01, 0.02):
+            phases.observe(seconds)
+
+        assert metrics.summary("http_request_seconds", phase="first") == (1, 0.5, 0.5)
+        assert metrics.summary("http_request_seconds", phase="steady")[0] == 2
+
+
+class TestPayPayPing:
+    """Tests for keeping the PayPay connection open."""
+
+    @pytest.mark.asyncio
+    async def test_ping_opens_connection_in_session_pool(self):
+        """Test that the ping goes through the SDK's requests session."""
+        adapter = PayPayAdapter(timeout=3.0)
+        adapter._client = FakePayPayClient()
+
+        await adapter.ping()
+
+        assert adapter._client.session.heads == [(FakePayPayClient.base_url, 3.0)]
+
+    @pytest.mark.asyncio
+    async def test_mock_mode_has_nothing_to_ping(self):
+        """Test that the mock adapter pings without a client."""
+        await PayPayAdapter().ping()
+
+
+class TestLifespan:
+    """Tests for the warm-up in the application lifespan."""
+
+    def test_startup_warms_configured_targets(self):
+        """Test that the lifespan pings the repository and counter, not mock providers."""
+        with TestClient(app) as client:
+            assert client.get("/health").status_code == 200
+
+        for target in ("donations", "campaign_total"):
+            assert metrics.summary("connection_ping_seconds", target=target, phase="warmup")
+        for target in ("paypay", "rakuten"):
+            assert not metrics.summary("connection_ping_seconds", target=target, phase="warmup")
+
+    def test_startup_warms_configured_paypay(self, monkeypatch):
+        """Test that PayPay is warmed up once its API credentials are set."""
+        adapter = PayPayAdapter(timeout=3.0)
+        adapter._client = FakePayPayClient()
+        monkeypatch.setattr(settings, "paypay_api_key", "key")
+        monkeypatch.setattr(settings, "paypay_api_secret", "secret")
+        monkeypatch.setattr(main, "build_paypay_adapter", lambda: adapter)
+
+        with TestClient(app):
+            pass
+
+        assert adapter._client.session.heads
+        assert metrics.summary("connection_ping_seconds", target="paypay", phase="warmup")
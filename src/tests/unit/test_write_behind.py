@@ -0,0 +1,128 @@
+"""Unit tests for write-behind batching of payment events."""
+
+import asyncio
+from datetime import UTC, datetime
+
+import pytest
+
+from app import deadline
+from app.metrics import metrics
+from app.models.donation import DonationStatus, PaymentEvent, PaymentProvider
+from app.repositories.donation import FirestoreDonationRepository
+from app.repositories.write_behind import WriteBehindBuffer
+
+
+class RecordingCommit:
+    """Commit callable that records batches and can be made to fail."""
+
+    def __init__(self) -> None:
+        self.batches: list[list[int]] = []
+        self.failures = 0
+
+    async def __call__(self, records: list[int]) -> None:
+        await asyncio.sleep(0)
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("commit failed")
+        self.batches.append(records)
+
+
+def payment_event(provider_event_id: str) -> PaymentEvent:
+    return PaymentEvent(
+        id=f"evt_{provider_event_id}",
+        provider=PaymentProvider.PAYPAY,
+        provider_event_id=provider_event_id,
+        provider_order_id="order_1",
+        status=DonationStatus.COMPLETED,
+        received_at=datetime.now(UTC),
+        raw_payload={},
+        signature_valid=True,
+    )
+
+
+class TestWriteBehindBuffer:
+    """Tests for the generic write-behind buffer."""
+
+    @pytest.mark.asyncio
+    async def test_full_batch_commits_without_waiting(self):
+        """Test that reaching max_batch commits without waiting for the interval."""
+        commit = RecordingCommit()
+        buffer = WriteBehindBuffer("test", commit, flush_interval=60, max_batch=3)
+
+        for i in range(7):
+            await buffer.add(i, i)
+        assert 6 in buffer
+        await asyncio.sleep(0.01)
+
+        # Split into batches of max_batch; the remainder rides along
+        assert commit.batches == [[0, 1, 2], [3, 4, 5], [6]]
+        assert len(buffer) == 0
+        await buffer.close()
+
+    @pytest.mark.asyncio
+    async def test_flushes_after_interval_and_tracks_lag(self):
+        """Test that a partial batch is committed after the flush interval."""
+        commit = RecordingCommit()
+        buffer = WriteBehindBuffer("test", commit, flush_interval=0.01, max_batch=100)
+
+        await buffer.add("a", 1)
+        await buffer.add("a", 2)  # same key: already buffered
+        await asyncio.sleep(0.05)
+
+        assert commit.batches == [[1]]
+        count, _, worst = metrics.summary("write_behind_lag_seconds", buffer="test")
+        assert count == 1
+        assert worst >= 0.01
+
+    @pytest.mark.asyncio
+    async def test_failed_commit_keeps_records_visible(self):
+        """Test that records stay buffered and are retried after a failed commit."""
+        commit = RecordingCommit()
+        commit.failures = 1
+        buffer = WriteBehindBuffer("test", commit, flush_interval=0.01)
+
+        await buffer.add("a", 1)
+        await asyncio.sleep(0.015)
+        assert "a" in buffer
+        assert metrics.get("write_behind_commit_failures_total", buffer="test") == 1
+
+        await asyncio.sleep(0.05)
+        assert commit.batches == [[1]]
+        assert "a" not in buffer
+
+    @pytest.mark.asyncio
+    async def test_flusher_ignores_request_deadline(self):
+        """Test that the background flush does not inherit the caller's deadline."""
+        seen: list[float | None] = []
+
+        async def commit(records: list[int]) -> None:
+            seen.append(deadline.remaining())
+
+        buffer = WriteBehindBuffer("test", commit, flush_interval=0.01)
+        with deadline.scope(0.001):
+            await buffer.add("a", 1)
+        await asyncio.sleep(0.05)
+
+        assert seen == [None]
+
+
+class TestFirestoreEventWriteBehind:
+    """Tests for write-behind payment events in the Firestore repository."""
+
+    @pytest.mark.asyncio
+    async def test_buffered_event_is_a_duplicate_before_commit(self):
+        """Test that dedupe sees an event that has not been committed yet."""
+        repository = FirestoreDonationRepository(
+            project_id="test", event_write_behind=True, event_flush_interval=60
+        )
+        commit = RecordingCommit()
+        repository._event_buffer._commit = commit
+
+        await repository.save_payment_event(payment_event("pay_1"))
+
+        # Answered from the buffer, without a Firestore query
+        assert await repository.event_exists(PaymentProvider.PAYPAY, "pay_1")
+        assert commit.batches == []
+
+        await repository.close()
+        assert [event.provider_event_id for event in commit.batches[0]] == ["pay_1"]